@@ -1,14 +1,136 @@
-from flask import Blueprint, jsonify, request
+import math
+import numpy as np
+from datetime import datetime
+from flask import Blueprint, Response, request, stream_with_context
 from services.stock_service import StockService
 from services.prediction_service import PredictionService
-from models.prediction_model import PredictionModel
-from xai.explainer import ModelExplainer
+from services.quote_stream import QuoteHub
+from services.precompute import default_scheduler
+from services.offload import default_offload
+from services.lazy import Lazy, resolve
+from services.records import dumps
+from services.price_store import INTRADAY, DAILY
+from models.prediction_model import PredictionModel, RECOMMENDATIONS
+from models.simulation import METHODS as SIMULATION_METHODS
+from models.training import HORIZON_BARS
+from xai.explainer import ModelExplainer, DETAILS
+from api import serializers
+from api.serializers import jsonify
 
 api_blueprint = Blueprint('api', __name__)
-stock_service = StockService()
-prediction_model = PredictionModel()
-prediction_service = PredictionService(prediction_model)
-model_explainer = ModelExplainer(prediction_model)
+
+def precomputable(symbol, timeframe):
+    """Whether requests for a key count towards precomputing it: listed symbols at trained timeframes"""
+    return timeframe in HORIZON_BARS and stock_service.symbol_index.get(symbol) is not None
+
+def _prediction_service():
+    # Model scoring runs in PREDICTION_PROCESSES worker processes when set
+    service = PredictionService(resolve(prediction_model), resolve(model_explainer),
+                                offload=default_offload(PredictionModel))
+    # Hot predictions computed ahead of demand when PRECOMPUTE_ENABLED=1
+    service.precompute = default_scheduler(service.precompute_many, precomputable)
+    return service
+
+# Services are built on first use, in the worker process using them
+stock_service = Lazy(StockService)
+prediction_model = Lazy(lambda: PredictionModel(stock_service.price_store))
+model_explainer = Lazy(lambda: ModelExplainer(resolve(prediction_model)))
+prediction_service = Lazy(_prediction_service)
+quote_hub = Lazy(lambda: QuoteHub(stock_service.get_quotes, interval=1.0))
+
+# Listed symbols predicted and explained while warming up
+WARM_UP_SYMBOLS = 100
+
+# Upper bound on symbols x timeframes scored by a single batch request
+MAX_BATCH_SIZE = 5000
+
+# Simulated price paths per predicted interval, and across a whole batch request
+MAX_SIMULATION_PATHS = 100000
+MAX_BATCH_SIMULATION_PATHS = 10000000
+
+# Bars per line of a streamed historical response
+STREAM_CHUNK_BARS = 10000
+
+# Symbols one quote stream can follow, and seconds between keep-alive comments
+MAX_STREAM_SYMBOLS = 100
+STREAM_KEEPALIVE_SECONDS = 15
+
+def warm_up_tasks():
+    """(name, step) pairs that build the services, load models and fill caches before a worker takes traffic"""
+    def services():
+        for service in (stock_service, prediction_model, model_explainer, prediction_service):
+            resolve(service)
+    
+    def models():
+        registry = prediction_model.registry
+        if registry is not None:
+            registry.prefetch(registry.names()[:registry.max_resident], background=False)
+    
+    def offload():
+        if prediction_service.offload is not None:
+            prediction_service.offload.warm()
+    
+    def predictions():
+        symbols = [listing["symbol"] for listing in stock_service.symbol_index.listings[:WARM_UP_SYMBOLS]]
+        model_explainer.explain_many(prediction_service.predict_many(symbols, '3m'), 'summary')
+    
+    return [
+        ('services', services),
+        ('models', models),
+        ('offload', offload),
+        ('market', lambda: stock_service.get_market_summary()),
+        ('predictions', predictions)
+    ]
+
+# Bar lengths in seconds that raw bars can be requested at
+BAR_RESOLUTIONS = (INTRADAY, DAILY)
+
+def _parse_time(value):
+    """Epoch seconds from an epoch number or ISO 8601 query parameter"""
+    if value is None:
+        return None
+    try:
+        seconds = float(value)
+    except ValueError:
+        # fromisoformat only reads a trailing Z from Python 3.11
+        if value[-1:] in ('Z', 'z'):
+            value = value[:-1] + '+00:00'
+        return int(datetime.fromisoformat(value).timestamp())
+    # int() of inf or nan would raise OverflowError or ValueError past the callers' checks
+    if not math.isfinite(seconds):
+        raise ValueError(f"Time must be a finite number of epoch seconds, got {value}")
+    return int(seconds)
+
+def _bar_range():
+    """(start, end, bar seconds) of a raw bars request; ValueError if any of them is invalid"""
+    start = _parse_time(request.args.get('start'))
+    end = _parse_time(request.args.get('end'))
+    interval = request.args.get('interval', str(INTRADAY))
+    if not interval.isdigit() or int(interval) not in BAR_RESOLUTIONS:
+        raise ValueError(f"'interval' must be one of {', '.join(map(str, BAR_RESOLUTIONS))} seconds")
+    return start, end, int(interval)
+
+def _ndjson_bars(symbol, bars, chunk_size):
+    """Stream bars as NDJSON: a header line, one line of columns per chunk, then a trailer"""
+    yield dumps({
+        'symbol': symbol,
+        'barSeconds': bars.bar_seconds,
+        'count': len(bars),
+        'fields': ['timestamps', 'open', 'high', 'low', 'close', 'volume']
+    }) + b'\n'
+    
+    # Columns are encoded straight from the arrays, without building lists of floats
+    for chunk in bars.chunks(chunk_size):
+        yield dumps({
+            'timestamps': chunk.timestamps,
+            'open': chunk.open,
+            'high': chunk.high,
+            'low': chunk.low,
+            'close': chunk.close,
+            'volume': chunk.volume
+        }) + b'\n'
+    
+    yield dumps({'done': True, 'count': len(bars)}) + b'\n'
 
 @api_blueprint.route('/stocks', methods=['GET'])
 def get_stocks():
@@ -43,11 +165,87 @@ def get_stock_details(symbol):
             'error': str(e)
         }), 500
 
+@api_blueprint.route('/quotes', methods=['GET'])
+def get_quotes():
+    """Get live quotes for a comma-separated list of symbols"""
+    symbols = [symbol for symbol in request.args.get('symbols', '').split(',') if symbol]
+    if not symbols:
+        return jsonify({
+            'success': False,
+            'error': "'symbols' must list at least one ticker symbol"
+        }), 400
+    if len(symbols) > MAX_BATCH_SIZE:
+        return jsonify({
+            'success': False,
+            'error': f"At most {MAX_BATCH_SIZE} symbols per request"
+        }), 400
+    
+    try:
+        quotes = stock_service.get_quotes(symbols)
+        return jsonify({
+            'success': True,
+            'data': quotes
+        })
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@api_blueprint.route('/stream/quotes', methods=['GET'])
+def stream_quotes():
+    """Stream live quotes for a comma-separated list of symbols as Server-Sent Events
+    
+    Each connection holds a worker thread, so serve streams from threaded
+    or async workers.
+    """
+    symbols = [symbol for symbol in request.args.get('symbols', '').split(',') if symbol]
+    if not symbols or len(symbols) > MAX_STREAM_SYMBOLS:
+        return jsonify({
+            'success': False,
+            'error': f"'symbols' must list between 1 and {MAX_STREAM_SYMBOLS} ticker symbols"
+        }), 400
+    
+    subscription = quote_hub.subscribe(symbols)
+    
+    def events():
+        try:
+            yield "retry: 3000\n\n"
+            while True:
+                event = subscription.get(timeout=STREAM_KEEPALIVE_SECONDS)
+                if event is not None:
+                    yield event.payload
+                elif subscription.closed:
+                    yield f"event: closed\ndata: {dumps({'reason': subscription.closed_reason}).decode('utf-8')}\n\n"
+                    return
+                else:
+                    yield ": keep-alive\n\n"
+        finally:
+            quote_hub.unsubscribe(subscription)
+    
+    return Response(
+        events(),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
 @api_blueprint.route('/stocks/<string:symbol>/historical', methods=['GET'])
 def get_historical_data(symbol):
     """Get historical price data for a stock"""
     timeframe = request.args.get('timeframe', '1m')
     
+    if request.args.get('stream', '0') not in ('0', 'false', ''):
+        return stream_historical_data(symbol, timeframe)
+    
+    response_format = serializers.negotiate(request)
+    if serializers.wants_unavailable_arrow(request):
+        return jsonify({
+            'success': False,
+            'error': 'Arrow output requires pyarrow on the server'
+        }), 406
+    if response_format != serializers.JSON:
+        return historical_columns(symbol, timeframe, response_format)
+    
     try:
         data = stock_service.get_historical_data(symbol, timeframe)
         return jsonify({
@@ -60,24 +258,126 @@ def get_historical_data(symbol):
             'error': str(e)
         }), 500
 
+def historical_columns(symbol, timeframe, response_format):
+    """Historical bars as binary columns straight from the stored NumPy arrays"""
+    bar_range = None
+    if any(arg in request.args for arg in ('start', 'end', 'interval')):
+        try:
+            bar_range = _bar_range()
+        except ValueError as e:
+            return jsonify({
+                'success': False,
+                'error': f"Invalid bar range: {e}"
+            }), 400
+    
+    try:
+        if bar_range is not None:
+            # Raw bars over an explicit range
+            bars = stock_service.get_historical_bars(symbol, timeframe, *bar_range)
+        else:
+            bars = stock_service.get_historical_series(symbol, timeframe)
+        
+        return serializers.binary_response(
+            response_format,
+            {
+                'timestamps': bars.timestamps,
+                'open': bars.open,
+                'high': bars.high,
+                'low': bars.low,
+                'close': bars.close,
+                'volume': bars.volume
+            },
+            {'symbol': symbol, 'timeframe': timeframe, 'barSeconds': bars.bar_seconds}
+        )
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+def stream_historical_data(symbol, timeframe):
+    """Stream raw historical bars for long ranges as chunked NDJSON"""
+    try:
+        start, end, bar_seconds = _bar_range()
+        chunk_size = min(max(request.args.get('chunk', STREAM_CHUNK_BARS, type=int), 1), 100000)
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'error': f"Invalid bar range: {e}"
+        }), 400
+    
+    try:
+        # Resolve the range up front so errors still get a proper status code
+        bars = stock_service.get_historical_bars(symbol, timeframe, start, end, bar_seconds)
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+    
+    return Response(
+        stream_with_context(_ndjson_bars(symbol, bars, chunk_size)),
+        mimetype='application/x-ndjson'
+    )
+
+def explanation_detail(value):
+    """Validated explanation level ('none' when not requested), or None if invalid"""
+    value = value or 'none'
+    return value if value == 'none' or value in DETAILS else None
+
+def simulation_error(paths, method, timeframes):
+    """Why a prediction interval request is invalid, or None if it is fine (or not made)"""
+    if paths is None:
+        return None
+    if not isinstance(paths, int) or isinstance(paths, bool) or not 0 < paths <= MAX_SIMULATION_PATHS:
+        return f"'intervals' must be a number of paths between 1 and {MAX_SIMULATION_PATHS}"
+    if method not in SIMULATION_METHODS:
+        return f"'method' must be one of {', '.join(SIMULATION_METHODS)}"
+    unknown = [timeframe for timeframe in timeframes if timeframe not in HORIZON_BARS]
+    if unknown:
+        return f"Intervals need a timeframe of {', '.join(HORIZON_BARS)}"
+    return None
+
 @api_blueprint.route('/stocks/<string:symbol>/predict', methods=['GET'])
 def predict_stock(symbol):
-    """Get prediction for a stock with XAI explanations"""
+    """Get prediction for a stock, with XAI explanations if asked for (?explain=none|summary|full)
+    
+    ?intervals=<paths> adds percentile bands and the probability of gain
+    from that many simulated price paths (?method=gbm|bootstrap).
+    """
     timeframe = request.args.get('timeframe', '3m')
+    detail = explanation_detail(request.args.get('explain'))
+    paths = request.args.get('intervals')
+    method = request.args.get('method', 'gbm')
+    if detail is None:
+        return jsonify({
+            'success': False,
+            'error': f"'explain' must be one of none, {', '.join(DETAILS)}"
+        }), 400
+    if paths is not None and paths.isdigit():
+        paths = int(paths)
+    error = simulation_error(paths, method, [timeframe])
+    if error:
+        return jsonify({
+            'success': False,
+            'error': error
+        }), 400
     
     try:
         # Get prediction
-        prediction = prediction_service.predict(symbol, timeframe)
+        prediction = prediction_service.predict(symbol, timeframe, paths, method)
+        data = {
+            'prediction': prediction,
+            'explanationUrl': f"/api/predictions/{prediction.id}/explanation"
+        }
         
-        # Get explanation
-        explanation = model_explainer.explain_prediction(symbol, prediction)
+        # Explanations are only computed for callers who ask for them
+        if detail != 'none':
+            data['explanation'] = prediction_service.explain(prediction.id, detail)
         
         return jsonify({
             'success': True,
-            'data': {
-                'prediction': prediction,
-                'explanation': explanation
-            }
+            'data': data
         })
     except Exception as e:
         return jsonify({
@@ -85,6 +385,137 @@ def predict_stock(symbol):
             'error': str(e)
         }), 500
 
+@api_blueprint.route('/predictions/<string:prediction_id>/explanation', methods=['GET'])
+def prediction_explanation(prediction_id):
+    """Get the explanation of a recently served prediction (?detail=summary|full)"""
+    detail = request.args.get('detail', 'full')
+    if detail not in DETAILS:
+        return jsonify({
+            'success': False,
+            'error': f"'detail' must be one of {', '.join(DETAILS)}"
+        }), 400
+    
+    try:
+        explanation = prediction_service.explain(prediction_id, detail)
+        return jsonify({
+            'success': True,
+            'data': explanation
+        })
+    except KeyError:
+        return jsonify({
+            'success': False,
+            'error': f"Unknown or expired prediction {prediction_id}"
+        }), 404
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@api_blueprint.route('/predict/batch', methods=['POST'])
+def predict_batch():
+    """Get predictions, with XAI explanations if asked for, for many stocks in one request"""
+    payload = request.get_json(silent=True) or {}
+    symbols = payload.get('symbols')
+    timeframes = payload.get('timeframes') or [payload.get('timeframe', '3m')]
+    detail = explanation_detail(payload.get('explain'))
+    paths = payload.get('intervals')
+    method = payload.get('method', 'gbm')
+    
+    if not isinstance(symbols, list) or not symbols or not all(isinstance(s, str) and s for s in symbols):
+        return jsonify({
+            'success': False,
+            'error': "'symbols' must be a non-empty list of ticker symbols"
+        }), 400
+    if not isinstance(timeframes, list) or not all(isinstance(t, str) for t in timeframes):
+        return jsonify({
+            'success': False,
+            'error': "'timeframes' must be a list of timeframe strings"
+        }), 400
+    if detail is None:
+        return jsonify({
+            'success': False,
+            'error': f"'explain' must be one of none, {', '.join(DETAILS)}"
+        }), 400
+    if len(symbols) * len(timeframes) > MAX_BATCH_SIZE:
+        return jsonify({
+            'success': False,
+            'error': f"Batch too large, at most {MAX_BATCH_SIZE} predictions per request"
+        }), 400
+    error = simulation_error(paths, method, timeframes)
+    if error:
+        return jsonify({
+            'success': False,
+            'error': error
+        }), 400
+    if paths and len(symbols) * len(timeframes) * paths > MAX_BATCH_SIMULATION_PATHS:
+        return jsonify({
+            'success': False,
+            'error': f"Batch too large, at most {MAX_BATCH_SIMULATION_PATHS} simulated paths per request"
+        }), 400
+    
+    response_format = serializers.negotiate(request)
+    if serializers.wants_unavailable_arrow(request):
+        return jsonify({
+            'success': False,
+            'error': 'Arrow output requires pyarrow on the server'
+        }), 406
+    if response_format != serializers.JSON:
+        return batch_columns(symbols, timeframes, response_format)
+    
+    try:
+        results = []
+        for timeframe in timeframes:
+            # Score every symbol for this timeframe in one batched model call
+            predictions = prediction_service.predict_many(symbols, timeframe, paths, method)
+            if detail == 'none':
+                results.extend({'prediction': prediction} for prediction in predictions)
+                continue
+            
+            explanations = prediction_service.explain_many(predictions, detail)
+            results.extend(
+                {'prediction': prediction, 'explanation': explanation}
+                for prediction, explanation in zip(predictions, explanations)
+            )
+        
+        return jsonify({
+            'success': True,
+            'data': results
+        })
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+def batch_columns(symbols, timeframes, response_format):
+    """Batch prediction scores as binary columns, one row per symbol and timeframe
+    
+    Explanations are text and stay on the JSON path. Symbols and
+    timeframes of the rows are listed in the metadata, and the
+    recommendation column holds codes into the listed recommendations.
+    """
+    try:
+        scores = [prediction_service.score_many(symbols, timeframe) for timeframe in timeframes]
+        columns = {
+            name: np.concatenate([score[name] for score in scores])
+            for name in ('currentPrice', 'predictedPrice', 'percentChange', 'confidence', 'recommendation')
+        }
+        return serializers.binary_response(
+            response_format,
+            columns,
+            {
+                'symbols': symbols * len(timeframes),
+                'timeframes': [timeframe for timeframe in timeframes for _ in symbols],
+                'recommendations': RECOMMENDATIONS.tolist()
+            }
+        )
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
 @api_blueprint.route('/market/summary', methods=['GET'])
 def get_market_summary():
     """Get summary of the overall market"""
@@ -102,15 +533,62 @@ def get_market_summary():
 
 @api_blueprint.route('/market/movers', methods=['GET'])
 def get_market_movers():
-    """Get top gainers and losers in the market"""
+    """Get top gainers and losers in the market, optionally within one sector"""
     limit = request.args.get('limit', 5, type=int)
+    sector = request.args.get('sector') or None
     
     try:
-        movers = stock_service.get_market_movers(limit)
+        movers = stock_service.get_market_movers(limit, sector)
         return jsonify({
             'success': True,
             'data': movers
         })
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 400
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@api_blueprint.route('/portfolio/risk', methods=['POST'])
+def get_portfolio_risk():
+    """Get volatility, VaR/CVaR, beta against an index and correlations of a portfolio
+    
+    The body holds {"holdings": {symbol: shares}} and optionally an
+    "index" from the market summary and a VaR "confidence".
+    """
+    payload = request.get_json(silent=True) or {}
+    holdings = payload.get('holdings')
+    index = payload.get('index', 'S&P 500')
+    confidence = payload.get('confidence', 0.95)
+    
+    if not isinstance(holdings, dict) or not all(
+            isinstance(shares, (int, float)) and not isinstance(shares, bool) for shares in holdings.values()):
+        return jsonify({
+            'success': False,
+            'error': "'holdings' must map ticker symbols to numbers of shares"
+        }), 400
+    if not isinstance(confidence, (int, float)) or not isinstance(index, str):
+        return jsonify({
+            'success': False,
+            'error': "'confidence' must be a number and 'index' an index name"
+        }), 400
+    
+    try:
+        risk = stock_service.get_portfolio_risk(holdings, index, confidence)
+        return jsonify({
+            'success': True,
+            'data': risk
+        })
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 400
     except Exception as e:
         return jsonify({
             'success': False,
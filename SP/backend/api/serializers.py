@@ -0,0 +1,131 @@
+"""Binary wire formats for numeric API payloads
+
+Large price series and batch predictions are mostly numbers, and turning
+each one into decimal text for JSON dominates encode and parse time.
+Clients that send a matching Accept header get the columns instead as
+
+* ``application/vnd.apache.arrow.stream`` - an Arrow IPC stream with one
+  record batch (requires the optional ``pyarrow`` package), or
+* ``application/vnd.stockpredict.columns`` - a packed format: the 8-byte
+  magic ``SPCOLS01``, a little-endian uint32 header length, a UTF-8 JSON
+  header, then each column's raw little-endian buffer, 8-byte aligned.
+  The header holds ``metadata`` plus a ``columns`` list of
+  ``{name, dtype, length, offset}`` where offset is relative to the end
+  of the padded header, so a browser can wrap each column in a
+  Float64Array/BigInt64Array view without parsing.
+
+JSON stays the default, encoded by services.records.dumps.
+"""
+import importlib.util
+import json
+import struct
+
+import numpy as np
+from flask import Response
+
+from services import records
+
+# Arrow output is optional; pyarrow is imported by the first Arrow response, not at startup
+ARROW_AVAILABLE = importlib.util.find_spec('pyarrow') is not None
+
+JSON = 'application/json'
+ARROW_STREAM = 'application/vnd.apache.arrow.stream'
+PACKED_COLUMNS = 'application/vnd.stockpredict.columns'
+
+PACKED_MAGIC = b'SPCOLS01'
+
+
+def negotiate(request):
+    """Response format for a request: JSON unless a binary format is explicitly accepted
+
+    A binary format named in the Accept header wins over JSON at the same
+    quality; one matched only through a wildcard (e.g. */*) doesn't.
+    """
+    accept = request.accept_mimetypes
+    binary = [PACKED_COLUMNS] + ([ARROW_STREAM] if ARROW_AVAILABLE else [])
+    named = [mimetype for mimetype in binary if any(value == mimetype for value, _ in accept)]
+    best = accept.best_match(named + [JSON], default=JSON)
+    if best != JSON and accept[best] < accept[JSON]:
+        return JSON
+    return best
+
+
+def wants_unavailable_arrow(request):
+    """True if the client only accepts Arrow but pyarrow isn't installed"""
+    return not ARROW_AVAILABLE and request.accept_mimetypes.best == ARROW_STREAM
+
+
+def jsonify(payload):
+    """JSON response for a payload of dicts, lists, records and NumPy values"""
+    return Response(records.dumps(payload), mimetype=JSON)
+
+
+def _padding(size):
+    return b'\0' * (-size % 8)
+
+
+def pack_columns(columns, metadata=None):
+    """Encode numeric columns in the packed format, as a list of byte chunks
+
+    Columns that are already contiguous little-endian arrays are not
+    converted; the only copy is into the bytes objects WSGI servers require.
+    """
+    arrays = []
+    header_columns = []
+    offset = 0
+    for name, values in columns.items():
+        values = np.asarray(values)
+        dtype = '<i8' if values.dtype.kind in 'iub' else '<f8'
+        array = np.ascontiguousarray(values, dtype=dtype)
+        arrays.append(array)
+        header_columns.append({"name": name, "dtype": dtype, "length": len(array), "offset": offset})
+        offset += array.nbytes + (-array.nbytes % 8)
+
+    header = json.dumps({"metadata": metadata or {}, "columns": header_columns}).encode('utf-8')
+    chunks = [PACKED_MAGIC, struct.pack('<I', len(header)), header, _padding(len(PACKED_MAGIC) + 4 + len(header))]
+    for array in arrays:
+        chunks.append(array.tobytes())
+        chunks.append(_padding(array.nbytes))
+    return chunks
+
+
+def unpack_columns(payload):
+    """Decode a packed payload into (metadata, {name: array}) with zero-copy views"""
+    if payload[:len(PACKED_MAGIC)] != PACKED_MAGIC:
+        raise ValueError("Not a packed columns payload")
+    (header_length,) = struct.unpack_from('<I', payload, len(PACKED_MAGIC))
+    header_end = len(PACKED_MAGIC) + 4 + header_length
+    header = json.loads(bytes(payload[len(PACKED_MAGIC) + 4:header_end]))
+    body = header_end + (-header_end % 8)
+    columns = {
+        column["name"]: np.frombuffer(payload, dtype=column["dtype"], count=column["length"],
+                                      offset=body + column["offset"])
+        for column in header["columns"]
+    }
+    return header["metadata"], columns
+
+
+def arrow_stream(columns, metadata=None):
+    """Encode columns as an Arrow IPC stream with a single record batch"""
+    import pyarrow
+    import pyarrow.ipc
+    batch = pyarrow.RecordBatch.from_pydict(
+        {name: pyarrow.array(values) for name, values in columns.items()},
+        metadata={key: json.dumps(value) for key, value in (metadata or {}).items()}
+    )
+    sink = pyarrow.BufferOutputStream()
+    with pyarrow.ipc.new_stream(sink, batch.schema) as writer:
+        writer.write_batch(batch)
+    return [sink.getvalue().to_pybytes()]
+
+
+def binary_response(mimetype, columns, metadata=None):
+    """Response carrying columns in the negotiated binary format"""
+    if mimetype == ARROW_STREAM:
+        chunks = arrow_stream(columns, metadata)
+    else:
+        chunks = pack_columns(columns, metadata)
+    response = Response(chunks, mimetype=mimetype)
+    response.headers['Content-Length'] = str(sum(len(chunk) for chunk in chunks))
+    response.headers['Vary'] = 'Accept'
+    return response
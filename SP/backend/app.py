@@ -1,23 +1,129 @@
-from flask import Flask, jsonify, request
+from flask import Flask, Response, g, request
 from flask_cors import CORS
 import os
+import tempfile
+import threading
+import time
 from datetime import datetime
-from api.routes import api_blueprint
+from api.routes import api_blueprint, prediction_service, stock_service, warm_up_tasks
+from api.serializers import jsonify
+from services.cache import response_cache
+from services.lazy import is_built
+from services.metrics import metrics, http_requests
+from services.profiler import StackSampler
+from services.readiness import Readiness
 
-app = Flask(__name__)
-CORS(app)
+STARTED_AT = time.time()
 
-# Register blueprints
-app.register_blueprint(api_blueprint, url_prefix='/api')
+@metrics.collect
+def _component_metrics():
+    cache = response_cache.stats()
+    prices = stock_service.price_store.stats()
+    return [
+        ('response_cache_hits_total', 'counter', 'Response cache hits', cache['hits']),
+        ('response_cache_misses_total', 'counter', 'Response cache misses', cache['misses']),
+        ('response_cache_entries', 'gauge', 'Entries in the response cache', cache['entries']),
+        ('response_cache_bytes', 'gauge', 'Estimated bytes held by the response cache', cache['bytes']),
+        ('price_store_resident_bytes', 'gauge', 'Bytes of bar series held in memory', prices['residentBytes']),
+        ('process_uptime_seconds', 'gauge', 'Seconds since the app was loaded', round(time.time() - STARTED_AT, 3))
+    ]
 
-@app.route('/health', methods=['GET'])
-def health_check():
-    return jsonify({
-        'status': 'healthy',
-        'timestamp': datetime.now().isoformat(),
-        'version': '1.0.0'
-    })
+def create_app(readiness_gate=None, profiling=None):
+    """Create the Flask app
+    
+    Its readiness (app.extensions['readiness']) runs the warm-up steps:
+    gunicorn.conf.py runs them before a worker accepts connections. With
+    the readiness gate on (READINESS_GATE=1), API requests get
+    503 until they have finished, and the first one starts them.
+    
+    Every request is counted and timed per route on /metrics. With
+    profiling allowed (PROFILING_ENABLED=1), a request with ?profile=1 is
+    sampled and its collapsed stacks written to PROFILE_DIR, named in the
+    X-Profile response header.
+    """
+    app = Flask(__name__)
+    CORS(app)
+    
+    # Register blueprints
+    app.register_blueprint(api_blueprint, url_prefix='/api')
+    
+    if profiling is None:
+        profiling = os.environ.get('PROFILING_ENABLED', '0') == '1'
+    profile_dir = os.environ.get('PROFILE_DIR') or os.path.join(tempfile.gettempdir(), 'profiles')
+    
+    @app.before_request
+    def start_request():
+        current = request._get_current_object()
+        if metrics.enabled:
+            http_requests.start(current.url_rule, current.method)
+        # The raw query string is checked first, as parsing it costs more than the rest of the hook
+        if profiling and b'profile=' in current.query_string and current.args.get('profile') == '1':
+            g.sampler = StackSampler(threading.get_ident()).start()
+    
+    @app.after_request
+    def finish_request(response):
+        if profiling:
+            sampler = g.pop('sampler', None)
+            if sampler is not None:
+                response.headers['X-Profile'] = sampler.stop().write(profile_dir, request.path)
+        http_requests.finish(response.status_code)
+        return response
+    
+    @app.teardown_request
+    def end_request(error):
+        # Counts a request that failed before a response could be made
+        http_requests.finish(500)
+    
+    readiness = Readiness(warm_up_tasks())
+    app.extensions['readiness'] = readiness
+    if readiness_gate is None:
+        readiness_gate = os.environ.get('READINESS_GATE', '0') == '1'
+    
+    if readiness_gate:
+        @app.before_request
+        def require_ready():
+            if readiness.ready or not request.path.startswith('/api/'):
+                return None
+            readiness.start()
+            response = jsonify({
+                'success': False,
+                'error': 'Warming up, try again shortly'
+            })
+            response.headers['Retry-After'] = '1'
+            return response, 503
+    
+    @app.route('/health', methods=['GET'])
+    def health_check():
+        # Reading the prediction service would build it; before then it has nothing to report
+        predictions = prediction_service if is_built(prediction_service) else None
+        precompute = predictions.precompute if predictions is not None else None
+        offload = predictions.offload if predictions is not None else None
+        return jsonify({
+            'status': 'healthy',
+            'timestamp': datetime.now().isoformat(),
+            'version': '1.0.0',
+            'uptimeSeconds': round(time.time() - STARTED_AT, 3),
+            'pid': os.getpid(),
+            'cache': response_cache.stats(),
+            'precompute': precompute.stats() if precompute else None,
+            'offload': offload.stats() if offload else None
+        })
+    
+    @app.route('/metrics', methods=['GET'])
+    def metrics_endpoint():
+        """Metrics of this worker in the Prometheus text format"""
+        return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+    
+    @app.route('/ready', methods=['GET'])
+    def readiness_check():
+        """200 once the warm-up steps have run, 503 before"""
+        return jsonify(readiness.stats()), 200 if readiness.ready else 503
+    
+    return app
+
+app = create_app()
 
 if __name__ == '__main__':
     port = int(os.environ.get('PORT', 5000))
-    app.run(host='0.0.0.0', port=port, debug=True)
\ No newline at end of file
+    app.extensions['readiness'].start()
+    app.run(host='0.0.0.0', port=port, debug=os.environ.get('FLASK_DEBUG', '0') == '1')
@@ -0,0 +1,122 @@
+"""Benchmark memory-mapped bar archive sharing across worker processes
+
+Builds a synthetic archive, then starts 4 and 16 worker processes that
+either map the archive (shared page cache) or copy the whole history into
+private memory, as a per-worker loader would. Each worker reports its
+startup time, first-query (cold) and steady-state (warm) latency, RSS and
+PSS (proportional set size, which splits shared pages between processes).
+
+Usage: python -m benchmarks.bench_bar_archive [--symbols 2000] [--workers 4 16] [--archive DIR]
+"""
+import argparse
+import multiprocessing
+import os
+import random
+import shutil
+import tempfile
+import time
+
+import numpy as np
+
+from benchmarks.common import synthetic_symbols, memory_kb, percentiles_ms, print_table
+from services.bar_archive import BarArchive, ArchiveBarLoader, build_synthetic
+from services.price_store import PriceStore, PriceSeries, INTRADAY, DAILY
+
+
+class CopyLoader:
+    """Loads every series into private memory up front"""
+
+    def __init__(self, archive):
+        self.series = {}
+        for symbol in archive.symbols():
+            for bar_seconds in (INTRADAY, DAILY):
+                mapped = archive.read(symbol, bar_seconds)
+                self.series[(symbol, bar_seconds)] = PriceSeries(
+                    *(np.array(column) for column in mapped.columns()), bar_seconds)
+
+    def __call__(self, symbol, bar_seconds):
+        return self.series[(symbol, bar_seconds)]
+
+
+def worker(path, mode, symbols, queries, barrier, results):
+    start = time.perf_counter()
+    archive = BarArchive(path)
+    loader = ArchiveBarLoader(archive) if mode == 'mmap' else CopyLoader(archive)
+    store = PriceStore(loader, memory_budget=1 << 40)
+    startup = time.perf_counter() - start
+
+    rng = random.Random(os.getpid())
+    timings = []
+    for _ in range(queries):
+        symbol = rng.choice(symbols)
+        query_start = time.perf_counter()
+        series = store.get(symbol, INTRADAY)
+        window = series.slice(start=series.timestamps[-1] - DAILY).resample('h')
+        float(window.close.mean())
+        timings.append(time.perf_counter() - query_start)
+
+    # Measure memory while every worker is still alive so shared pages are split
+    barrier.wait()
+    rss, pss = memory_kb()
+    results.put((startup, timings[0], percentiles_ms(timings[1:], (50, 99)), rss, pss))
+    barrier.wait()
+
+
+def run(path, mode, workers, symbols, queries):
+    context = multiprocessing.get_context('fork')
+    barrier = context.Barrier(workers)
+    results = context.Queue()
+    processes = [
+        context.Process(target=worker, args=(path, mode, symbols, queries, barrier, results))
+        for _ in range(workers)
+    ]
+    for process in processes:
+        process.start()
+    collected = [results.get() for _ in processes]
+    for process in processes:
+        process.join()
+
+    startup = np.mean([r[0] for r in collected]) * 1000
+    cold = np.mean([r[1] for r in collected]) * 1000
+    warm = np.mean([r[2]['p50'] for r in collected])
+    rss = np.mean([r[3] for r in collected]) / 1024
+    pss = np.mean([r[4] for r in collected]) / 1024
+    return [mode, workers, f"{startup:.1f}", f"{cold:.3f}", f"{warm:.3f}", f"{rss:.1f}", f"{pss:.1f}"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--symbols', type=int, default=2000)
+    parser.add_argument('--intraday-days', type=int, default=30)
+    parser.add_argument('--workers', type=int, nargs='+', default=[4, 16])
+    parser.add_argument('--queries', type=int, default=2000)
+    parser.add_argument('--archive', help='existing archive to use instead of building one')
+    args = parser.parse_args()
+
+    temp_dir = None
+    path = args.archive
+    symbols = synthetic_symbols(args.symbols)
+    if path is None:
+        temp_dir = tempfile.mkdtemp(prefix='bars-')
+        path = os.path.join(temp_dir, 'archive')
+        build_synthetic(path, symbols, args.intraday_days)
+    else:
+        symbols = BarArchive(path).symbols()
+
+    size_mb = sum(os.path.getsize(os.path.join(path, name)) for name in os.listdir(path)) / 2 ** 20
+    print(f"archive: {len(symbols)} symbols, {size_mb:.1f} MB")
+
+    rows = []
+    try:
+        for workers in args.workers:
+            for mode in ('mmap', 'copy'):
+                rows.append(run(path, mode, workers, symbols, args.queries))
+    finally:
+        if temp_dir:
+            shutil.rmtree(temp_dir)
+
+    print_table(['mode', 'workers', 'startup ms', 'cold query ms', 'warm p50 ms', 'RSS MB/worker', 'PSS MB/worker'], rows)
+
+
+if __name__ == '__main__':
+    main()
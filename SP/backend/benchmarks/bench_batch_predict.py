@@ -0,0 +1,55 @@
+"""Benchmark the batch prediction endpoint against the per-symbol route
+
+Usage: python -m benchmarks.bench_batch_predict [--sizes 10 100 1000] [--repeat 3]
+"""
+import argparse
+
+from app import app
+from services.cache import response_cache
+from benchmarks.common import synthetic_symbols, time_calls, print_table
+
+
+def run_per_symbol(client, symbols, timeframe):
+    for symbol in symbols:
+        response = client.get(f'/api/stocks/{symbol}/predict?timeframe={timeframe}')
+        assert response.status_code == 200
+
+
+def run_batch(client, symbols, timeframe):
+    response = client.post('/api/predict/batch', json={'symbols': symbols, 'timeframe': timeframe})
+    assert response.status_code == 200
+    assert len(response.get_json()['data']) == len(symbols)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10, 100, 1000])
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--timeframe', default='3m')
+    args = parser.parse_args()
+
+    # Compare scoring cost, not cached responses
+    response_cache.enabled = False
+    client = app.test_client()
+    rows = []
+    for size in args.sizes:
+        symbols = synthetic_symbols(size)
+        per_symbol = min(time_calls(lambda: run_per_symbol(client, symbols, args.timeframe), args.repeat))
+        batch = min(time_calls(lambda: run_batch(client, symbols, args.timeframe), args.repeat))
+        rows.append([
+            size,
+            f"{size / per_symbol:,.0f}",
+            f"{per_symbol / size * 1e3:.3f}",
+            f"{1 / batch:,.1f}",
+            f"{batch / size * 1e3:.3f}",
+            f"{per_symbol / batch:.1f}x"
+        ])
+
+    print_table(
+        ['symbols', 'per-symbol req/s', 'per-symbol ms/sym', 'batch req/s', 'batch ms/sym', 'speedup'],
+        rows
+    )
+
+
+if __name__ == '__main__':
+    main()
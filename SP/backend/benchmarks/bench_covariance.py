@@ -0,0 +1,85 @@
+"""Benchmark the EWMA covariance behind /api/portfolio/risk: full recompute vs incremental update
+
+For each universe size, lists the synthetic symbols and tracks them in
+a CovarianceTracker, then times:
+
+* full recompute: rebuild() of the whole matrix from the trailing
+  returns, O(n^2 T), what recomputing per request or per bar would cost
+* incremental: update() with one new bar of returns, O(n^2)
+* request: StockService.get_portfolio_risk for random portfolios of
+  --holdings symbols drawn from the universe, with the matrix warm
+
+and checks that the incremental matrix matches a recompute over the
+same window.
+
+Usage: python -m benchmarks.bench_covariance [--universes 500 5000] [--holdings 20] [--requests 200]
+"""
+import argparse
+import time
+
+import numpy as np
+
+from benchmarks.common import synthetic_symbols, time_calls, percentiles_ms, print_table
+from services import reference_data
+from services.price_store import PriceStore, SyntheticBarLoader
+from services.stock_service import StockService
+from services.symbol_index import SymbolIndex
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--universes', type=int, nargs='+', default=[500, 5000])
+    parser.add_argument('--holdings', type=int, default=20)
+    parser.add_argument('--requests', type=int, default=200)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    rows = []
+    for universe in args.universes:
+        store = PriceStore(SyntheticBarLoader(history_days=400), memory_budget=2 * 1024 ** 3)
+        symbols = synthetic_symbols(universe)
+        listings = [{"symbol": symbol, "name": symbol, "sector": reference_data.sector(symbol)} for symbol in symbols]
+        service = StockService(price_store=store, symbol_index=SymbolIndex(listings))
+        tracker = service.covariance
+
+        start = time.perf_counter()
+        tracker.add(symbols)
+        build = time.perf_counter() - start
+
+        full = min(time_calls(tracker.rebuild, args.repeat))
+        rng = np.random.default_rng(0)
+        bars = iter(rng.normal(0, 0.02, (args.repeat, len(symbols))))
+        incremental = min(time_calls(lambda: tracker.update(next(bars)), args.repeat))
+
+        # The recursion and a recompute over the rolled window differ only by weights older than the window
+        updated = tracker.covariance(symbols)
+        tracker.rebuild()
+        error = np.abs(updated - tracker.covariance(symbols)).max() / np.abs(updated).max()
+
+        portfolios = [
+            {symbol: int(shares) for symbol, shares in zip(
+                rng.choice(symbols, args.holdings, replace=False), rng.integers(1, 100, args.holdings))}
+            for _ in range(args.requests)
+        ]
+        # Warm the prices the holdings are valued at, so requests measure the risk computation
+        for portfolio in portfolios:
+            service.get_portfolio_risk(portfolio)
+        timings = []
+        for portfolio in portfolios:
+            start = time.perf_counter()
+            service.get_portfolio_risk(portfolio)
+            timings.append(time.perf_counter() - start)
+        latency = percentiles_ms(timings, (50, 99))
+
+        rows.append([
+            universe, f"{build:.2f}", f"{full * 1000:,.1f}", f"{incremental * 1000:,.2f}",
+            f"{full / incremental:,.0f}x", f"{error:.1e}", latency['p50'], latency['p99'],
+            f"{tracker.stats()['matrixBytes'] / 2 ** 20:,.0f}"
+        ])
+
+    print_table(['symbols', 'track s', 'full recompute ms', 'incremental ms', 'ratio', 'rel. error',
+                 'request p50 ms', 'request p99 ms', 'matrix MB'], rows)
+
+
+if __name__ == '__main__':
+    main()
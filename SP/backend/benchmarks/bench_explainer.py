@@ -0,0 +1,90 @@
+"""Benchmark SHAP explanation latency per symbol, one at a time and batched
+
+Trains per-sector 3m models for a synthetic universe into a temporary
+registry, then explains predictions for 1 and 100 symbols:
+
+* kernel: model-agnostic KernelSHAP per symbol, what a naive integration pays
+* single: ModelExplainer.explain_prediction called once per symbol
+* batched: one ModelExplainer.explain_many call for all symbols
+* memoized: the batched call repeated for the same feature vectors
+
+Each measured pass uses symbols not explained before, so only the
+memoized row hits the attribution cache; explainers for the models are
+built in a warm-up pass first.
+
+Usage: python -m benchmarks.bench_explainer [--universe 300] [--counts 1 100]
+"""
+import argparse
+import os
+import shutil
+import tempfile
+import time
+
+import numpy as np
+import shap
+
+from benchmarks.common import synthetic_symbols, print_table
+from models import training
+from models.prediction_model import PredictionModel
+from models.registry import ModelRegistry
+from xai.explainer import ModelExplainer
+
+
+def per_symbol_ms(func, count):
+    start = time.perf_counter()
+    func()
+    return (time.perf_counter() - start) / count * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--universe', type=int, default=300, help='symbols to train the models on')
+    parser.add_argument('--counts', type=int, nargs='+', default=[1, 100])
+    parser.add_argument('--kernel-symbols', type=int, default=3, help='symbols to time KernelSHAP on')
+    args = parser.parse_args()
+
+    root = tempfile.mkdtemp(prefix='explainer-')
+    try:
+        start = time.perf_counter()
+        training.run(synthetic_symbols(args.universe), ['3m'], processes=1,
+                     cache_dir=os.path.join(root, 'cache'), registry=os.path.join(root, 'registry'))
+        print(f"trained sector models on {args.universe} symbols in {time.perf_counter() - start:.1f} s")
+
+        model = PredictionModel(registry=ModelRegistry(os.path.join(root, 'registry')))
+        explainer = ModelExplainer(model)
+        offset = 100000
+        warmup = model.predict_many(synthetic_symbols(200, offset), '3m')
+        explainer.explain_many(warmup)
+
+        # KernelSHAP baseline on the same models and background
+        kernel_symbols = synthetic_symbols(args.kernel_symbols, offset + 1000)
+        rows = np.nan_to_num(model.technical_signals(kernel_symbols)["features"])
+        names = model.resolve_models(kernel_symbols, '3m')
+
+        def kernel():
+            for row, name in zip(rows, names):
+                trained = model.registry.get(name)
+                kernel_explainer = shap.KernelExplainer(trained.predict, trained.background)
+                kernel_explainer.shap_values(row[np.newaxis], silent=True)
+
+        kernel_ms = per_symbol_ms(kernel, len(rows))
+
+        results = []
+        for count in args.counts:
+            offset += 10000
+            single = model.predict_many(synthetic_symbols(count, offset), '3m')
+            batched = model.predict_many(synthetic_symbols(count, offset + 5000), '3m')
+            single_ms = per_symbol_ms(
+                lambda: [explainer.explain_prediction(p.symbol, p) for p in single], count)
+            batched_ms = per_symbol_ms(lambda: explainer.explain_many(batched), count)
+            memoized_ms = per_symbol_ms(lambda: explainer.explain_many(batched), count)
+            results.append([count, f"{kernel_ms:,.1f}", f"{single_ms:.2f}", f"{batched_ms:.2f}", f"{memoized_ms:.3f}"])
+    finally:
+        shutil.rmtree(root)
+
+    print_table(['symbols', 'kernel ms/symbol', 'single ms/symbol', 'batched ms/symbol', 'memoized ms/symbol'], results)
+    print(f"\nexplainer cache: {explainer.stats()}")
+
+
+if __name__ == '__main__':
+    main()
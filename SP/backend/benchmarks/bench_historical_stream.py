@@ -0,0 +1,124 @@
+"""Benchmark streamed NDJSON historical responses against a single JSON body
+
+Writes one symbol with the largest requested number of 1-minute bars to a
+temporary bar archive, then serves ranges of each size from a fresh
+process per run, either through the streaming route (?stream=1) or as one
+jsonify'd body with full labels/data/timestamps lists as the regular
+historical route builds them. Reports time to first byte, total time,
+bytes and the peak RSS growth of the serving process. For streamed runs
+that growth is mostly pages of the mapped archive file, which belong to
+the shared page cache rather than the worker.
+
+Usage: python -m benchmarks.bench_historical_stream [--sizes 1000 100000 10000000] [--json-max 1000000]
+"""
+import argparse
+import json
+import os
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.common import print_table
+
+SYMBOL = 'ZSTREAM'
+BAR_SECONDS = 60
+
+
+def peak_rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def serve_once(mode, size):
+    """Run in a child process: serve `size` bars and report timings and memory"""
+    from datetime import datetime
+    from api.serializers import jsonify
+    from app import app
+    from api.routes import stock_service
+
+    series = stock_service.price_store.get(SYMBOL, BAR_SECONDS)
+    start = int(series.timestamps[-size])
+    client = app.test_client()
+    baseline = peak_rss_mb()
+
+    begin = time.perf_counter()
+    if mode == 'stream':
+        response = client.get(
+            f'/api/stocks/{SYMBOL}/historical?stream=1&interval={BAR_SECONDS}&start={start}',
+            buffered=False
+        )
+        chunks = iter(response.response)
+        first = next(chunks)
+        ttfb = time.perf_counter() - begin
+        total_bytes = len(first) + sum(len(chunk) for chunk in chunks)
+    else:
+        with app.test_request_context():
+            bars = stock_service.get_historical_bars(SYMBOL, start=start, bar_seconds=BAR_SECONDS)
+            dates = [datetime.fromtimestamp(ts) for ts in bars.timestamps.tolist()]
+            body = jsonify({
+                'success': True,
+                'data': {
+                    'labels': [date.strftime('%Y-%m-%d %H:%M') for date in dates],
+                    'data': bars.close.tolist(),
+                    'timestamps': [date.isoformat() for date in dates]
+                }
+            }).get_data()
+        ttfb = time.perf_counter() - begin
+        total_bytes = len(body)
+    elapsed = time.perf_counter() - begin
+
+    print(json.dumps({
+        'ttfb_ms': ttfb * 1000,
+        'total_ms': elapsed * 1000,
+        'bytes': total_bytes,
+        'peak_rss_growth_mb': peak_rss_mb() - baseline
+    }))
+
+
+def build_archive(path, bars):
+    from services.bar_archive import BarArchiveWriter
+    from services.price_store import synthetic_series
+    with BarArchiveWriter(path) as writer:
+        writer.add(SYMBOL, synthetic_series(SYMBOL, BAR_SECONDS, bars))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 100000, 10000000])
+    parser.add_argument('--json-max', type=int, default=1000000, help='largest size to also serve as one JSON body')
+    parser.add_argument('--child', nargs=2, metavar=('MODE', 'SIZE'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        serve_once(args.child[0], int(args.child[1]))
+        return
+
+    temp_dir = tempfile.mkdtemp(prefix='stream-bench-')
+    archive = os.path.join(temp_dir, 'archive')
+    rows = []
+    try:
+        build_archive(archive, max(args.sizes))
+        env = dict(os.environ, BAR_ARCHIVE_PATH=archive, RESPONSE_CACHE_ENABLED='0')
+        for size in args.sizes:
+            for mode in ('stream', 'json'):
+                if mode == 'json' and size > args.json_max:
+                    continue
+                output = subprocess.run(
+                    [sys.executable, '-m', 'benchmarks.bench_historical_stream', '--child', mode, str(size)],
+                    env=env, check=True, capture_output=True, text=True
+                ).stdout
+                result = json.loads(output.strip().splitlines()[-1])
+                rows.append([
+                    f"{size:,}", mode, f"{result['ttfb_ms']:.1f}", f"{result['total_ms']:,.0f}",
+                    f"{result['bytes'] / 2 ** 20:,.1f}", f"{result['peak_rss_growth_mb']:,.1f}"
+                ])
+    finally:
+        shutil.rmtree(temp_dir)
+
+    print_table(['bars', 'mode', 'TTFB ms', 'total ms', 'MB sent', 'peak RSS growth MB'], rows)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,105 @@
+"""Benchmark live index and sector aggregation from constituent ticks
+
+Builds an IndexAggregator over --constituents synthetic listings (11
+sectors, four cap-ranked indices) and replays --seconds of a feed at
+--rate ticks per second:
+
+* re-sum: recomputing every group's caps from the whole universe per
+  tick, what computing the summary from scratch costs
+* single: update() once per quote
+* batched: update_arrays() for batches of distinct constituents, as the
+  quote feed delivers them
+* quotes: update_many() on Quote records, including reading their fields
+
+and reports the cost per tick, the share of one core the feed rate
+would use, and the latency of reading the summary.
+
+Usage: python -m benchmarks.bench_indices [--constituents 10000] [--rate 50000] [--batches 50 500]
+"""
+import argparse
+import time
+
+import numpy as np
+
+from benchmarks.common import synthetic_symbols, time_calls, percentiles_ms, print_table
+from services import reference_data
+from services.indices import IndexAggregator
+from services.records import Quote
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--constituents', type=int, default=10000)
+    parser.add_argument('--rate', type=int, default=50000, help='ticks per second of the simulated feed')
+    parser.add_argument('--seconds', type=float, default=1.0)
+    parser.add_argument('--batches', type=int, nargs='+', default=[50, 500])
+    parser.add_argument('--reads', type=int, default=2000)
+    args = parser.parse_args()
+
+    symbols = synthetic_symbols(args.constituents)
+    listings = [{"symbol": symbol, "sector": reference_data.sector(symbol)} for symbol in symbols]
+    start = time.perf_counter()
+    aggregator = IndexAggregator.from_listings(listings)
+    build = time.perf_counter() - start
+    print(f"{len(aggregator):,} constituents, {len(aggregator.sector_names)} sectors, "
+          f"{len(aggregator.index_names)} indices, built in {build * 1000:.0f} ms; "
+          f"feed of {args.rate:,} ticks/s for {args.seconds:g} s")
+
+    rng = np.random.default_rng(0)
+    ticks = int(args.rate * args.seconds)
+    base = np.array([reference_data.base_price(symbol) for symbol in symbols])
+
+    def tick_arrays(count):
+        positions = rng.integers(0, len(symbols), count)
+        prices = np.round(base[positions] * (1 + rng.normal(0, 0.01, count)), 2)
+        return positions, prices, np.round(base[positions], 2)
+
+    rows = []
+
+    def record(label, seconds, count):
+        per_tick = seconds / count
+        rows.append([label, f"{per_tick * 1e6:,.2f}", f"{1 / per_tick:,.0f}", f"{args.rate * per_tick:.1%}"])
+
+    # Re-summing the universe per tick is far too slow to replay the whole feed
+    resum = min(time_calls(aggregator._resum, 200))
+    record('re-sum per tick', resum, 1)
+
+    positions, prices, previous = tick_arrays(ticks)
+    quotes = [
+        Quote(symbols[position], price, price - close, (price / close - 1) * 100, 0.0, None)
+        for position, price, close in zip(positions.tolist(), prices.tolist(), previous.tolist())
+    ]
+    start = time.perf_counter()
+    for quote in quotes:
+        aggregator.update(quote)
+    record('single update()', time.perf_counter() - start, ticks)
+
+    for batch in args.batches:
+        batches = [
+            (chosen, np.round(base[chosen] * (1 + rng.normal(0, 0.01, batch)), 2), np.round(base[chosen], 2))
+            for chosen in (rng.choice(len(symbols), batch, replace=False) for _ in range(max(ticks // batch, 1)))
+        ]
+        start = time.perf_counter()
+        for batch_positions, batch_prices, batch_previous in batches:
+            aggregator.update_arrays(batch_positions, batch_prices, batch_previous)
+        record(f'batched update_arrays() x{batch}', time.perf_counter() - start, len(batches) * batch)
+
+        chunks = [quotes[i:i + batch] for i in range(0, len(quotes), batch)]
+        start = time.perf_counter()
+        for chunk in chunks:
+            aggregator.update_many(chunk)
+        record(f'quotes update_many() x{batch}', time.perf_counter() - start, len(quotes))
+
+    print_table(['path', 'us/tick', 'ticks/s', f'core at {args.rate:,}/s'], rows)
+
+    latency = percentiles_ms(time_calls(aggregator.summary, args.reads), (50, 99))
+    print(f"\nsummary read: p50 {latency['p50']} ms, p99 {latency['p99']} ms")
+
+    # The incremental sums should agree with a re-sum after the replay
+    current = aggregator._current_caps.copy()
+    aggregator._resum()
+    print(f"max relative drift vs re-sum: {np.max(np.abs(current / aggregator._current_caps - 1)):.1e}")
+
+
+if __name__ == '__main__':
+    main()
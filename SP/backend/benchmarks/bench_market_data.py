@@ -0,0 +1,108 @@
+"""Benchmark concurrent quote lookups through the market data provider layer
+
+Runs --lookups single-symbol quote lookups against the in-process fake
+feed, whose every upstream call takes --latency seconds, in several modes:
+
+* sequential - one blocking call per symbol, as a requests loop would do
+  (timed on a sample and extrapolated)
+* async unbatched - all lookups concurrently, one upstream call each
+* async batched - all lookups concurrently, coalesced into multi-symbol calls
+* threads batched - lookups from a pool of request threads through the
+  blocking MarketDataClient, sharing one event loop
+* flaky batched - async batched with --failure-rate transient failures retried
+
+Usage: python -m benchmarks.bench_market_data [--lookups 1000] [--latency 0.02]
+"""
+import argparse
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.common import synthetic_symbols, percentiles_ms, print_table
+from services.market_data import FakeMarketDataProvider, MarketDataClient
+
+
+async def concurrent_lookups(provider, symbols):
+    async def lookup(symbol):
+        start = time.perf_counter()
+        await provider.get_quote(symbol)
+        return time.perf_counter() - start
+
+    start = time.perf_counter()
+    timings = await asyncio.gather(*(lookup(symbol) for symbol in symbols))
+    return time.perf_counter() - start, timings
+
+
+def run_async(symbols, **options):
+    provider = FakeMarketDataProvider(**options)
+    wall, timings = asyncio.run(concurrent_lookups(provider, symbols))
+    return wall, timings, provider
+
+
+def run_sequential(symbols, sample, **options):
+    client = MarketDataClient(FakeMarketDataProvider(max_batch=1, batch_window=0, **options))
+    timings = []
+    for symbol in symbols[:sample]:
+        start = time.perf_counter()
+        client.get_quote(symbol)
+        timings.append(time.perf_counter() - start)
+    client.close()
+    return sum(timings) * len(symbols) / len(timings), timings, client.provider
+
+
+def run_threads(symbols, threads, **options):
+    client = MarketDataClient(FakeMarketDataProvider(**options))
+
+    def lookup(symbol):
+        start = time.perf_counter()
+        client.get_quote(symbol)
+        return time.perf_counter() - start
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        timings = list(pool.map(lookup, symbols))
+    wall = time.perf_counter() - start
+    client.close()
+    return wall, timings, client.provider
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--lookups', type=int, default=1000)
+    parser.add_argument('--latency', type=float, default=0.02, help='seconds per upstream call')
+    parser.add_argument('--jitter', type=float, default=0.005)
+    parser.add_argument('--max-batch', type=int, default=100)
+    parser.add_argument('--max-concurrency', type=int, default=32)
+    parser.add_argument('--threads', type=int, default=64)
+    parser.add_argument('--failure-rate', type=float, default=0.3)
+    parser.add_argument('--sequential-sample', type=int, default=50)
+    args = parser.parse_args()
+
+    symbols = synthetic_symbols(args.lookups)
+    feed = {'latency': args.latency, 'jitter': args.jitter}
+    batched = dict(feed, max_batch=args.max_batch, max_concurrency=args.max_concurrency)
+
+    runs = [
+        ('sequential*', run_sequential(symbols, args.sequential_sample, **feed)),
+        ('async unbatched', run_async(symbols, max_batch=1, batch_window=0, max_concurrency=args.max_concurrency, **feed)),
+        ('async batched', run_async(symbols, **batched)),
+        ('threads batched', run_threads(symbols, args.threads, **batched)),
+        ('flaky batched', run_async(symbols, failure_rate=args.failure_rate, backoff=args.latency, **batched)),
+    ]
+
+    rows = []
+    for name, (wall, timings, provider) in runs:
+        latency = percentiles_ms(timings, (50, 99))
+        stats = provider.stats()
+        rows.append([
+            name, f"{wall * 1000:,.0f}", f"{args.lookups / wall:,.0f}", latency['p50'], latency['p99'],
+            provider.calls, stats['retries']
+        ])
+
+    print(f"{args.lookups} quote lookups, {args.latency * 1000:.0f} ms per upstream call")
+    print_table(['mode', 'wall ms', 'lookups/s', 'p50 ms', 'p99 ms', 'upstream calls', 'retries'], rows)
+    print(f"* extrapolated from {args.sequential_sample} lookups")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,127 @@
+"""Benchmark the overhead of request metrics and the idle profiler hook
+
+Drives requests against one app that allows profiling, so its idle
+profiler hook runs on every request, and compares requests with
+metrics disabled (the baseline) to the same requests with metrics on.
+Each path is requested both ways, in alternating order, and the
+overhead is the median difference of these pairs, so drift on the
+machine and outliers such as garbage collection affect neither side.
+(Two separate apps differ by several microseconds a request even when
+configured alike, which would swamp what is measured.) The workloads
+are a cheap market summary read, the worst case relative to its own
+cost, and uncached predictions with full explanations. A profiled
+request is timed last for comparison.
+
+With --transport http (the default) each app is served by a werkzeug
+server on a local port and requested over a new connection each time,
+as clients see it; with --transport wsgi requests go through the Flask
+test client, which leaves out the HTTP cost and so shows the largest
+overhead the instrumentation can have relative to a request.
+
+Usage: python -m benchmarks.bench_metrics [--requests 500] [--rounds 9] [--budget 2] [--transport http]
+"""
+import argparse
+import http.client
+import logging
+import statistics
+import threading
+import time
+
+from werkzeug.serving import make_server
+
+from app import create_app
+from benchmarks.common import synthetic_symbols, print_table
+from services.cache import response_cache
+from services.metrics import metrics
+
+
+class HttpClient:
+    """GET requests to an app served on a local port by a background werkzeug server"""
+
+    def __init__(self, app):
+        self.server = make_server('127.0.0.1', 0, app)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def get(self, path):
+        connection = http.client.HTTPConnection('127.0.0.1', self.server.server_port)
+        try:
+            connection.request('GET', path)
+            response = connection.getresponse()
+            response.read()
+            return response
+        finally:
+            connection.close()
+
+    def close(self):
+        self.server.shutdown()
+
+
+def timed_get(client, path, enabled):
+    metrics.enabled = enabled
+    start = time.perf_counter()
+    client.get(path)
+    return time.perf_counter() - start
+
+
+def paired_us(client, paths):
+    """Microseconds of each request with metrics off and on, requesting every path both ways"""
+    pairs = []
+    for index, path in enumerate(paths):
+        timings = [0.0, 0.0]
+        for enabled in ((True, False) if index % 2 else (False, True)):
+            timings[enabled] = timed_get(client, path, enabled) * 1e6
+        pairs.append(timings)
+    return pairs
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--requests', type=int, default=500, help='requests per round')
+    parser.add_argument('--rounds', type=int, default=9, help='rounds of new symbols for predictions')
+    parser.add_argument('--budget', type=float, default=2.0, help='acceptable overhead in percent')
+    parser.add_argument('--transport', choices=('http', 'wsgi'), default='http')
+    args = parser.parse_args()
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+
+    app = create_app(profiling=True)
+    client = HttpClient(app) if args.transport == 'http' else app.test_client()
+    response_cache.enabled = False
+
+    workloads = {
+        'market summary': lambda offset: ['/api/market/summary'] * args.requests,
+        'predict explain=full': lambda offset: [
+            f'/api/stocks/{symbol}/predict?explain=full' for symbol in synthetic_symbols(args.requests, offset)
+        ],
+    }
+    rows = []
+    for name, paths_for in workloads.items():
+        # A warm-up pass loads each round's symbols before they are timed
+        pairs = []
+        for round_number in range(args.rounds):
+            paths = paths_for(round_number * args.requests)
+            for path in paths:
+                timed_get(client, path, False)
+            pairs.extend(paired_us(client, paths))
+        base = statistics.median(off for off, on in pairs)
+        timed = statistics.median(on for off, on in pairs)
+        difference = statistics.median(on - off for off, on in pairs)
+        overhead = difference / base * 100
+        rows.append([name, f"{base:,.1f}", f"{timed:,.1f}", f"{difference:+.1f}", f"{overhead:+.2f}%",
+                     'ok' if overhead < args.budget else 'over budget'])
+
+    metrics.enabled = True
+    start = time.perf_counter()
+    response = client.get('/api/stocks/ZZZZ/predict?explain=full&intervals=20000&profile=1')
+    profiled_ms = (time.perf_counter() - start) * 1000
+
+    if isinstance(client, HttpClient):
+        client.close()
+
+    print(f"transport: {args.transport}\n")
+    print_table(['workload', 'baseline us/req', 'instrumented us/req', 'us/req', 'overhead', f'< {args.budget:g}%'],
+                rows)
+    print(f"\nprofiled request: {profiled_ms:.1f} ms, stacks in {response.headers.get('X-Profile')}")
+
+
+if __name__ == '__main__':
+    main()
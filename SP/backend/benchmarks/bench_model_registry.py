@@ -0,0 +1,118 @@
+"""Benchmark worker cold start and memory with a registry of trained models
+
+Fits a few gradient-boosted models on synthetic features, saves them as
+--models artifacts in a temporary registry, then forks worker processes
+that start up in one of three ways:
+
+* eager-copy: load every artifact into private memory at startup
+* eager-mmap: load every artifact at startup, memory-mapping the weights
+* lazy: open the registry and load models on first use (memory-mapped)
+
+Each worker then scores a batch with --hot models. Reported per worker:
+startup time, latency of the first prediction, the hot-set pass, RSS and
+PSS (proportional set size, which splits shared pages between processes).
+
+Usage: python -m benchmarks.bench_model_registry [--models 200] [--workers 1 4] [--hot 20]
+"""
+import argparse
+import multiprocessing
+import os
+import shutil
+import tempfile
+import time
+
+import numpy as np
+from sklearn.ensemble import HistGradientBoostingRegressor
+
+from benchmarks.common import memory_kb, print_table
+from models.features import FEATURE_NAMES
+from models.registry import ModelRegistry
+
+MODES = ('eager-copy', 'eager-mmap', 'lazy')
+
+
+def build_registry(root, count, distinct, iterations):
+    rng = np.random.default_rng(0)
+    fitted = []
+    for seed in range(distinct):
+        X = rng.normal(size=(20000, len(FEATURE_NAMES)))
+        y = 0.01 * X[:, seed % X.shape[1]] + rng.normal(0, 0.02, len(X))
+        fitted.append(HistGradientBoostingRegressor(max_iter=iterations, early_stopping=False, random_state=seed).fit(X, y))
+
+    registry = ModelRegistry(root)
+    names = [f"bench-{i:03d}" for i in range(count)]
+    for i, name in enumerate(names):
+        registry.save(name, fitted[i % distinct], {"features": FEATURE_NAMES})
+    return names
+
+
+def worker(root, mode, names, hot, barrier, results):
+    batch = np.random.default_rng(os.getpid()).normal(size=(500, len(FEATURE_NAMES)))
+
+    start = time.perf_counter()
+    registry = ModelRegistry(root, max_resident=len(names), mmap_mode=None if mode == 'eager-copy' else 'r')
+    if mode != 'lazy':
+        registry.prefetch(names, background=False)
+    startup = time.perf_counter() - start
+
+    start = time.perf_counter()
+    registry.get(names[0]).predict(batch)
+    first = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for name in names[:hot]:
+        registry.get(name).predict(batch)
+    hot_pass = time.perf_counter() - start
+
+    rss, pss = memory_kb()
+    results.put((startup, first, hot_pass, rss, pss))
+    barrier.wait()
+
+
+def run(root, mode, workers, names, hot):
+    context = multiprocessing.get_context('fork')
+    barrier = context.Barrier(workers)
+    results = context.Queue()
+    processes = [
+        context.Process(target=worker, args=(root, mode, names, hot, barrier, results))
+        for _ in range(workers)
+    ]
+    for process in processes:
+        process.start()
+    collected = [results.get() for _ in processes]
+    for process in processes:
+        process.join()
+
+    startup, first, hot_pass, rss, pss = np.mean(collected, axis=0)
+    return [mode, workers, f"{startup * 1000:,.0f}", f"{first * 1000:.1f}", f"{hot_pass * 1000:,.0f}",
+            f"{rss / 1024:,.1f}", f"{pss / 1024:,.1f}"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--models', type=int, default=200)
+    parser.add_argument('--distinct', type=int, default=4, help='distinct fitted models the artifacts cycle through')
+    parser.add_argument('--iterations', type=int, default=200, help='boosting iterations per model')
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 4])
+    parser.add_argument('--hot', type=int, default=20, help='models each worker uses after startup')
+    args = parser.parse_args()
+
+    root = tempfile.mkdtemp(prefix='models-')
+    try:
+        start = time.perf_counter()
+        names = build_registry(root, args.models, args.distinct, args.iterations)
+        size_mb = sum(
+            os.path.getsize(os.path.join(path, name)) for path, _, files in os.walk(root) for name in files
+        ) / 2 ** 20
+        print(f"registry: {len(names)} artifacts, {size_mb:,.1f} MB, built in {time.perf_counter() - start:.1f} s")
+
+        rows = [run(root, mode, workers, names, args.hot) for workers in args.workers for mode in MODES]
+    finally:
+        shutil.rmtree(root)
+
+    print_table(['mode', 'workers', 'startup ms', 'first predict ms', f'hot {args.hot} ms',
+                 'RSS MB/worker', 'PSS MB/worker'], rows)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,116 @@
+"""Benchmark the incremental movers engine against sorting the universe per request
+
+Loads --universe symbols across the sectors, then measures:
+
+* update throughput, one quote at a time and in batches as a feed delivers them
+* read latency for gainers+losers at several limits, market-wide and per
+  sector, against sorting every quote by percentChange
+* a sustained run feeding --rate updates per second in 10 ms batches while
+  another thread reads the movers, reporting the achieved rate and read latency
+
+Usage: python -m benchmarks.bench_movers [--universe 50000] [--rate 100000] [--duration 5]
+"""
+import argparse
+import threading
+import time
+
+import numpy as np
+
+from benchmarks.common import synthetic_symbols, percentiles_ms, print_table
+from services.movers import MoversEngine
+from services.records import Quote
+from services.reference_data import SECTORS
+
+
+def make_quotes(symbols, changes):
+    return [Quote(symbol, 100.0, change, change, 0.0, None) for symbol, change in zip(symbols, changes)]
+
+
+def naive_movers(quotes, limit, sector=None, sectors=None):
+    selected = quotes if sector is None else [q for q in quotes if sectors[q.symbol] == sector]
+    ranked = sorted(selected, key=lambda quote: quote.percentChange, reverse=True)
+    return ranked[:limit], ranked[::-1][:limit]
+
+
+def timed_ms(func, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--universe', type=int, default=50000)
+    parser.add_argument('--updates', type=int, default=500000)
+    parser.add_argument('--rate', type=int, default=100000, help='target updates per second for the sustained run')
+    parser.add_argument('--duration', type=float, default=5.0)
+    parser.add_argument('--reads', type=int, default=200)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    symbols = synthetic_symbols(args.universe)
+    sectors = {symbol: SECTORS[i % len(SECTORS)] for i, symbol in enumerate(symbols)}
+    engine = MoversEngine(max_limit=100)
+
+    start = time.perf_counter()
+    initial = make_quotes(symbols, rng.normal(0, 2, args.universe).tolist())
+    engine.update_many(initial, sectors)
+    print(f"loaded {args.universe:,} symbols in {(time.perf_counter() - start) * 1000:,.0f} ms")
+
+    picks = rng.integers(0, args.universe, args.updates)
+    updates = make_quotes([symbols[i] for i in picks.tolist()], rng.normal(0, 2, args.updates).tolist())
+
+    start = time.perf_counter()
+    for quote in updates[:args.updates // 5]:
+        engine.update(quote)
+    single = args.updates // 5 / (time.perf_counter() - start)
+    start = time.perf_counter()
+    for offset in range(0, args.updates, 1000):
+        engine.update_many(updates[offset:offset + 1000])
+    batched = args.updates / (time.perf_counter() - start)
+    print(f"updates/s: {single:,.0f} one at a time, {batched:,.0f} in batches of 1000\n")
+
+    # The same latest quotes the engine holds, for the sorting baseline
+    quotes = list({quote.symbol: quote for quote in initial + updates}.values())
+    rows = []
+    for sector in (None, SECTORS[0]):
+        for limit in (5, 25, 100):
+            heap_ms = timed_ms(lambda: (engine.gainers(limit, sector), engine.losers(limit, sector)), args.reads)
+            sort_ms = timed_ms(lambda: naive_movers(quotes, limit, sector, sectors), max(args.reads // 20, 3))
+            rows.append([sector or 'market', limit, f"{heap_ms:.4f}", f"{sort_ms:.2f}", f"{sort_ms / heap_ms:,.0f}x"])
+    print_table(['scope', 'limit', 'heap read ms', 'sort read ms', 'speedup'], rows)
+
+    # Sustained feed at the target rate with concurrent readers
+    stop = threading.Event()
+    read_timings = []
+
+    def reader():
+        while not stop.is_set():
+            start = time.perf_counter()
+            engine.gainers(5)
+            engine.losers(5)
+            read_timings.append(time.perf_counter() - start)
+            time.sleep(0.001)
+
+    thread = threading.Thread(target=reader)
+    thread.start()
+    batch = args.rate // 100
+    applied = 0
+    start = time.perf_counter()
+    deadline = start
+    while time.perf_counter() - start < args.duration:
+        offset = applied % (args.updates - batch)
+        engine.update_many(updates[offset:offset + batch])
+        applied += batch
+        deadline += 0.01
+        time.sleep(max(0.0, deadline - time.perf_counter()))
+    elapsed = time.perf_counter() - start
+    stop.set()
+    thread.join()
+    print(f"\nsustained: {applied / elapsed:,.0f} updates/s applied (target {args.rate:,}), "
+          f"concurrent top-5 reads {percentiles_ms(read_timings, (50, 99))}")
+
+
+if __name__ == '__main__':
+    main()
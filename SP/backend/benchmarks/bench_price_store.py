@@ -0,0 +1,112 @@
+"""Benchmark historical queries served from PriceStore against the per-request rebuild
+
+Compares, for every timeframe, the previous implementation of
+get_historical_data (date_range + random walk + get_stock_details per
+call) with the store-backed path, cold (first load of a symbol) and warm.
+The scale run then queries a large universe through a bounded memory
+budget and reports resident bytes and latency including evictions.
+
+Usage: python -m benchmarks.bench_price_store [--universe 20000] [--budget-mb 256]
+"""
+import argparse
+import random
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.common import synthetic_symbols, percentiles_ms, print_table
+from services.cache import response_cache
+from services.price_store import PriceStore
+from services.stock_service import StockService
+
+TIMEFRAMES = ['1d', '1w', '1m', '3m', '1y', 'all']
+
+# Periods, pandas frequency, lookback and label format of the previous implementation
+LEGACY_TIMEFRAMES = {
+    '1d': (78, '5min', timedelta(days=1), '%H:%M'),
+    '1w': (7 * 6, '1h', timedelta(weeks=1), '%a'),
+    '1m': (30, '1D', timedelta(days=30), 'Week %U'),
+    '3m': (90, '1D', timedelta(days=90), '%b'),
+    '1y': (52, '1W', timedelta(days=365), '%b'),
+    'all': (60, '1M', timedelta(days=365 * 5), '%Y')
+}
+
+
+def legacy_historical(service, symbol, timeframe):
+    """The pre-PriceStore get_historical_data, rebuilding everything per call"""
+    periods, freq, lookback, date_format = LEGACY_TIMEFRAMES[timeframe]
+    stock_info = service.get_stock_details(symbol)
+    date_range = pd.date_range(start=datetime.now() - lookback, periods=periods, freq=freq)
+    trend = 0.02 if stock_info['percentChange'] > 0 else -0.02
+    random_walk = np.random.default_rng(sum(ord(c) for c in symbol)).normal(trend, 0.02, periods).cumsum()
+    price_factors = 1 + random_walk + 1 - random_walk[-1]
+    prices = stock_info['price'] / price_factors[-1] * price_factors
+    return {
+        "labels": [date.strftime(date_format) for date in date_range],
+        "data": prices.tolist(),
+        "timestamps": [date.isoformat() for date in date_range]
+    }
+
+
+def mean_ms(func, calls):
+    start = time.perf_counter()
+    for _ in range(calls):
+        func()
+    return (time.perf_counter() - start) / calls * 1000
+
+
+def compare_timeframes(symbols, calls):
+    rows = []
+    for timeframe in TIMEFRAMES:
+        service = StockService(PriceStore())
+        legacy = mean_ms(lambda: legacy_historical(service, symbols[0], timeframe), calls)
+
+        # Cold: every query loads a symbol the store has not seen yet
+        cold_symbols = iter(symbols)
+        cold = mean_ms(lambda: service.get_historical_data(next(cold_symbols), timeframe), min(calls, len(symbols)))
+
+        warm = mean_ms(lambda: service.get_historical_data(symbols[0], timeframe), calls)
+        rows.append([timeframe, f"{legacy:.3f}", f"{cold:.3f}", f"{warm:.3f}", f"{legacy / warm:.1f}x"])
+
+    print_table(['timeframe', 'legacy ms', 'store cold ms', 'store warm ms', 'warm speedup'], rows)
+
+
+def scale_run(universe, budget_mb, queries):
+    store = PriceStore(memory_budget=budget_mb * 1024 * 1024)
+    service = StockService(store)
+    symbols = synthetic_symbols(universe)
+    rng = random.Random(0)
+
+    timings = []
+    for _ in range(queries):
+        symbol = rng.choice(symbols)
+        timeframe = rng.choice(TIMEFRAMES)
+        start = time.perf_counter()
+        service.get_historical_data(symbol, timeframe)
+        timings.append(time.perf_counter() - start)
+
+    stats = store.stats()
+    print()
+    print(f"universe={universe} symbols, budget={budget_mb} MB, {queries} random queries")
+    print(f"resident series={stats['series']}, resident={stats['residentBytes'] / 2 ** 20:.1f} MB, "
+          f"latency {percentiles_ms(timings, (50, 99))}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--calls', type=int, default=200)
+    parser.add_argument('--universe', type=int, default=20000)
+    parser.add_argument('--budget-mb', type=int, default=256)
+    parser.add_argument('--queries', type=int, default=5000)
+    args = parser.parse_args()
+
+    # Measure the data path itself, not the response cache in front of it
+    response_cache.enabled = False
+    compare_timeframes(synthetic_symbols(args.calls), args.calls)
+    scale_run(args.universe, args.budget_mb, args.queries)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,154 @@
+"""Benchmark typed records against the per-item dicts they replaced
+
+For --count quotes and predictions (with their four factors each), built
+from the same values both ways, measures:
+
+* build: constructing Quote/Prediction/Factor records against the
+  equivalent dicts
+* memory: bytes per item the built list holds, traced with tracemalloc
+* encode: a {'success': True, 'data': [...]} body as the API returns it,
+  for the dicts through Flask's jsonify (the previous path) and through
+  records.dumps, and for the records through records.dumps
+
+Usage: python -m benchmarks.bench_records [--count 10000] [--repeat 5]
+"""
+import argparse
+import os
+import time
+import tracemalloc
+
+from flask import Flask, jsonify
+
+from benchmarks.common import synthetic_symbols, print_table
+from services import records
+from services.records import Factor, Prediction, Quote
+
+
+def quote_rows(symbols):
+    """Field values of a quote per symbol, from the fake feed"""
+    os.environ.pop('MARKET_DATA_URL', None)
+    from services.market_data import MarketDataClient
+    client = MarketDataClient()
+    try:
+        quotes = client.get_quotes(symbols)
+    finally:
+        client.close()
+    return [(q.symbol, q.price, q.change, q.percentChange, q.volume, q.timestamp) for q in quotes.values()]
+
+
+def prediction_rows(symbols):
+    """Field values of a prediction per symbol, with its factors as tuples"""
+    from models.prediction_model import PredictionModel
+    predictions = PredictionModel().predict_many(symbols, '3m')
+    return [
+        (p.symbol, p.currentPrice, p.predictedPrice, p.percentChange, p.confidence, p.timeframe, p.recommendation,
+         [(f.name, f.impact, f.weight, f.description) for f in p.factors], p.generatedAt, p.generatedBy)
+        for p in predictions
+    ]
+
+
+def quote_records(rows):
+    return [Quote(*row) for row in rows]
+
+
+def quote_dicts(rows):
+    return [
+        {"symbol": symbol, "price": price, "change": change, "percentChange": percent_change, "volume": volume,
+         "timestamp": timestamp}
+        for symbol, price, change, percent_change, volume, timestamp in rows
+    ]
+
+
+def prediction_records(rows):
+    return [
+        Prediction(symbol, current, predicted, percent_change, confidence, timeframe, recommendation,
+                   [Factor(*factor) for factor in factors], generated_at, generated_by,
+                   interval=None, timestamp=None, updatedBy=None, id=None)
+        for (symbol, current, predicted, percent_change, confidence, timeframe, recommendation, factors,
+             generated_at, generated_by) in rows
+    ]
+
+
+def prediction_dicts(rows):
+    return [
+        {
+            "symbol": symbol,
+            "currentPrice": current,
+            "predictedPrice": predicted,
+            "percentChange": percent_change,
+            "confidence": confidence,
+            "timeframe": timeframe,
+            "recommendation": recommendation,
+            "factors": [
+                {"name": name, "impact": impact, "weight": weight, "description": description}
+                for name, impact, weight, description in factors
+            ],
+            "generatedAt": generated_at,
+            "generatedBy": generated_by
+        }
+        for (symbol, current, predicted, percent_change, confidence, timeframe, recommendation, factors,
+             generated_at, generated_by) in rows
+    ]
+
+
+def best_ms(func, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return min(timings) * 1000
+
+
+def traced_bytes(build):
+    """Bytes still allocated by what build returns"""
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    items = build()
+    held = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    del items
+    return held
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--count', type=int, default=10000, help='quotes and predictions built per round')
+    parser.add_argument('--repeat', type=int, default=5, help='rounds timed, the fastest is reported')
+    args = parser.parse_args()
+
+    app = Flask(__name__)
+    symbols = synthetic_symbols(args.count)
+    kinds = {
+        'quote': (quote_rows(symbols), quote_dicts, quote_records),
+        'prediction': (prediction_rows(symbols), prediction_dicts, prediction_records),
+    }
+    print(f"{args.count:,} items per round, encoder: {'orjson' if records.orjson else 'json'}\n")
+
+    rows = []
+    for kind, (values, as_dicts, as_records) in kinds.items():
+        dicts, typed = as_dicts(values), as_records(values)
+
+        with app.app_context():
+            paths = [
+                ('dict', as_dicts, lambda: jsonify({'success': True, 'data': dicts}).get_data()),
+                ('dict + dumps', as_dicts, lambda: records.dumps({'success': True, 'data': dicts})),
+                ('record + dumps', as_records, lambda: records.dumps({'success': True, 'data': typed})),
+            ]
+            results = []
+            for label, build, encode in paths:
+                build_ms = best_ms(lambda: build(values), args.repeat)
+                encode_ms = best_ms(encode, args.repeat)
+                results.append((label, build_ms, traced_bytes(lambda: build(values)) / args.count, encode_ms))
+
+        _, _, base_bytes, base_encode = results[0]
+        for label, build_ms, item_bytes, encode_ms in results:
+            rows.append([kind, label, f"{build_ms:,.2f}", f"{item_bytes:,.0f}", f"{base_bytes / item_bytes:.2f}x",
+                         f"{encode_ms:,.2f}", f"{base_encode / encode_ms:.2f}x",
+                         f"{args.count / (build_ms + encode_ms) * 1000:,.0f}"])
+
+    print_table(['kind', 'path', 'build ms', 'bytes/item', 'memory', 'encode ms', 'encode', 'items/s'], rows)
+
+
+if __name__ == '__main__':
+    main()
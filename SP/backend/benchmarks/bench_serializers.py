@@ -0,0 +1,75 @@
+"""Benchmark JSON against the binary wire formats for numeric columns
+
+Encodes a bar series of each size (timestamps plus OHLCV, six columns)
+the way the historical route does for each format: the API's JSON
+encoder on the columns, the packed columns format and, if pyarrow is
+installed, an Arrow IPC stream. Reports bytes on the wire and encode time, and for the binary
+formats the time to decode back into NumPy arrays.
+
+Usage: python -m benchmarks.bench_serializers [--sizes 10000 100000 1000000 10000000] [--json-max 1000000]
+"""
+import argparse
+import time
+
+from api import serializers
+from benchmarks.common import print_table
+from services.price_store import BAR_FIELDS, INTRADAY, synthetic_series
+
+
+def timed(func):
+    start = time.perf_counter()
+    result = func()
+    return result, (time.perf_counter() - start) * 1000
+
+
+def bar_columns(bars):
+    return dict(zip(BAR_FIELDS, bars.columns()))
+
+
+def encode_json(bars):
+    return serializers.jsonify({'success': True, 'data': bar_columns(bars)}).get_data()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000, 1000000, 10000000])
+    parser.add_argument('--json-max', type=int, default=1000000, help='largest size to also encode as JSON')
+    args = parser.parse_args()
+
+    formats = [serializers.PACKED_COLUMNS] + ([serializers.ARROW_STREAM] if serializers.ARROW_AVAILABLE else [])
+    # Warm up each encoder so one-time imports don't land in the first row
+    for mimetype in formats:
+        serializers.binary_response(mimetype, bar_columns(synthetic_series('ZWIRE', INTRADAY, 10)))
+
+    rows = []
+    for size in args.sizes:
+        bars = synthetic_series('ZWIRE', INTRADAY, size)
+        metadata = {'symbol': 'ZWIRE', 'barSeconds': INTRADAY}
+
+        if size <= args.json_max:
+            body, encode_ms = timed(lambda: encode_json(bars))
+            rows.append([f"{size:,}", 'json', f"{len(body) / 2 ** 20:,.1f}", f"{encode_ms:,.1f}", '-'])
+            json_bytes = len(body)
+        else:
+            json_bytes = None
+
+        for mimetype in formats:
+            response, encode_ms = timed(lambda: serializers.binary_response(mimetype, bar_columns(bars), metadata))
+            body = b''.join(response.response)
+            if mimetype == serializers.ARROW_STREAM:
+                import pyarrow.ipc
+                _, decode_ms = timed(
+                    lambda: [column.to_numpy() for column in pyarrow.ipc.open_stream(body).read_all().columns]
+                )
+                name = 'arrow'
+            else:
+                _, decode_ms = timed(lambda: serializers.unpack_columns(body))
+                name = 'packed'
+            ratio = f" ({json_bytes / len(body):.1f}x smaller)" if json_bytes else ''
+            rows.append([f"{size:,}", name, f"{len(body) / 2 ** 20:,.1f}{ratio}", f"{encode_ms:,.1f}", f"{decode_ms:,.2f}"])
+
+    print_table(['points', 'format', 'MB on wire', 'encode ms', 'decode ms'], rows)
+
+
+if __name__ == '__main__':
+    main()
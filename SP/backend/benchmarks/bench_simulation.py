@@ -0,0 +1,74 @@
+"""Benchmark Monte Carlo prediction intervals across worker processes
+
+Simulates --paths GBM paths of --steps daily steps for each of --symbols
+synthetic symbols with models.simulation.simulate_many, for each process
+count, and reports the wall time, throughput in path-steps per second and
+the peak RSS of the parent and of the largest worker. Paths are simulated
+in chunks of --chunk-paths, so the working set per worker stays at about
+chunk x steps x 4 bytes rather than the full paths x steps array, which
+is shown for comparison.
+
+Usage: python -m benchmarks.bench_simulation [--symbols 100] [--paths 100000] [--steps 252] [--processes 1 2 4]
+"""
+import argparse
+import os
+import resource
+import time
+
+import numpy as np
+
+from benchmarks.common import synthetic_symbols, memory_kb, print_table
+from models import simulation
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--symbols', type=int, default=100)
+    parser.add_argument('--paths', type=int, default=100000)
+    parser.add_argument('--steps', type=int, default=252)
+    parser.add_argument('--processes', type=int, nargs='+', default=[1, 2, 4])
+    parser.add_argument('--chunk-paths', type=int, default=simulation.CHUNK_PATHS)
+    parser.add_argument('--method', choices=simulation.METHODS, default='gbm')
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    symbols = synthetic_symbols(args.symbols)
+    returns = rng.normal(0.0004, 0.02, (args.symbols, 252))
+    tasks = [
+        (symbol, 100.0, 100.0 * (1 + rng.normal(0.05, 0.05)), float(history.std()),
+         history if args.method == 'bootstrap' else None, args.steps, args.paths, args.method, args.chunk_paths)
+        for symbol, history in zip(symbols, returns)
+    ]
+    print(f"{args.symbols} symbols x {args.paths:,} paths x {args.steps} steps ({args.method}), "
+          f"chunks of {args.chunk_paths:,} paths, {os.cpu_count()} CPUs; "
+          f"an unchunked float64 array would be {args.paths * args.steps * 8 / 2**20:,.0f} MB per symbol")
+
+    rows = []
+    baseline = None
+    reference = None
+    for processes in args.processes:
+        start = time.perf_counter()
+        results = simulation.simulate_many(tasks, processes)
+        wall = time.perf_counter() - start
+        simulation.shutdown()
+        baseline = baseline or wall
+        reference = reference or results
+        assert results == reference, "results depend on the process count"
+        workers_kb = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss if processes > 1 else '-'
+        rows.append([
+            processes, f"{wall:.1f}", f"{args.symbols / wall:.2f}",
+            f"{args.symbols * args.paths * args.steps / wall / 1e6:,.0f}",
+            f"{baseline / wall:.2f}x", f"{memory_kb()[0]:,}",
+            f"{resource.getrusage(resource.RUSAGE_SELF).ru_maxrss:,}",
+            f"{workers_kb:,}" if processes > 1 else workers_kb
+        ])
+
+    print_table(['processes', 'wall s', 'symbols/s', 'M path-steps/s', 'speedup', 'RSS kB', 'peak RSS kB',
+                 'worker peak RSS kB'], rows)
+    sample = reference[0]
+    print(f"\n{symbols[0]}: p5 {sample['p5']} p50 {sample['p50']} p95 {sample['p95']}, "
+          f"P(gain) {sample['probabilityOfGain']:.1%}")
+
+
+if __name__ == '__main__':
+    main()
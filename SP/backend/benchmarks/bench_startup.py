@@ -0,0 +1,180 @@
+"""Benchmark how long the app and gunicorn workers take to start
+
+Each measurement runs in a fresh interpreter, started with the offline
+environment the other benchmarks use. Three parts:
+
+* importtime: ``python -X importtime -c "import app"``, reduced to the
+  modules that cost the most in total (cumulative, with what they
+  import) and on their own (self)
+* cold start: the time to ``import app``, then to build the app and
+  serve its first request, the median over --runs interpreters
+* workers (with --gunicorn): gunicorn with one worker, with
+  GUNICORN_PRELOAD off and on. Each worker logs how long it took from
+  the fork until it was warmed up; the first worker is timed, then the
+  worker is killed --respawns times and each replacement is timed, which
+  is what a crashed or recycled worker costs
+
+Worker boot is checked against --target seconds, and the cold start
+when workers aren't timed.
+
+Usage: python -m benchmarks.bench_startup [--runs 5] [--top 15] [--gunicorn] [--respawns 3] [--target 0.5]
+"""
+import argparse
+import json
+import os
+import queue
+import re
+import signal
+import statistics
+import subprocess
+import sys
+import threading
+import time
+
+from benchmarks.common import print_table
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Serves from the synthetic feed, without process pools or background precompute
+OFFLINE = {'PREDICTION_PROCESSES': '0', 'SIMULATION_PROCESSES': '1', 'PRECOMPUTE_ENABLED': '0',
+           'MODEL_PREFETCH': '0', 'PYTHONDONTWRITEBYTECODE': '1'}
+
+COLD_START = """
+import json, time
+start = time.perf_counter()
+import app
+imported = time.perf_counter()
+client = app.create_app(readiness_gate=False, profiling=False).test_client()
+assert client.get('/api/market/summary').status_code == 200
+served = time.perf_counter()
+print(json.dumps({'import': imported - start, 'first': served - imported}))
+"""
+
+BOOTED = re.compile(r"Worker (\d+) booted in ([\d.]+) s \(app loaded in ([\d.]+) s, warmed up in ([\d.]+) s\)")
+
+
+def offline_env(**extra):
+    env = dict(os.environ, **OFFLINE, **extra)
+    env.pop('MARKET_DATA_URL', None)
+    return env
+
+
+def import_profile():
+    """(module, self seconds, cumulative seconds, depth) of each import made by ``import app``"""
+    output = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import app'], cwd=BACKEND,
+                            env=offline_env(), capture_output=True, text=True, check=True).stderr
+    modules = []
+    for line in output.splitlines():
+        if not line.startswith('import time:') or 'imported package' in line:
+            continue
+        own, total, name = line[len('import time:'):].split('|')
+        depth = (len(name) - len(name.lstrip())) // 2
+        modules.append((name.strip(), int(own) / 1e6, int(total) / 1e6, depth))
+        # Imports are listed after what they import, so an earlier top-level module isn't the app's
+        if depth == 0 and name.strip() != 'app':
+            modules = []
+    return modules
+
+
+def cold_start(runs):
+    """Median seconds to import the app and to serve its first request, over fresh interpreters"""
+    samples = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        output = subprocess.run([sys.executable, '-c', COLD_START], cwd=BACKEND, env=offline_env(),
+                                capture_output=True, text=True, check=True).stdout
+        sample = json.loads(output)
+        sample['process'] = time.perf_counter() - start
+        samples.append(sample)
+    return {key: statistics.median(sample[key] for sample in samples) for key in ('import', 'first', 'process')}
+
+
+class Gunicorn:
+    """gunicorn with one worker, reading the boot times its workers log"""
+
+    def __init__(self, port, preload):
+        self.process = subprocess.Popen(
+            [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py'], cwd=BACKEND,
+            env=offline_env(PORT=str(port), WEB_CONCURRENCY='1', GUNICORN_PRELOAD='1' if preload else '0'),
+            stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True
+        )
+        self.boots = queue.Queue()
+        threading.Thread(target=self._read, daemon=True).start()
+
+    def _read(self):
+        for line in self.process.stderr:
+            match = BOOTED.search(line)
+            if match:
+                self.boots.put((int(match.group(1)), *map(float, match.groups()[1:])))
+
+    def next_boot(self, timeout=120):
+        """(pid, boot, app load, warm-up) of the next worker to finish booting"""
+        try:
+            return self.boots.get(timeout=timeout)
+        except queue.Empty:
+            raise RuntimeError(f"no worker booted within {timeout} s") from None
+
+    def stop(self):
+        self.process.send_signal(signal.SIGTERM)
+        self.process.wait(timeout=60)
+
+
+def worker_boots(port, preload, respawns):
+    """Boot times of the first worker and of the workers replacing it after it's killed"""
+    server = Gunicorn(port, preload)
+    try:
+        first = server.next_boot()
+        respawned = []
+        pid = first[0]
+        for _ in range(respawns):
+            os.kill(pid, signal.SIGKILL)
+            boot = server.next_boot()
+            respawned.append(boot)
+            pid = boot[0]
+        return first, respawned
+    finally:
+        server.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=5, help='fresh interpreters timed for the cold start')
+    parser.add_argument('--top', type=int, default=15, help='modules listed in the import profile')
+    parser.add_argument('--gunicorn', action='store_true', help='also time gunicorn worker boots')
+    parser.add_argument('--respawns', type=int, default=3, help='workers killed and replaced per mode')
+    parser.add_argument('--port', type=int, default=5099)
+    parser.add_argument('--target', type=float, default=0.5, help='acceptable worker boot in seconds')
+    args = parser.parse_args()
+
+    modules = import_profile()
+    total = next(module[2] for module in modules if module[0] == 'app')
+    print(f"import app: {total:.3f} s by -X importtime, {len(modules)} modules\n")
+    for title, key in (('by cumulative time', 2), ('by self time', 1)):
+        print(title)
+        ranked = sorted((module for module in modules if module[0] != 'app'), key=lambda module: -module[key])
+        print_table(['module', 'depth', 'self ms', 'cumulative ms'],
+                    [[name, depth, f"{own * 1000:.1f}", f"{cumulative * 1000:.1f}"]
+                     for name, own, cumulative, depth in ranked[:args.top]])
+        print()
+
+    cold = cold_start(args.runs)
+    print(f"cold start (median of {args.runs}): import {cold['import']:.3f} s, "
+          f"first request {cold['first']:.3f} s, whole process {cold['process']:.3f} s")
+    if not args.gunicorn:
+        startup = cold['import'] + cold['first']
+        print(f"\nstartup {startup:.3f} s, target {args.target:g} s: {'ok' if startup <= args.target else 'over target'}")
+        return
+
+    rows = []
+    for preload in (False, True):
+        first, respawned = worker_boots(args.port, preload, args.respawns)
+        for label, boots in (('first', [first]), ('respawned', respawned)):
+            boot, loaded, warmed = (statistics.median(boot[index] for boot in boots) for index in (1, 2, 3))
+            rows.append([f"preload {'on' if preload else 'off'}", label, len(boots), f"{loaded:.3f}",
+                         f"{warmed:.3f}", f"{boot:.3f}", 'ok' if boot <= args.target else 'over target'])
+    print()
+    print_table(['mode', 'worker', 'boots', 'app load s', 'warm-up s', 'boot s', f'<= {args.target:g} s'], rows)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,84 @@
+"""Benchmark the symbol search index against the previous linear substring scan
+
+Builds a synthetic universe of listings (60k by default, the size of the
+real listings file), then times typical search-box queries - short
+prefixes, full names, multi-word and misspelled queries - through
+SymbolIndex.search and through the old `in` scan over lowercase names.
+
+Usage: python -m benchmarks.bench_symbol_search [--listings 60000] [--calls 2000]
+"""
+import argparse
+import time
+
+import numpy as np
+
+from benchmarks.common import synthetic_symbols, print_table
+from services.reference_data import STOCK_UNIVERSE
+from services.symbol_index import SymbolIndex
+
+NAME_WORDS = [
+    "Global", "American", "Pacific", "United", "First", "National", "Advanced", "Digital",
+    "Energy", "Health", "Capital", "Systems", "Networks", "Pharma", "Materials", "Motors",
+    "Financial", "Realty", "Semiconductor", "Biotech", "Foods", "Retail", "Logistics", "Media"
+]
+NAME_SUFFIXES = ["Inc.", "Corp.", "Holdings", "Group", "Ltd.", "Co.", "Trust", "plc"]
+
+QUERIES = ["a", "ap", "appl", "apple", "MSFT", "micro", "corp", "global ener", "pharma hold", "semicondctor", "zaq"]
+
+
+def synthetic_listings(count, seed=0):
+    rng = np.random.default_rng(seed)
+    symbols = synthetic_symbols(count)
+    words = rng.choice(NAME_WORDS, size=(count, 2))
+    suffixes = rng.choice(NAME_SUFFIXES, size=count)
+    return list(STOCK_UNIVERSE) + [
+        {"symbol": symbol, "name": f"{symbol.title()} {first} {second} {suffix}"}
+        for symbol, (first, second), suffix in zip(symbols, words, suffixes)
+    ]
+
+
+def linear_scan(listings, query, limit=10):
+    """The previous search_stocks filter"""
+    query = query.lower()
+    return [
+        stock for stock in listings
+        if query in stock["symbol"].lower() or query in stock["name"].lower()
+    ][:limit]
+
+
+def mean_us(func, calls):
+    start = time.perf_counter()
+    for _ in range(calls):
+        func()
+    return (time.perf_counter() - start) / calls * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--listings', type=int, default=60000)
+    parser.add_argument('--calls', type=int, default=2000)
+    args = parser.parse_args()
+
+    listings = synthetic_listings(args.listings)
+    start = time.perf_counter()
+    index = SymbolIndex(listings)
+    build = time.perf_counter() - start
+    start = time.perf_counter()
+    index.search("warmup typo index", 10)
+    typo_build = time.perf_counter() - start
+    print(f"{len(listings):,} listings: index built in {build * 1000:.0f} ms, "
+          f"typo index in {typo_build * 1000:.0f} ms")
+
+    rows = []
+    for query in QUERIES:
+        scan_calls = max(args.calls // 100, 5)
+        scan = mean_us(lambda: linear_scan(listings, query), scan_calls)
+        indexed = mean_us(lambda: index.search(query, 10), args.calls)
+        top = [listing["symbol"] for listing in index.search(query, 3)]
+        rows.append([repr(query), f"{scan:,.0f}", f"{indexed:,.1f}", f"{scan / indexed:,.0f}x", " ".join(top)])
+
+    print_table(['query', 'scan us', 'index us', 'speedup', 'top matches'], rows)
+
+
+if __name__ == '__main__':
+    main()
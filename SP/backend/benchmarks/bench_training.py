@@ -0,0 +1,67 @@
+"""Benchmark the training pipeline's scaling across worker processes
+
+Trains per-sector models for --symbols synthetic symbols with 1, 4 and
+16 worker processes, each from an empty feature cache, and reports the
+time of the feature and fitting stages and the speedup over one process.
+A final rerun with a warm cache shows the cost when no history changed.
+
+Usage: python -m benchmarks.bench_training [--symbols 2000] [--processes 1 4 16] [--timeframes 3m]
+"""
+import argparse
+import os
+import shutil
+import tempfile
+import time
+
+import numpy as np
+
+from benchmarks.common import synthetic_symbols, print_table
+from models import training
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--symbols', type=int, default=2000)
+    parser.add_argument('--processes', type=int, nargs='+', default=[1, 4, 16])
+    parser.add_argument('--timeframes', nargs='+', default=['3m'])
+    parser.add_argument('--by', choices=training.GROUPINGS, default='sector')
+    args = parser.parse_args()
+
+    symbols = synthetic_symbols(args.symbols)
+    print(f"{args.symbols:,} symbols, timeframes {' '.join(args.timeframes)}, one model per {args.by}, "
+          f"{os.cpu_count()} CPUs")
+
+    root = tempfile.mkdtemp(prefix='training-')
+    rows = []
+    baseline = None
+    try:
+        for processes in args.processes:
+            cache_dir = os.path.join(root, f'cache-{processes}')
+            start = time.perf_counter()
+            results, timings = training.run(
+                symbols, args.timeframes, args.by, processes, cache_dir, os.path.join(root, 'registry')
+            )
+            total = time.perf_counter() - start
+            baseline = baseline or total
+            rows.append([processes, 'cold', f"{timings['features']:.1f}", f"{timings['fitting']:.1f}",
+                         f"{total:.1f}", f"{baseline / total:.2f}x"])
+
+        start = time.perf_counter()
+        results, timings = training.run(
+            symbols, args.timeframes, args.by, args.processes[-1], cache_dir, os.path.join(root, 'registry')
+        )
+        total = time.perf_counter() - start
+        rows.append([args.processes[-1], 'warm', f"{timings['features']:.1f}", f"{timings['fitting']:.1f}",
+                     f"{total:.1f}", f"{baseline / total:.2f}x"])
+    finally:
+        shutil.rmtree(root)
+
+    print_table(['processes', 'cache', 'features s', 'fitting s', 'total s', 'speedup'], rows)
+    accuracy = np.mean([metrics['directionAccuracy'] for metrics in results.values()])
+    calibration = np.mean([metrics.get('calibrationError', np.nan) for metrics in results.values()])
+    print(f"\n{len(results)} models, mean out-of-sample direction accuracy {accuracy:.3f}, "
+          f"mean calibration error {calibration:.3f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,59 @@
+"""Shared helpers for the benchmark scripts
+
+Run benchmarks from the backend directory so the app packages resolve,
+e.g. ``python -m benchmarks.bench_batch_predict``.
+"""
+import time
+import numpy as np
+
+
+def synthetic_symbols(count, offset=0):
+    """Generate distinct ticker-like symbols for benchmark inputs"""
+    letters = "ABCDEFGHIJKLMNOPQRSTUVWXYZ"
+    symbols = []
+    for i in range(offset, offset + count):
+        symbol = ""
+        n = i
+        while True:
+            symbol = letters[n % 26] + symbol
+            n = n // 26 - 1
+            if n < 0:
+                break
+        symbols.append("Z" + symbol)
+    return symbols
+
+
+def time_calls(func, repeat=1):
+    """Call func repeatedly and return the elapsed wall time of each call in seconds"""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def memory_kb():
+    """(RSS, PSS) of the current process in kB"""
+    values = {}
+    with open('/proc/self/smaps_rollup') as rollup:
+        for line in rollup:
+            parts = line.split()
+            if parts[0] in ('Rss:', 'Pss:'):
+                values[parts[0]] = int(parts[1])
+    return values['Rss:'], values['Pss:']
+
+
+def percentiles_ms(timings, points=(50, 99)):
+    """Latency percentiles in milliseconds"""
+    values = np.percentile(np.asarray(timings) * 1000, points)
+    return {f"p{point}": round(float(value), 3) for point, value in zip(points, values)}
+
+
+def print_table(headers, rows):
+    """Print rows as an aligned plain-text table"""
+    rows = [[str(cell) for cell in row] for row in rows]
+    widths = [max(len(str(h)), *(len(row[i]) for row in rows)) for i, h in enumerate(headers)]
+    print("  ".join(str(h).rjust(w) for h, w in zip(headers, widths)))
+    for row in rows:
+        print("  ".join(cell.rjust(w) for cell, w in zip(row, widths)))
@@ -0,0 +1,128 @@
+"""Load test the response cache under a Zipf-distributed symbol mix
+
+Drives /api/stocks/<symbol>, /historical and /predict through the Flask
+test client from several threads and reports throughput and p50/p99
+latency with the cache disabled, cold (empty) and warm (second pass over
+the same request sequence). A final check fires concurrent misses for one
+key and counts how many computations actually ran.
+
+Usage: python -m benchmarks.loadtest_cache [--requests 5000] [--threads 8] [--zipf 1.1]
+"""
+import argparse
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from app import app
+from api import routes
+from benchmarks.common import synthetic_symbols, percentiles_ms, print_table
+from services.cache import response_cache
+
+TIMEFRAMES = ['1d', '1w', '1m', '3m', '1y', 'all']
+
+
+def zipf_paths(universe, count, exponent, seed=0):
+    """Request paths whose symbols follow a Zipf popularity distribution"""
+    rng = np.random.default_rng(seed)
+    symbols = synthetic_symbols(universe)
+    weights = 1.0 / np.arange(1, universe + 1) ** exponent
+    picks = rng.choice(universe, size=count, p=weights / weights.sum())
+    kinds = rng.choice(3, size=count, p=[0.5, 0.3, 0.2])
+    timeframes = rng.choice(TIMEFRAMES, size=count)
+
+    paths = []
+    for pick, kind, timeframe in zip(picks, kinds, timeframes):
+        symbol = symbols[pick]
+        if kind == 0:
+            paths.append(f'/api/stocks/{symbol}')
+        elif kind == 1:
+            paths.append(f'/api/stocks/{symbol}/historical?timeframe={timeframe}')
+        else:
+            paths.append(f'/api/stocks/{symbol}/predict?timeframe={timeframe}')
+    return paths
+
+
+def run_phase(paths, threads):
+    local = threading.local()
+
+    def request(path):
+        client = getattr(local, 'client', None)
+        if client is None:
+            client = local.client = app.test_client()
+        start = time.perf_counter()
+        response = client.get(path)
+        elapsed = time.perf_counter() - start
+        assert response.status_code == 200, path
+        return elapsed
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        timings = list(pool.map(request, paths))
+    wall = time.perf_counter() - start
+    return len(paths) / wall, percentiles_ms(timings, (50, 99))
+
+
+def single_flight_check(concurrency):
+    """Concurrent misses for one key, returning how many computations ran"""
+    model = routes.prediction_service.model
+    calls = []
+    original = model.predict_many
+
+    def counting_predict_many(*args, **kwargs):
+        calls.append(1)
+        time.sleep(0.05)  # Hold the computation open so the other callers pile up
+        return original(*args, **kwargs)
+
+    response_cache.clear()
+    model.predict_many = counting_predict_many
+    barrier = threading.Barrier(concurrency)
+
+    def call():
+        barrier.wait()
+        routes.prediction_service.predict('AAPL', '3m')
+
+    try:
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            list(pool.map(lambda _: call(), range(concurrency)))
+    finally:
+        del model.predict_many
+    return len(calls)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--universe', type=int, default=2000)
+    parser.add_argument('--requests', type=int, default=5000)
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--zipf', type=float, default=1.1)
+    parser.add_argument('--concurrent-misses', type=int, default=200)
+    args = parser.parse_args()
+
+    paths = zipf_paths(args.universe, args.requests, args.zipf)
+    rows = []
+
+    response_cache.enabled = False
+    throughput, latency = run_phase(paths, args.threads)
+    rows.append(['disabled', f"{throughput:,.0f}", latency['p50'], latency['p99'], '-'])
+
+    response_cache.enabled = True
+    response_cache.clear()
+    for phase in ('cold', 'warm'):
+        before = response_cache.stats()
+        throughput, latency = run_phase(paths, args.threads)
+        after = response_cache.stats()
+        hits = after['hits'] - before['hits']
+        lookups = hits + after['misses'] - before['misses'] + after['coalesced'] - before['coalesced']
+        rows.append([phase, f"{throughput:,.0f}", latency['p50'], latency['p99'], f"{hits / lookups:.1%}"])
+
+    print_table(['cache', 'req/s', 'p50 ms', 'p99 ms', 'hit rate'], rows)
+
+    computations = single_flight_check(args.concurrent_misses)
+    print(f"\n{args.concurrent_misses} concurrent misses for AAPL ran {computations} computation(s)")
+    print(f"cache stats: {response_cache.stats()}")
+
+
+if __name__ == '__main__':
+    main()
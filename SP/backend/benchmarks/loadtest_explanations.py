@@ -0,0 +1,92 @@
+"""Load test /predict with and without explanations
+
+Trains per-sector 3m models into a temporary registry so explanations
+carry real SHAP attributions, then drives /api/stocks/<symbol>/predict
+through the Flask test client from several threads with ?explain=none,
+summary and full, and finally fetches full explanations afterwards
+through /api/predictions/<id>/explanation for a share of the none
+responses. The response cache is disabled so every request computes;
+each phase uses symbols the others don't, so attribution memoization
+doesn't carry over between them.
+
+Usage: python -m benchmarks.loadtest_explanations [--requests 2000] [--threads 8] [--later 0.1]
+"""
+import argparse
+import os
+import shutil
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from app import app
+from api import routes
+from benchmarks.common import synthetic_symbols, percentiles_ms, print_table
+from models import training
+from models.registry import ModelRegistry
+from services.cache import response_cache
+
+
+def run_phase(paths, threads):
+    local = threading.local()
+    responses = []
+
+    def request(path):
+        client = getattr(local, 'client', None)
+        if client is None:
+            client = local.client = app.test_client()
+        start = time.perf_counter()
+        response = client.get(path)
+        elapsed = time.perf_counter() - start
+        assert response.status_code == 200, path
+        responses.append(response.get_json())
+        return elapsed
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        timings = list(pool.map(request, paths))
+    wall = time.perf_counter() - start
+    return len(paths) / wall, percentiles_ms(timings, (50, 99)), responses
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--universe', type=int, default=300, help='symbols to train the models on')
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--later', type=float, default=0.1, help='share of none responses whose explanation is fetched later')
+    args = parser.parse_args()
+
+    root = tempfile.mkdtemp(prefix='explanations-')
+    try:
+        training.run(synthetic_symbols(args.universe), ['3m'], processes=1,
+                     cache_dir=os.path.join(root, 'cache'), registry=os.path.join(root, 'registry'))
+        routes.prediction_model.registry = ModelRegistry(os.path.join(root, 'registry'))
+        response_cache.enabled = False
+
+        # Build the per-model explainers before measuring
+        routes.model_explainer.explain_many(routes.prediction_service.predict_many(synthetic_symbols(100, 900000), '3m'))
+
+        rows = []
+        none_responses = []
+        for phase, detail in enumerate(('none', 'summary', 'full')):
+            symbols = synthetic_symbols(args.requests, 100000 * (phase + 1))
+            paths = [f'/api/stocks/{symbol}/predict?timeframe=3m&explain={detail}' for symbol in symbols]
+            throughput, latency, responses = run_phase(paths, args.threads)
+            rows.append([f"explain={detail}", f"{throughput:,.0f}", latency['p50'], latency['p99']])
+            if detail == 'none':
+                none_responses = responses
+
+        later = none_responses[:int(len(none_responses) * args.later)]
+        if later:
+            throughput, latency, _ = run_phase([response['data']['explanationUrl'] for response in later], args.threads)
+            rows.append([f"later /explanation ({len(later)})", f"{throughput:,.0f}", latency['p50'], latency['p99']])
+    finally:
+        shutil.rmtree(root)
+
+    print_table(['phase', 'req/s', 'p50 ms', 'p99 ms'], rows)
+    print(f"\nexplainer: {routes.model_explainer.stats()}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,111 @@
+"""Load test /predict p99 latency under a Zipf symbol mix with and without precomputation
+
+Trains per-sector 3m models into a temporary registry, then drives
+/api/stocks/<symbol>/predict (a --full share of them with ?explain=full)
+from several threads. The response cache stays on, but a refresher
+thread clears it every --refresh seconds the way a data refresh
+invalidates cached predictions, so without the scheduler the first
+request for each key after a refresh pays the full cost.
+
+Each configuration runs a warm-up pass, so the scheduler has seen the
+demand, then the measured pass.
+
+Usage: python -m benchmarks.loadtest_precompute [--requests 4000] [--threads 8] [--top-n 200] [--refresh 2]
+"""
+import argparse
+import os
+import shutil
+import tempfile
+import threading
+
+import numpy as np
+
+from api import routes
+from benchmarks.common import synthetic_symbols, print_table
+from benchmarks.loadtest_explanations import run_phase
+from models import training
+from models.registry import ModelRegistry
+from services.cache import response_cache
+from services.precompute import PrecomputeScheduler
+
+
+def zipf_paths(universe, count, exponent, full_share, seed):
+    rng = np.random.default_rng(seed)
+    symbols = synthetic_symbols(universe)
+    weights = 1.0 / np.arange(1, universe + 1) ** exponent
+    picks = rng.choice(universe, size=count, p=weights / weights.sum())
+    full = rng.random(count) < full_share
+    return [
+        f"/api/stocks/{symbols[pick]}/predict?timeframe=3m&explain={'full' if explain else 'none'}"
+        for pick, explain in zip(picks.tolist(), full.tolist())
+    ]
+
+
+def run(paths, threads, refresh):
+    stop = threading.Event()
+
+    def refresher():
+        while not stop.wait(refresh):
+            response_cache.clear()
+
+    thread = threading.Thread(target=refresher, daemon=True)
+    thread.start()
+    try:
+        return run_phase(paths, threads)[:2]
+    finally:
+        stop.set()
+        thread.join()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--universe', type=int, default=2000)
+    parser.add_argument('--train-symbols', type=int, default=300)
+    parser.add_argument('--requests', type=int, default=4000)
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--zipf', type=float, default=1.1)
+    parser.add_argument('--full', type=float, default=0.2, help='share of requests asking for full explanations')
+    parser.add_argument('--refresh', type=float, default=2.0, help='seconds between response cache clears')
+    parser.add_argument('--top-n', type=int, default=200)
+    parser.add_argument('--interval', type=float, default=1.0)
+    args = parser.parse_args()
+
+    root = tempfile.mkdtemp(prefix='precompute-')
+    rows = []
+    try:
+        training.run(synthetic_symbols(args.train_symbols), ['3m'], processes=1,
+                     cache_dir=os.path.join(root, 'cache'), registry=os.path.join(root, 'registry'))
+        routes.prediction_model.registry = ModelRegistry(os.path.join(root, 'registry'))
+
+        for label in ('off', 'on'):
+            scheduler = None
+            if label == 'on':
+                scheduler = PrecomputeScheduler(
+                    routes.prediction_service.precompute_many, top_n=args.top_n, interval=args.interval,
+                    max_age=args.refresh, flush_interval=0.5
+                )
+            routes.prediction_service.precompute = scheduler
+            response_cache.clear()
+
+            run(zipf_paths(args.universe, args.requests // 2, args.zipf, args.full, seed=1), args.threads, args.refresh)
+            throughput, latency = run(
+                zipf_paths(args.universe, args.requests, args.zipf, args.full, seed=2), args.threads, args.refresh
+            )
+            stats = scheduler.stats() if scheduler else {}
+            rows.append([
+                label, f"{throughput:,.0f}", latency['p50'], latency['p99'],
+                f"{stats['hitRate']:.1%}" if scheduler else '-',
+                stats['stalenessSeconds']['p99'] if scheduler and stats['stalenessSeconds'] else '-',
+                f"{stats['wastedRatio']:.1%}" if scheduler else '-'
+            ])
+            if scheduler:
+                scheduler.stop()
+    finally:
+        routes.prediction_service.precompute = None
+        shutil.rmtree(root)
+
+    print_table(['scheduler', 'req/s', 'p50 ms', 'p99 ms', 'precomputed hits', 'staleness p99 s', 'wasted'], rows)
+
+
+if __name__ == '__main__':
+    main()
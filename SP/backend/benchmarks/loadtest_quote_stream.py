@@ -0,0 +1,141 @@
+"""Load test quote fan-out through QuoteHub against the equivalent polling load
+
+Subscribes --subscribers simulated clients, each following one of
+--symbols symbols, to a QuoteHub ticking every --interval seconds and
+drains them from a pool of consumer threads for --duration seconds. A few
+clients (--stalled) never read and should be dropped as slow consumers.
+Reports process CPU per second of wall time, messages delivered per
+second and message latency from publish to receipt.
+
+The polling baseline sends the same clients' requests to
+/api/stocks/<symbol> once per interval through the Flask test client, with
+and without the response cache. Its latency is the age of the data a
+client sees: the request time plus the wait since the last poll.
+
+Usage: python -m benchmarks.loadtest_quote_stream [--subscribers 10000] [--symbols 500] [--duration 10]
+"""
+import argparse
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from app import app
+from benchmarks.common import synthetic_symbols, percentiles_ms, print_table
+from services.cache import response_cache
+from services.market_data import FakeMarketDataProvider, MarketDataClient
+from services.quote_stream import QuoteHub
+
+
+def run_stream(symbols, subscribers, interval, duration, consumers, stalled):
+    market_data = MarketDataClient(FakeMarketDataProvider())
+    hub = QuoteHub(market_data.get_quotes, interval=interval, queue_size=8)
+    latencies = [[] for _ in range(consumers)]
+    stop = threading.Event()
+
+    groups = []
+    for consumer in range(consumers):
+        wakeup = threading.Event()
+        subscriptions = [
+            hub.subscribe([symbols[i % len(symbols)]], wakeup=wakeup)
+            for i in range(consumer, subscribers, consumers)
+        ]
+        groups.append((wakeup, subscriptions))
+    stalled_subscriptions = [hub.subscribe([symbols[i % len(symbols)]]) for i in range(stalled)]
+
+    def consume(index):
+        wakeup, subscriptions = groups[index]
+        received = latencies[index]
+        while not stop.is_set():
+            if not wakeup.wait(0.1):
+                continue
+            wakeup.clear()
+            for subscription in subscriptions:
+                for event in subscription.drain():
+                    received.append(time.time() - event.published)
+
+    threads = [threading.Thread(target=consume, args=(i,)) for i in range(consumers)]
+    cpu_start = time.process_time()
+    wall_start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    time.sleep(duration)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    wall = time.perf_counter() - wall_start
+    cpu = time.process_time() - cpu_start
+    hub.stop()
+
+    timings = [latency for group in latencies for latency in group]
+    dropped = sum(1 for subscription in stalled_subscriptions if subscription.closed_reason == 'slow consumer')
+    return cpu / wall, len(timings) / wall, timings, dropped, hub.stats()
+
+
+def run_polling(symbols, subscribers, interval, rounds, threads, cache):
+    response_cache.enabled = cache
+    response_cache.clear()
+    paths = [f'/api/stocks/{symbols[i % len(symbols)]}' for i in range(subscribers)]
+    local = threading.local()
+
+    def poll(path):
+        client = getattr(local, 'client', None)
+        if client is None:
+            client = local.client = app.test_client()
+        start = time.perf_counter()
+        response = client.get(path)
+        assert response.status_code == 200, path
+        return time.perf_counter() - start
+
+    timings = []
+    cpu_start = time.process_time()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        for _ in range(rounds):
+            timings.extend(pool.map(poll, paths))
+    cpu = time.process_time() - cpu_start
+    response_cache.enabled = True
+
+    # Each round has to fit in one interval for clients to see every tick
+    cpu_per_second = cpu / (rounds * interval)
+    staleness = np.random.default_rng(0).uniform(0, interval, len(timings))
+    return cpu_per_second, len(timings) / (rounds * interval), np.asarray(timings) + staleness
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--subscribers', type=int, default=10000)
+    parser.add_argument('--symbols', type=int, default=500)
+    parser.add_argument('--interval', type=float, default=1.0, help='seconds between ticks or polls')
+    parser.add_argument('--duration', type=float, default=10.0)
+    parser.add_argument('--consumers', type=int, default=16)
+    parser.add_argument('--stalled', type=int, default=20)
+    parser.add_argument('--poll-rounds', type=int, default=2)
+    parser.add_argument('--poll-threads', type=int, default=16)
+    args = parser.parse_args()
+
+    symbols = synthetic_symbols(args.symbols)
+    rows = []
+
+    cores, rate, timings, dropped, stats = run_stream(
+        symbols, args.subscribers, args.interval, args.duration, args.consumers, args.stalled
+    )
+    latency = percentiles_ms(timings, (50, 99))
+    rows.append(['stream', f"{cores:.3f}", f"{rate:,.0f}", latency['p50'], latency['p99']])
+
+    for cache in (False, True):
+        cores, rate, ages = run_polling(
+            symbols, args.subscribers, args.interval, args.poll_rounds, args.poll_threads, cache
+        )
+        latency = percentiles_ms(ages, (50, 99))
+        rows.append([f"polling, cache {'on' if cache else 'off'}", f"{cores:.3f}", f"{rate:,.0f}",
+                     latency['p50'], latency['p99']])
+
+    print(f"{args.subscribers:,} clients across {args.symbols} symbols, one update per {args.interval:g} s")
+    print_table(['mode', 'CPU s per s', 'messages/s', 'p50 latency ms', 'p99 latency ms'], rows)
+    print(f"\nstream: {stats['ticks']} ticks, {stats['events']} events encoded, "
+          f"{dropped} of {args.stalled} stalled subscribers dropped")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,123 @@
+"""Load test the API under gunicorn in several serving configurations
+
+Starts gunicorn with gunicorn.conf.py for each configuration, waits for
+/ready, then drives it for --duration seconds from --concurrency
+connections of a built-in aiohttp client. A --slow share of requests
+are CPU-bound predictions with simulated intervals for symbols not seen
+before (so the response cache can't serve them); the rest are cheap
+market summary reads. Reports throughput and latency percentiles of
+each kind, which shows how far slow requests hold up cheap ones.
+
+Usage: python -m benchmarks.loadtest_serving [--duration 20] [--concurrency 32] [--slow 0.2] [--configs sync gthread offload]
+"""
+import argparse
+import asyncio
+import os
+import signal
+import subprocess
+import sys
+import time
+
+import aiohttp
+import numpy as np
+
+from benchmarks.common import synthetic_symbols, percentiles_ms, print_table
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Environment of each configuration, on top of the caller's
+CONFIGS = {
+    'sync': {'GUNICORN_WORKER_CLASS': 'sync', 'WEB_CONCURRENCY': '1'},
+    'gthread': {'GUNICORN_WORKER_CLASS': 'gthread', 'WEB_CONCURRENCY': '2', 'GUNICORN_THREADS': '8'},
+    'offload': {'GUNICORN_WORKER_CLASS': 'gthread', 'WEB_CONCURRENCY': '2', 'GUNICORN_THREADS': '8',
+                'PREDICTION_PROCESSES': '2'},
+}
+
+
+def start_server(name, port):
+    env = dict(os.environ, PORT=str(port), **CONFIGS[name])
+    return subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py'],
+        cwd=BACKEND, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+
+
+async def wait_ready(session, base, timeout=120):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            async with session.get(f"{base}/ready") as response:
+                if response.status == 200:
+                    return
+        except aiohttp.ClientError:
+            pass
+        await asyncio.sleep(0.5)
+    raise RuntimeError(f"{base} not ready after {timeout} s")
+
+
+async def drive(base, duration, concurrency, slow_share, paths, seed):
+    rng = np.random.default_rng(seed)
+    symbols = iter(synthetic_symbols(100000, seed * 100000))
+    timings = {'slow': [], 'fast': []}
+    errors = 0
+
+    async with aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=concurrency)) as session:
+        await wait_ready(session, base)
+        deadline = time.monotonic() + duration
+
+        async def client():
+            nonlocal errors
+            while time.monotonic() < deadline:
+                kind = 'slow' if rng.random() < slow_share else 'fast'
+                path = (f"/api/stocks/{next(symbols)}/predict?timeframe=1y&intervals={paths}"
+                        if kind == 'slow' else '/api/market/summary')
+                start = time.perf_counter()
+                async with session.get(base + path) as response:
+                    await response.read()
+                    if response.status != 200:
+                        errors += 1
+                timings[kind].append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(client() for _ in range(concurrency)))
+        wall = time.perf_counter() - start
+    return timings, wall, errors
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--configs', nargs='+', choices=list(CONFIGS), default=list(CONFIGS))
+    parser.add_argument('--duration', type=float, default=20)
+    parser.add_argument('--concurrency', type=int, default=32)
+    parser.add_argument('--slow', type=float, default=0.2, help='share of CPU-bound prediction requests')
+    parser.add_argument('--paths', type=int, default=20000, help='simulated paths per slow prediction')
+    parser.add_argument('--port', type=int, default=5090)
+    args = parser.parse_args()
+
+    print(f"{os.cpu_count()} CPUs, {args.concurrency} connections for {args.duration:g} s, "
+          f"{args.slow:.0%} predictions with {args.paths:,} paths")
+    rows = []
+    for offset, name in enumerate(args.configs):
+        port = args.port + offset
+        server = start_server(name, port)
+        try:
+            timings, wall, errors = asyncio.run(
+                drive(f"http://127.0.0.1:{port}", args.duration, args.concurrency, args.slow, args.paths, offset + 1)
+            )
+        finally:
+            server.send_signal(signal.SIGTERM)
+            server.wait()
+        total = sum(len(values) for values in timings.values())
+        fast = percentiles_ms(timings['fast'], (50, 95, 99))
+        slow = percentiles_ms(timings['slow'], (50, 95, 99))
+        rows.append([
+            name, f"{total / wall:,.0f}", errors,
+            fast['p50'], fast['p95'], fast['p99'], slow['p50'], slow['p95'], slow['p99']
+        ])
+
+    print_table(['config', 'req/s', 'errors', 'fast p50 ms', 'fast p95 ms', 'fast p99 ms',
+                 'slow p50 ms', 'slow p95 ms', 'slow p99 ms'], rows)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,158 @@
+"""Concurrency stress test for the deterministic /predict and /historical routes
+
+Hammers both routes from many client threads, checks that every response
+matches the single-threaded reference output and reports throughput per
+server thread count. By default requests go through the Flask test client
+with a semaphore limiting in-flight requests to the worker thread count;
+with --gunicorn a real ``gunicorn -k gthread --threads N`` server is
+started for each thread count.
+
+Usage: python -m benchmarks.stress_concurrency [--clients 32] [--threads 1 4 16] [--gunicorn]
+The response cache is disabled so every request is actually computed.
+Exits non-zero if any response differs from the reference.
+"""
+import argparse
+import json
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.common import synthetic_symbols, print_table
+
+# Response fields derived from the wall clock, which legitimately differ between calls
+VOLATILE_KEYS = {"timestamp", "updated_at", "timestamps", "labels"}
+
+TIMEFRAMES = ['1d', '1w', '1m', '3m', '1y', 'all']
+
+
+def strip_volatile(value):
+    if isinstance(value, dict):
+        return {k: strip_volatile(v) for k, v in value.items() if k not in VOLATILE_KEYS}
+    if isinstance(value, list):
+        return [strip_volatile(v) for v in value]
+    return value
+
+
+def build_paths(symbols):
+    paths = []
+    for symbol in symbols:
+        for timeframe in TIMEFRAMES:
+            paths.append(f'/api/stocks/{symbol}/predict?timeframe={timeframe}')
+            paths.append(f'/api/stocks/{symbol}/historical?timeframe={timeframe}')
+    return paths
+
+
+class TestClientTarget:
+    """Runs requests in-process, allowing at most `threads` to execute at once"""
+
+    def __init__(self, threads):
+        from app import app
+        from services.cache import response_cache
+        response_cache.enabled = False
+        self.local = threading.local()
+        self.app = app
+        self.slots = threading.BoundedSemaphore(threads)
+
+    def get(self, path):
+        client = getattr(self.local, 'client', None)
+        if client is None:
+            client = self.local.client = self.app.test_client()
+        with self.slots:
+            response = client.get(path)
+        return response.get_json()
+
+    def close(self):
+        pass
+
+
+class GunicornTarget:
+    """Runs requests over HTTP against a gthread gunicorn server"""
+
+    def __init__(self, threads):
+        with socket.socket() as sock:
+            sock.bind(('127.0.0.1', 0))
+            self.port = sock.getsockname()[1]
+        self.process = subprocess.Popen(
+            [sys.executable, '-m', 'gunicorn', '--bind', f'127.0.0.1:{self.port}',
+             '--worker-class', 'gthread', '--workers', '1', '--threads', str(threads), 'app:app'],
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+            env=dict(os.environ, RESPONSE_CACHE_ENABLED='0')
+        )
+        deadline = time.time() + 30
+        while True:
+            try:
+                urllib.request.urlopen(f'http://127.0.0.1:{self.port}/health', timeout=1)
+                break
+            except OSError:
+                if time.time() > deadline:
+                    self.close()
+                    raise RuntimeError('gunicorn did not start')
+                time.sleep(0.2)
+
+    def get(self, path):
+        try:
+            with urllib.request.urlopen(f'http://127.0.0.1:{self.port}{path}') as response:
+                return json.loads(response.read())
+        except urllib.error.HTTPError as error:
+            # Error responses still carry a JSON body to compare
+            return json.loads(error.read())
+
+    def close(self):
+        self.process.terminate()
+        self.process.wait()
+
+
+def hammer(target, paths, reference, clients, rounds):
+    """Issue every path `rounds` times from `clients` threads, returning (elapsed, count, mismatches)"""
+    work = paths * rounds
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=clients) as pool:
+        results = list(pool.map(lambda path: (path, strip_volatile(target.get(path))), work))
+    elapsed = time.perf_counter() - start
+    mismatches = [path for path, body in results if body != reference[path]]
+    return elapsed, len(work), mismatches
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--clients', type=int, default=32)
+    parser.add_argument('--threads', type=int, nargs='+', default=[1, 4, 16])
+    parser.add_argument('--symbols', type=int, default=20)
+    parser.add_argument('--rounds', type=int, default=5)
+    parser.add_argument('--gunicorn', action='store_true', help='serve through real gthread gunicorn workers')
+    args = parser.parse_args()
+
+    symbols = ['AAPL', 'MSFT', 'NVDA'] + synthetic_symbols(args.symbols)
+    paths = build_paths(symbols)
+
+    # Single-threaded reference output
+    reference_target = TestClientTarget(1)
+    reference = {path: strip_volatile(reference_target.get(path)) for path in paths}
+
+    target_class = GunicornTarget if args.gunicorn else TestClientTarget
+    rows = []
+    failed = False
+    for threads in args.threads:
+        target = target_class(threads)
+        try:
+            elapsed, total, mismatches = hammer(target, paths, reference, args.clients, args.rounds)
+        finally:
+            target.close()
+        failed = failed or bool(mismatches)
+        rows.append([threads, args.clients, total, f"{total / elapsed:,.0f}", len(mismatches)])
+
+    print_table(['worker threads', 'clients', 'requests', 'req/s', 'mismatches'], rows)
+    if failed:
+        print('FAIL: concurrent responses differ from single-threaded output')
+        sys.exit(1)
+    print('OK: all concurrent responses match single-threaded output')
+
+
+if __name__ == '__main__':
+    main()
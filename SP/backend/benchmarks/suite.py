@@ -0,0 +1,576 @@
+"""Benchmark suite of every API route and service method, with results saved as JSON for comparison
+
+Micro benchmarks call the methods of StockService, PredictionService,
+PredictionModel and ModelExplainer directly. Macro benchmarks drive every
+route of the API blueprint, and the app's health, readiness and metrics
+endpoints, through the Flask test client. Symbols come from a Zipf mix
+over the listed stocks and a synthetic universe, so popular symbols
+repeat as they would in production.
+
+Everything runs offline and from fixed seeds: quotes come from the fake
+feed rather than MARKET_DATA_URL, prediction processes, precompute and
+the response cache are off (--cache keeps the cache on), and sector
+models are trained on synthetic history into a temporary registry first
+so explanations take the SHAP path (--no-models skips this).
+
+Each case is called once to warm up and check its response, then run
+for --repeat rounds of enough calls to take --min-time seconds. Results
+(median, min and interquartile range of seconds per call, with the
+machine, package versions and git revision) are written to --output,
+by default a new file in .benchmarks/. With --baseline, each case is
+compared with a saved run and the process exits with status 1 if any is
+slower by more than --threshold percent, in both its median and its
+fastest round, which keeps one noisy round from failing the check.
+--baseline latest picks the newest file in .benchmarks/. Explainer
+cases see repeated symbols, so they mostly hit memoized attributions,
+as popular symbols do when serving.
+
+Sub-millisecond cases vary by 10-30% between runs on a busy machine,
+hence the 20% default threshold; compare runs from the same machine,
+with little else running.
+
+Usage: python -m benchmarks.suite [--filter predict] [--baseline latest] [--threshold 20] [--quick]
+"""
+import argparse
+import glob
+import importlib.metadata
+import itertools
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from benchmarks.common import synthetic_symbols, print_table
+
+RESULTS_DIR = '.benchmarks'
+
+# Symbols in the mix, and the exponent of their Zipf popularity
+UNIVERSE = 500
+ZIPF_EXPONENT = 1.1
+MIX_SIZE = 10000
+
+# Symbols per batched call, and simulated paths per predicted interval
+BATCH = 50
+PATHS = 2000
+
+# Synthetic symbols the sector models are trained on
+TRAINING_SYMBOLS = 120
+
+PACKAGES = ('flask', 'numpy', 'pandas', 'scipy', 'scikit-learn', 'shap')
+
+# (group, name, setup) of every case, in registration order; setup(workload) returns the callable to time
+CASES = []
+
+
+def case(group, name):
+    def register(setup):
+        CASES.append((group, name, setup))
+        return setup
+    return register
+
+
+class Workload:
+    """The app's services and a test client, with a reproducible mix of symbols to call them with"""
+
+    def __init__(self, seed=0, universe=UNIVERSE):
+        # Imported here, after main() has set up the environment the services read
+        from api import routes
+        from app import create_app
+
+        self.stocks = routes.stock_service
+        self.predictions = routes.prediction_service
+        self.model = routes.prediction_model
+        self.explainer = routes.model_explainer
+        self.app = create_app(readiness_gate=False, profiling=False)
+        self.client = self.app.test_client()
+        # Measured as a worker serves traffic: after its warm-up steps
+        self.app.extensions['readiness'].warm_up()
+
+        listed = [listing["symbol"] for listing in self.stocks.symbol_index.listings]
+        self.universe = listed + synthetic_symbols(max(universe - len(listed), 0))
+        rng = np.random.default_rng(seed)
+        weights = 1.0 / np.arange(1, len(self.universe) + 1) ** ZIPF_EXPONENT
+        picks = rng.choice(len(self.universe), size=MIX_SIZE, p=weights / weights.sum())
+        self.mix = [self.universe[pick] for pick in picks]
+        self.restart()
+
+    def restart(self):
+        """Start the mix over, so each case calls the same symbols whichever cases run before it"""
+        self.symbol = itertools.cycle(self.mix).__next__
+
+    def symbols(self, count):
+        """The next count distinct symbols of the mix"""
+        symbols = {}
+        while len(symbols) < count:
+            symbols[self.symbol()] = None
+        return list(symbols)
+
+    def request(self, method, path, expected=200, **kwargs):
+        """Response of the app to a request, which must have the expected status"""
+        response = self.client.open(path, method=method, **kwargs)
+        if response.status_code != expected:
+            raise RuntimeError(f"{method} {path} returned {response.status_code}: {response.get_data(as_text=True)[:200]}")
+        return response
+
+    def get(self, path, **kwargs):
+        return self.request('GET', path, **kwargs)
+
+    def post(self, path, payload, **kwargs):
+        return self.request('POST', path, json=payload, **kwargs)
+
+    def prediction_ids(self, count):
+        """Ids of retained predictions for the mix, for the explanation cases"""
+        return itertools.cycle([prediction.id for prediction in self.predictions.predict_many(self.symbols(count))])
+
+    def prediction_batches(self, count=10):
+        """Batches of predictions for the mix, made ahead so explainer cases time only explaining them"""
+        return itertools.cycle([self.model.predict_many(self.symbols(BATCH), '3m') for _ in range(count)])
+
+    def holdings(self, count=20):
+        return {symbol: 10 + index for index, symbol in enumerate(self.symbols(count))}
+
+
+# Micro benchmarks: service, model and explainer methods
+
+@case('micro', 'StockService.get_quotes')
+def _(w):
+    return lambda: w.stocks.get_quotes(w.symbols(BATCH))
+
+
+@case('micro', 'StockService.search_stocks')
+def _(w):
+    return lambda: w.stocks.search_stocks(w.symbol()[:2], 10)
+
+
+@case('micro', 'StockService.get_stock_details')
+def _(w):
+    return lambda: w.stocks.get_stock_details(w.symbol())
+
+
+@case('micro', 'StockService.get_historical_series')
+def _(w):
+    return lambda: w.stocks.get_historical_series(w.symbol(), '1y')
+
+
+@case('micro', 'StockService.get_historical_data')
+def _(w):
+    return lambda: w.stocks.get_historical_data(w.symbol(), '3m')
+
+
+@case('micro', 'StockService.get_historical_bars')
+def _(w):
+    return lambda: w.stocks.get_historical_bars(w.symbol(), '1w')
+
+
+@case('micro', 'StockService.get_market_summary')
+def _(w):
+    return w.stocks.get_market_summary
+
+
+@case('micro', 'StockService.get_market_movers')
+def _(w):
+    return lambda: w.stocks.get_market_movers(5)
+
+
+@case('micro', 'StockService.get_portfolio_risk')
+def _(w):
+    holdings = w.holdings()
+    return lambda: w.stocks.get_portfolio_risk(holdings)
+
+
+@case('micro', 'StockService.get_most_watched')
+def _(w):
+    return lambda: w.stocks.get_most_watched(5)
+
+
+@case('micro', 'PredictionService.predict')
+def _(w):
+    return lambda: w.predictions.predict(w.symbol(), '3m')
+
+
+@case('micro', 'PredictionService.predict_many')
+def _(w):
+    return lambda: w.predictions.predict_many(w.symbols(BATCH), '3m')
+
+
+@case('micro', 'PredictionService.precompute_many')
+def _(w):
+    return lambda: w.predictions.precompute_many(w.symbols(10), '3m')
+
+
+@case('micro', 'PredictionService.get_prediction')
+def _(w):
+    ids = w.prediction_ids(BATCH)
+    return lambda: w.predictions.get_prediction(next(ids))
+
+
+@case('micro', 'PredictionService.explain')
+def _(w):
+    ids = w.prediction_ids(BATCH)
+    return lambda: w.predictions.explain(next(ids), 'full')
+
+
+@case('micro', 'PredictionService.explain_many')
+def _(w):
+    batches = w.prediction_batches()
+    return lambda: w.predictions.explain_many(next(batches), 'summary')
+
+
+@case('micro', 'PredictionService.score_many')
+def _(w):
+    return lambda: w.predictions.score_many(w.symbols(BATCH), '3m')
+
+
+@case('micro', 'PredictionModel.predict')
+def _(w):
+    return lambda: w.model.predict(w.symbol(), '3m')
+
+
+@case('micro', 'PredictionModel.predict_many')
+def _(w):
+    return lambda: w.model.predict_many(w.symbols(BATCH), '3m')
+
+
+@case('micro', 'PredictionModel.score_many')
+def _(w):
+    return lambda: w.model.score_many(w.symbols(BATCH), '3m')
+
+
+@case('micro', 'PredictionModel.simulate_intervals')
+def _(w):
+    symbols = w.symbols(10)
+    scores = w.model.score_many(symbols, '3m')
+    return lambda: w.model.simulate_intervals(symbols, '3m', scores, PATHS, processes=1)
+
+
+@case('micro', 'PredictionModel.technical_signals')
+def _(w):
+    return lambda: w.model.technical_signals(w.symbols(BATCH))
+
+
+@case('micro', 'PredictionModel.resolve_models')
+def _(w):
+    return lambda: w.model.resolve_models(w.symbols(BATCH), '3m')
+
+
+@case('micro', 'ModelExplainer.explain_prediction')
+def _(w):
+    predictions = itertools.chain.from_iterable(w.prediction_batches())
+
+    def explain():
+        prediction = next(predictions)
+        return w.explainer.explain_prediction(prediction.symbol, prediction)
+    return explain
+
+
+@case('micro', 'ModelExplainer.explain_many')
+def _(w):
+    batches = w.prediction_batches()
+    return lambda: w.explainer.explain_many(next(batches), 'full')
+
+
+@case('micro', 'ModelExplainer.attributions_many')
+def _(w):
+    batches = w.prediction_batches()
+    return lambda: w.explainer.attributions_many(next(batches))
+
+
+# Macro benchmarks: routes through the test client
+
+@case('macro', 'GET /api/stocks')
+def _(w):
+    return lambda: w.get(f'/api/stocks?query={w.symbol()[:2]}')
+
+
+@case('macro', 'GET /api/stocks/<symbol>')
+def _(w):
+    return lambda: w.get(f'/api/stocks/{w.symbol()}')
+
+
+@case('macro', 'GET /api/quotes')
+def _(w):
+    return lambda: w.get(f"/api/quotes?symbols={','.join(w.symbols(20))}")
+
+
+@case('macro', 'GET /api/stream/quotes (first event)')
+def _(w):
+    def first_event():
+        response = w.get(f"/api/stream/quotes?symbols={','.join(w.symbols(10))}", buffered=False)
+        try:
+            return next(iter(response.response))
+        finally:
+            response.close()
+    return first_event
+
+
+@case('macro', 'GET /api/stocks/<symbol>/historical')
+def _(w):
+    return lambda: w.get(f'/api/stocks/{w.symbol()}/historical?timeframe=3m')
+
+
+@case('macro', 'GET /api/stocks/<symbol>/historical packed columns')
+def _(w):
+    from api import serializers
+    headers = {'Accept': serializers.PACKED_COLUMNS}
+    return lambda: w.get(f'/api/stocks/{w.symbol()}/historical?timeframe=1y', headers=headers)
+
+
+@case('macro', 'GET /api/stocks/<symbol>/historical stream=1')
+def _(w):
+    return lambda: w.get(f'/api/stocks/{w.symbol()}/historical?timeframe=1m&stream=1')
+
+
+@case('macro', 'GET /api/stocks/<symbol>/predict')
+def _(w):
+    return lambda: w.get(f'/api/stocks/{w.symbol()}/predict')
+
+
+@case('macro', 'GET /api/stocks/<symbol>/predict explain=full')
+def _(w):
+    return lambda: w.get(f'/api/stocks/{w.symbol()}/predict?explain=full')
+
+
+@case('macro', f'GET /api/stocks/<symbol>/predict intervals={PATHS}')
+def _(w):
+    return lambda: w.get(f'/api/stocks/{w.symbol()}/predict?intervals={PATHS}')
+
+
+@case('macro', 'GET /api/predictions/<id>/explanation')
+def _(w):
+    ids = w.prediction_ids(BATCH)
+    return lambda: w.get(f'/api/predictions/{next(ids)}/explanation')
+
+
+@case('macro', f'POST /api/predict/batch {BATCH} symbols explain=summary')
+def _(w):
+    return lambda: w.post('/api/predict/batch', {'symbols': w.symbols(BATCH), 'explain': 'summary'})
+
+
+@case('macro', f'POST /api/predict/batch {BATCH} symbols packed columns')
+def _(w):
+    from api import serializers
+    headers = {'Accept': serializers.PACKED_COLUMNS}
+    return lambda: w.post('/api/predict/batch', {'symbols': w.symbols(BATCH), 'timeframes': ['1m', '3m']},
+                          headers=headers)
+
+
+@case('macro', 'GET /api/market/summary')
+def _(w):
+    return lambda: w.get('/api/market/summary')
+
+
+@case('macro', 'GET /api/market/movers')
+def _(w):
+    return lambda: w.get('/api/market/movers?limit=10')
+
+
+@case('macro', 'GET /api/market/most-watched')
+def _(w):
+    return lambda: w.get('/api/market/most-watched')
+
+
+@case('macro', 'POST /api/portfolio/risk')
+def _(w):
+    holdings = w.holdings()
+    return lambda: w.post('/api/portfolio/risk', {'holdings': holdings})
+
+
+@case('macro', 'GET /health')
+def _(w):
+    return lambda: w.get('/health')
+
+
+@case('macro', 'GET /ready')
+def _(w):
+    return lambda: w.get('/ready')
+
+
+@case('macro', 'GET /metrics')
+def _(w):
+    return lambda: w.get('/metrics')
+
+
+def measure(func, repeat, min_time):
+    """Seconds per call of func in each of repeat rounds, after a warm-up call sizing the rounds"""
+    start = time.perf_counter()
+    func()
+    single = max(time.perf_counter() - start, 1e-6)
+    number = max(1, int(min_time / single))
+    rounds = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        rounds.append((time.perf_counter() - start) / number)
+    return rounds, number
+
+
+def summarize(rounds, number):
+    quartiles = statistics.quantiles(rounds, n=4) if len(rounds) > 1 else [rounds[0]] * 3
+    median = statistics.median(rounds)
+    return {
+        "median": median,
+        "min": min(rounds),
+        "iqr": quartiles[2] - quartiles[0],
+        "callsPerSecond": 1 / median,
+        "rounds": len(rounds),
+        "callsPerRound": number
+    }
+
+
+def environment():
+    versions = {}
+    for package in PACKAGES:
+        try:
+            versions[package] = importlib.metadata.version(package)
+        except importlib.metadata.PackageNotFoundError:
+            versions[package] = None
+    try:
+        revision = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                                  check=True).stdout.strip()
+        dirty = bool(subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'], capture_output=True,
+                                    text=True).stdout.strip())
+    except (OSError, subprocess.CalledProcessError):
+        revision, dirty = None, None
+    return {
+        "machine": platform.machine(),
+        "processor": platform.processor(),
+        "cpus": os.cpu_count(),
+        "system": platform.platform(),
+        "python": platform.python_version(),
+        "packages": versions,
+        "git": {"revision": revision, "dirty": dirty}
+    }
+
+
+def latest_results():
+    paths = sorted(glob.glob(os.path.join(RESULTS_DIR, '*.json')))
+    if not paths:
+        raise SystemExit(f"No saved results in {RESULTS_DIR}/ to compare with")
+    return paths[-1]
+
+
+def compare(baseline, results, threshold):
+    """Table rows comparing results with a baseline run, and the names of cases that regressed"""
+    rows = []
+    regressions = []
+    for name, result in results.items():
+        before = baseline.get(name)
+        if before is None:
+            rows.append([name, '-', f"{result['median'] * 1000:.3f}", 'new', ''])
+            continue
+        change = (result["median"] / before["median"] - 1) * 100
+        regressed = change > threshold and (result["min"] / before["min"] - 1) * 100 > threshold
+        if regressed:
+            regressions.append(name)
+        rows.append([name, f"{before['median'] * 1000:.3f}", f"{result['median'] * 1000:.3f}", f"{change:+.1f}%",
+                     'REGRESSION' if regressed else ''])
+    return rows, regressions
+
+
+def train_models(root):
+    """Train 3m sector models on synthetic history into a registry under root, returning its path"""
+    from models import training
+    registry = os.path.join(root, 'registry')
+    training.run(synthetic_symbols(TRAINING_SYMBOLS, 100000), ['3m'], processes=1,
+                 cache_dir=os.path.join(root, 'cache'), registry=registry)
+    return registry
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--filter', nargs='+', default=[], help='run only cases whose names contain one of these')
+    parser.add_argument('--group', choices=('micro', 'macro'), help='run only micro or macro benchmarks')
+    parser.add_argument('--list', action='store_true', help='list the cases and exit')
+    parser.add_argument('--repeat', type=int, default=7, help='timed rounds per case')
+    parser.add_argument('--min-time', type=float, default=0.2, help='seconds each round should take at least')
+    parser.add_argument('--quick', action='store_true', help='3 rounds of 0.02 s, as a smoke test')
+    parser.add_argument('--seed', type=int, default=0, help='seed of the symbol mix')
+    parser.add_argument('--cache', action='store_true', help='keep the response cache on')
+    parser.add_argument('--no-models', action='store_true', help="don't train sector models first")
+    parser.add_argument('--output', help=f'results file (default: a new file in {RESULTS_DIR}/)')
+    parser.add_argument('--baseline', help="results file to compare with, or 'latest'")
+    parser.add_argument('--threshold', type=float, default=20.0, help='percent slowdown counted as a regression')
+    args = parser.parse_args()
+    if args.quick:
+        args.repeat, args.min_time = 3, 0.02
+
+    cases = [(group, name, setup) for group, name, setup in CASES
+             if (args.group is None or group == args.group)
+             and (not args.filter or any(pattern in name for pattern in args.filter))]
+    if args.list or not cases:
+        for group, name, _ in cases:
+            print(f"{group:5}  {name}")
+        return
+    baseline_path = latest_results() if args.baseline == 'latest' else args.baseline
+    baseline = None
+    if baseline_path:
+        with open(baseline_path) as saved:
+            baseline = json.load(saved)
+
+    # Offline and deterministic: the fake quote feed, the model in this process, nothing ahead of demand
+    os.environ.pop('MARKET_DATA_URL', None)
+    os.environ.update(PREDICTION_PROCESSES='0', SIMULATION_PROCESSES='1', PRECOMPUTE_ENABLED='0',
+                      READINESS_GATE='0', PROFILING_ENABLED='0')
+    root = tempfile.mkdtemp(prefix='suite-')
+    try:
+        if args.no_models:
+            os.environ.pop('MODEL_REGISTRY_PATH', None)
+        else:
+            start = time.perf_counter()
+            os.environ['MODEL_REGISTRY_PATH'] = train_models(root)
+            print(f"trained sector models on {TRAINING_SYMBOLS} symbols in {time.perf_counter() - start:.1f} s")
+
+        workload = Workload(args.seed)
+        from services.cache import response_cache
+        response_cache.enabled = args.cache
+
+        results = {}
+        rows = []
+        for group, name, setup in cases:
+            workload.restart()
+            rounds, number = measure(setup(workload), args.repeat, args.min_time)
+            result = results[name] = dict(group=group, **summarize(rounds, number))
+            rows.append([group, name, f"{result['median'] * 1000:.3f}", f"{result['iqr'] * 1000:.3f}",
+                         f"{result['callsPerSecond']:,.1f}"])
+            print(f"  {name}: {result['median'] * 1000:.3f} ms", file=sys.stderr)
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+    print()
+    print_table(['group', 'case', 'median ms', 'iqr ms', 'calls/s'], rows)
+
+    output = args.output or os.path.join(RESULTS_DIR, f"{time.strftime('%Y%m%d-%H%M%S')}.json")
+    os.makedirs(os.path.dirname(output) or '.', exist_ok=True)
+    with open(output, 'w') as saved:
+        json.dump({
+            "created": time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+            "environment": environment(),
+            "settings": {"repeat": args.repeat, "minTime": args.min_time, "seed": args.seed, "cache": args.cache,
+                         "models": not args.no_models, "universe": UNIVERSE, "batch": BATCH},
+            "results": results
+        }, saved, indent=2)
+    print(f"\nresults written to {output}")
+
+    if baseline is None:
+        return
+    rows, regressions = compare(baseline["results"], results, args.threshold)
+    print(f"\ncompared with {baseline_path} ({baseline['environment']['git']['revision']}), "
+          f"threshold {args.threshold:g}%\n")
+    if baseline["environment"]["machine"] != platform.machine() or baseline["environment"]["cpus"] != os.cpu_count():
+        print("warning: the baseline was recorded on a different machine\n")
+    print_table(['case', 'baseline ms', 'median ms', 'change', ''], rows)
+    if regressions:
+        print(f"\n{len(regressions)} case(s) slower than the baseline by more than {args.threshold:g}%")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
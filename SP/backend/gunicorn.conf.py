@@ -0,0 +1,79 @@
+"""Gunicorn settings for serving the API in production
+
+Usage: gunicorn -c gunicorn.conf.py
+
+Each setting comes from the environment:
+
+* WEB_CONCURRENCY: worker processes (default: one per core)
+* GUNICORN_WORKER_CLASS: gthread (default) or sync; gevent or eventlet
+  need those packages installed
+* GUNICORN_THREADS: request threads per gthread worker (default 8)
+* GUNICORN_TIMEOUT, GUNICORN_GRACEFUL_TIMEOUT, GUNICORN_KEEPALIVE: seconds
+* PORT: port to bind (default 5000)
+* GUNICORN_PRELOAD=1: import the app in the master before forking workers
+
+Prediction scoring can run in a process pool per worker with
+PREDICTION_PROCESSES, so threads waiting on I/O aren't stuck behind
+NumPy work holding the GIL. A worker runs the app's warm-up steps
+before it accepts connections, so it only takes traffic once models
+and caches are loaded. Each worker logs how long it took to load the
+app and to warm up.
+
+Workers start faster with GUNICORN_PRELOAD=1: the master imports the
+app, and the libraries the app imports on first use (PRELOAD_MODULES),
+once, and forked workers share those pages copy-on-write instead of
+importing them again. Services are built on first use, so each worker
+still builds its own, after the fork. A preloaded master keeps the code
+it started with, so deploy new code by restarting it rather than with
+a HUP.
+"""
+import importlib
+import os
+import time
+
+wsgi_app = 'app:app'
+bind = f"0.0.0.0:{os.environ.get('PORT', 5000)}"
+workers = int(os.environ.get('WEB_CONCURRENCY', os.cpu_count() or 1))
+worker_class = os.environ.get('GUNICORN_WORKER_CLASS', 'gthread')
+threads = int(os.environ.get('GUNICORN_THREADS', 8))
+# Greenlet workers take as many connections as this, rather than threads
+worker_connections = int(os.environ.get('GUNICORN_WORKER_CONNECTIONS', 1000))
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 60))
+graceful_timeout = int(os.environ.get('GUNICORN_GRACEFUL_TIMEOUT', 30))
+keepalive = int(os.environ.get('GUNICORN_KEEPALIVE', 5))
+
+preload_app = os.environ.get('GUNICORN_PRELOAD', '0') == '1'
+accesslog = os.environ.get('GUNICORN_ACCESS_LOG') or None
+
+
+# Imported by the app when first needed, which a preloaded master does up front
+PRELOAD_MODULES = ('shap', 'joblib', 'scipy.linalg', 'pyarrow.ipc')
+
+
+def when_ready(server):
+    """Import the app's lazily imported libraries in a preloading master, before any worker is forked"""
+    if not server.cfg.preload_app:
+        return
+    start = time.monotonic()
+    for name in PRELOAD_MODULES:
+        try:
+            importlib.import_module(name)
+        except ImportError:
+            continue
+    server.log.info("Preloaded %s in %.3f s", ', '.join(PRELOAD_MODULES), time.monotonic() - start)
+
+
+def post_fork(server, worker):
+    worker.forked_at = time.monotonic()
+
+
+def post_worker_init(worker):
+    """Warm the worker's models and caches before it accepts connections"""
+    loaded_at = time.monotonic()
+    readiness = worker.wsgi.extensions['readiness']
+    readiness.start()
+    # Keep the arbiter from timing the worker out while it warms up
+    while not readiness.wait(1):
+        worker.notify()
+    worker.log.info("Worker %s booted in %.3f s (app loaded in %.3f s, warmed up in %.3f s)", worker.pid,
+                    time.monotonic() - worker.forked_at, loaded_at - worker.forked_at, time.monotonic() - loaded_at)
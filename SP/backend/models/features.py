@@ -0,0 +1,457 @@
+"""Vectorized technical indicators over symbol x time price matrices
+
+Every function takes arrays shaped (symbols, bars) - or a single series
+of shape (bars,) - and returns arrays of the same shape, computed for all
+symbols at once with running sums and linear filters rather than per-bar
+Python loops. Bars before an indicator has a full window
+are NaN. Functions take an optional out (a tuple for those returning
+several arrays) to write their results into instead of new arrays.
+
+When numba is installed, compute_indicators runs the single compiled
+pass of models.indicator_kernel instead, and these functions are its
+reference.
+
+IndicatorState carries the trailing state of every indicator so that a
+newly arrived bar updates them in O(window) per symbol instead of a full
+recomputation.
+"""
+from functools import lru_cache
+
+import numpy as np
+
+# Default indicator parameters
+SMA_WINDOW = 50
+EMA_SPAN = 20
+RSI_PERIOD = 14
+MACD_FAST, MACD_SLOW, MACD_SIGNAL = 12, 26, 9
+BOLLINGER_WINDOW, BOLLINGER_WIDTH = 20, 2.0
+ATR_PERIOD = 14
+VOLATILITY_WINDOW = 20
+
+# Indicators computed by compute_indicators, in order
+INDICATORS = ("sma", "ema", "rsi", "macd", "macdSignal", "macdHistogram",
+              "bollingerMiddle", "bollingerUpper", "bollingerLower", "atr", "volatility")
+
+# Bars per block of the running sums behind rolling means and deviations
+_MOMENT_BLOCK_BARS = 256
+
+# Largest growth of 1 / d**k within one block of the EMA closed form. Rounding
+# in the block's cumsum stays relative to the average of |x| however large the
+# growth, so blocks are bounded only to keep the weighted terms far from overflow
+_EMA_BLOCK_GROWTH = 1e100
+
+# Rows per call of the filter behind the MACD line when written to out
+_FILTER_BLOCK_ROWS = 32
+
+
+def _as_matrix(values):
+    values = np.asarray(values, dtype=np.float64)
+    return values[np.newaxis, :] if values.ndim == 1 else values
+
+
+def _like(result, values):
+    return result[0] if np.ndim(values) == 1 else result
+
+
+def _output(out, matrix):
+    """out viewed as a matrix, or a new array shaped like matrix"""
+    return np.empty(matrix.shape) if out is None else _as_matrix(out)
+
+
+def _window_means(values, window, out):
+    """Means over trailing windows along the last axis into out, valid from bar window - 1 on"""
+    # Imported on first use rather than at startup, which it would add a third of a second to
+    from scipy.ndimage import uniform_filter1d
+    # A running sum in one pass; the origin aligns each window to end at its bar
+    return uniform_filter1d(values, window, axis=-1, origin=(window - 1) // 2, output=out)
+
+
+def _rolling_moments(matrix, window, std=True, mean=None, deviation=None):
+    """Trailing-window mean and, if std, population standard deviation of each row
+
+    Means are running sums over whole rows. Deviations come from the mean
+    square less the squared mean, which cancels badly when a series sits
+    far from zero, so they are computed over blocks of _MOMENT_BLOCK_BARS
+    bars (plus the window before them), each centered on its first value.
+    Results are written to mean and deviation when they are given;
+    mean=False leaves the mean out.
+    """
+    rows, bars = matrix.shape
+    mean = None if mean is False else _output(mean, matrix)
+    deviation = _output(deviation, matrix) if std else None
+    if not std:
+        _window_means(matrix, window, mean)
+    for values in (mean, deviation):
+        if values is not None:
+            values[:, :window - 1] = np.nan
+    if not std or bars < window:
+        return mean, deviation
+
+    # Every block reuses the same buffers, sized for the longest segment and
+    # reshaped to each one so that they stay contiguous
+    size = rows * min(bars, _MOMENT_BLOCK_BARS + window - 1)
+    buffers = np.empty(size), np.empty(size), np.empty(size)
+    for lo in range(window - 1, bars, _MOMENT_BLOCK_BARS):
+        hi = min(lo + _MOMENT_BLOCK_BARS, bars)
+        segment = matrix[:, lo - window + 1:hi]
+        offset = segment[:, :1]
+        centered, means, variance = (buffer[:segment.size].reshape(segment.shape) for buffer in buffers)
+        np.subtract(segment, offset, out=centered)
+        _window_means(centered, window, means)
+        _window_means(np.square(centered, out=centered), window, variance)
+        variance -= np.square(means, out=centered)
+        np.maximum(variance, 0.0, out=variance)
+        np.sqrt(variance[:, window - 1:], out=deviation[:, lo:hi])
+        if mean is not None:
+            np.add(means[:, window - 1:], offset, out=mean[:, lo:hi])
+    return mean, deviation
+
+
+def sma(values, window=SMA_WINDOW, out=None):
+    """Simple moving average"""
+    return _like(_rolling_moments(_as_matrix(values), window, std=False, mean=out)[0], values)
+
+
+def rolling_std(values, window, out=None):
+    """Population standard deviation over trailing windows"""
+    return _like(_rolling_moments(_as_matrix(values), window, mean=False, deviation=out)[1], values)
+
+
+def ewm(values, alpha, initial=None, out=None):
+    """Exponentially weighted mean y[t] = alpha * x[t] + (1 - alpha) * y[t - 1]
+
+    Seeded with the first value unless initial (one per row) is given.
+    Within a block of bars the recurrence has the closed form
+    y[t] = d**t * (y[-1] + alpha * cumsum(x[k] / d**k)) with d = 1 - alpha,
+    so each block is a handful of array operations. out may be values
+    itself.
+    """
+    matrix = _as_matrix(values)
+    rows, bars = matrix.shape
+    decay = 1.0 - alpha
+    result = _output(out, matrix)
+    if bars == 0:
+        return _like(result, values)
+
+    if initial is None:
+        previous = matrix[:, 0]
+        start = 1
+        result[:, 0] = previous
+    else:
+        previous = np.asarray(initial, dtype=np.float64).reshape(rows)
+        start = 0
+
+    block, growth, weights = _ewm_weights(alpha, bars)
+    for lo in range(start, bars, block):
+        hi = min(lo + block, bars)
+        out = result[:, lo:hi]
+        np.multiply(matrix[:, lo:hi], weights[:hi - lo], out=out)
+        # Folding the carried-in value into the first term makes the block one cumsum
+        out[:, 0] += previous
+        np.cumsum(out, axis=-1, out=out)
+        out *= growth[:hi - lo]
+        previous = out[:, -1]
+    return _like(result, values)
+
+
+def _ewm_weights(alpha, bars):
+    """Bars per block of the EMA closed form, with the d**k and alpha / d**k of a block"""
+    decay = 1.0 - alpha
+    block = bars if decay == 0 else max(1, int(np.log(_EMA_BLOCK_GROWTH) / -np.log(decay)))
+    growth = decay ** np.arange(1, min(block, bars) + 1)
+    return block, growth, alpha / growth
+
+
+def _linear_filter(matrix, numerator, denominator, state, out=None):
+    """scipy.signal.lfilter along every row from the given filter state, written to out when given"""
+    # Imported on first use rather than at startup, which it would add a second to
+    from scipy.signal import lfilter
+    if out is None:
+        return lfilter(numerator, denominator, matrix, axis=-1, zi=state)[0]
+
+    # lfilter returns new arrays; filtering a few rows at a time keeps them small enough to reuse
+    result = _as_matrix(out)
+    for lo in range(0, len(matrix), _FILTER_BLOCK_ROWS):
+        hi = lo + _FILTER_BLOCK_ROWS
+        result[lo:hi] = lfilter(numerator, denominator, matrix[lo:hi], axis=-1, zi=state[lo:hi])[0]
+    return result
+
+
+def ema(values, span=EMA_SPAN, out=None):
+    """Exponential moving average with the usual 2 / (span + 1) smoothing"""
+    return ewm(values, 2.0 / (span + 1), out=out)
+
+
+def rsi(close, period=RSI_PERIOD, out=None):
+    """Relative strength index with Wilder's smoothing, from 0 to 100 (NaN while prices are flat)"""
+    matrix = _as_matrix(close)
+    result = _output(out, matrix)
+    # With average gain G and loss L, G - L is the average move and G + L the
+    # average absolute move, so RSI = 100 * G / (G + L) = 50 * (1 + (G - L) / (G + L)).
+    # Both are EMAs of the moves seeded with the first one; in ewm's closed form they
+    # share the factor d**t, which cancels in the ratio, leaving two cumsums
+    moves = np.subtract(matrix[:, 1:], matrix[:, :-1], out=result[:, 1:])
+    sizes = np.abs(moves)
+    block, growth, weights = _ewm_weights(1.0 / period, moves.shape[1])
+    net, total = moves[:, 0], sizes[:, 0]
+    # Flat prices leave both averages at zero, and 0 / 0 at NaN
+    with np.errstate(invalid='ignore'):
+        for lo in range(1, moves.shape[1], block):
+            hi = min(lo + block, moves.shape[1])
+            weighted = np.multiply(moves[:, lo:hi], weights[:hi - lo], out=moves[:, lo:hi])
+            weighted_sizes = np.abs(weighted, out=sizes[:, lo:hi])
+            weighted[:, 0] += net
+            weighted_sizes[:, 0] += total
+            np.cumsum(weighted, axis=-1, out=weighted)
+            np.cumsum(weighted_sizes, axis=-1, out=weighted_sizes)
+            net, total = weighted[:, -1] * growth[hi - lo - 1], weighted_sizes[:, -1] * growth[hi - lo - 1]
+        moves /= sizes
+    result += 1
+    result *= 50
+    result[:, :period] = np.nan
+    return _like(result, close)
+
+
+def macd(close, fast=MACD_FAST, slow=MACD_SLOW, signal=MACD_SIGNAL, out=None):
+    """MACD line, signal line and histogram"""
+    from scipy.signal import lfilter_zi
+    matrix = _as_matrix(close)
+    line, signal_line, histogram = (_output(None if out is None else values, matrix) for values in out or (None,) * 3)
+    # The difference of two averages is a second-order filter of the closes, run in one
+    # pass; both averages start at the first close, which is the filter's steady state there
+    fast_alpha, slow_alpha = 2.0 / (fast + 1), 2.0 / (slow + 1)
+    numerator = [fast_alpha - slow_alpha, slow_alpha * (1 - fast_alpha) - fast_alpha * (1 - slow_alpha)]
+    denominator = np.convolve([1.0, fast_alpha - 1], [1.0, slow_alpha - 1])
+    if matrix.shape[1]:
+        _linear_filter(matrix, numerator, denominator, matrix[:, :1] * lfilter_zi(numerator, denominator), line)
+    ema(line, signal, out=signal_line)
+    np.subtract(line, signal_line, out=histogram)
+    return _like(line, close), _like(signal_line, close), _like(histogram, close)
+
+
+def bollinger(close, window=BOLLINGER_WINDOW, width=BOLLINGER_WIDTH, out=None):
+    """Middle, upper and lower Bollinger bands"""
+    matrix = _as_matrix(close)
+    middle, upper, lower = (_output(None if out is None else values, matrix) for values in out or (None,) * 3)
+    # The deviation goes into upper, which is then shifted by the middle in place
+    _, spread = _rolling_moments(matrix, window, mean=middle, deviation=upper)
+    spread *= width
+    np.subtract(middle, spread, out=lower)
+    upper += middle
+    return _like(middle, close), _like(upper, close), _like(lower, close)
+
+
+def true_range(high, low, close, out=None):
+    """Bar range extended to the previous close"""
+    high, low, close = _as_matrix(high), _as_matrix(low), _as_matrix(close)
+    result = _output(out, high)
+    previous = close[:, :-1]
+    np.subtract(high[:, :1], low[:, :1], out=result[:, :1])
+    np.maximum(high[:, 1:], previous, out=result[:, 1:])
+    result[:, 1:] -= np.minimum(low[:, 1:], previous)
+    return result
+
+
+def atr(high, low, close, period=ATR_PERIOD, out=None):
+    """Average true range with Wilder's smoothing"""
+    ranges = true_range(high, low, close, out=out)
+    result = ewm(ranges, 1.0 / period, out=ranges)
+    result[..., :period - 1] = np.nan
+    return _like(result, close)
+
+
+def log_returns(close):
+    """Log returns, NaN for the first bar"""
+    matrix = _as_matrix(close)
+    result = np.full(matrix.shape, np.nan)
+    result[:, 1:] = np.diff(np.log(matrix), axis=-1)
+    return _like(result, close)
+
+
+def volatility(close, window=VOLATILITY_WINDOW, periods_per_year=None, out=None):
+    """Rolling standard deviation of log returns, annualized if periods_per_year is given"""
+    matrix = _as_matrix(close)
+    result = _output(out, matrix)
+    result[:, 0] = np.nan
+    returns = np.divide(matrix[:, 1:], matrix[:, :-1])
+    _rolling_moments(np.log(returns, out=returns), window, mean=False, deviation=result[:, 1:])
+    if periods_per_year:
+        result *= np.sqrt(periods_per_year)
+    return _like(result, close)
+
+
+def compute_indicators(close, high=None, low=None, block_rows=256):
+    """All indicators for price matrices, as a dict of arrays shaped like close
+
+    Without high and low, ATR is computed from closes alone. With numba
+    installed, models.indicator_kernel computes every indicator in one
+    compiled pass per symbol. Otherwise symbols are processed block_rows
+    at a time so the intermediates of each block stay in cache, and every
+    indicator is written straight into its result.
+    """
+    matrix = _as_matrix(close)
+    high = matrix if high is None else _as_matrix(high)
+    low = matrix if low is None else _as_matrix(low)
+
+    results = {name: np.empty(matrix.shape) for name in INDICATORS}
+    kernel = _indicator_kernel()
+    if kernel is not None:
+        kernel(matrix, high, low, tuple(results.values()), SMA_WINDOW, EMA_SPAN, RSI_PERIOD, MACD_FAST, MACD_SLOW,
+               MACD_SIGNAL, BOLLINGER_WINDOW, BOLLINGER_WIDTH, ATR_PERIOD, VOLATILITY_WINDOW)
+        return {name: _like(values, close) for name, values in results.items()}
+
+    for lo in range(0, matrix.shape[0], block_rows):
+        rows = slice(lo, lo + block_rows)
+        _block_indicators(matrix[rows], high[rows], low[rows], {name: values[rows] for name, values in results.items()})
+    return {name: _like(values, close) for name, values in results.items()}
+
+
+@lru_cache(maxsize=1)
+def _indicator_kernel():
+    """The compiled kernel computing every indicator at once, or None if numba isn't installed"""
+    try:
+        from models.indicator_kernel import indicators
+    except ImportError:
+        return None
+    return indicators
+
+
+def _block_indicators(close, high, low, out):
+    sma(close, out=out["sma"])
+    ema(close, out=out["ema"])
+    rsi(close, out=out["rsi"])
+    macd(close, out=(out["macd"], out["macdSignal"], out["macdHistogram"]))
+    bollinger(close, out=(out["bollingerMiddle"], out["bollingerUpper"], out["bollingerLower"]))
+    atr(high, low, close, out=out["atr"])
+    volatility(close, out=out["volatility"])
+
+
+# Columns of the per-bar feature vectors models are trained and scored on
+FEATURE_NAMES = [
+    "smaGap", "emaGap", "rsi", "macdHistogram", "bollingerPosition",
+    "atr", "volatility", "return5", "return20"
+]
+
+
+def feature_matrix(close, indicators):
+    """Scale-free model features for every bar, shaped (symbols, bars, len(FEATURE_NAMES))
+
+    Takes the indicators computed for the same close matrix. Bars without
+    enough history for a feature hold NaN.
+    """
+    close = _as_matrix(close)
+    indicators = {name: _as_matrix(values) for name, values in indicators.items()}
+    band = indicators["bollingerUpper"] - indicators["bollingerLower"]
+    returns = {}
+    for lag in (5, 20):
+        returns[lag] = np.full(close.shape, np.nan)
+        returns[lag][:, lag:] = close[:, lag:] / close[:, :-lag] - 1
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        columns = [
+            close / indicators["sma"] - 1,
+            close / indicators["ema"] - 1,
+            indicators["rsi"] / 100 - 0.5,
+            indicators["macdHistogram"] / close,
+            np.where(band > 0, (close - indicators["bollingerLower"]) / band - 0.5, 0.0),
+            indicators["atr"] / close,
+            indicators["volatility"],
+            returns[5],
+            returns[20]
+        ]
+    return np.stack(columns, axis=-1)
+
+
+def stack_tails(series, length):
+    """Matrix of the last `length` values of each 1-D array, left-padded with its first value"""
+    matrix = np.empty((len(series), length))
+    for row, values in enumerate(series):
+        values = values[-length:]
+        matrix[row, length - len(values):] = values
+        matrix[row, :length - len(values)] = values[0] if len(values) else np.nan
+    return matrix
+
+
+class IndicatorState:
+    """Latest indicator values for a set of symbols, updated one bar at a time
+
+    Keeps the recursive averages (EMAs, Wilder averages) and the trailing
+    windows the rolling indicators need, so append() costs O(window) per
+    symbol. Build it from history with from_history().
+    """
+
+    def __init__(self, close, high, low):
+        close, high, low = _as_matrix(close), _as_matrix(high), _as_matrix(low)
+        window = max(SMA_WINDOW, BOLLINGER_WINDOW, VOLATILITY_WINDOW + 1)
+        self.bars = close.shape[1]
+        self.closes = stack_tails(close, window)
+        self.returns = np.diff(np.log(self.closes), axis=-1)
+
+        self.ema = ema(close)[:, -1]
+        self.ema_fast = ema(close, MACD_FAST)[:, -1]
+        self.ema_slow = ema(close, MACD_SLOW)[:, -1]
+        self.macd_signal = macd(close)[1][:, -1]
+
+        delta = np.diff(close, axis=-1)
+        self.average_gain = ewm(np.maximum(delta, 0.0), 1.0 / RSI_PERIOD)[:, -1]
+        self.average_loss = ewm(np.maximum(-delta, 0.0), 1.0 / RSI_PERIOD)[:, -1]
+        self.atr = ewm(true_range(high, low, close), 1.0 / ATR_PERIOD)[:, -1]
+        self.latest = self._snapshot()
+
+    @classmethod
+    def from_history(cls, close, high=None, low=None):
+        """State after the bars of the (symbols, bars) history matrices"""
+        return cls(close, close if high is None else high, close if low is None else low)
+
+    def append(self, close, high=None, low=None):
+        """Advance every symbol by one bar (arrays with one value per symbol) and return the latest values"""
+        close = np.asarray(close, dtype=np.float64)
+        high = close if high is None else np.asarray(high, dtype=np.float64)
+        low = close if low is None else np.asarray(low, dtype=np.float64)
+        previous = self.closes[:, -1]
+
+        delta = close - previous
+        self.average_gain += (np.maximum(delta, 0.0) - self.average_gain) / RSI_PERIOD
+        self.average_loss += (np.maximum(-delta, 0.0) - self.average_loss) / RSI_PERIOD
+        tr = np.maximum(high, previous) - np.minimum(low, previous)
+        self.atr += (tr - self.atr) / ATR_PERIOD
+
+        self.ema += (close - self.ema) * 2.0 / (EMA_SPAN + 1)
+        self.ema_fast += (close - self.ema_fast) * 2.0 / (MACD_FAST + 1)
+        self.ema_slow += (close - self.ema_slow) * 2.0 / (MACD_SLOW + 1)
+        self.macd_signal += (self.ema_fast - self.ema_slow - self.macd_signal) * 2.0 / (MACD_SIGNAL + 1)
+
+        self.closes = np.concatenate([self.closes[:, 1:], close[:, np.newaxis]], axis=-1)
+        self.returns = np.concatenate([self.returns[:, 1:], np.log(close / previous)[:, np.newaxis]], axis=-1)
+        self.bars += 1
+        self.latest = self._snapshot()
+        return self.latest
+
+    def _snapshot(self):
+        bars = self.bars
+        closes = self.closes
+        bollinger_window = closes[:, -BOLLINGER_WINDOW:]
+        middle = bollinger_window.mean(axis=-1)
+        spread = BOLLINGER_WIDTH * bollinger_window.std(axis=-1)
+        macd_line = self.ema_fast - self.ema_slow
+        # 100 * G / (G + L) as in rsi(), NaN while prices are flat
+        moves = self.average_gain + self.average_loss
+        rsi_value = np.full(moves.shape, np.nan)
+        np.divide(100 * self.average_gain, moves, out=rsi_value, where=moves > 0)
+
+        def ready(values, needed):
+            return values if bars >= needed else np.full_like(values, np.nan)
+
+        return {
+            "sma": ready(closes[:, -SMA_WINDOW:].mean(axis=-1), SMA_WINDOW),
+            "ema": self.ema.copy(),
+            "rsi": ready(rsi_value, RSI_PERIOD + 1),
+            "macd": macd_line,
+            "macdSignal": self.macd_signal.copy(),
+            "macdHistogram": macd_line - self.macd_signal,
+            "bollingerMiddle": ready(middle, BOLLINGER_WINDOW),
+            "bollingerUpper": ready(middle + spread, BOLLINGER_WINDOW),
+            "bollingerLower": ready(middle - spread, BOLLINGER_WINDOW),
+            "atr": ready(self.atr.copy(), ATR_PERIOD),
+            "volatility": ready(self.returns[:, -VOLATILITY_WINDOW:].std(axis=-1), VOLATILITY_WINDOW + 1)
+        }
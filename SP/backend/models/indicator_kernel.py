@@ -0,0 +1,145 @@
+"""Every indicator of compute_indicators in one compiled pass over each symbol's bars
+
+The NumPy functions in models.features make a dozen passes over the
+price matrix per indicator, and their running sums and recurrences are
+serial along a row, so they stay bound by memory traffic and by one
+addition at a time. Here numba compiles a single loop per symbol that
+advances all the averages and window sums together: each bar reads its
+prices once and writes its 11 values once, and the independent
+recurrences overlap in the CPU.
+
+numba is a requirement of its own (shap also needs it). Importing it
+and loading the compiled kernel from its on-disk cache takes a fraction
+of a second, so models.features imports this module on the first
+compute_indicators call, and falls back to its NumPy path when numba is
+missing.
+"""
+import math
+
+import numba
+import numpy as np
+
+# Window sums are recomputed around a new center every this many bars, as
+# models.features centers its moment blocks, so they don't cancel badly
+# when prices sit far from zero
+RECENTER_BARS = 256
+
+
+@numba.njit(cache=True, nogil=True, error_model='numpy')
+def indicators(close, high, low, out, sma_window, ema_span, rsi_period, macd_fast, macd_slow, macd_signal,
+               bollinger_window, bollinger_width, atr_period, volatility_window):
+    """Write every indicator of the (symbols, bars) price matrices to out, ordered as features.INDICATORS"""
+    returns = np.empty(volatility_window)
+    for row in range(close.shape[0]):
+        _row(close[row], high[row], low[row], out, row, returns, sma_window, ema_span, rsi_period, macd_fast,
+             macd_slow, macd_signal, bollinger_window, bollinger_width, atr_period, volatility_window)
+
+
+@numba.njit(cache=True, nogil=True, error_model='numpy')
+def _row(close, high, low, out, row, returns, sma_window, ema_span, rsi_period, macd_fast, macd_slow, macd_signal,
+         bollinger_window, bollinger_width, atr_period, volatility_window):
+    sma, ema, rsi, macd, signal, histogram = out[0][row], out[1][row], out[2][row], out[3][row], out[4][row], out[5][row]
+    middle, upper, lower, atr, volatility = out[6][row], out[7][row], out[8][row], out[9][row], out[10][row]
+    bars = len(close)
+    if bars == 0:
+        return
+    ema_alpha, fast_alpha, slow_alpha = 2.0 / (ema_span + 1), 2.0 / (macd_fast + 1), 2.0 / (macd_slow + 1)
+    signal_alpha, rsi_alpha, atr_alpha = 2.0 / (macd_signal + 1), 1.0 / rsi_period, 1.0 / atr_period
+
+    # The MACD line is the second-order filter of features.macd, run on the moves so
+    # that it doesn't take the difference of two averages near the price
+    line_gain, line_decay = fast_alpha - slow_alpha, 2.0 - fast_alpha - slow_alpha
+    line_damping = (1.0 - fast_alpha) * (1.0 - slow_alpha)
+    first = close[0]
+    average = first
+    line = last_line = signal_value = 0.0
+    net = total = 0.0
+    true_range = high[0] - low[0]
+    sma_sum = 0.0
+    # Bollinger sums are of closes less center, volatility sums of returns less return_center
+    center = first
+    band_sum = band_squares = 0.0
+    return_center = return_sum = return_squares = 0.0
+    slot = 0
+    for t in range(bars):
+        price = close[t]
+        if t > 0:
+            previous = close[t - 1]
+            average += ema_alpha * (price - average)
+            move = price - previous
+            line, last_line = line_gain * move + line_decay * line - line_damping * last_line, line
+            if t == 1:
+                net, total = move, abs(move)
+            else:
+                net += rsi_alpha * (move - net)
+                total += rsi_alpha * (abs(move) - total)
+            true_range += atr_alpha * (max(high[t], previous) - min(low[t], previous) - true_range)
+
+        signal_value += signal_alpha * (line - signal_value)
+        ema[t] = average
+        macd[t] = line
+        signal[t] = signal_value
+        histogram[t] = line - signal_value
+        # 100 * G / (G + L) as in features.rsi; 0 / 0 leaves flat prices at NaN
+        rsi[t] = 50.0 * (1.0 + net / total)
+        atr[t] = true_range
+
+        sma_sum += price
+        if t >= sma_window:
+            sma_sum -= close[t - sma_window]
+        sma[t] = sma_sum / sma_window
+
+        if t % RECENTER_BARS == 0:
+            center = price
+            band_sum = band_squares = 0.0
+            for k in range(max(0, t - bollinger_window + 1), t + 1):
+                deviation = close[k] - center
+                band_sum += deviation
+                band_squares += deviation * deviation
+        else:
+            deviation = price - center
+            band_sum += deviation
+            band_squares += deviation * deviation
+            if t >= bollinger_window:
+                deviation = close[t - bollinger_window] - center
+                band_sum -= deviation
+                band_squares -= deviation * deviation
+        mean = band_sum / bollinger_window
+        spread = bollinger_width * math.sqrt(max(band_squares / bollinger_window - mean * mean, 0.0))
+        middle[t] = center + mean
+        upper[t] = center + mean + spread
+        lower[t] = center + mean - spread
+
+        if t == 0:
+            continue
+        # returns is a ring of the last volatility_window returns, the oldest at slot
+        value = math.log(price / close[t - 1])
+        oldest = returns[slot]
+        returns[slot] = value
+        slot = slot + 1 if slot + 1 < volatility_window else 0
+        if (t - 1) % RECENTER_BARS == 0:
+            return_center = value
+            return_sum = return_squares = 0.0
+            for k in range(min(t, volatility_window)):
+                deviation = returns[k] - return_center
+                return_sum += deviation
+                return_squares += deviation * deviation
+        else:
+            deviation = value - return_center
+            return_sum += deviation
+            return_squares += deviation * deviation
+            if t > volatility_window:
+                deviation = oldest - return_center
+                return_sum -= deviation
+                return_squares -= deviation * deviation
+        mean = return_sum / volatility_window
+        volatility[t] = math.sqrt(max(return_squares / volatility_window - mean * mean, 0.0))
+
+    # Bars before each indicator has a full window, as models.features leaves them
+    sma[:sma_window - 1] = np.nan
+    rsi[:rsi_period] = np.nan
+    middle[:bollinger_window - 1] = np.nan
+    upper[:bollinger_window - 1] = np.nan
+    lower[:bollinger_window - 1] = np.nan
+    atr[:atr_period - 1] = np.nan
+    volatility[:volatility_window] = np.nan
@@ -1,143 +1,285 @@
 import numpy as np
 from datetime import datetime
+from functools import lru_cache
+from models import features, simulation
+from models.registry import default_registry, model_name
+from models.training import HORIZON_BARS
+from services import reference_data
+from services.metrics import timed
+from services.price_store import PriceStore, DAILY
+from services.random_provider import random_provider
+from services.records import Factor, Prediction
+
+# Column layout of the per-symbol uniform draws used by predict_many
+(
+    U_NORMAL_1, U_NORMAL_2, U_CONFIDENCE,
+    U_TECHNICAL_WEIGHT, U_TECHNICAL_IMPACT, U_FUNDAMENTAL_WEIGHT, U_FUNDAMENTAL_IMPACT,
+    U_SENTIMENT_WEIGHT, U_SENTIMENT_IMPACT, U_SECTOR_IMPACT
+) = range(10)
+N_DRAWS = 10
+
+RECOMMENDATIONS = np.array(["STRONG BUY", "BUY", "HOLD", "WATCH", "SELL"])
+
+# Impact labels indexed by code: 0 = positive, 1 = neutral, 2 = negative
+IMPACTS = ["positive", "neutral", "negative"]
+
+# Daily bars of history behind the technical indicators
+TECHNICAL_HISTORY_BARS = 200
+
+# Daily bars of history the volatility and bootstrap returns of simulated paths come from
+SIMULATION_HISTORY_BARS = 252
+
+# Technical outlook indexed by impact code
+TECHNICAL_OUTLOOKS = ["Bullish", "Mixed", "Bearish"]
+
+# Factor descriptions indexed by impact code
+FUNDAMENTAL_DESCRIPTIONS = {
+    True: ["Strong earnings growth and healthy balance sheet", "Steady financial performance with average growth metrics", None],
+    False: [None, "Stable financials but facing industry headwinds", "Declining revenue growth and margin pressure"]
+}
+SENTIMENT_DESCRIPTIONS = {
+    True: ["Positive news and social media sentiment", "Mixed media coverage with neutral social sentiment", None],
+    False: [None, "Limited media coverage with neutral sentiment", "Negative news cycle and bearish social indicators"]
+}
+SECTOR_DESCRIPTIONS = [
+    "Sector outperforming the broader market",
+    "Sector showing mixed signals",
+    "Sector underperforming broader market"
+]
+
+
+@lru_cache(maxsize=65536)
+def _symbol_draws(symbol):
+    """Uniform draws for a symbol, deterministic so the same symbol always gets the same prediction"""
+    draws = random_provider.generator(symbol, 'prediction').random(N_DRAWS)
+    draws.setflags(write=False)
+    return draws
+
 
 class PredictionModel:
     """Machine learning model for stock price prediction"""
-    
-    def __init__(self):
-        """Initialize the model - in a real app, this would load trained models"""
-        # This would typically load pre-trained models
-        pass
-    
-    def predict(self, symbol, timeframe='3m'):
-        """Make a prediction for a specific stock and timeframe"""
-        # In a real app, this would run actual ML inference
-        # For now, generate mock prediction data
-        
-        # Use the symbol to create a deterministic but seemingly random prediction
-        # This ensures the same symbol always gets the same prediction
-        symbol_seed = sum(ord(c) for c in symbol)
-        np.random.seed(symbol_seed)
+
+    def __init__(self, price_store=None, registry=None):
+        """Initialize the model
         
-        # Get a base price - would come from API in real app
-        base_price = 0
-        if symbol == "AAPL":
-            base_price = 243.56
-        elif symbol == "MSFT":
-            base_price = 415.67
-        elif symbol == "GOOGL":
-            base_price = 187.32
-        elif symbol == "AMZN":
-            base_price = 192.45
-        elif symbol == "META":
-            base_price = 532.78
-        elif symbol == "TSLA":
-            base_price = 267.89
-        elif symbol == "NVDA":
-            base_price = 1245.67
-        else:
-            # Generate a semi-random price for other symbols
-            base_price = np.random.randint(50, 500) + np.random.random()
+        Trained models come from the registry (MODEL_REGISTRY_PATH by
+        default) and are only loaded when a sector and timeframe is first
+        scored; without one, predictions fall back to per-symbol draws.
+        """
+        # Technical indicators are computed from the same bars the API serves
+        self.price_store = price_store or PriceStore()
+        self.registry = registry if registry is not None else default_registry()
+
+    def predict(self, symbol, timeframe='3m', paths=None, method='gbm'):
+        """Make a prediction for a specific stock and timeframe"""
+        return self.predict_many([symbol], timeframe, paths, method)[0]
+
+    @timed
+    def predict_many(self, symbols, timeframe='3m', paths=None, method='gbm'):
+        """Make predictions for many stocks at once, scoring them in a single vectorized pass
         
-        # Generate a prediction with tendency toward positive (for demo purposes)
-        percent_change = np.random.normal(8, 4)  # Mean 8% with 4% standard deviation
-        predicted_price = base_price * (1 + percent_change/100)
+        With paths, each prediction also gets an "interval" of percentile
+        bands from that many simulated price paths over the timeframe.
+        """
+        symbols = list(symbols)
+        if not symbols:
+            return []
+        scores = self.score_many(symbols, timeframe)
+        intervals = (self.simulate_intervals(symbols, timeframe, scores, paths, method)
+                     if paths else [None] * len(symbols))
+
+        # Assemble the prediction records from the scored columns
+        columns = zip(
+            symbols,
+            scores["currentPrice"].tolist(),
+            scores["predictedPrice"].tolist(),
+            scores["percentChange"].tolist(),
+            scores["confidence"].tolist(),
+            RECOMMENDATIONS[scores["recommendation"]].tolist(),
+            scores["rising"].tolist(),
+            scores["technicalWeight"].tolist(), scores["technicalImpact"].tolist(),
+            scores["rsi"].tolist(), scores["macdHistogram"].tolist(), scores["smaGap"].tolist(),
+            scores["fundamentalWeight"].tolist(), scores["fundamentalImpact"].tolist(),
+            scores["sentimentWeight"].tolist(), scores["sentimentImpact"].tolist(),
+            scores["sectorWeight"].tolist(), scores["sectorImpact"].tolist()
+        )
+
+        predictions = []
+        for (symbol, base_price, predicted_price, percent_change, confidence, recommendation, up,
+                technical_weight, technical_impact, rsi, macd_histogram, sma_gap,
+                fundamental_weight, fundamental_impact,
+                sentiment_weight, sentiment_impact, sector_weight, sector_impact), interval in zip(columns, intervals):
+            factors = [
+                Factor("Technical Analysis", IMPACTS[technical_impact], technical_weight,
+                       self._technical_description(technical_impact, rsi, macd_histogram, sma_gap)),
+                Factor("Fundamental Analysis", IMPACTS[fundamental_impact], fundamental_weight,
+                       FUNDAMENTAL_DESCRIPTIONS[up][fundamental_impact]),
+                Factor("Market Sentiment", IMPACTS[sentiment_impact], sentiment_weight,
+                       SENTIMENT_DESCRIPTIONS[up][sentiment_impact]),
+                Factor("Sector Performance", IMPACTS[sector_impact], sector_weight, SECTOR_DESCRIPTIONS[sector_impact])
+            ]
+
+            prediction = Prediction(
+                symbol, base_price, predicted_price, percent_change, confidence, timeframe, recommendation, factors,
+                generatedAt="2025-03-12 05:57:26",  # Using the provided timestamp
+                generatedBy="lucifer0177continue",  # Using the provided username
+                interval=interval, timestamp=None, updatedBy=None, id=None
+            )
+            predictions.append(prediction)
+
+        return predictions
+
+    @timed
+    def simulate_intervals(self, symbols, timeframe, scores, paths, method='gbm', processes=None):
+        """Percentile bands of simulated prices for scored symbols, one dict per symbol
         
-        # Determine confidence level (60-95%)
-        confidence = int(np.random.uniform(60, 95))
+        Paths run from the current to the predicted price over the
+        timeframe's daily bars, with the volatility (or, for bootstrap, the
+        returns) of the symbol's last year of closes.
+        """
+        steps = HORIZON_BARS[timeframe]
+        tasks = []
+        for symbol, start, target in zip(symbols, scores["currentPrice"].tolist(), scores["predictedPrice"].tolist()):
+            close = self.price_store.get(symbol, DAILY).close[-(SIMULATION_HISTORY_BARS + 1):]
+            returns = np.diff(np.log(close))
+            tasks.append((symbol, start, target, float(returns.std()),
+                          returns if method == 'bootstrap' else None, steps, paths, method, None))
+        return simulation.simulate_many(tasks, processes)
+
+    @timed
+    def score_many(self, symbols, timeframe=None):
+        """Score many stocks at once, returning one NumPy array per output column
         
+        Recommendation and impact columns hold codes indexing RECOMMENDATIONS
+        and IMPACTS.
+        """
+        u = np.vstack([_symbol_draws(symbol) for symbol in symbols])
+        technical = self.technical_signals(symbols)
+
+        # Get base prices - would come from API in real app
+        base_prices = np.array([reference_data.base_price(symbol) for symbol in symbols])
+
+        # Without a trained model, generate a prediction with tendency toward positive (for demo purposes):
+        # mean 8% with 4% standard deviation, via the Box-Muller transform
+        # and a confidence level of 60-95%
+        normal = np.sqrt(-2 * np.log1p(-u[:, U_NORMAL_1])) * np.cos(2 * np.pi * u[:, U_NORMAL_2])
+        percent_changes = 8 + 4 * normal
+        confidences = (60 + u[:, U_CONFIDENCE] * 35).astype(np.int64)
+        if timeframe is not None:
+            self._apply_trained_models(symbols, timeframe, technical["features"], percent_changes, confidences)
+        predicted_prices = np.round(base_prices * (1 + percent_changes / 100), 2)
+
         # Determine recommendation based on percent change and confidence
-        if percent_change > 10 and confidence > 75:
-            recommendation = "STRONG BUY"
-        elif percent_change > 5:
-            recommendation = "BUY"
-        elif percent_change > 0:
-            recommendation = "HOLD"
-        elif percent_change > -5:
-            recommendation = "WATCH"
-        else:
-            recommendation = "SELL"
-        
-        # Generate contributing factors
-        factors = []
-        
-        # Technical Analysis
-        technical_weight = np.random.randint(25, 40)
-        if percent_change > 0:
-            technical_impact = "positive" if np.random.random() > 0.2 else "neutral"
-            technical_desc = "Bullish patterns on multiple timeframes" if technical_impact == "positive" else "Mixed technical signals with moderate upside potential"
-        else:
-            technical_impact = "negative" if np.random.random() > 0.2 else "neutral"
-            technical_desc = "Bearish patterns indicating downward momentum" if technical_impact == "negative" else "Mixed technical signals with cautious outlook"
-            
-        factors.append({
-            "name": "Technical Analysis",
-            "impact": technical_impact,
-            "weight": technical_weight,
-            "description": technical_desc
-        })
-        
-        # Fundamental Analysis
-        fundamental_weight = np.random.randint(20, 35)
-        remaining_weight = 100 - technical_weight - fundamental_weight
-        
-        if percent_change > 0:
-            fundamental_impact = "positive" if np.random.random() > 0.3 else "neutral"
-            fundamental_desc = "Strong earnings growth and healthy balance sheet" if fundamental_impact == "positive" else "Steady financial performance with average growth metrics"
-        else:
-            fundamental_impact = "negative" if np.random.random() > 0.3 else "neutral"
-            fundamental_desc = "Declining revenue growth and margin pressure" if fundamental_impact == "negative" else "Stable financials but facing industry headwinds"
-            
-        factors.append({
-            "name": "Fundamental Analysis",
-            "impact": fundamental_impact,
-            "weight": fundamental_weight,
-            "description": fundamental_desc
-        })
-        
-        # Market Sentiment
-        sentiment_weight = np.random.randint(15, 25)
-        remaining_weight -= sentiment_weight
+        recommendation_codes = np.select(
+            [
+                (percent_changes > 10) & (confidences > 75),
+                percent_changes > 5,
+                percent_changes > 0,
+                percent_changes > -5
+            ],
+            [0, 1, 2, 3],
+            default=4
+        )
+
+        # Factor weights and impacts
+        rising = percent_changes > 0
+        technical_weights = 25 + (u[:, U_TECHNICAL_WEIGHT] * 15).astype(np.int64)
+        fundamental_weights = 20 + (u[:, U_FUNDAMENTAL_WEIGHT] * 15).astype(np.int64)
+        sentiment_weights = 15 + (u[:, U_SENTIMENT_WEIGHT] * 10).astype(np.int64)
+
+        return {
+            "currentPrice": base_prices,
+            "predictedPrice": predicted_prices,
+            "percentChange": np.round(percent_changes, 2),
+            "confidence": confidences,
+            "recommendation": recommendation_codes,
+            "rising": rising,
+            "technicalWeight": technical_weights,
+            "technicalImpact": technical["impact"],
+            "rsi": technical["rsi"],
+            "macdHistogram": technical["macdHistogram"],
+            "smaGap": technical["smaGap"],
+            "fundamentalWeight": fundamental_weights,
+            "fundamentalImpact": self._directional_impacts(rising, u[:, U_FUNDAMENTAL_IMPACT] > 0.3),
+            "sentimentWeight": sentiment_weights,
+            "sentimentImpact": self._directional_impacts(rising, u[:, U_SENTIMENT_IMPACT] > 0.25),
+            "sectorWeight": 100 - technical_weights - fundamental_weights - sentiment_weights,
+            "sectorImpact": np.searchsorted([0.4, 0.8], u[:, U_SECTOR_IMPACT], side='right')
+        }
+
+    def technical_signals(self, symbols):
+        """Latest indicator readings and the technical impact code for each symbol
         
-        if percent_change > 0:
-            sentiment_impact = "positive" if np.random.random() > 0.25 else "neutral"
-            sentiment_desc = "Positive news and social media sentiment" if sentiment_impact == "positive" else "Mixed media coverage with neutral social sentiment"
-        else:
-            sentiment_impact = "negative" if np.random.random() > 0.25 else "neutral"
-            sentiment_desc = "Negative news cycle and bearish social indicators" if sentiment_impact == "negative" else "Limited media coverage with neutral sentiment"
-            
-        factors.append({
-            "name": "Market Sentiment",
-            "impact": sentiment_impact,
-            "weight": sentiment_weight,
-            "description": sentiment_desc
-        })
+        Each of trend (price against its 50-day SMA), momentum (MACD
+        histogram), RSI extremes and Bollinger band breaks votes bullish or
+        bearish; two net votes either way make the impact positive or negative.
+        """
+        bars = [self.price_store.get(symbol, DAILY) for symbol in symbols]
+        close = features.stack_tails([series.close for series in bars], TECHNICAL_HISTORY_BARS)
+        high = features.stack_tails([series.high for series in bars], TECHNICAL_HISTORY_BARS)
+        low = features.stack_tails([series.low for series in bars], TECHNICAL_HISTORY_BARS)
+        indicators = features.compute_indicators(close, high, low)
+        latest = {name: values[:, -1] for name, values in indicators.items()}
+        price = close[:, -1]
+
+        with np.errstate(invalid='ignore'):
+            votes = (
+                np.sign(price - latest["sma"])
+                + np.sign(latest["macdHistogram"])
+                + (latest["rsi"] < 30).astype(np.int64) - (latest["rsi"] > 70)
+                + (price < latest["bollingerLower"]).astype(np.int64) - (price > latest["bollingerUpper"])
+            )
+        return {
+            "impact": np.select([votes >= 2, votes <= -2], [0, 2], default=1),
+            "rsi": np.round(np.nan_to_num(latest["rsi"], nan=50.0), 1),
+            "macdHistogram": np.round(np.nan_to_num(latest["macdHistogram"]), 4),
+            "smaGap": np.round(np.nan_to_num((price / latest["sma"] - 1) * 100), 2),
+            "features": features.feature_matrix(close, indicators)[:, -1]
+        }
+
+    def resolve_models(self, symbols, timeframe):
+        """Registry name of the model scoring each symbol, '' where none is trained
         
-        # Sector Performance
-        sector_impact = np.random.choice(["positive", "neutral", "negative"], p=[0.4, 0.4, 0.2])
-        if sector_impact == "positive":
-            sector_desc = "Sector outperforming the broader market"
-        elif sector_impact == "neutral":
-            sector_desc = "Sector showing mixed signals"
-        else:
-            sector_desc = "Sector underperforming broader market"
-            
-        factors.append({
-            "name": "Sector Performance",
-            "impact": sector_impact,
-            "weight": remaining_weight,
-            "description": sector_desc
-        })
+        Each symbol uses the most specific model available: its own, its
+        sector's, then the market-wide one.
+        """
+        if self.registry is None:
+            return np.full(len(symbols), '')
+        names = []
+        for symbol in symbols:
+            candidates = (model_name(symbol, timeframe), model_name(reference_data.sector(symbol), timeframe),
+                          model_name(None, timeframe))
+            names.append(next((name for name in candidates if self.registry.latest_version(name) is not None), ''))
+        return np.array(names)
+
+    def _apply_trained_models(self, symbols, timeframe, feature_rows, percent_changes, confidences):
+        """Overwrite predictions with those of trained models where the registry has one
         
-        return {
-            "symbol": symbol,
-            "currentPrice": base_price,
-            "predictedPrice": round(predicted_price, 2),
-            "percentChange": round(percent_change, 2),
-            "confidence": confidence,
-            "timeframe": timeframe,
-            "recommendation": recommendation,
-            "factors": factors,
-            "generatedAt": "2025-03-12 05:57:26",  # Using the provided timestamp
-            "generatedBy": "lucifer0177continue"    # Using the provided username
-        }
\ No newline at end of file
+        Models trained by models.training also replace the confidence with
+        their calibrated hit rate.
+        """
+        names = self.resolve_models(symbols, timeframe)
+        for name in np.unique(names):
+            if not name:
+                continue
+            model = self.registry.get(name)
+            rows = np.flatnonzero(names == name)
+            # Models predict the forward return as a fraction
+            returns = model.predict(np.nan_to_num(feature_rows[rows]))
+            percent_changes[rows] = returns * 100
+            if hasattr(model, 'confidence'):
+                confidences[rows] = model.confidence(returns)
+
+    @staticmethod
+    def _technical_description(impact, rsi, macd_histogram, sma_gap):
+        return (
+            f"{TECHNICAL_OUTLOOKS[impact]} technicals: RSI {rsi:.0f}, "
+            f"MACD {'above' if macd_histogram >= 0 else 'below'} its signal line, "
+            f"price {abs(sma_gap):.1f}% {'above' if sma_gap >= 0 else 'below'} the 50-day average"
+        )
+
+    @staticmethod
+    def _directional_impacts(rising, strong):
+        """Impact codes for factors that follow the direction of the predicted move"""
+        # Strong signals agree with the move, weak ones are neutral
+        return np.where(strong, np.where(rising, 0, 2), 1)
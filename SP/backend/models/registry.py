@@ -0,0 +1,229 @@
+"""Versioned on-disk registry of trained models, loaded lazily
+
+Artifacts live under the registry root as
+
+    <root>/<name>/<version>/model.joblib   uncompressed joblib dump
+    <root>/<name>/<version>/meta.json      metadata (sector, timeframe, metrics...)
+
+with integer versions; the highest version of a name is its current one.
+Nothing is read until a model is first requested. Loads use joblib's
+mmap mode, so the NumPy arrays holding a model's weights are mapped from
+the file and shared through the page cache by every worker process
+instead of being copied into each. At most max_resident models stay
+loaded, least recently used first out, and a background thread can
+prefetch the hot set after startup.
+"""
+import json
+import os
+import re
+import shutil
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+ARTIFACT_FILE = 'model.joblib'
+METADATA_FILE = 'meta.json'
+
+_NAME_PATTERN = re.compile(r'[^a-z0-9]+')
+
+
+def model_name(sector, timeframe):
+    """Registry name of the model for a sector and timeframe, e.g. 'technology-3m'"""
+    return _NAME_PATTERN.sub('-', f"{sector or 'market'}-{timeframe}".lower()).strip('-')
+
+
+class ReturnModel:
+    """A fitted regressor of forward returns with its confidence calibration
+
+    Saved by models.training. edges are quantiles of the absolute
+    predicted return and hit_rates the observed share of predictions in
+    each bin whose direction was right. background holds k-means
+    centroids of the training features (with the share of samples behind
+    each in background_weights), the reference set for explanations.
+    """
+
+    def __init__(self, estimator, edges, hit_rates, timeframe=None, background=None, background_weights=None):
+        self.estimator = estimator
+        self.edges = np.asarray(edges, dtype=np.float64)
+        self.hit_rates = np.asarray(hit_rates, dtype=np.float64)
+        self.timeframe = timeframe
+        self.background = background
+        self.background_weights = background_weights
+
+    def predict(self, X):
+        """Forward returns over the horizon as fractions"""
+        return self.estimator.predict(X)
+
+    def confidence(self, returns):
+        """Calibrated confidence percentages (0-100) for predicted returns"""
+        bins = np.clip(np.searchsorted(self.edges, np.abs(returns), side='right') - 1, 0, len(self.hit_rates) - 1)
+        return np.round(self.hit_rates[bins] * 100).astype(np.int64)
+
+
+class ModelRegistry:
+    """Lazily loaded, LRU-bounded view of the model artifacts under root"""
+
+    def __init__(self, root, max_resident=32, mmap_mode='r'):
+        self.root = root
+        self.max_resident = max_resident
+        self.mmap_mode = mmap_mode
+        self._latest = {}  # name -> latest version, read from disk once
+        self._saved = None  # entries of the root directory, listed once
+        self._resident = OrderedDict()  # (name, version) -> model
+        self._loading = {}  # (name, version) -> lock held while that model loads
+        self._lock = threading.Lock()
+        self._prefetch_thread = None
+        self._counters = {"hits": 0, "misses": 0, "evictions": 0, "loadSeconds": 0.0}
+
+    def names(self):
+        """Names with at least one saved version"""
+        if not os.path.isdir(self.root):
+            return []
+        return sorted(name for name in os.listdir(self.root) if self.versions(name))
+
+    def versions(self, name):
+        """Saved versions of a model, oldest first"""
+        path = os.path.join(self.root, name)
+        if not os.path.isdir(path):
+            return []
+        return sorted(int(entry) for entry in os.listdir(path) if entry.isdigit())
+
+    def latest_version(self, name):
+        """Current version of a model, cached after the first lookup (see refresh)
+        
+        Names are first checked against one listing of the root, so names
+        never saved, such as those of made-up symbols, cost no scan and
+        add nothing to the cache.
+        """
+        saved = self._saved
+        if saved is None:
+            saved = self._saved = set(os.listdir(self.root)) if os.path.isdir(self.root) else set()
+        if name not in saved:
+            return None
+        if name not in self._latest:
+            versions = self.versions(name)
+            self._latest[name] = versions[-1] if versions else None
+        return self._latest[name]
+
+    def refresh(self):
+        """Forget cached versions so models saved by other processes are picked up"""
+        self._saved = None
+        self._latest.clear()
+
+    def metadata(self, name, version=None):
+        version = self.latest_version(name) if version is None else version
+        with open(os.path.join(self.root, name, str(version), METADATA_FILE)) as meta_file:
+            return json.load(meta_file)
+
+    def save(self, name, model, metadata=None):
+        """Write a model as the next version of name and return that version
+
+        The artifact is written to a temporary directory and renamed into
+        place, so readers never see a partial version.
+        """
+        os.makedirs(os.path.join(self.root, name), exist_ok=True)
+        versions = self.versions(name)
+        version = versions[-1] + 1 if versions else 1
+        staging = tempfile.mkdtemp(prefix=f'.{name}-', dir=self.root)
+        try:
+            import joblib
+            # Uncompressed so arrays can be memory-mapped on load
+            joblib.dump(model, os.path.join(staging, ARTIFACT_FILE))
+            with open(os.path.join(staging, METADATA_FILE), 'w') as meta_file:
+                json.dump(dict(metadata or {}, name=name, version=version, savedAt=time.time()), meta_file)
+            os.rename(staging, os.path.join(self.root, name, str(version)))
+        except BaseException:
+            shutil.rmtree(staging, ignore_errors=True)
+            raise
+        if self._saved is not None:
+            self._saved.add(name)
+        self._latest[name] = version
+        return version
+
+    def get(self, name, version=None):
+        """The model for name (latest version by default), or None if there is none"""
+        version = self.latest_version(name) if version is None else version
+        if version is None:
+            return None
+        key = (name, version)
+
+        with self._lock:
+            model = self._resident.get(key)
+            if model is not None:
+                self._resident.move_to_end(key)
+                self._counters["hits"] += 1
+                return model
+            self._counters["misses"] += 1
+            key_lock = self._loading.setdefault(key, threading.Lock())
+
+        # One thread loads a given model; others asking for it wait for that load
+        with key_lock:
+            with self._lock:
+                model = self._resident.get(key)
+            if model is None:
+                model = self._load(key)
+        return model
+
+    def prefetch(self, names, background=True):
+        """Load the latest version of each name ahead of first use"""
+        def run():
+            for name in names:
+                try:
+                    self.get(name)
+                except (OSError, ValueError):
+                    # A broken artifact surfaces when a request asks for it
+                    continue
+
+        if not background:
+            run()
+            return None
+        self._prefetch_thread = threading.Thread(target=run, name='model-prefetch', daemon=True)
+        self._prefetch_thread.start()
+        return self._prefetch_thread
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._counters)
+            stats["resident"] = len(self._resident)
+            stats["maxResident"] = self.max_resident
+        stats["loadSeconds"] = round(stats["loadSeconds"], 4)
+        return stats
+
+    def _load(self, key):
+        import joblib
+        name, version = key
+        start = time.perf_counter()
+        model = joblib.load(os.path.join(self.root, name, str(version), ARTIFACT_FILE), mmap_mode=self.mmap_mode)
+        elapsed = time.perf_counter() - start
+
+        with self._lock:
+            self._counters["loadSeconds"] += elapsed
+            self._resident[key] = model
+            self._resident.move_to_end(key)
+            self._loading.pop(key, None)
+            while len(self._resident) > self.max_resident:
+                self._resident.popitem(last=False)
+                self._counters["evictions"] += 1
+        return model
+
+
+def default_registry():
+    """Registry at MODEL_REGISTRY_PATH, or None when no trained models are configured
+
+    MODEL_REGISTRY_MAX_RESIDENT caps resident models, and MODEL_PREFETCH
+    lists model names (comma-separated, or 'all') to load in the background.
+    """
+    path = os.environ.get('MODEL_REGISTRY_PATH')
+    if not path:
+        return None
+
+    registry = ModelRegistry(path, max_resident=int(os.environ.get('MODEL_REGISTRY_MAX_RESIDENT', 32)))
+    prefetch = os.environ.get('MODEL_PREFETCH', '')
+    if prefetch == 'all':
+        registry.prefetch(registry.names()[:registry.max_resident])
+    elif prefetch:
+        registry.prefetch([name.strip() for name in prefetch.split(',') if name.strip()])
+    return registry
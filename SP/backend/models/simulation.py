@@ -0,0 +1,154 @@
+"""Monte Carlo price path simulation for prediction intervals
+
+Paths are simulated as (paths x steps) arrays of log returns in chunks of
+chunk_paths paths, so memory stays bounded however many paths are asked
+for; only the terminal prices and a few checkpoint columns of each chunk
+are kept. Two processes are supported:
+
+* gbm: geometric Brownian motion with the symbol's historical volatility
+* bootstrap: daily log returns resampled from the symbol's own history
+
+Both are centred in log space on the point prediction, so the median
+terminal price is the predicted price and the spread comes from the
+history. Draws come from the symbol's own generator, so a symbol always
+gets the same bands however the work is split across processes.
+
+simulate_many spreads symbols over a process pool.
+"""
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from services.random_provider import random_provider
+
+PERCENTILES = (5, 25, 50, 75, 95)
+METHODS = ('gbm', 'bootstrap')
+
+# Paths per chunk: 10k paths x 252 steps of float32 is about 10 MB
+CHUNK_PATHS = 10000
+
+# Steps at which intermediate bands are reported, besides the last one
+BAND_CHECKPOINTS = 10
+
+_executor = None
+_executor_processes = None
+# Held while the pool is replaced or given work, so no thread submits to a pool another one shut down
+_executor_lock = threading.RLock()
+
+
+def log_return_paths(drift, sigma, steps, paths, rng, method='gbm', returns=None):
+    """Cumulative log returns of simulated paths, shaped (paths, steps), as float32
+
+    drift and sigma are per-step log drift and volatility; bootstrap
+    resamples returns (demeaned) instead of drawing normals.
+    """
+    if method == 'gbm':
+        increments = rng.standard_normal((paths, steps), dtype=np.float32)
+        increments *= np.float32(sigma)
+    elif method == 'bootstrap':
+        returns = np.asarray(returns, dtype=np.float32)
+        increments = (returns - returns.mean())[rng.integers(0, len(returns), (paths, steps))]
+    else:
+        raise ValueError(f"method must be one of {', '.join(METHODS)}")
+    increments += np.float32(drift)
+    return np.cumsum(increments, axis=1, out=increments)
+
+
+def simulate(start, target, sigma, steps, paths, rng, method='gbm', returns=None, chunk_paths=CHUNK_PATHS,
+             checkpoints=BAND_CHECKPOINTS):
+    """Percentile bands and probability of gain of simulated prices from start over steps
+
+    The log drift puts the median terminal price at target.
+    """
+    drift = np.log(target / start) / steps
+    columns = np.unique(np.linspace(0, steps - 1, checkpoints + 1).round().astype(np.int64)[1:])
+    sampled = np.empty((paths, len(columns)), dtype=np.float32)
+    for offset in range(0, paths, chunk_paths):
+        count = min(chunk_paths, paths - offset)
+        cumulative = log_return_paths(drift, sigma, steps, count, rng, method, returns)
+        sampled[offset:offset + count] = cumulative[:, columns]
+
+    prices = start * np.exp(sampled.astype(np.float64))
+    bands = np.percentile(prices, PERCENTILES, axis=0)
+    terminal = bands[:, -1]
+    result = {f"p{point}": round(float(value), 2) for point, value in zip(PERCENTILES, terminal)}
+    result.update({
+        "probabilityOfGain": round(float(np.mean(sampled[:, -1] > 0)), 4),
+        "paths": paths,
+        "steps": steps,
+        "method": method,
+        "bands": {
+            "steps": (columns + 1).tolist(),
+            **{f"p{point}": np.round(band, 2).tolist() for point, band in zip(PERCENTILES, bands)}
+        }
+    })
+    return result
+
+
+def _simulate_task(task):
+    symbol, start, target, sigma, returns, steps, paths, method, chunk_paths = task
+    rng = random_provider.generator(symbol, 'simulation', steps, method)
+    return simulate(start, target, sigma, steps, paths, rng, method, returns, chunk_paths)
+
+
+def _simulate_batch(tasks):
+    return [_simulate_task(task) for task in tasks]
+
+
+def executor(processes):
+    """Shared process pool for simulations, recreated if the size changes
+
+    Workers are spawned rather than forked, as the API server forks from
+    a process with running threads.
+    """
+    global _executor, _executor_processes
+    with _executor_lock:
+        if _executor is None or _executor_processes != processes:
+            if _executor is not None:
+                _executor.shutdown(wait=False)
+            _executor = ProcessPoolExecutor(max_workers=processes, mp_context=multiprocessing.get_context('spawn'))
+            _executor_processes = processes
+        return _executor
+
+
+def shutdown():
+    """Stop the shared process pool, if one was started"""
+    global _executor, _executor_processes
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=True)
+            _executor = _executor_processes = None
+
+
+def default_processes():
+    """SIMULATION_PROCESSES, or this worker's share of the cores among WEB_CONCURRENCY server workers"""
+    processes = int(os.environ.get('SIMULATION_PROCESSES', 0))
+    if processes:
+        return processes
+    workers = int(os.environ.get('WEB_CONCURRENCY', 0)) or os.cpu_count() or 1
+    return max(1, (os.cpu_count() or 1) // workers)
+
+
+def simulate_many(tasks, processes=None, batch_size=None):
+    """Results of many simulations, spread in batches over a process pool
+
+    tasks are (symbol, start, target, sigma, returns, steps, paths, method,
+    chunk_paths) tuples; returns and chunk_paths may be None. processes
+    defaults to default_processes(), which is one unless there are more
+    cores than server workers; with one process or a single task
+    everything runs here.
+    """
+    tasks = [task[:8] + (task[8] or CHUNK_PATHS,) for task in tasks]
+    processes = processes or default_processes()
+    if processes <= 1 or len(tasks) <= 1:
+        return _simulate_batch(tasks)
+
+    batch_size = batch_size or max(1, -(-len(tasks) // (processes * 4)))
+    batches = [tasks[i:i + batch_size] for i in range(0, len(tasks), batch_size)]
+    with _executor_lock:
+        # map submits every batch before it returns
+        results = executor(processes).map(_simulate_batch, batches)
+    return [result for batch in results for result in batch]
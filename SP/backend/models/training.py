@@ -0,0 +1,345 @@
+"""Offline training and walk-forward backtesting of the return models
+
+Trains one model per sector (or per symbol, or one market-wide model)
+and timeframe on the stored daily history, predicting the forward return
+over the timeframe's horizon from features.feature_matrix. Work runs in
+two parallel stages over a process pool:
+
+1. features: each symbol's feature matrix is computed once and cached on
+   disk under a fingerprint of its bars, so reruns only recompute symbols
+   whose history changed
+2. fitting: each (group, timeframe) is evaluated with walk-forward splits
+   on shared calendar cut-offs, then refit on all of its history and
+   saved to the model registry
+
+The out-of-sample predictions of the walk-forward folds give accuracy
+metrics and a calibration table mapping the size of a predicted return
+to the observed rate of calling its direction right; PredictionModel
+reports that rate as the prediction's confidence.
+
+Usage: python -m models.training {train,backtest} [--timeframes 1m 3m] [--by sector] [--processes 4]
+"""
+import argparse
+import hashlib
+import logging
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from models import features
+from models.registry import ModelRegistry, ReturnModel, model_name
+from services import reference_data
+from services.price_store import PriceStore, DAILY
+
+# Forward horizon of each prediction timeframe in daily bars (the stored
+# history has one bar per calendar day)
+HORIZON_BARS = {'1w': 7, '1m': 30, '3m': 90, '6m': 180, '1y': 365}
+
+# Bumped whenever feature_matrix changes, so cached features are rebuilt
+FEATURE_VERSION = 1
+
+CALIBRATION_BINS = 10
+
+# Centroids summarizing the training features as the explanation background
+BACKGROUND_SIZE = 32
+GROUPINGS = ('sector', 'symbol', 'market')
+
+_thread_limits = None
+
+logger = logging.getLogger(__name__)
+
+
+def make_estimator():
+    # Imported here so the API process only pays for sklearn when unpickling models
+    from sklearn.ensemble import HistGradientBoostingRegressor
+    return HistGradientBoostingRegressor(
+        max_iter=100, learning_rate=0.05, max_leaf_nodes=15, min_samples_leaf=100, early_stopping=False
+    )
+
+
+def calibrate(predictions, actual, bins=CALIBRATION_BINS):
+    """Calibration table (edges, hit rates) of directional accuracy by predicted return size
+
+    Bins are quantiles of |prediction|; hit rates are made non-decreasing
+    in the size of the prediction, so a stronger signal never reports
+    less confidence than a weaker one.
+    """
+    size = np.abs(predictions)
+    edges = np.unique(np.quantile(size, np.linspace(0, 1, bins + 1)))
+    edges[0] = 0.0
+    index = np.clip(np.searchsorted(edges, size, side='right') - 1, 0, max(len(edges) - 2, 0))
+    hits = np.sign(predictions) == np.sign(actual)
+    counts = np.bincount(index, minlength=max(len(edges) - 1, 1))
+    hit_rates = np.bincount(index, weights=hits, minlength=len(counts)) / np.maximum(counts, 1)
+    hit_rates[counts == 0] = 0.5
+    return edges[:len(counts)], np.maximum.accumulate(hit_rates)
+
+
+def evaluate(predictions, actual, calibration=None):
+    """Accuracy metrics of predicted against realized returns, with calibration error if a table is given"""
+    errors = predictions - actual
+    metrics = {
+        "samples": int(len(actual)),
+        "directionAccuracy": float(np.mean(np.sign(predictions) == np.sign(actual))),
+        "mae": float(np.mean(np.abs(errors))),
+        "rmse": float(np.sqrt(np.mean(errors ** 2))),
+        "informationCoefficient": float(np.corrcoef(predictions, actual)[0, 1]) if np.std(predictions) > 0 else 0.0
+    }
+    if calibration is not None:
+        # Expected calibration error: stated confidence against observed hit rate, per bin
+        stated = ReturnModel(None, *calibration).confidence(predictions) / 100
+        hits = np.sign(predictions) == np.sign(actual)
+        error = 0.0
+        for level in np.unique(stated):
+            selected = stated == level
+            error += selected.mean() * abs(hits[selected].mean() - level)
+        metrics["calibrationError"] = float(error)
+    return metrics
+
+
+def summarize_background(X, size=BACKGROUND_SIZE, max_rows=20000, seed=0):
+    """k-means centroids of the rows of X and the share of rows closest to each"""
+    from sklearn.cluster import KMeans
+    rng = np.random.default_rng(seed)
+    if len(X) > max_rows:
+        X = X[rng.choice(len(X), max_rows, replace=False)]
+    size = min(size, len(X))
+    kmeans = KMeans(n_clusters=size, n_init=1, random_state=seed).fit(X)
+    weights = np.bincount(kmeans.labels_, minlength=size) / len(X)
+    return kmeans.cluster_centers_, weights
+
+
+def walk_forward_splits(timestamps, folds, horizon_seconds, min_train_fraction=0.5):
+    """(train cut-off, test start, test end) timestamps of expanding walk-forward folds
+
+    The span after the first min_train_fraction of history is divided into
+    folds consecutive test windows. Training samples are purged so their
+    label horizon ends before the test window starts.
+    """
+    first, last = timestamps.min(), timestamps.max()
+    start = first + (last - first) * min_train_fraction
+    bounds = np.linspace(start, last + 1, folds + 1)
+    return [(lo - horizon_seconds, lo, hi) for lo, hi in zip(bounds[:-1], bounds[1:])]
+
+
+class FeatureCache:
+    """On-disk cache of per-symbol feature matrices keyed by a fingerprint of the bars"""
+
+    def __init__(self, root):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+
+    @staticmethod
+    def fingerprint(series):
+        digest = hashlib.blake2b(digest_size=16)
+        digest.update(str(FEATURE_VERSION).encode())
+        for column in (series.timestamps, series.high, series.low, series.close):
+            digest.update(np.ascontiguousarray(column).tobytes())
+        return digest.hexdigest()
+
+    def _path(self, symbol):
+        return os.path.join(self.root, f"{symbol}.npz")
+
+    def load(self, symbol, fingerprint=None):
+        """Cached (timestamps, close, features) of a symbol, or None if missing or stale"""
+        try:
+            with np.load(self._path(symbol)) as cached:
+                if fingerprint is not None and str(cached["fingerprint"]) != fingerprint:
+                    return None
+                return cached["timestamps"], cached["close"], cached["features"]
+        except (OSError, KeyError, ValueError):
+            return None
+
+    def store(self, symbol, fingerprint, timestamps, close, matrix):
+        # Write then rename, so a concurrent reader never sees half a file
+        staging = self._path(symbol) + f".{os.getpid()}.tmp.npz"
+        np.savez(staging, fingerprint=fingerprint, timestamps=timestamps, close=close, features=matrix)
+        os.replace(staging, self._path(symbol))
+
+
+def _limit_threads():
+    # One process per core: keep OpenMP in the fitted estimators single-threaded
+    global _thread_limits
+    from threadpoolctl import threadpool_limits
+    _thread_limits = threadpool_limits(limits=1)
+
+
+def build_features(symbols, cache_dir):
+    """Make sure the feature cache is current for symbols; returns (symbols computed, symbols reused)"""
+    cache = FeatureCache(cache_dir)
+    store = PriceStore(memory_budget=0)
+    computed = reused = 0
+    for symbol in symbols:
+        series = store.get(symbol, DAILY)
+        fingerprint = FeatureCache.fingerprint(series)
+        if cache.load(symbol, fingerprint) is not None:
+            reused += 1
+            continue
+        close = np.asarray(series.close, dtype=np.float64)
+        indicators = features.compute_indicators(close, series.high, series.low)
+        matrix = features.feature_matrix(close, indicators)[0].astype(np.float32)
+        cache.store(symbol, fingerprint, np.asarray(series.timestamps), close, matrix)
+        computed += 1
+    return computed, reused
+
+
+def group_dataset(symbols, cache_dir, horizon, stride):
+    """Stacked samples (timestamps, X, y) of symbols for a forward horizon in bars
+
+    Only every stride-th bar is sampled, as neighbouring samples share most
+    of their label window and add little.
+    """
+    cache = FeatureCache(cache_dir)
+    parts = []
+    for symbol in symbols:
+        cached = cache.load(symbol)
+        if cached is None:
+            logger.warning("No cached features for %s, leaving it out", symbol)
+            continue
+        timestamps, close, matrix = cached
+        rows = np.arange(0, len(close) - horizon, stride)
+        parts.append((timestamps[rows], matrix[rows], close[rows + horizon] / close[rows] - 1))
+    if not parts:
+        return np.empty(0, dtype=np.int64), np.empty((0, len(features.FEATURE_NAMES))), np.empty(0)
+    timestamps = np.concatenate([part[0] for part in parts])
+    X = np.concatenate([part[1] for part in parts])
+    y = np.concatenate([part[2] for part in parts])
+    usable = np.isfinite(X).all(axis=1) & np.isfinite(y)
+    return timestamps[usable], X[usable], y[usable]
+
+
+def fit_group(task):
+    """Walk-forward evaluation, and unless backtesting a final fit saved to the registry, for one group
+
+    Returns the group's metrics, or None when its history is too short
+    for any walk-forward fold, in which case it is skipped.
+    """
+    name, symbols, timeframe, options = task
+    horizon = HORIZON_BARS[timeframe]
+    start = time.perf_counter()
+    timestamps, X, y = group_dataset(symbols, options["cacheDir"], horizon, options["stride"])
+    if not len(timestamps):
+        logger.warning("Skipping %s: no samples with a full %d-bar horizon", name, horizon)
+        return name, None
+
+    predictions, actual, fold_ids = [], [], []
+    for fold, (train_end, test_start, test_end) in enumerate(
+            walk_forward_splits(timestamps, options["folds"], horizon * DAILY)):
+        train = timestamps < train_end
+        test = (timestamps >= test_start) & (timestamps < test_end)
+        if not train.any() or not test.any():
+            continue
+        estimator = make_estimator().fit(X[train], y[train])
+        predictions.append(estimator.predict(X[test]))
+        actual.append(y[test])
+        fold_ids.append(np.full(test.sum(), fold))
+    if not predictions:
+        logger.warning("Skipping %s: no walk-forward fold has both training and test samples", name)
+        return name, None
+    predictions, actual, fold_ids = map(np.concatenate, (predictions, actual, fold_ids))
+
+    # Calibrate on the earlier folds and measure calibration on the last one
+    earlier = fold_ids < fold_ids.max()
+    held_out = calibrate(predictions[earlier], actual[earlier]) if earlier.any() else None
+    metrics = evaluate(predictions, actual)
+    if held_out is not None:
+        metrics["calibrationError"] = evaluate(predictions[~earlier], actual[~earlier], held_out)["calibrationError"]
+
+    if options["save"]:
+        edges, hit_rates = calibrate(predictions, actual)
+        background, background_weights = summarize_background(X)
+        model = ReturnModel(make_estimator().fit(X, y), edges, hit_rates, timeframe, background, background_weights)
+        ModelRegistry(options["registry"]).save(name, model, {
+            "timeframe": timeframe,
+            "horizonBars": horizon,
+            "features": features.FEATURE_NAMES,
+            "symbols": len(symbols),
+            "metrics": metrics,
+            "calibration": {"edges": edges.tolist(), "hitRates": hit_rates.tolist()}
+        })
+    metrics["seconds"] = round(time.perf_counter() - start, 3)
+    return name, metrics
+
+
+def group_symbols(symbols, by):
+    """Symbols per model group for a grouping (sector, symbol or market)"""
+    if by == 'market':
+        return {None: list(symbols)}
+    if by == 'symbol':
+        return {symbol: [symbol] for symbol in symbols}
+    groups = {}
+    for symbol in symbols:
+        groups.setdefault(reference_data.sector(symbol), []).append(symbol)
+    return groups
+
+
+def run(symbols, timeframes, by='sector', processes=None, cache_dir=None, registry=None,
+        folds=4, stride=5, save=True, chunk_size=50):
+    """Build features and fit every group and timeframe; returns {model name: metrics} and stage timings"""
+    cache_dir = cache_dir or os.environ.get('FEATURE_CACHE_PATH', os.path.join('.cache', 'features'))
+    registry = registry or os.environ.get('MODEL_REGISTRY_PATH')
+    if save and not registry:
+        raise ValueError("Saving models needs a registry path (MODEL_REGISTRY_PATH or --registry)")
+    unknown = [timeframe for timeframe in timeframes if timeframe not in HORIZON_BARS]
+    if unknown:
+        raise ValueError(f"Unknown timeframes {unknown}, expected some of {sorted(HORIZON_BARS)}")
+
+    options = {"cacheDir": cache_dir, "registry": registry, "folds": folds, "stride": stride, "save": save}
+    tasks = [
+        (model_name(group, timeframe), members, timeframe, options)
+        for group, members in group_symbols(symbols, by).items()
+        for timeframe in timeframes
+    ]
+    chunks = [symbols[i:i + chunk_size] for i in range(0, len(symbols), chunk_size)]
+
+    timings = {}
+    with ProcessPoolExecutor(max_workers=processes, initializer=_limit_threads) as pool:
+        start = time.perf_counter()
+        counts = list(pool.map(build_features, chunks, [cache_dir] * len(chunks)))
+        timings["features"] = time.perf_counter() - start
+        timings["featuresComputed"] = sum(computed for computed, _ in counts)
+        timings["featuresReused"] = sum(reused for _, reused in counts)
+
+        start = time.perf_counter()
+        # Largest groups first so a big sector doesn't start last and straggle
+        tasks.sort(key=lambda task: len(task[1]), reverse=True)
+        # Groups skipped for lack of history have no metrics
+        results = {name: metrics for name, metrics in pool.map(fit_group, tasks) if metrics is not None}
+        timings["fitting"] = time.perf_counter() - start
+    return results, timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Train or backtest the return models")
+    parser.add_argument('command', choices=('train', 'backtest'))
+    parser.add_argument('--symbols', nargs='+', help='symbols to use (default: listed symbols)')
+    parser.add_argument('--timeframes', nargs='+', default=['1m', '3m'])
+    parser.add_argument('--by', choices=GROUPINGS, default='sector', help='train one model per sector, symbol or the market')
+    parser.add_argument('--processes', type=int, default=None, help='worker processes (default: one per core)')
+    parser.add_argument('--folds', type=int, default=4)
+    parser.add_argument('--stride', type=int, default=5, help='sample every nth bar')
+    parser.add_argument('--cache', help='feature cache directory (default: FEATURE_CACHE_PATH or .cache/features)')
+    parser.add_argument('--registry', help='model registry directory (default: MODEL_REGISTRY_PATH)')
+    args = parser.parse_args()
+
+    symbols = args.symbols or [listing["symbol"] for listing in reference_data.load_listings()]
+    try:
+        results, timings = run(
+            symbols, args.timeframes, args.by, args.processes, args.cache, args.registry,
+            args.folds, args.stride, save=args.command == 'train'
+        )
+    except ValueError as e:
+        parser.error(str(e))
+
+    print(f"features: {timings['featuresComputed']} computed, {timings['featuresReused']} cached "
+          f"in {timings['features']:.1f} s; fitting {len(results)} models in {timings['fitting']:.1f} s")
+    print(f"{'model':<32} {'samples':>8} {'direction':>9} {'mae':>8} {'ic':>7} {'calib err':>9}")
+    for name, metrics in sorted(results.items()):
+        print(f"{name:<32} {metrics['samples']:>8} {metrics['directionAccuracy']:>9.3f} {metrics['mae']:>8.4f} "
+              f"{metrics['informationCoefficient']:>7.3f} {metrics.get('calibrationError', float('nan')):>9.3f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,242 @@
+"""On-disk bar archive shared between worker processes through numpy.memmap
+
+Layout of an archive directory:
+
+    index.bin          fixed-width records, one per stored segment, sorted
+                       by (symbol, bar_seconds, first timestamp)
+    part-00000.bars    partition files: a 64-byte header followed by
+    part-00001.bars    segments of column-major bars
+
+A segment holds `count` bars of one symbol at one resolution as six
+contiguous little-endian 8-byte columns (int64 timestamps, then float64
+open, high, low, close and volume), so every column can be handed out as
+a zero-copy view of the mapped file. Nothing is parsed on open: the index
+and partitions are mapped and looked up with binary search.
+
+Command line usage:
+
+    python -m services.bar_archive build ARCHIVE [--symbols SYMBOL ...] [--intraday-days D]
+    python -m services.bar_archive compact SOURCE DEST
+"""
+import argparse
+import os
+import threading
+
+import numpy as np
+
+from services.price_store import PriceSeries, SyntheticBarLoader, INTRADAY, DAILY, BAR_FIELDS
+
+MAGIC = b'SPBARS01'
+HEADER_BYTES = 64
+INDEX_FILE = 'index.bin'
+
+INDEX_DTYPE = np.dtype([
+    ('symbol', 'S16'),
+    ('bar_seconds', '<i8'),
+    ('first_ts', '<i8'),
+    ('partition', '<i8'),
+    ('offset', '<i8'),
+    ('count', '<i8')
+])
+
+COLUMN_DTYPES = [np.dtype('<i8')] + [np.dtype('<f8')] * (len(BAR_FIELDS) - 1)
+
+
+def _partition_name(number):
+    return f'part-{number:05d}.bars'
+
+
+class BarArchive:
+    """Read-only view of a bar archive, mapped into memory on open"""
+
+    def __init__(self, path):
+        self.path = path
+        self.index = np.memmap(os.path.join(path, INDEX_FILE), dtype=INDEX_DTYPE, mode='r')
+        self._partitions = {}
+        self._lock = threading.Lock()
+
+    def _partition(self, number):
+        mapped = self._partitions.get(number)
+        if mapped is None:
+            with self._lock:
+                mapped = self._partitions.get(number)
+                if mapped is None:
+                    mapped = np.memmap(os.path.join(self.path, _partition_name(number)), dtype=np.uint8, mode='r')
+                    if bytes(mapped[:len(MAGIC)]) != MAGIC:
+                        raise ValueError(f"{_partition_name(number)} is not a bar archive partition")
+                    self._partitions[number] = mapped
+        return mapped
+
+    def symbols(self):
+        """Distinct symbols stored in the archive"""
+        return sorted({s.decode('ascii') for s in np.unique(self.index['symbol'])})
+
+    def segments(self, symbol, bar_seconds):
+        """Index records of the segments stored for a symbol at a resolution"""
+        key = symbol.encode('ascii')
+        lo = np.searchsorted(self.index['symbol'], key, side='left')
+        hi = np.searchsorted(self.index['symbol'], key, side='right')
+        records = self.index[lo:hi]
+        return records[records['bar_seconds'] == bar_seconds]
+
+    def _segment_columns(self, record):
+        mapped = self._partition(int(record['partition']))
+        count = int(record['count'])
+        offset = int(record['offset'])
+        columns = []
+        for dtype in COLUMN_DTYPES:
+            columns.append(np.frombuffer(mapped, dtype=dtype, count=count, offset=offset))
+            offset += count * dtype.itemsize
+        return columns
+
+    def read(self, symbol, bar_seconds):
+        """Bars for a symbol at a resolution, or None if the archive has none
+
+        Compacted archives store one segment per series, returned as views
+        of the mapped file. Segments appended since the last compaction are
+        concatenated, which copies.
+        """
+        records = self.segments(symbol, bar_seconds)
+        if len(records) == 0:
+            return None
+        if len(records) == 1:
+            return PriceSeries(*self._segment_columns(records[0]), bar_seconds, mapped=True)
+
+        parts = [self._segment_columns(record) for record in records]
+        columns = [np.concatenate(column) for column in zip(*parts)]
+        order = np.argsort(columns[0], kind='stable')
+        return PriceSeries(*(column[order] for column in columns), bar_seconds)
+
+
+class BarArchiveWriter:
+    """Writes bar series into an archive, rolling partitions at a size limit
+
+    With append=True new segments are added after the existing ones; use
+    compact() afterwards to merge them into one segment per series.
+    """
+
+    def __init__(self, path, partition_bytes=1 << 30, append=False):
+        self.path = path
+        self.partition_bytes = partition_bytes
+        os.makedirs(path, exist_ok=True)
+
+        self.records = []
+        self.partition = 0
+        index_path = os.path.join(path, INDEX_FILE)
+        if append and os.path.exists(index_path):
+            existing = np.fromfile(index_path, dtype=INDEX_DTYPE)
+            self.records = existing.tolist()
+            if len(existing):
+                self.partition = int(existing['partition'].max()) + 1
+
+        self._file = None
+        self._open_partition()
+
+    def _open_partition(self):
+        self._file = open(os.path.join(self.path, _partition_name(self.partition)), 'wb')
+        self._file.write(MAGIC.ljust(HEADER_BYTES, b'\0'))
+
+    def add(self, symbol, series):
+        """Append one series as a segment"""
+        if len(series) == 0:
+            return
+        if self._file.tell() >= self.partition_bytes:
+            self._file.close()
+            self.partition += 1
+            self._open_partition()
+
+        offset = self._file.tell()
+        for column, dtype in zip(series.columns(), COLUMN_DTYPES):
+            self._file.write(np.ascontiguousarray(column, dtype=dtype).tobytes())
+        self.records.append((
+            symbol.encode('ascii'), series.bar_seconds, int(series.timestamps[0]),
+            self.partition, offset, len(series)
+        ))
+
+    def close(self):
+        """Finish the current partition and write the sorted index"""
+        self._file.close()
+        index = np.array(self.records, dtype=INDEX_DTYPE)
+        index.sort(order=['symbol', 'bar_seconds', 'first_ts'])
+
+        # Replace the index atomically so readers never see a partial file
+        temp_path = os.path.join(self.path, INDEX_FILE + '.tmp')
+        index.tofile(temp_path)
+        os.replace(temp_path, os.path.join(self.path, INDEX_FILE))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def compact(source, dest, partition_bytes=1 << 30):
+    """Rewrite an archive with one sorted, de-duplicated segment per series"""
+    archive = BarArchive(source)
+    keys = sorted(set(zip(archive.index['symbol'].tolist(), archive.index['bar_seconds'].tolist())))
+    with BarArchiveWriter(dest, partition_bytes) as writer:
+        for symbol, bar_seconds in keys:
+            symbol = symbol.decode('ascii')
+            series = archive.read(symbol, bar_seconds)
+            # Keep one bar per timestamp, preferring the later segment
+            keep = np.append(series.timestamps[1:] != series.timestamps[:-1], True)
+            writer.add(symbol, PriceSeries(*(column[keep] for column in series.columns()), bar_seconds))
+
+
+class ArchiveBarLoader:
+    """PriceStore loader that serves series from a bar archive
+
+    Symbols missing from the archive are handed to the fallback loader.
+    """
+
+    def __init__(self, archive, fallback=None):
+        self.archive = archive
+        self.fallback = fallback
+
+    def __call__(self, symbol, bar_seconds):
+        series = self.archive.read(symbol, bar_seconds)
+        if series is None:
+            if self.fallback is None:
+                raise KeyError(f"No {bar_seconds}s bars for {symbol} in {self.archive.path}")
+            series = self.fallback(symbol, bar_seconds)
+        return series
+
+
+def build_synthetic(path, symbols, intraday_days=7, partition_bytes=1 << 30):
+    """Write synthetic history for the given symbols into a new archive"""
+    loader = SyntheticBarLoader(intraday_days=intraday_days)
+    with BarArchiveWriter(path, partition_bytes) as writer:
+        for symbol in symbols:
+            for bar_seconds in (INTRADAY, DAILY):
+                writer.add(symbol, loader(symbol, bar_seconds))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build or compact a memory-mapped bar archive")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    build = commands.add_parser('build', help='write synthetic history for a symbol universe')
+    build.add_argument('archive')
+    build.add_argument('--symbols', nargs='+', help='symbols to write (default: reference symbols)')
+    build.add_argument('--intraday-days', type=int, default=7)
+    build.add_argument('--partition-mb', type=int, default=1024)
+
+    compact_command = commands.add_parser('compact', help='merge appended segments into a new archive')
+    compact_command.add_argument('source')
+    compact_command.add_argument('dest')
+    compact_command.add_argument('--partition-mb', type=int, default=1024)
+
+    args = parser.parse_args()
+    partition_bytes = args.partition_mb * 1024 * 1024
+    if args.command == 'build':
+        from services.reference_data import BASE_PRICES
+        build_synthetic(args.archive, args.symbols or list(BASE_PRICES), args.intraday_days, partition_bytes)
+    else:
+        if os.path.exists(args.dest):
+            parser.error(f"{args.dest} already exists")
+        compact(args.source, args.dest, partition_bytes)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,161 @@
+import functools
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+
+def estimate_size(value):
+    """Approximate memory footprint of a JSON-like value, records included, in bytes"""
+    size = sys.getsizeof(value)
+    if isinstance(value, dict):
+        size += sum(estimate_size(k) + estimate_size(v) for k, v in value.items())
+    elif isinstance(value, (list, tuple)):
+        size += sum(estimate_size(v) for v in value)
+    elif hasattr(value, '__dataclass_fields__'):
+        size += sum(estimate_size(getattr(value, name)) for name in value.__dataclass_fields__)
+    return size
+
+
+def _freeze(value):
+    """Hashable form of call arguments, turning lists into tuples"""
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(v) for v in value)
+    if isinstance(value, dict):
+        return tuple(sorted((k, _freeze(v)) for k, v in value.items()))
+    return value
+
+
+class _Flight:
+    """A computation in progress that concurrent callers for the same key wait on"""
+
+    __slots__ = ('done', 'value', 'error')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class ResponseCache:
+    """Thread-safe TTL cache with LRU eviction and single-flight loading
+
+    Entries expire after their TTL and the least recently used ones are
+    evicted once the cache holds more than max_entries entries or
+    max_bytes estimated bytes. Concurrent misses for the same key run the
+    computation once; the other callers wait for its result.
+
+    Cached values are shared between requests and must not be mutated.
+    """
+
+    def __init__(self, max_entries=10000, max_bytes=64 * 1024 * 1024, enabled=True):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.enabled = enabled
+        self._entries = OrderedDict()  # key -> (expires_at, size, value)
+        self._flights = {}
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._counters = dict.fromkeys(('hits', 'misses', 'coalesced', 'evictions', 'expirations'), 0)
+
+    def get_or_compute(self, key, ttl, compute):
+        """Cached value for key, computing and storing it on a miss"""
+        if not self.enabled:
+            return compute()
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[0] > time.monotonic():
+                    self._entries.move_to_end(key)
+                    self._counters['hits'] += 1
+                    return entry[2]
+                self._remove(key)
+                self._counters['expirations'] += 1
+
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+                self._counters['misses'] += 1
+            else:
+                self._counters['coalesced'] += 1
+
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.value
+
+        try:
+            flight.value = compute()
+        except Exception as e:
+            flight.error = e
+            raise
+        else:
+            self._store(key, ttl, flight.value)
+        finally:
+            with self._lock:
+                del self._flights[key]
+            flight.done.set()
+
+        return flight.value
+
+    def _store(self, key, ttl, value):
+        size = estimate_size(value)
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (time.monotonic() + ttl, size, value)
+            self._bytes += size
+
+            while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+                _, (_, evicted_size, _) = self._entries.popitem(last=False)
+                self._bytes -= evicted_size
+                self._counters['evictions'] += 1
+
+    def _remove(self, key):
+        _, size, _ = self._entries.pop(key)
+        self._bytes -= size
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._counters)
+            stats.update({
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "maxEntries": self.max_entries,
+                "maxBytes": self.max_bytes,
+                "enabled": self.enabled
+            })
+        lookups = stats['hits'] + stats['misses'] + stats['coalesced']
+        stats['hitRate'] = round(stats['hits'] / lookups, 4) if lookups else 0.0
+        return stats
+
+
+# Shared cache for service responses
+response_cache = ResponseCache(
+    max_entries=int(os.environ.get('RESPONSE_CACHE_MAX_ENTRIES', 10000)),
+    max_bytes=int(os.environ.get('RESPONSE_CACHE_MAX_MB', 64)) * 1024 * 1024,
+    enabled=os.environ.get('RESPONSE_CACHE_ENABLED', '1') != '0'
+)
+
+
+def cached(ttl, cache=None):
+    """Cache a service method's results per instance and arguments for `ttl` seconds"""
+    def decorator(method):
+        name = method.__qualname__
+
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            key = (name, self, _freeze(args), _freeze(kwargs))
+            return (cache or response_cache).get_or_compute(key, ttl, lambda: method(self, *args, **kwargs))
+
+        return wrapper
+    return decorator
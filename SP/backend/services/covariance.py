@@ -0,0 +1,166 @@
+import threading
+
+import numpy as np
+
+from models.features import stack_tails
+from services.price_store import DAILY
+
+# RiskMetrics decay for daily returns; weights older than a year are below 1e-6
+EWMA_DECAY = 0.94
+
+# Trailing daily returns kept per symbol, to add symbols and for historical VaR
+HISTORY_BARS = 252
+
+# Below this, the lazy scale of the matrix is folded into its entries
+MIN_SCALE = 1e-100
+
+
+class CovarianceTracker:
+    """EWMA covariance of daily log returns, updated one bar at a time
+
+    The matrix follows the RiskMetrics recursion C = decay * C + (1 - decay)
+    * r r' with zero-mean returns, so a new bar costs one O(n^2) rank-1
+    update instead of an O(n^2 T) recompute over the history. Only the
+    lower triangle is kept, as scale * M: decaying the matrix just shrinks
+    the scale, so a bar is a single in-place BLAS syr pass over M. Symbols are
+    tracked from first use: adding k of them computes only their k rows
+    against the trailing returns kept for every symbol. Symbols are never
+    dropped, so callers must only add symbols from a bounded set such as
+    the listings. sync() catches up
+    with bars the price store has gained since the last one seen.
+    """
+
+    def __init__(self, price_store, decay=EWMA_DECAY, history=HISTORY_BARS):
+        self.price_store = price_store
+        self.decay = decay
+        self.history = history
+        self.symbols = []
+        self.last_timestamp = None
+        self._positions = {}
+        self._returns = np.zeros((history, 0))   # trailing returns, oldest first
+        self._matrix = np.zeros((0, 0))          # capacity-sized; the top-left n x n block is live
+        self._scale = 1.0
+        self._weights = (1 - decay) * decay ** np.arange(history - 1, -1, -1)
+        self._counts = {"updates": 0, "added": 0, "rebuilds": 0}
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self.symbols)
+
+    def add(self, symbols):
+        """Track symbols not tracked yet, from the store's daily history"""
+        with self._lock:
+            new = [symbol for symbol in dict.fromkeys(symbols) if symbol not in self._positions]
+            if not new:
+                return
+            bars = [self.price_store.get(symbol, DAILY) for symbol in new]
+            if self.last_timestamp is None:
+                self.last_timestamp = int(bars[0].timestamps[-1])
+            close = stack_tails([series.close for series in bars], self.history + 1)
+            self._append(new, np.nan_to_num(np.diff(np.log(close), axis=1).T))
+
+    def rebuild(self):
+        """Recompute the whole matrix from the trailing returns, O(n^2 T)"""
+        with self._lock:
+            n = len(self.symbols)
+            self._matrix[:n, :n] = (self._returns * self._weights[:, np.newaxis]).T @ self._returns
+            self._scale = 1.0
+            self._counts["rebuilds"] += 1
+
+    def update(self, returns, timestamp=None):
+        """Apply new bars of returns, shaped (bars, symbols) in the order of self.symbols"""
+        # Imported on first use rather than at startup, which it would add a tenth of a second to
+        from scipy.linalg import blas
+        returns = np.atleast_2d(np.asarray(returns, dtype=np.float64))
+        with self._lock:
+            # Spare capacity gets zero returns, leaving it untouched
+            padded = np.zeros(len(self._matrix))
+            for bar in returns:
+                self._scale *= self.decay
+                if self._scale < MIN_SCALE:
+                    self._matrix *= self._scale
+                    self._scale = 1.0
+                padded[:len(bar)] = bar
+                # The transpose is Fortran-ordered, so BLAS updates M's lower triangle in place
+                blas.dsyr((1 - self.decay) / self._scale, padded, a=self._matrix.T, overwrite_a=True)
+
+            self._returns = np.concatenate((self._returns, returns))[-self.history:]
+            if timestamp is not None:
+                self.last_timestamp = timestamp
+            self._counts["updates"] += len(returns)
+
+    def sync(self):
+        """Apply the daily bars the price store has gained since the last one seen"""
+        with self._lock:
+            if not self.symbols:
+                return 0
+            reference = self.price_store.get(self.symbols[0], DAILY)
+            start = np.searchsorted(reference.timestamps, self.last_timestamp, side='right')
+            bars = len(reference) - start
+            if bars <= 0:
+                return 0
+
+            # Symbols missing some of the new bars get zero returns for them
+            returns = np.zeros((bars, len(self.symbols)))
+            for column, symbol in enumerate(self.symbols):
+                series = self.price_store.get(symbol, DAILY)
+                first = np.searchsorted(series.timestamps, self.last_timestamp, side='left')
+                new = np.diff(np.log(series.close[first:]))[-bars:]
+                returns[bars - len(new):, column] = new
+            self.update(np.nan_to_num(returns), int(reference.timestamps[-1]))
+            return bars
+
+    def covariance(self, symbols):
+        """Covariance matrix of tracked symbols, as a copy"""
+        positions = self._indices(symbols)
+        with self._lock:
+            rows, columns = np.maximum.outer(positions, positions), np.minimum.outer(positions, positions)
+            return self._matrix[rows, columns] * self._scale
+
+    def covariance_with(self, symbols, returns):
+        """EWMA covariances of tracked symbols with an untracked series, and the series' variance
+        
+        returns holds the series' trailing daily returns, oldest first, up
+        to the last bar seen; they are weighted as the matrix was built.
+        """
+        positions = self._indices(symbols)
+        returns = np.asarray(returns, dtype=np.float64)[-self.history:]
+        weighted = self._weights[-len(returns):] * returns
+        with self._lock:
+            tracked = self._returns[-len(returns):, positions]
+        return weighted @ tracked, float(weighted @ returns)
+
+    def returns(self, symbols):
+        """Trailing daily returns of tracked symbols, shaped (bars, symbols)"""
+        positions = self._indices(symbols)
+        with self._lock:
+            return self._returns[:, positions]
+
+    def stats(self):
+        with self._lock:
+            return {
+                "symbols": len(self.symbols),
+                "matrixBytes": self._matrix.nbytes,
+                "lastTimestamp": self.last_timestamp,
+                **self._counts
+            }
+
+    def _indices(self, symbols):
+        return np.array([self._positions[symbol] for symbol in symbols], dtype=np.int64)
+
+    def _append(self, symbols, returns):
+        """Grow the matrix by the rows and columns of new symbols, O(n k T)"""
+        n, k = len(self.symbols), len(symbols)
+        if n + k > len(self._matrix):
+            # Grow geometrically so adding symbols one at a time stays amortized O(n^2)
+            grown = np.zeros((max(n + k, 2 * len(self._matrix)),) * 2)
+            grown[:n, :n] = self._matrix[:n, :n]
+            self._matrix = grown
+
+        self._returns = np.concatenate((self._returns, returns), axis=1)
+        cross = (self._returns * self._weights[:, np.newaxis]).T @ returns
+        self._matrix[n:n + k, :n + k] = cross.T / self._scale
+        for offset, symbol in enumerate(symbols):
+            self._positions[symbol] = n + offset
+        self.symbols.extend(symbols)
+        self._counts["added"] += k
@@ -0,0 +1,168 @@
+import threading
+
+import numpy as np
+
+from services import reference_data
+
+# Constituents of each index, as a range of market cap ranks (largest first).
+# These only approximate the real indices over a full listings file
+# (LISTINGS_PATH).
+INDEX_RANKS = {
+    "S&P 500": (0, 500),
+    "Dow Jones": (0, 30),
+    "Nasdaq": (0, 100),
+    "Russell 2000": (1000, 3000)
+}
+
+# Ticks between full re-sums, which drop the rounding error incremental sums pick up
+RESUM_TICKS = 100000
+
+
+class IndexAggregator:
+    """Cap-weighted index levels and sector changes maintained incrementally from constituent quotes
+
+    Every constituent belongs to one sector and any number of indices,
+    together its groups, kept as CSR arrays (groups[offsets[i]:offsets[i + 1]]
+    for constituent i). The aggregator holds the current and previous-close
+    market cap of every group; a quote moves its constituent's caps and adds
+    the difference to just its groups, so a batch of ticks is one segment
+    sum (np.bincount) over their groups rather than a re-sum of the universe.
+    Index levels are chained from their levels at the previous close.
+    Groups without constituents (the Russell 2000 over the ten built-in
+    listings) keep their place in the summary with null values, so its
+    shape doesn't depend on the listings, and are left out of
+    index_names, which lists the indices that can be valued against.
+    """
+
+    def __init__(self, symbols, sectors, shares, prices, indices):
+        """indices maps each index name to (level at the previous close, member positions)"""
+        self.symbols = list(symbols)
+        self.sector_names = list(dict.fromkeys([*reference_data.SECTORS, *sectors]))
+        self._indices = list(indices)
+        self.ticks = 0
+        self._positions = {symbol: position for position, symbol in enumerate(self.symbols)}
+        self._members = {name: np.asarray(members, dtype=np.int64) for name, (_, members) in indices.items()}
+        self._levels = np.array([level for level, _ in indices.values()], dtype=np.float64)
+        self._shares = np.asarray(shares, dtype=np.float64)
+        self._price = np.asarray(prices, dtype=np.float64).copy()
+        self._previous = self._price.copy()
+
+        # Group ids: sectors first, then indices
+        sector_codes = {name: code for code, name in enumerate(self.sector_names)}
+        memberships = [[sector_codes[sector]] for sector in sectors]
+        for offset, (_, members) in enumerate(indices.values()):
+            for position in members:
+                memberships[position].append(len(self.sector_names) + offset)
+        self._counts = np.array([len(groups) for groups in memberships], dtype=np.int64)
+        self._offsets = np.concatenate(([0], np.cumsum(self._counts)))
+        self._groups = np.array([group for groups in memberships for group in groups], dtype=np.int64)
+        self._group_count = len(self.sector_names) + len(self._indices)
+        self._populated = np.bincount(self._groups, minlength=self._group_count) > 0
+        self.index_names = [
+            name for name, populated in zip(self._indices, self._populated[len(self.sector_names):]) if populated
+        ]
+        self._lock = threading.Lock()
+        self._resum()
+
+    @classmethod
+    def from_listings(cls, listings):
+        """Aggregator over listings at their reference prices, with indices by market cap rank"""
+        symbols = [listing["symbol"] for listing in listings]
+        shares = np.array([reference_data.shares_outstanding(symbol) for symbol in symbols], dtype=np.float64)
+        prices = np.array([reference_data.base_price(symbol) for symbol in symbols])
+        ranked = np.argsort(-shares * prices, kind='stable')
+        indices = {
+            name: (reference_data.INDEX_LEVELS[name], ranked[start:end])
+            for name, (start, end) in INDEX_RANKS.items()
+        }
+        return cls(symbols, [listing["sector"] for listing in listings], shares, prices, indices)
+
+    def __len__(self):
+        return len(self.symbols)
+
+    def constituents(self, index):
+        """Symbols of an index's constituents and their current cap weights"""
+        members = self._members[index]
+        with self._lock:
+            caps = self._price[members] * self._shares[members]
+        return [self.symbols[position] for position in members.tolist()], caps / caps.sum() if len(caps) else caps
+
+    def update(self, quote):
+        """Record the latest Quote of a constituent"""
+        position = self._positions.get(quote.symbol)
+        if position is None:
+            return
+        price = quote.price
+        previous = price - quote.change
+        shares = self._shares[position]
+        groups = self._groups[self._offsets[position]:self._offsets[position + 1]]
+        with self._lock:
+            self._current_caps[groups] += (price - self._price[position]) * shares
+            self._previous_caps[groups] += (previous - self._previous[position]) * shares
+            self._price[position] = price
+            self._previous[position] = previous
+            self._tick(1)
+
+    def update_many(self, quotes):
+        """Record many quotes at once; for a symbol quoted more than once the last quote wins"""
+        latest = {quote.symbol: quote for quote in quotes if quote.symbol in self._positions}
+        if not latest:
+            return
+        positions = np.fromiter((self._positions[symbol] for symbol in latest), dtype=np.int64, count=len(latest))
+        prices = np.fromiter((quote.price for quote in latest.values()), dtype=np.float64, count=len(latest))
+        changes = np.fromiter((quote.change for quote in latest.values()), dtype=np.float64, count=len(latest))
+        self.update_arrays(positions, prices, prices - changes)
+
+    def update_arrays(self, positions, prices, previous):
+        """Record new prices and previous closes for distinct constituent positions"""
+        # Each tick's cap deltas, repeated over its groups
+        counts = self._counts[positions]
+        starts = np.repeat(self._offsets[positions] - np.cumsum(counts) + counts, counts)
+        groups = self._groups[starts + np.arange(len(starts))]
+        with self._lock:
+            current_deltas = np.repeat((prices - self._price[positions]) * self._shares[positions], counts)
+            previous_deltas = np.repeat((previous - self._previous[positions]) * self._shares[positions], counts)
+            self._current_caps += np.bincount(groups, current_deltas, self._group_count)
+            self._previous_caps += np.bincount(groups, previous_deltas, self._group_count)
+            self._price[positions] = prices
+            self._previous[positions] = previous
+            self._tick(len(positions))
+
+    def summary(self):
+        """Index levels and sector percent changes, in the shape of the market summary"""
+        with self._lock:
+            current, previous = self._current_caps.copy(), self._previous_caps.copy()
+        with np.errstate(invalid='ignore', divide='ignore'):
+            ratios = np.where(previous > 0, current / previous, 1.0)
+        sector_ratios, index_ratios = ratios[:len(self.sector_names)], ratios[len(self.sector_names):]
+        sectors_populated, indices_populated = np.split(self._populated, [len(self.sector_names)])
+        values = self._levels * index_ratios
+        return {
+            "indices": [
+                {
+                    "name": name,
+                    "value": round(float(value), 2) if populated else None,
+                    "change": round(float(value - level), 2) if populated else None,
+                    "percentChange": round(float(ratio - 1) * 100, 2) if populated else None
+                }
+                for name, value, level, ratio, populated in zip(self._indices, values, self._levels, index_ratios,
+                                                                indices_populated)
+            ],
+            "sectorPerformance": [
+                {"name": name, "percentChange": round(float(ratio - 1) * 100, 2) if populated else None}
+                for name, ratio, populated in zip(self.sector_names, sector_ratios, sectors_populated)
+            ]
+        }
+
+    def _tick(self, count):
+        self.ticks += count
+        if self.ticks // RESUM_TICKS != (self.ticks - count) // RESUM_TICKS:
+            self._resum()
+
+    def _resum(self):
+        """Recompute every group's caps from the constituents, O(n)"""
+        weights = np.repeat(self._shares, self._counts)
+        self._current_caps = np.bincount(self._groups, np.repeat(self._price, self._counts) * weights,
+                                         self._group_count)
+        self._previous_caps = np.bincount(self._groups, np.repeat(self._previous, self._counts) * weights,
+                                          self._group_count)
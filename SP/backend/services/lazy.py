@@ -0,0 +1,49 @@
+import threading
+
+
+class Lazy:
+    """Stand-in for a service that is built on first use
+
+    Reading or setting an attribute builds the service with factory, once,
+    and then goes to it, so callers use a Lazy as they would the service.
+    Importing a module that holds one builds nothing: a gunicorn master
+    preloading the app shares its imported code with the workers it
+    forks, and each worker builds its own services, with their own
+    threads and locks, after the fork.
+    """
+
+    __slots__ = ('_factory', '_instance', '_lock')
+
+    def __init__(self, factory):
+        object.__setattr__(self, '_factory', factory)
+        object.__setattr__(self, '_instance', None)
+        object.__setattr__(self, '_lock', threading.Lock())
+
+    def __getattr__(self, name):
+        return getattr(resolve(self), name)
+
+    def __setattr__(self, name, value):
+        setattr(resolve(self), name, value)
+
+    def __repr__(self):
+        state = 'unbuilt' if self._instance is None else repr(self._instance)
+        return f"<Lazy {getattr(self._factory, '__name__', self._factory)}: {state}>"
+
+
+def resolve(value):
+    """The service a Lazy stands for, built now if it hasn't been; any other value as it is"""
+    if not isinstance(value, Lazy):
+        return value
+    instance = value._instance
+    if instance is None:
+        with value._lock:
+            instance = value._instance
+            if instance is None:
+                instance = value._factory()
+                object.__setattr__(value, '_instance', instance)
+    return instance
+
+
+def is_built(value):
+    """Whether a Lazy's service has been built; other values always have"""
+    return not isinstance(value, Lazy) or value._instance is not None
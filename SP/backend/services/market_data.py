@@ -0,0 +1,297 @@
+import asyncio
+import os
+import random
+import threading
+import time
+import zlib
+from datetime import datetime
+
+import numpy as np
+
+from services import reference_data
+from services.random_provider import random_provider
+from services.records import Quote
+
+
+class MarketDataError(Exception):
+    """A quote lookup failed"""
+
+
+class TransientMarketDataError(MarketDataError):
+    """A quote lookup failed in a way that is worth retrying (timeouts, 429s, 5xx)"""
+
+
+class MarketDataProvider:
+    """Asynchronous source of live quotes
+
+    Subclasses implement fetch_quotes for a batch of symbols. Callers use
+    get_quote/get_quotes, which coalesce lookups from concurrent tasks:
+    symbols requested within batch_window seconds of each other are sent
+    upstream as one multi-symbol call of at most max_batch symbols, a
+    symbol already in flight is not requested twice, at most
+    max_concurrency upstream calls run at once, and transient failures are
+    retried with exponential backoff and jitter.
+
+    A provider belongs to the event loop it is first used on.
+    """
+
+    def __init__(self, max_batch=100, batch_window=0.002, max_concurrency=32, retries=3, backoff=0.1):
+        self.max_batch = max_batch
+        self.batch_window = batch_window
+        self.max_concurrency = max_concurrency
+        self.retries = retries
+        self.backoff = backoff
+
+        self._pending = {}  # symbol -> future shared by every waiting caller
+        self._queue = []  # symbols waiting for the next batch
+        self._flush_handle = None
+        self._semaphore = None
+        self._tasks = set()
+        self._counters = {"lookups": 0, "coalesced": 0, "batches": 0, "retries": 0, "failures": 0}
+
+    async def fetch_quotes(self, symbols):
+        """Fetch Quote records for a batch of distinct symbols, as a dict keyed by symbol"""
+        raise NotImplementedError
+
+    async def close(self):
+        """Release connections held by the provider"""
+
+    async def get_quote(self, symbol):
+        """Quote for one symbol, batched with concurrent lookups"""
+        # Shield the shared future so one caller giving up doesn't cancel it for the others
+        return await asyncio.shield(self._enqueue(symbol))
+
+    async def get_quotes(self, symbols):
+        """Quotes for many symbols as a dict keyed by symbol"""
+        symbols = list(dict.fromkeys(symbols))
+        quotes = await asyncio.gather(*(asyncio.shield(self._enqueue(symbol)) for symbol in symbols))
+        return dict(zip(symbols, quotes))
+
+    def stats(self):
+        stats = dict(self._counters)
+        stats["pending"] = len(self._pending)
+        return stats
+
+    def _enqueue(self, symbol):
+        self._counters["lookups"] += 1
+        future = self._pending.get(symbol)
+        if future is not None:
+            self._counters["coalesced"] += 1
+            return future
+
+        loop = asyncio.get_running_loop()
+        future = self._pending[symbol] = loop.create_future()
+        self._queue.append(symbol)
+        if len(self._queue) >= self.max_batch:
+            self._flush()
+        elif self._flush_handle is None:
+            self._flush_handle = loop.call_later(self.batch_window, self._flush)
+        return future
+
+    def _flush(self):
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        batch, self._queue = self._queue, []
+        if batch:
+            # Keep a reference so the task isn't garbage collected mid-flight
+            task = asyncio.get_running_loop().create_task(self._dispatch(batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _dispatch(self, batch):
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        try:
+            async with self._semaphore:
+                self._counters["batches"] += 1
+                quotes = await self._fetch_with_retry(batch)
+        except Exception as e:
+            self._counters["failures"] += 1
+            for symbol in batch:
+                future = self._pending.pop(symbol)
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for symbol in batch:
+            future = self._pending.pop(symbol)
+            if future.done():
+                continue
+            if symbol in quotes:
+                future.set_result(quotes[symbol])
+            else:
+                future.set_exception(MarketDataError(f"No quote for symbol {symbol}"))
+
+    async def _fetch_with_retry(self, batch):
+        for attempt in range(self.retries + 1):
+            try:
+                return await self.fetch_quotes(batch)
+            except TransientMarketDataError:
+                if attempt == self.retries:
+                    raise
+                self._counters["retries"] += 1
+                await asyncio.sleep(self.backoff * 2 ** attempt * (0.5 + random.random()))
+
+
+class HttpMarketDataProvider(MarketDataProvider):
+    """Quotes from an HTTP feed over a pooled keep-alive aiohttp session
+
+    Expects GET {base_url}{quotes_path}?symbols=A,B,C to return either a
+    list of quote objects or {"quotes": [...]}, each with a "symbol" key.
+    """
+
+    def __init__(self, base_url, api_key=None, quotes_path='/quotes', max_connections=64, timeout=5.0, **kwargs):
+        super().__init__(**kwargs)
+        self.base_url = base_url.rstrip('/')
+        self.api_key = api_key
+        self.quotes_path = quotes_path
+        self.max_connections = max_connections
+        self.timeout = timeout
+        self._session = None
+
+    def _get_session(self):
+        if self._session is None or self._session.closed:
+            import aiohttp
+
+            connector = aiohttp.TCPConnector(limit=self.max_connections, keepalive_timeout=30, ttl_dns_cache=300)
+            headers = {'Authorization': f'Bearer {self.api_key}'} if self.api_key else None
+            self._session = aiohttp.ClientSession(
+                connector=connector,
+                headers=headers,
+                timeout=aiohttp.ClientTimeout(total=self.timeout)
+            )
+        return self._session
+
+    async def fetch_quotes(self, symbols):
+        import aiohttp
+
+        session = self._get_session()
+        try:
+            async with session.get(self.base_url + self.quotes_path, params={'symbols': ','.join(symbols)}) as response:
+                if response.status == 429 or response.status >= 500:
+                    raise TransientMarketDataError(f"Quote feed returned HTTP {response.status}")
+                if response.status >= 400:
+                    raise MarketDataError(f"Quote feed returned HTTP {response.status}")
+                payload = await response.json()
+        except (aiohttp.ClientConnectionError, asyncio.TimeoutError) as e:
+            raise TransientMarketDataError(f"Quote feed unavailable: {e!r}") from e
+
+        if isinstance(payload, dict):
+            payload = payload.get('quotes', [])
+        return {quote['symbol']: Quote.from_dict(quote) for quote in payload}
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+
+class FakeMarketDataProvider(MarketDataProvider):
+    """In-process quote feed with configurable latency, for development and offline benchmarks
+
+    Every upstream call sleeps latency seconds (plus up to jitter) however
+    many symbols it carries, like a multi-symbol HTTP endpoint, and fails
+    transiently with probability failure_rate.
+
+    A symbol's quote is a function of the symbol and the bucket_seconds
+    long time bucket it is asked for in, so every caller in the same
+    bucket - a batch, a stream tick, a details page - sees the same quote.
+    """
+
+    def __init__(self, latency=0.0, jitter=0.0, failure_rate=0.0, seed=0, bucket_seconds=1.0, **kwargs):
+        super().__init__(**kwargs)
+        self.latency = latency
+        self.jitter = jitter
+        self.failure_rate = failure_rate
+        self.seed = seed
+        self.bucket_seconds = bucket_seconds
+        self.calls = 0
+        self._rng = random_provider.generator('quotes', 'fake', seed)
+
+    async def fetch_quotes(self, symbols):
+        self.calls += 1
+        delay = self.latency + self.jitter * self._rng.random()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        if self._rng.random() < self.failure_rate:
+            raise TransientMarketDataError("Fake quote feed failure")
+
+        bucket = int(time.time() // self.bucket_seconds)
+        prices = np.array([reference_data.base_price(symbol) for symbol in symbols])
+        change_percent, volume = _bucket_draws(symbols, self.seed, bucket)
+        timestamp = datetime.fromtimestamp(bucket * self.bucket_seconds).isoformat()
+        return {
+            symbol: Quote(symbol, round(price, 2), round(price * change / 100, 2), round(change, 2), volume, timestamp)
+            for symbol, price, change, volume in zip(symbols, prices.tolist(), change_percent.tolist(), volume.tolist())
+        }
+
+
+def _mix(values):
+    """splitmix64 finalizer of uint64 values, wrapping like the C original"""
+    values = (values ^ (values >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+    values = (values ^ (values >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    return values ^ (values >> np.uint64(31))
+
+
+def _bucket_draws(symbols, seed, bucket):
+    """Percent changes (normal, sd 2) and volumes of symbols, fixed per (seed, symbol, bucket)"""
+    keys = np.fromiter((zlib.crc32(symbol.encode('utf-8')) for symbol in symbols), dtype=np.uint64, count=len(symbols))
+    salt = _mix(np.array([(seed << 32) + bucket], dtype=np.uint64))
+    state = _mix((keys << np.uint64(32)) ^ salt)
+    first, second = _mix(state + np.uint64(1)), _mix(state + np.uint64(2))
+    # Top 53 bits as uniforms; the first in (0, 1] for the log
+    scale = 2.0 ** -53
+    radius = np.sqrt(-2 * np.log(((first >> np.uint64(11)).astype(np.float64) + 1) * scale))
+    angle = 2 * np.pi * (second >> np.uint64(11)).astype(np.float64) * scale
+    volume = (state % np.uint64(99) + np.uint64(1)).astype(np.float64) * 1e6
+    return 2 * radius * np.cos(angle), volume
+
+
+def default_provider():
+    """HTTP provider when MARKET_DATA_URL is set, the fake feed otherwise"""
+    url = os.environ.get('MARKET_DATA_URL')
+    if not url:
+        return FakeMarketDataProvider()
+    return HttpMarketDataProvider(url, api_key=os.environ.get('MARKET_DATA_API_KEY'))
+
+
+class MarketDataClient:
+    """Blocking interface to a provider for request threads
+
+    The provider runs on an event loop in a daemon thread, started on
+    first use so it is created after any worker fork. Lookups from
+    concurrent request threads land on the same loop and are batched
+    together.
+    """
+
+    def __init__(self, provider=None, timeout=10.0):
+        self.provider = provider or default_provider()
+        self.timeout = timeout
+        self._loop = None
+        self._lock = threading.Lock()
+
+    def _run(self, coroutine):
+        if self._loop is None:
+            with self._lock:
+                if self._loop is None:
+                    loop = asyncio.new_event_loop()
+                    threading.Thread(target=loop.run_forever, name='market-data', daemon=True).start()
+                    self._loop = loop
+        return asyncio.run_coroutine_threadsafe(coroutine, self._loop).result(self.timeout)
+
+    def get_quote(self, symbol):
+        return self._run(self.provider.get_quote(symbol))
+
+    def get_quotes(self, symbols):
+        return self._run(self.provider.get_quotes(symbols))
+
+    def stats(self):
+        return self.provider.stats()
+
+    def close(self):
+        if self._loop is not None:
+            self._run(self.provider.close())
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._loop = None
@@ -0,0 +1,337 @@
+import bisect
+import functools
+import os
+import threading
+import time
+
+# Upper bounds of latency histogram buckets, in seconds
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(names, values, extra=''):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _format_value(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Series:
+    """One labelled series of a metric, updated under its own lock"""
+
+    __slots__ = ('value', '_lock')
+
+    def __init__(self, value=0):
+        self.value = value
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1):
+        with self._lock:
+            self.value += amount
+
+    def dec(self, amount=1):
+        with self._lock:
+            self.value -= amount
+
+    def set(self, value):
+        self.value = value
+
+
+class _HistogramSeries:
+    """Counts of observations per bucket, kept non-cumulative and summed when rendered"""
+
+    __slots__ = ('buckets', 'counts', 'total', '_lock')
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.total = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.total += value
+
+
+class _Metric:
+    """A named metric with one series per combination of label values
+
+    labels() returns the series for some label values, which callers on
+    a hot path keep, so an update takes one lock and no lookups.
+    """
+
+    kind = None
+
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.labels_names = tuple(labels)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def labels(self, *values):
+        series = self._series.get(values)
+        if series is None:
+            with self._lock:
+                series = self._series.setdefault(values, self._new_series())
+        return series
+
+    def render(self):
+        with self._lock:
+            series = sorted(self._series.items())
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        for values, child in series:
+            lines.extend(self._render_series(values, child))
+        return lines
+
+    def _new_series(self):
+        return _Series()
+
+    def _render_series(self, values, child):
+        return [f"{self.name}{_format_labels(self.labels_names, values)} {_format_value(child.value)}"]
+
+
+class Counter(_Metric):
+    kind = 'counter'
+
+    def inc(self, *values, amount=1):
+        self.labels(*values).inc(amount)
+
+
+class Gauge(_Metric):
+    kind = 'gauge'
+
+    def inc(self, *values, amount=1):
+        self.labels(*values).inc(amount)
+
+    def dec(self, *values, amount=1):
+        self.labels(*values).dec(amount)
+
+    def set(self, value, *values):
+        self.labels(*values).set(value)
+
+
+class Histogram(_Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, help, labels=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, *values):
+        self.labels(*values).observe(value)
+
+    def _new_series(self):
+        return _HistogramSeries(self.buckets)
+
+    def _render_series(self, values, child):
+        with child._lock:
+            counts, total = list(child.counts), child.total
+        return _histogram_lines(self.name, self.labels_names, values, self.buckets, counts, total)
+
+
+def _histogram_lines(name, names, values, buckets, counts, total):
+    """Bucket, sum and count lines of one histogram series, from its non-cumulative counts"""
+    lines = []
+    cumulative = 0
+    for bound, count in zip(buckets + ('+Inf',), counts):
+        cumulative += count
+        le = f'le="{bound}"'
+        lines.append(f"{name}_bucket{_format_labels(names, values, le)} {cumulative}")
+    labels = _format_labels(names, values)
+    lines.append(f"{name}_sum{labels} {total!r}")
+    lines.append(f"{name}_count{labels} {cumulative}")
+    return lines
+
+
+class _RouteRequests:
+    """Requests served by one route and method, as a latency histogram per status"""
+
+    __slots__ = ('route', 'buckets', 'statuses', '_lock')
+
+    def __init__(self, route, buckets):
+        self.route = route
+        self.buckets = buckets
+        self.statuses = {}   # status code -> [non-cumulative bucket counts, sum of latencies]
+        self._lock = threading.Lock()
+
+    def finish(self, status, duration):
+        index = bisect.bisect_left(self.buckets, duration)
+        with self._lock:
+            histogram = self.statuses.get(status)
+            if histogram is None:
+                histogram = self.statuses[status] = [[0] * (len(self.buckets) + 1), 0.0]
+            histogram[0][index] += 1
+            histogram[1] += duration
+
+
+class RequestMetrics:
+    """Requests served, their latency and those in flight, by route and method
+
+    Rendered as http_requests_total (by route, method and status),
+    http_request_duration_seconds (by route and method) and
+    http_requests_in_flight (by route), from as little as the request
+    hooks can do per request. A route and method's _RouteRequests keeps
+    its latency histogram per status, whose counts are the requests
+    served, so a request takes a single locked update, when it ends.
+    The _RouteRequests of a URL rule are kept on the rule, by method, so
+    a request finds its own without building a key. A request in flight
+    is the entry of its thread (or greenlet) in the in_flight dict,
+    holding its _RouteRequests and start: adding and removing one needs
+    no lock of its own, and no context variable to find it again.
+    """
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.in_flight = {}
+        self._routes = {}
+        self._lock = threading.Lock()
+
+    def route(self, route, method):
+        """The _RouteRequests of a route and method, shared by all their requests"""
+        series = self._routes.get((route, method))
+        if series is None:
+            with self._lock:
+                series = self._routes.setdefault((route, method), _RouteRequests(route, self.buckets))
+        return series
+
+    def start(self, rule, method):
+        """Count the current thread's request as in flight on a URL rule, or None if none matched"""
+        try:
+            series = rule.request_series[method]
+        except (AttributeError, KeyError):
+            if rule is None:
+                series = self.route('unmatched', method)
+            else:
+                by_method = rule.__dict__.setdefault('request_series', {})
+                series = by_method.setdefault(method, self.route(rule.rule, method))
+        self.in_flight[threading.get_ident()] = (series, time.perf_counter())
+
+    def finish(self, status):
+        """Count the current thread's request as served with status, unless it was already"""
+        request = self.in_flight.pop(threading.get_ident(), None)
+        if request is not None:
+            series, start = request
+            series.finish(status, time.perf_counter() - start)
+
+    def render(self):
+        served, latency = {}, {}
+        with self._lock:
+            routes = sorted(self._routes.items())
+        in_flight = dict.fromkeys((route for (route, _), _ in routes), 0)
+        for series, _ in list(self.in_flight.values()):
+            in_flight[series.route] = in_flight.get(series.route, 0) + 1
+        for (route, method), series in routes:
+            with series._lock:
+                statuses = {status: (list(counts), total) for status, (counts, total) in series.statuses.items()}
+            counts, total = [0] * (len(self.buckets) + 1), 0.0
+            for status, (status_counts, status_total) in sorted(statuses.items()):
+                served[route, method, str(status)] = sum(status_counts)
+                counts = [a + b for a, b in zip(counts, status_counts)]
+                total += status_total
+            if statuses:
+                latency[route, method] = counts, total
+
+        lines = ["# HELP http_requests_total Requests served, by route, method and status",
+                 "# TYPE http_requests_total counter"]
+        for values, count in sorted(served.items()):
+            lines.append(f"http_requests_total{_format_labels(('route', 'method', 'status'), values)} {count}")
+        lines += ["# HELP http_request_duration_seconds Request latency, by route and method",
+                  "# TYPE http_request_duration_seconds histogram"]
+        for values, (counts, total) in latency.items():
+            lines.extend(_histogram_lines('http_request_duration_seconds', ('route', 'method'), values,
+                                          self.buckets, counts, total))
+        lines += ["# HELP http_requests_in_flight Requests being handled, by route",
+                  "# TYPE http_requests_in_flight gauge"]
+        for route, count in sorted(in_flight.items()):
+            lines.append(f"http_requests_in_flight{_format_labels(('route',), (route,))} {count}")
+        return lines
+
+
+class MetricsRegistry:
+    """Metrics of this process, rendered in the Prometheus text exposition format
+
+    Collectors are callables returning (name, kind, help, value) tuples,
+    read at render time for state that other components already count.
+    Under gunicorn each worker has its own registry, so a scrape sees
+    the worker that answered it.
+    """
+
+    def __init__(self, enabled=True):
+        self.enabled = enabled
+        self._metrics = []
+        self._collectors = []
+
+    def counter(self, name, help, labels=()):
+        return self._register(Counter(name, help, labels))
+
+    def gauge(self, name, help, labels=()):
+        return self._register(Gauge(name, help, labels))
+
+    def histogram(self, name, help, labels=(), buckets=LATENCY_BUCKETS):
+        return self._register(Histogram(name, help, labels, buckets))
+
+    def requests(self, buckets=LATENCY_BUCKETS):
+        return self._register(RequestMetrics(buckets))
+
+    def collect(self, collector):
+        self._collectors.append(collector)
+        return collector
+
+    def render(self):
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        for collector in self._collectors:
+            for name, kind, help, value in collector():
+                lines.extend([f"# HELP {name} {help}", f"# TYPE {name} {kind}", f"{name} {_format_value(value)}"])
+        return '\n'.join(lines) + '\n'
+
+    def _register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+
+# Shared registry for the app's metrics
+metrics = MetricsRegistry(enabled=os.environ.get('METRICS_ENABLED', '1') != '0')
+
+http_requests = metrics.requests()
+call_duration = metrics.histogram(
+    'service_call_duration_seconds', 'Latency of instrumented service and model methods', ('method',))
+call_errors = metrics.counter(
+    'service_call_errors_total', 'Exceptions raised by instrumented methods', ('method',))
+
+
+def timed(func):
+    """Record a function's latency and errors under its qualified name
+
+    Requests in flight are tracked per route; per method they would cost
+    two more locked updates a call, for little more insight.
+    """
+    name = func.__qualname__
+    duration = call_duration.labels(name)
+    errors = call_errors.labels(name)
+    perf_counter = time.perf_counter
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        if not metrics.enabled:
+            return func(*args, **kwargs)
+        start = perf_counter()
+        try:
+            return func(*args, **kwargs)
+        except Exception:
+            errors.inc()
+            raise
+        finally:
+            duration.observe(perf_counter() - start)
+    return wrapper
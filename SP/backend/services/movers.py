@@ -0,0 +1,192 @@
+import heapq
+import threading
+
+
+class IndexedHeap:
+    """Binary max-heap of items with a position index, so any item's key can change in O(log n)"""
+
+    __slots__ = ('keys', 'items', 'positions')
+
+    def __init__(self):
+        self.keys = []
+        self.items = []
+        self.positions = {}
+
+    def __len__(self):
+        return len(self.keys)
+
+    def __contains__(self, item):
+        return item in self.positions
+
+    def set(self, item, key):
+        """Insert an item or change its key"""
+        pos = self.positions.get(item)
+        if pos is None:
+            self.keys.append(key)
+            self.items.append(item)
+            self._sift_up(len(self.keys) - 1)
+            return
+
+        old = self.keys[pos]
+        if key == old:
+            return
+        self.keys[pos] = key
+        if key > old:
+            self._sift_up(pos)
+        else:
+            self._sift_down(pos)
+
+    def remove(self, item):
+        pos = self.positions.pop(item)
+        last_key = self.keys.pop()
+        last_item = self.items.pop()
+        if pos == len(self.keys):
+            return
+        old = self.keys[pos]
+        self.keys[pos] = last_key
+        self.items[pos] = last_item
+        if last_key > old:
+            self._sift_up(pos)
+        else:
+            self._sift_down(pos)
+
+    def _sift_up(self, pos):
+        keys, items, positions = self.keys, self.items, self.positions
+        key, item = keys[pos], items[pos]
+        while pos:
+            parent = (pos - 1) >> 1
+            parent_key = keys[parent]
+            if parent_key >= key:
+                break
+            keys[pos] = parent_key
+            parent_item = items[pos] = items[parent]
+            positions[parent_item] = pos
+            pos = parent
+        keys[pos] = key
+        items[pos] = item
+        positions[item] = pos
+
+    def _sift_down(self, pos):
+        keys, items, positions = self.keys, self.items, self.positions
+        size = len(keys)
+        key, item = keys[pos], items[pos]
+        while True:
+            child = 2 * pos + 1
+            if child >= size:
+                break
+            if child + 1 < size and keys[child + 1] > keys[child]:
+                child += 1
+            child_key = keys[child]
+            if child_key <= key:
+                break
+            keys[pos] = child_key
+            child_item = items[pos] = items[child]
+            positions[child_item] = pos
+            pos = child
+        keys[pos] = key
+        items[pos] = item
+        positions[item] = pos
+
+
+def top_k(heaps, k):
+    """The k largest (item, key) pairs across heaps, best first, in O(k log k)
+
+    Walks the heaps from their roots with a frontier of candidate nodes;
+    only nodes whose parent was taken can be next, so at most 2k + len(heaps)
+    nodes are ever looked at.
+    """
+    frontier = [(-heap.keys[0], index, 0) for index, heap in enumerate(heaps) if len(heap)]
+    heapq.heapify(frontier)
+    result = []
+    while frontier and len(result) < k:
+        negative_key, index, pos = heapq.heappop(frontier)
+        heap = heaps[index]
+        result.append((heap.items[pos], -negative_key))
+        for child in (2 * pos + 1, 2 * pos + 2):
+            if child < len(heap.keys):
+                heapq.heappush(frontier, (-heap.keys[child], index, child))
+    return result
+
+
+class MoversEngine:
+    """Top gainers and losers maintained incrementally as quotes arrive
+
+    Every symbol sits in a pair of indexed heaps for its sector, one keyed
+    by percent change and one by its negation, so an update is two
+    O(log n) sifts. Reads walk the tops of the heaps (all sectors, or one)
+    and cost O(K log K) for K results, never a sort of the universe.
+    """
+
+    def __init__(self, max_limit=100):
+        self.max_limit = max_limit
+        self._quotes = {}
+        self._sectors = {}
+        self._gainers = {}
+        self._losers = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._quotes)
+
+    def update(self, quote, sector=None):
+        """Record the latest Quote for a symbol
+        
+        Without a sector, a known symbol keeps the sector it was last recorded with.
+        """
+        with self._lock:
+            self._update(quote, sector)
+
+    def update_many(self, quotes, sectors=None):
+        """Record many quotes, with an optional {symbol: sector} mapping"""
+        sectors = sectors or {}
+        with self._lock:
+            for quote in quotes:
+                self._update(quote, sectors.get(quote.symbol))
+
+    def remove(self, symbol):
+        with self._lock:
+            if self._quotes.pop(symbol, None) is not None:
+                sector = self._sectors.pop(symbol)
+                self._gainers[sector].remove(symbol)
+                self._losers[sector].remove(symbol)
+
+    def sectors(self):
+        with self._lock:
+            return sorted(sector for sector in self._gainers if sector is not None)
+
+    def gainers(self, limit=5, sector=None):
+        """Quotes of the biggest gainers (positive percent change), best first"""
+        return self._top(self._gainers, limit, sector)
+
+    def losers(self, limit=5, sector=None):
+        """Quotes of the biggest losers (negative percent change), worst first"""
+        return self._top(self._losers, limit, sector)
+
+    def _update(self, quote, sector):
+        symbol = quote.symbol
+        change = quote.percentChange
+        previous = self._sectors.get(symbol)
+        if sector is None:
+            sector = previous
+        elif symbol in self._quotes and previous != sector:
+            self._gainers[previous].remove(symbol)
+            self._losers[previous].remove(symbol)
+
+        self._quotes[symbol] = quote
+        self._sectors[symbol] = sector
+        gainers = self._gainers.get(sector)
+        if gainers is None:
+            gainers = self._gainers[sector] = IndexedHeap()
+            self._losers[sector] = IndexedHeap()
+        gainers.set(symbol, change)
+        self._losers[sector].set(symbol, -change)
+
+    def _top(self, heaps, limit, sector):
+        if not 0 < limit <= self.max_limit:
+            raise ValueError(f"limit must be between 1 and {self.max_limit}")
+        with self._lock:
+            if sector is None:
+                selected = list(heaps.values())
+            else:
+                selected = [heaps[sector]] if sector in heaps else []
+            return [self._quotes[symbol] for symbol, key in top_k(selected, limit) if key > 0]
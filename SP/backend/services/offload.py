@@ -0,0 +1,85 @@
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+# Model built in each worker process by _init_worker
+_worker_model = None
+
+
+def _init_worker(factory):
+    global _worker_model
+    # Workers already run in parallel, so simulations inside them stay inline
+    os.environ['SIMULATION_PROCESSES'] = '1'
+    _worker_model = factory()
+
+
+def _call(method, args):
+    return getattr(_worker_model, method)(*args)
+
+
+class ProcessOffload:
+    """Bounded process pool running model calls off the request threads
+
+    Each worker process builds its own model with factory, so NumPy
+    scoring there never holds the GIL of the server's request threads.
+    At most max_pending calls are in flight; further callers wait for a
+    slot, which pushes back on the server's threads instead of queueing
+    without bound. The pool is spawned on first use, after any server
+    fork.
+    """
+
+    def __init__(self, factory, processes, max_pending=None):
+        self.factory = factory
+        self.processes = processes
+        self.max_pending = max_pending or 2 * processes
+        self._slots = threading.BoundedSemaphore(self.max_pending)
+        self._executor = None
+        self._lock = threading.Lock()
+        self._counts = {"calls": 0, "waits": 0}
+
+    def call(self, method, *args):
+        """Result of model.method(*args) computed in a worker process"""
+        if not self._slots.acquire(blocking=False):
+            self._counts["waits"] += 1
+            self._slots.acquire()
+        try:
+            self._counts["calls"] += 1
+            return self._get_executor().submit(_call, method, args).result()
+        finally:
+            self._slots.release()
+
+    def warm(self):
+        """Start every worker process and build its model"""
+        executor = self._get_executor()
+        # Initialized workers answer, until each one has
+        started = set()
+        while len(started) < self.processes:
+            started.update(future.result() for future in [executor.submit(os.getpid) for _ in range(self.processes)])
+
+    def stats(self):
+        return {"processes": self.processes, "maxPending": self.max_pending, **self._counts}
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=True)
+                self._executor = None
+
+    def _get_executor(self):
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ProcessPoolExecutor(
+                        max_workers=self.processes, mp_context=multiprocessing.get_context('spawn'),
+                        initializer=_init_worker, initargs=(self.factory,)
+                    )
+        return self._executor
+
+
+def default_offload(factory):
+    """Offload pool of PREDICTION_PROCESSES workers (PREDICTION_MAX_PENDING calls in flight), or None when unset or 0"""
+    processes = int(os.environ.get('PREDICTION_PROCESSES', 0))
+    if processes <= 0:
+        return None
+    return ProcessOffload(factory, processes, int(os.environ.get('PREDICTION_MAX_PENDING', 0)) or None)
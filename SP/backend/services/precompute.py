@@ -0,0 +1,406 @@
+"""Precomputation of predictions for the hot (symbol, timeframe) keys
+
+Every worker process counts the prediction requests it serves per key
+and flushes the counts into a shared store every few seconds. One
+scheduler thread - in the worker that holds the store's leader lock -
+periodically picks the top-N keys by exponentially decayed demand,
+computes their predictions and full explanations in batches on a thread
+pool, and writes them back to the store, from which every worker serves
+them while they are fresh. Only keys the scheduler accepts (listed
+symbols and known timeframes, as wired up by the API) are counted, and
+keys whose decayed demand falls below min_demand are forgotten, so the
+demand table stays bounded by what was recently asked for.
+
+With PRECOMPUTE_STORE_PATH set the store is a SQLite database (WAL mode)
+shared by all workers on the host; without it, an in-process store.
+"""
+import fcntl
+import heapq
+import os
+import sqlite3
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from services import records
+
+
+class MemoryPrecomputeStore:
+    """Precomputed predictions and request demand for a single process"""
+
+    def __init__(self):
+        self._entries = {}  # key -> (computed_at, hits_at_compute, prediction, explanation)
+        self._demand = {}  # key -> [score, updated_at, hits]
+        self._lock = threading.Lock()
+
+    def get(self, symbol, timeframe):
+        """(computed_at, prediction, explanation) of a key, or None"""
+        with self._lock:
+            entry = self._entries.get((symbol, timeframe))
+        if entry is None:
+            return None
+        computed_at, _, prediction, explanation = entry
+        # Callers own what they get back, as they would from a decoded row
+        return computed_at, _decode_prediction(prediction), records.loads(explanation) if explanation else None
+
+    def add_demand(self, counts, now, half_life):
+        """Fold {key: requests} observed up to now into the decayed demand"""
+        with self._lock:
+            for key, count in counts.items():
+                demand = self._demand.get(key)
+                if demand is None:
+                    self._demand[key] = [float(count), now, count]
+                else:
+                    demand[0] = demand[0] * _decay(now - demand[1], half_life) + count
+                    demand[1] = now
+                    demand[2] += count
+
+    def hot_keys(self, limit, now, half_life, min_demand=0.0):
+        """The limit keys with the highest current demand, hottest first; keys below min_demand are dropped"""
+        with self._lock:
+            demand = [
+                (key, score * _decay(now - updated_at, half_life))
+                for key, (score, updated_at, _) in self._demand.items()
+            ]
+            for key, score in demand:
+                if score < min_demand:
+                    del self._demand[key]
+        return _hottest(demand, limit, min_demand)
+
+    def put_many(self, results, now):
+        """Store computed (symbol, timeframe, prediction, explanation) rows; returns how many replaced unserved entries"""
+        wasted = 0
+        with self._lock:
+            for symbol, timeframe, prediction, explanation in results:
+                key = (symbol, timeframe)
+                hits = self._demand[key][2] if key in self._demand else 0
+                previous = self._entries.get(key)
+                if previous is not None and previous[1] == hits:
+                    wasted += 1
+                self._entries[key] = (now, hits, _encode(prediction), _encode(explanation) if explanation else None)
+        return wasted
+
+    def evict(self, keep, older_than):
+        """Drop entries outside keep computed before older_than; returns how many were never served"""
+        wasted = 0
+        with self._lock:
+            for key, (computed_at, hits_at_compute, _, _) in list(self._entries.items()):
+                if key not in keep and computed_at < older_than:
+                    hits = self._demand[key][2] if key in self._demand else 0
+                    wasted += hits == hits_at_compute
+                    del self._entries[key]
+        return wasted
+
+    def size(self):
+        with self._lock:
+            return len(self._entries)
+
+    def try_lead(self):
+        """Whether this process runs the scheduler; a private store always does"""
+        return True
+
+
+class SqlitePrecomputeStore:
+    """Precomputed predictions and demand in a SQLite file shared by the worker processes on a host
+
+    Connections are per thread. The process holding an exclusive lock on
+    <path>.lock is the leader that runs the precompute cycles.
+    """
+
+    SCHEMA = (
+        "CREATE TABLE IF NOT EXISTS predictions (symbol TEXT, timeframe TEXT, computed_at REAL, "
+        "hits_at_compute INTEGER, prediction TEXT, explanation TEXT, PRIMARY KEY (symbol, timeframe))",
+        "CREATE TABLE IF NOT EXISTS demand (symbol TEXT, timeframe TEXT, score REAL, updated_at REAL, "
+        "hits INTEGER, PRIMARY KEY (symbol, timeframe))"
+    )
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        self._lock_file = None
+        with self._connection() as connection:
+            for statement in self.SCHEMA:
+                connection.execute(statement)
+
+    def _connection(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is None or self._local.pid != os.getpid():
+            connection = sqlite3.connect(self.path, timeout=10)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+            self._local.pid = os.getpid()
+        return connection
+
+    def get(self, symbol, timeframe):
+        row = self._connection().execute(
+            "SELECT computed_at, prediction, explanation FROM predictions WHERE symbol = ? AND timeframe = ?",
+            (symbol, timeframe)
+        ).fetchone()
+        if row is None:
+            return None
+        return row[0], _decode_prediction(row[1]), records.loads(row[2]) if row[2] else None
+
+    def add_demand(self, counts, now, half_life):
+        with self._connection() as connection:
+            for (symbol, timeframe), count in counts.items():
+                row = connection.execute(
+                    "SELECT score, updated_at FROM demand WHERE symbol = ? AND timeframe = ?", (symbol, timeframe)
+                ).fetchone()
+                score = count if row is None else row[0] * _decay(now - row[1], half_life) + count
+                connection.execute(
+                    "INSERT INTO demand VALUES (?, ?, ?, ?, ?) ON CONFLICT (symbol, timeframe) "
+                    "DO UPDATE SET score = excluded.score, updated_at = excluded.updated_at, hits = hits + excluded.hits",
+                    (symbol, timeframe, score, now, count)
+                )
+
+    def hot_keys(self, limit, now, half_life, min_demand=0.0):
+        with self._connection() as connection:
+            rows = connection.execute("SELECT symbol, timeframe, score, updated_at FROM demand").fetchall()
+            demand = [((symbol, timeframe), score * _decay(now - updated_at, half_life))
+                      for symbol, timeframe, score, updated_at in rows]
+            cold = [key for key, score in demand if score < min_demand]
+            if cold:
+                connection.executemany("DELETE FROM demand WHERE symbol = ? AND timeframe = ?", cold)
+        return _hottest(demand, limit, min_demand)
+
+    def put_many(self, results, now):
+        wasted = 0
+        with self._connection() as connection:
+            for symbol, timeframe, prediction, explanation in results:
+                row = connection.execute(
+                    "SELECT hits_at_compute FROM predictions WHERE symbol = ? AND timeframe = ?", (symbol, timeframe)
+                ).fetchone()
+                hits = connection.execute(
+                    "SELECT hits FROM demand WHERE symbol = ? AND timeframe = ?", (symbol, timeframe)
+                ).fetchone()
+                hits = hits[0] if hits else 0
+                if row is not None and row[0] == hits:
+                    wasted += 1
+                connection.execute(
+                    "INSERT OR REPLACE INTO predictions VALUES (?, ?, ?, ?, ?, ?)",
+                    (symbol, timeframe, now, hits, _encode(prediction), _encode(explanation) if explanation else None)
+                )
+        return wasted
+
+    def evict(self, keep, older_than):
+        wasted = 0
+        with self._connection() as connection:
+            rows = connection.execute(
+                "SELECT p.symbol, p.timeframe, p.hits_at_compute, COALESCE(d.hits, 0) FROM predictions p "
+                "LEFT JOIN demand d ON d.symbol = p.symbol AND d.timeframe = p.timeframe WHERE p.computed_at < ?",
+                (older_than,)
+            ).fetchall()
+            for symbol, timeframe, hits_at_compute, hits in rows:
+                if (symbol, timeframe) not in keep:
+                    wasted += hits == hits_at_compute
+                    connection.execute(
+                        "DELETE FROM predictions WHERE symbol = ? AND timeframe = ?", (symbol, timeframe)
+                    )
+        return wasted
+
+    def size(self):
+        return self._connection().execute("SELECT COUNT(*) FROM predictions").fetchone()[0]
+
+    def try_lead(self):
+        if self._lock_file is None:
+            lock_file = open(self.path + '.lock', 'a')
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                lock_file.close()
+                return False
+            # Held until the process exits
+            self._lock_file = lock_file
+        return True
+
+
+def _hottest(demand, limit, min_demand):
+    """Keys of the limit highest (key, score) pairs at or above min_demand, hottest first"""
+    hottest = heapq.nlargest(limit, (item for item in demand if item[1] >= min_demand), key=lambda item: item[1])
+    return [key for key, _ in hottest]
+
+
+def _decay(elapsed, half_life):
+    return 0.5 ** (max(elapsed, 0.0) / half_life)
+
+
+def _encode(value):
+    return records.dumps(value).decode('utf-8')
+
+
+def _decode_prediction(text):
+    return records.Prediction.from_dict(records.loads(text))
+
+
+class PrecomputeScheduler:
+    """Keeps predictions and explanations for the most requested keys computed ahead of demand
+
+    compute(symbols, timeframe) returns [(prediction, explanation)] for
+    the symbols, and accepts(symbol, timeframe), when given, says whether
+    a requested key may be precomputed; demand for other keys isn't
+    recorded. Entries older than max_age are not served, and
+    precomputed entries that no request read before they were replaced
+    or dropped count as wasted work.
+    """
+
+    def __init__(self, compute, store=None, top_n=200, interval=60.0, workers=2, batch_size=50,
+                 max_age=None, half_life=600.0, flush_interval=5.0, min_demand=0.01, accepts=None):
+        self.compute = compute
+        self.accepts = accepts
+        self.store = store or MemoryPrecomputeStore()
+        self.top_n = top_n
+        self.interval = interval
+        self.workers = workers
+        self.batch_size = batch_size
+        self.max_age = max_age or 2 * interval
+        self.half_life = half_life
+        self.min_demand = min_demand
+        self.flush_interval = min(flush_interval, interval)
+        self._pending = {}  # key -> requests since the last flush
+        self._ages = deque(maxlen=4096)  # ages of recently served entries in seconds
+        self._lock = threading.Lock()
+        self._thread = None
+        self._stopped = threading.Event()
+        self._leader = False
+        self._last_cycle = None
+        self._counters = {
+            "served": 0, "missed": 0, "expired": 0,
+            "cycles": 0, "computed": 0, "wasted": 0, "errors": 0, "cycleSeconds": 0.0
+        }
+
+    def lookup(self, symbol, timeframe):
+        """(prediction, explanation) precomputed for a key and still fresh, or None; records the request"""
+        if self.accepts is not None and not self.accepts(symbol, timeframe):
+            self._counters["missed"] += 1
+            return None
+        key = (symbol, timeframe)
+        with self._lock:
+            self._pending[key] = self._pending.get(key, 0) + 1
+        self._ensure_running()
+
+        entry = self.store.get(symbol, timeframe)
+        if entry is None:
+            self._counters["missed"] += 1
+            return None
+        computed_at, prediction, explanation = entry
+        age = time.time() - computed_at
+        if age > self.max_age:
+            self._counters["expired"] += 1
+            return None
+        self._counters["served"] += 1
+        self._ages.append(age)
+        return prediction, explanation
+
+    def flush(self):
+        """Hand the requests counted since the last flush to the shared store"""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        if pending:
+            self.store.add_demand(pending, time.time(), self.half_life)
+
+    def run_cycle(self):
+        """Recompute the hottest keys now; returns how many were computed"""
+        started = time.monotonic()
+        now = time.time()
+        self.flush()
+        hot = self.store.hot_keys(self.top_n, now, self.half_life, self.min_demand)
+
+        by_timeframe = {}
+        for symbol, timeframe in hot:
+            by_timeframe.setdefault(timeframe, []).append(symbol)
+        batches = [
+            (timeframe, symbols[i:i + self.batch_size])
+            for timeframe, symbols in by_timeframe.items()
+            for i in range(0, len(symbols), self.batch_size)
+        ]
+
+        def run_batch(batch):
+            timeframe, symbols = batch
+            results = self.compute(symbols, timeframe)
+            return [
+                (symbol, timeframe, prediction, explanation)
+                for symbol, (prediction, explanation) in zip(symbols, results)
+            ]
+
+        computed = 0
+        wasted = 0
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='precompute') as pool:
+            for rows in pool.map(run_batch, batches):
+                wasted += self.store.put_many(rows, time.time())
+                computed += len(rows)
+        wasted += self.store.evict(set(hot), now - self.max_age)
+
+        self._counters["cycles"] += 1
+        self._counters["computed"] += computed
+        self._counters["wasted"] += wasted
+        self._counters["cycleSeconds"] = round(time.monotonic() - started, 3)
+        self._last_cycle = time.time()
+        return computed
+
+    def stats(self):
+        stats = dict(self._counters)
+        ages = np.array(self._ages) if self._ages else None
+        lookups = stats["served"] + stats["missed"] + stats["expired"]
+        stats.update({
+            "leader": self._leader,
+            "entries": self.store.size(),
+            "hitRate": round(stats["served"] / lookups, 4) if lookups else 0.0,
+            "wastedRatio": round(stats["wasted"] / stats["computed"], 4) if stats["computed"] else 0.0,
+            "stalenessSeconds": {
+                "p50": round(float(np.percentile(ages, 50)), 3),
+                "p99": round(float(np.percentile(ages, 99)), 3),
+                "max": round(float(ages.max()), 3)
+            } if ages is not None else None,
+            "lastCycleAgeSeconds": round(time.time() - self._last_cycle, 3) if self._last_cycle else None,
+            "topN": self.top_n,
+            "interval": self.interval
+        })
+        return stats
+
+    def stop(self):
+        self._stopped.set()
+
+    def _ensure_running(self):
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name='precompute', daemon=True)
+                    self._thread.start()
+
+    def _run(self):
+        next_cycle = time.monotonic()
+        while not self._stopped.is_set():
+            try:
+                self._leader = self.store.try_lead()
+                if self._leader and time.monotonic() >= next_cycle:
+                    next_cycle = time.monotonic() + self.interval
+                    self.run_cycle()
+                else:
+                    self.flush()
+            except Exception:
+                # A failed cycle is retried on the next one; requests fall back to computing
+                self._counters["errors"] += 1
+            self._stopped.wait(self.flush_interval)
+
+
+def default_scheduler(compute, accepts=None):
+    """Scheduler configured from PRECOMPUTE_* environment variables, or None unless PRECOMPUTE_ENABLED=1"""
+    if os.environ.get('PRECOMPUTE_ENABLED', '0') != '1':
+        return None
+    path = os.environ.get('PRECOMPUTE_STORE_PATH')
+    interval = float(os.environ.get('PRECOMPUTE_INTERVAL', 60))
+    return PrecomputeScheduler(
+        compute,
+        store=SqlitePrecomputeStore(path) if path else None,
+        top_n=int(os.environ.get('PRECOMPUTE_TOP_N', 200)),
+        interval=interval,
+        workers=int(os.environ.get('PRECOMPUTE_WORKERS', 2)),
+        max_age=float(os.environ.get('PRECOMPUTE_MAX_AGE', 2 * interval)),
+        half_life=float(os.environ.get('PRECOMPUTE_HALF_LIFE', 600)),
+        min_demand=float(os.environ.get('PRECOMPUTE_MIN_DEMAND', 0.01)),
+        accepts=accepts
+    )
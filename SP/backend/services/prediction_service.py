@@ -1,20 +1,138 @@
+import dataclasses
+import os
+import threading
+import time
+import uuid
 import numpy as np
+from collections import OrderedDict
 from datetime import datetime, timedelta
+from services.cache import cached
+from services.metrics import timed
+
+# How long and how many served predictions are kept for later explanation requests
+PREDICTION_RETENTION_SECONDS = int(os.environ.get('PREDICTION_RETENTION_SECONDS', 3600))
+PREDICTION_RETENTION_MAX = int(os.environ.get('PREDICTION_RETENTION_MAX', 20000))
 
 class PredictionService:
-    """Service for generating stock price predictions using models"""
+    """Service for generating stock price predictions using models
+    
+    Every prediction served gets an id and is retained for a while, so
+    its explanation can be computed later - and only if someone asks.
+    With a precompute scheduler attached, predictions for hot keys are
+    served from its store while fresh. With an offload pool, the model
+    runs in its worker processes instead of on the request thread.
+    """
     
-    def __init__(self, model):
+    def __init__(self, model, explainer=None, precompute=None, offload=None):
         self.model = model
+        self.explainer = explainer
+        self.precompute = precompute
+        self.offload = offload
+        self._retained = OrderedDict()  # id -> (expires_at, prediction, full explanation or None), oldest first
+        self._lock = threading.Lock()
+    
+    @timed
+    def predict(self, symbol, timeframe='3m', paths=None, method='gbm'):
+        """Generate prediction for a stock over the specified timeframe
+        
+        With paths, the prediction carries an interval from that many
+        simulated price paths; those are never precomputed.
+        """
+        if self.precompute is not None and not paths:
+            precomputed = self.precompute.lookup(symbol, timeframe)
+            if precomputed is not None:
+                prediction, explanation = precomputed
+                self._retain([prediction], [explanation])
+                return prediction
+        
+        # The cached record is shared, so every caller gets a copy with its own metadata,
+        # and serving it again keeps its id retained as long as the first time
+        prediction = dataclasses.replace(self._predict(symbol, timeframe, paths, method),
+                                         timestamp=datetime.now().isoformat(), updatedBy="lucifer0177continue")
+        self._retain([prediction])
+        return prediction
     
-    def predict(self, symbol, timeframe='3m'):
-        """Generate prediction for a stock over the specified timeframe"""
+    @cached(ttl=300)
+    def _predict(self, symbol, timeframe, paths=None, method='gbm'):
         # Get prediction from model
-        # In a real app, this would use the actual ML model
-        prediction_result = self.model.predict(symbol, timeframe)
+        prediction_result = self._run_model('predict', symbol, timeframe, paths, method)
+        
+        # Copies served from the cache share one id, and so one explanation
+        prediction_result.id = uuid.uuid4().hex
+        
+        return prediction_result
+    
+    @timed
+    def predict_many(self, symbols, timeframe='3m', paths=None, method='gbm'):
+        """Generate predictions for many stocks in one batched model call"""
+        prediction_results = self._run_model('predict_many', symbols, timeframe, paths, method)
         
         # Add metadata
-        prediction_result["timestamp"] = datetime.now().isoformat()
-        prediction_result["updatedBy"] = "lucifer0177continue"
+        timestamp = datetime.now().isoformat()
+        for prediction_result in prediction_results:
+            prediction_result.timestamp = timestamp
+            prediction_result.updatedBy = "lucifer0177continue"
+        self._retain(prediction_results)
         
-        return prediction_result
\ No newline at end of file
+        return prediction_results
+    
+    def _run_model(self, method, *args):
+        if self.offload is not None:
+            return self.offload.call(method, *args)
+        return getattr(self.model, method)(*args)
+    
+    def precompute_many(self, symbols, timeframe):
+        """(prediction, full explanation) pairs for the precompute scheduler to store"""
+        predictions = self.predict_many(symbols, timeframe)
+        return list(zip(predictions, self.explain_many(predictions, 'full')))
+    
+    def get_prediction(self, prediction_id):
+        """A retained prediction by id, or None if unknown or expired"""
+        entry = self._retained_entry(prediction_id)
+        return entry[1] if entry is not None else None
+    
+    @timed
+    @cached(ttl=300)
+    def explain(self, prediction_id, detail='full'):
+        """Explanation of a retained prediction, computed on first request; KeyError if the id is unknown"""
+        entry = self._retained_entry(prediction_id)
+        if entry is None:
+            raise KeyError(prediction_id)
+        _, prediction, explanation = entry
+        if detail == 'full' and explanation is not None:
+            # Precomputed along with the prediction
+            return explanation
+        return self.explainer.explain_prediction(prediction.symbol, prediction, detail)
+    
+    def explain_many(self, predictions, detail='full'):
+        """Explanations for many predictions, batched through the explainer"""
+        return self.explainer.explain_many(predictions, detail)
+    
+    def _retained_entry(self, prediction_id):
+        with self._lock:
+            entry = self._retained.get(prediction_id)
+        if entry is None or entry[0] <= time.monotonic():
+            return None
+        return entry
+    
+    def _retain(self, predictions, explanations=None):
+        now = time.monotonic()
+        expires_at = now + PREDICTION_RETENTION_SECONDS
+        explanations = explanations or [None] * len(predictions)
+        with self._lock:
+            for prediction, explanation in zip(predictions, explanations):
+                # Precomputed predictions keep the id they were stored with
+                if prediction.id is None:
+                    prediction.id = uuid.uuid4().hex
+                prediction_id = prediction.id
+                self._retained[prediction_id] = (expires_at, prediction, explanation)
+                self._retained.move_to_end(prediction_id)
+            
+            # Entries are in insertion order, so expired ones are at the front
+            while self._retained and (
+                    len(self._retained) > PREDICTION_RETENTION_MAX or next(iter(self._retained.values()))[0] <= now):
+                self._retained.popitem(last=False)
+    
+    def score_many(self, symbols, timeframe=None):
+        """Raw prediction score columns for many stocks, as NumPy arrays"""
+        return self._run_model('score_many', symbols, timeframe)
\ No newline at end of file
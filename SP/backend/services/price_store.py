@@ -0,0 +1,199 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+from services import reference_data
+from services.random_provider import random_provider
+
+# Resolutions the store keeps series at, in seconds per bar
+INTRADAY = 300       # 5-minute bars
+DAILY = 86400        # Daily bars
+
+# Column names of a bar series, all 8 bytes wide
+BAR_FIELDS = ('timestamps', 'open', 'high', 'low', 'close', 'volume')
+
+
+class PriceSeries:
+    """OHLCV bars for one symbol at one resolution, stored column-wise
+
+    Each column is a contiguous NumPy array; timestamps are int64 epoch
+    seconds sorted ascending so ranges can be found by binary search.
+    Mapped series are views of a shared on-disk archive rather than
+    private memory.
+    """
+
+    __slots__ = BAR_FIELDS + ('bar_seconds', 'mapped')
+
+    def __init__(self, timestamps, open, high, low, close, volume, bar_seconds, mapped=False):
+        self.timestamps = timestamps
+        self.open = open
+        self.high = high
+        self.low = low
+        self.close = close
+        self.volume = volume
+        self.bar_seconds = bar_seconds
+        self.mapped = mapped
+
+    def __len__(self):
+        return len(self.timestamps)
+
+    @property
+    def nbytes(self):
+        return sum(getattr(self, field).nbytes for field in BAR_FIELDS)
+
+    def columns(self):
+        return [getattr(self, field) for field in BAR_FIELDS]
+
+    def slice(self, start=None, end=None):
+        """Bars with start <= timestamp < end, as views on the stored arrays"""
+        lo = 0 if start is None else np.searchsorted(self.timestamps, start, side='left')
+        hi = len(self) if end is None else np.searchsorted(self.timestamps, end, side='left')
+        return PriceSeries(*(column[lo:hi] for column in self.columns()), self.bar_seconds)
+
+    def tail(self, count):
+        """The last `count` bars, as views on the stored arrays"""
+        start = max(len(self) - count, 0)
+        return PriceSeries(*(column[start:] for column in self.columns()), self.bar_seconds)
+
+    def chunks(self, size):
+        """Yield consecutive views of at most `size` bars"""
+        for start in range(0, len(self), size):
+            yield PriceSeries(*(column[start:start + size] for column in self.columns()), self.bar_seconds)
+
+    def resample(self, unit, multiple=1):
+        """Aggregate bars into calendar buckets of `multiple` numpy datetime `unit`s ('m', 'h', 'D', 'W', 'M')"""
+        if len(self) == 0:
+            return self
+
+        # Bucket id of every bar, computed with numpy datetime arithmetic
+        buckets = self.timestamps.astype('datetime64[s]').astype(f'datetime64[{unit}]').astype(np.int64)
+        if multiple > 1:
+            buckets = buckets // multiple
+        starts = np.concatenate(([0], np.flatnonzero(np.diff(buckets)) + 1))
+        ends = np.append(starts[1:], len(self)) - 1
+
+        bucket_starts = (buckets[starts] * multiple).astype(f'datetime64[{unit}]').astype('datetime64[s]').astype(np.int64)
+        return PriceSeries(
+            bucket_starts,
+            self.open[starts],
+            np.maximum.reduceat(self.high, starts),
+            np.minimum.reduceat(self.low, starts),
+            self.close[ends],
+            np.add.reduceat(self.volume, starts),
+            None
+        )
+
+
+def synthetic_series(symbol, bar_seconds, bars, end=None):
+    """Generate a deterministic random-walk bar series ending at the symbol's reference price"""
+    # In a real app, bars would be loaded from a market data vendor
+    rng = random_provider.generator(symbol, 'bars', bar_seconds)
+    end = int(time.time()) if end is None else end
+    last = end - end % bar_seconds
+    timestamps = np.arange(last - (bars - 1) * bar_seconds, last + 1, bar_seconds, dtype=np.int64)
+
+    # Volatility scales with the square root of the bar length
+    sigma = 0.02 * np.sqrt(bar_seconds / DAILY)
+    trend = rng.choice([-1, 1]) * sigma / 4
+    log_returns = rng.normal(trend, sigma, bars)
+    log_prices = np.cumsum(log_returns)
+    close = reference_data.base_price(symbol) * np.exp(log_prices - log_prices[-1])
+
+    open = np.empty_like(close)
+    open[0] = close[0] / np.exp(log_returns[0])
+    open[1:] = close[:-1]
+    wick = np.abs(rng.normal(0, sigma / 2, (2, bars)))
+    high = np.maximum(open, close) * (1 + wick[0])
+    low = np.minimum(open, close) * (1 - wick[1])
+    volume = np.round(rng.lognormal(13, 0.5, bars) * np.sqrt(bar_seconds / DAILY))
+
+    return PriceSeries(timestamps, open, high, low, close, volume, bar_seconds)
+
+
+class SyntheticBarLoader:
+    """Loads deterministic synthetic history for the store's resolutions"""
+
+    def __init__(self, intraday_days=7, history_days=365 * 5 + 31):
+        self.bars = {
+            INTRADAY: intraday_days * DAILY // INTRADAY,
+            DAILY: history_days
+        }
+
+    def __call__(self, symbol, bar_seconds):
+        if bar_seconds not in self.bars:
+            raise ValueError(f"No history at {bar_seconds}s resolution")
+        return synthetic_series(symbol, bar_seconds, self.bars[bar_seconds])
+
+
+def default_loader():
+    """Archive-backed loader when BAR_ARCHIVE_PATH is set, synthetic history otherwise"""
+    path = os.environ.get('BAR_ARCHIVE_PATH')
+    if not path:
+        return SyntheticBarLoader()
+
+    from services.bar_archive import BarArchive, ArchiveBarLoader
+    return ArchiveBarLoader(BarArchive(path), fallback=SyntheticBarLoader())
+
+
+class PriceStore:
+    """In-memory columnar store of OHLCV bar series keyed by symbol and resolution
+
+    Series are loaded on first use and kept in an LRU bounded by the total
+    bytes of their arrays, so the store can front a universe far larger
+    than memory.
+    """
+
+    def __init__(self, loader=None, memory_budget=256 * 1024 * 1024):
+        self.loader = loader or default_loader()
+        self.memory_budget = memory_budget
+        self.resident_bytes = 0
+        self._series = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, symbol, bar_seconds):
+        """Series for a symbol at a resolution, loading it on first use"""
+        key = (symbol, bar_seconds)
+        with self._lock:
+            series = self._series.get(key)
+            if series is not None:
+                self._series.move_to_end(key)
+                return series
+
+        # Load outside the lock so misses for different symbols don't serialize
+        series = self.loader(symbol, bar_seconds)
+        self.put(symbol, series)
+        return series
+
+    def put(self, symbol, series):
+        """Add or replace a series, evicting least recently used series over budget"""
+        key = (symbol, series.bar_seconds)
+        with self._lock:
+            previous = self._series.pop(key, None)
+            if previous is not None:
+                self.resident_bytes -= self._private_bytes(previous)
+            self._series[key] = series
+            self.resident_bytes += self._private_bytes(series)
+
+            while self.resident_bytes > self.memory_budget and len(self._series) > 1:
+                _, evicted = self._series.popitem(last=False)
+                self.resident_bytes -= self._private_bytes(evicted)
+
+    @staticmethod
+    def _private_bytes(series):
+        # Mapped series live in the shared page cache, not in this process
+        return 0 if series.mapped else series.nbytes
+
+    def latest_close(self, symbol):
+        """Most recent close price for a symbol"""
+        return float(self.get(symbol, INTRADAY).close[-1])
+
+    def stats(self):
+        with self._lock:
+            return {
+                "series": len(self._series),
+                "residentBytes": self.resident_bytes,
+                "memoryBudget": self.memory_budget
+            }
@@ -0,0 +1,70 @@
+import itertools
+import os
+import sys
+import threading
+import time
+from collections import Counter
+
+# Seconds between stack samples
+SAMPLE_INTERVAL = 0.001
+
+# Numbers profile files written by this process
+_sequence = itertools.count()
+
+
+def _frame_name(frame):
+    code = frame.f_code
+    return f"{os.path.basename(code.co_filename)}:{code.co_name}"
+
+
+class StackSampler:
+    """Samples one thread's Python stack on a background thread, for flame graphs
+
+    Every interval seconds the sampler reads the target thread's current
+    frame and counts its stack, root first. Results are written in the
+    collapsed format ("frame;frame;frame count" per line) that
+    flamegraph.pl and speedscope read. Nothing runs unless a sampler is
+    started, so unprofiled requests pay nothing.
+    """
+
+    def __init__(self, thread_id=None, interval=SAMPLE_INTERVAL):
+        self.thread_id = thread_id if thread_id is not None else threading.get_ident()
+        self.interval = interval
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name='stack-sampler', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        return self
+
+    def collapsed(self):
+        return ''.join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+    def write(self, directory, label):
+        """Write the collapsed stacks to a new file in directory and return its path"""
+        os.makedirs(directory, exist_ok=True)
+        safe_label = ''.join(c if c.isalnum() else '_' for c in label).strip('_') or 'request'
+        name = f"{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}-{next(_sequence)}-{safe_label}.folded"
+        path = os.path.join(directory, name)
+        with open(path, 'w') as profile:
+            profile.write(self.collapsed())
+        return path
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            names = []
+            while frame is not None:
+                names.append(_frame_name(frame))
+                frame = frame.f_back
+            self.stacks[';'.join(reversed(names))] += 1
@@ -0,0 +1,190 @@
+import threading
+import time
+from collections import deque
+
+from services.records import dumps
+
+
+class QuoteEvent:
+    """One tick of one symbol, encoded once as a Server-Sent Event for every subscriber"""
+
+    __slots__ = ('symbol', 'seq', 'quote', 'published', 'payload')
+
+    def __init__(self, symbol, seq, quote):
+        self.symbol = symbol
+        self.seq = seq
+        self.quote = quote
+        self.published = time.time()
+        self.payload = f"id: {seq}\nevent: quote\ndata: {dumps(quote).decode('utf-8')}\n\n"
+
+
+class Subscription:
+    """A subscriber's bounded queue of quote events
+
+    The hub never blocks on a subscriber: if the queue is full when a tick
+    is published, the subscriber is too slow to keep up and is dropped.
+    """
+
+    def __init__(self, hub, symbols, maxsize, wakeup=None):
+        self.hub = hub
+        self.symbols = symbols
+        self.maxsize = maxsize
+        self.closed_reason = None
+        self._queue = deque()
+        self._condition = threading.Condition()
+        self._wakeup = wakeup
+
+    @property
+    def closed(self):
+        return self.closed_reason is not None
+
+    def offer(self, event):
+        """Queue an event, returning False if the subscription is closed or full"""
+        with self._condition:
+            if self.closed_reason is not None or len(self._queue) >= self.maxsize:
+                return False
+            self._queue.append(event)
+            self._condition.notify()
+        if self._wakeup is not None:
+            self._wakeup.set()
+        return True
+
+    def get(self, timeout=None):
+        """Next event, or None on timeout or once the subscription is closed and drained"""
+        with self._condition:
+            if not self._queue and self.closed_reason is None:
+                self._condition.wait(timeout)
+            return self._queue.popleft() if self._queue else None
+
+    def drain(self):
+        """All queued events, without waiting"""
+        with self._condition:
+            events = list(self._queue)
+            self._queue.clear()
+        return events
+
+    def close(self, reason='unsubscribed'):
+        with self._condition:
+            if self.closed_reason is None:
+                self.closed_reason = reason
+            self._condition.notify_all()
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+
+class _Producer:
+    """Per-symbol subscriber set and the latest event, which new subscribers receive first"""
+
+    __slots__ = ('symbol', 'subscribers', 'seq', 'last')
+
+    def __init__(self, symbol):
+        self.symbol = symbol
+        self.subscribers = set()
+        self.seq = 0
+        self.last = None
+
+
+class QuoteHub:
+    """Fan-out of live quotes to streaming subscribers
+
+    Each subscribed symbol has one producer, however many clients follow
+    it. Every interval seconds a background thread fetches quotes for all
+    subscribed symbols in one batch call to source (a callable taking a
+    list of symbols and returning quotes keyed by symbol), encodes each
+    tick once and offers it to that symbol's subscribers. Subscribers
+    whose queues are full are dropped rather than slowing the hub down.
+    Producers disappear with their last subscriber.
+    """
+
+    def __init__(self, source, interval=1.0, queue_size=64):
+        self.source = source
+        self.interval = interval
+        self.queue_size = queue_size
+        self._producers = {}
+        self._lock = threading.Lock()
+        self._thread = None
+        self._stopped = threading.Event()
+        self._counters = {"ticks": 0, "events": 0, "delivered": 0, "dropped": 0, "errors": 0}
+
+    def subscribe(self, symbols, queue_size=None, wakeup=None):
+        """Subscribe to quotes for symbols, returning a Subscription to read events from"""
+        subscription = Subscription(self, list(dict.fromkeys(symbols)), queue_size or self.queue_size, wakeup)
+        with self._lock:
+            for symbol in subscription.symbols:
+                producer = self._producers.get(symbol)
+                if producer is None:
+                    producer = self._producers[symbol] = _Producer(symbol)
+                producer.subscribers.add(subscription)
+                if producer.last is not None:
+                    subscription.offer(producer.last)
+        self._ensure_running()
+        return subscription
+
+    def unsubscribe(self, subscription, reason='unsubscribed'):
+        subscription.close(reason)
+        with self._lock:
+            for symbol in subscription.symbols:
+                producer = self._producers.get(symbol)
+                if producer is None:
+                    continue
+                producer.subscribers.discard(subscription)
+                if not producer.subscribers:
+                    del self._producers[symbol]
+
+    def publish(self, quotes):
+        """Broadcast one tick per symbol to its subscribers, dropping any that can't keep up"""
+        slow = []
+        for symbol, quote in quotes.items():
+            with self._lock:
+                producer = self._producers.get(symbol)
+                if producer is None:
+                    continue
+                producer.seq += 1
+                event = producer.last = QuoteEvent(symbol, producer.seq, quote)
+                subscribers = list(producer.subscribers)
+
+            self._counters["events"] += 1
+            for subscription in subscribers:
+                if subscription.offer(event):
+                    self._counters["delivered"] += 1
+                elif not subscription.closed:
+                    slow.append(subscription)
+
+        for subscription in set(slow):
+            self._counters["dropped"] += 1
+            self.unsubscribe(subscription, 'slow consumer')
+
+    def tick(self):
+        """Fetch and publish one round of quotes for every subscribed symbol"""
+        with self._lock:
+            symbols = list(self._producers)
+        if symbols:
+            self.publish(self.source(symbols))
+        self._counters["ticks"] += 1
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._counters)
+            stats["symbols"] = len(self._producers)
+            stats["subscriptions"] = len({s for p in self._producers.values() for s in p.subscribers})
+        return stats
+
+    def stop(self):
+        self._stopped.set()
+
+    def _ensure_running(self):
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name='quote-hub', daemon=True)
+                    self._thread.start()
+
+    def _run(self):
+        while not self._stopped.is_set():
+            started = time.monotonic()
+            try:
+                self.tick()
+            except Exception:
+                # A failed fetch skips this tick; subscribers keep their last quote
+                self._counters["errors"] += 1
+            self._stopped.wait(max(0.0, self.interval - (time.monotonic() - started)))
@@ -0,0 +1,57 @@
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class Readiness:
+    """Warm-up steps a worker runs before it takes traffic, and whether they are done
+
+    Steps run once, in order; one that fails is logged and recorded but
+    doesn't keep the worker out of service, as requests will load what
+    it didn't. Until warm_up() finishes, ready is False.
+    """
+
+    def __init__(self, tasks=()):
+        self.tasks = list(tasks)
+        self.ready = False
+        self._steps = {}
+        self._started = False
+        self._done = threading.Event()
+        self._lock = threading.Lock()
+
+    def warm_up(self):
+        """Run the steps on this thread, or wait for the call already running them"""
+        with self._lock:
+            running = self._started
+            self._started = True
+        if running:
+            self._done.wait()
+            return
+        for name, step in self.tasks:
+            start = time.perf_counter()
+            try:
+                step()
+                error = None
+            except Exception as e:
+                logger.exception("Warm-up step %s failed", name)
+                error = str(e)
+            self._steps[name] = {"seconds": round(time.perf_counter() - start, 3), "error": error}
+        self.ready = True
+        self._done.set()
+
+    def start(self):
+        """Run the steps on a daemon thread, unless they have been started already"""
+        if self._started:
+            return None
+        thread = threading.Thread(target=self.warm_up, name='warm-up', daemon=True)
+        thread.start()
+        return thread
+
+    def wait(self, timeout=None):
+        """Whether the steps have finished, waiting up to timeout seconds for them"""
+        return self._done.wait(timeout)
+
+    def stats(self):
+        return {"ready": self.ready, "steps": dict(self._steps)}
@@ -0,0 +1,119 @@
+"""Typed records for the values the API serves in bulk, and their JSON encoding
+
+Quotes, predictions and prediction factors are dataclasses with
+__slots__ rather than dicts: an instance holds its fields in a fixed
+array instead of a hash table of its own, and is built without hashing
+a key per field. Field names are the API's JSON keys, so the records
+encode as the dicts they replace. Bars need no record of their own: a
+PriceSeries already keeps them as NumPy columns, which dumps encodes
+without converting them to lists first.
+
+dumps is the single encoder for API payloads. It uses orjson when it is
+installed, which encodes dataclasses, NumPy arrays and NumPy scalars
+natively, and falls back to the standard library otherwise.
+
+Records are shared between requests through caches and must not be
+mutated once served.
+"""
+import json
+from dataclasses import dataclass
+
+import numpy as np
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+@dataclass
+class Quote:
+    """Latest trade of one symbol"""
+
+    __slots__ = ('symbol', 'price', 'change', 'percentChange', 'volume', 'timestamp')
+
+    symbol: str
+    price: float
+    change: float
+    percentChange: float
+    volume: float
+    timestamp: str
+
+    @classmethod
+    def from_dict(cls, quote):
+        """Quote from a feed's quote object; volume and timestamp are optional, other fields are dropped"""
+        return cls(quote['symbol'], quote['price'], quote['change'], quote['percentChange'],
+                   quote.get('volume'), quote.get('timestamp'))
+
+
+@dataclass
+class Factor:
+    """One factor behind a prediction, with its share of the prediction's weight in percent"""
+
+    __slots__ = ('name', 'impact', 'weight', 'description')
+
+    name: str
+    impact: str
+    weight: int
+    description: str
+
+
+@dataclass
+class Prediction:
+    """Predicted price of one symbol over a timeframe
+
+    interval holds percentile bands of simulated prices when they were
+    asked for, and None otherwise. timestamp, updatedBy and id are None
+    until PredictionService serves the prediction.
+    """
+
+    __slots__ = ('symbol', 'currentPrice', 'predictedPrice', 'percentChange', 'confidence', 'timeframe',
+                 'recommendation', 'factors', 'generatedAt', 'generatedBy', 'interval', 'timestamp', 'updatedBy',
+                 'id')
+
+    symbol: str
+    currentPrice: float
+    predictedPrice: float
+    percentChange: float
+    confidence: int
+    timeframe: str
+    recommendation: str
+    factors: list
+    generatedAt: str
+    generatedBy: str
+    interval: dict
+    timestamp: str
+    updatedBy: str
+    id: str
+
+    @classmethod
+    def from_dict(cls, prediction):
+        """Prediction from its decoded JSON"""
+        return cls(**dict(prediction, factors=[Factor(**factor) for factor in prediction['factors']]))
+
+
+def _default(value):
+    """JSON form of the values neither encoder handles natively"""
+    if hasattr(value, '__dataclass_fields__'):
+        return {name: getattr(value, name) for name in value.__dataclass_fields__}
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, np.generic):
+        return value.item()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+if orjson is not None:
+    _OPTIONS = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+
+    def dumps(value):
+        """UTF-8 JSON of a payload of dicts, lists, records and NumPy values"""
+        return orjson.dumps(value, default=_default, option=_OPTIONS)
+
+    loads = orjson.loads
+else:
+    def dumps(value):
+        """UTF-8 JSON of a payload of dicts, lists, records and NumPy values"""
+        return json.dumps(value, default=_default, separators=(',', ':')).encode('utf-8')
+
+    loads = json.loads
@@ -0,0 +1,125 @@
+import csv
+import os
+from functools import lru_cache
+from services.random_provider import random_provider
+
+# Market sectors
+SECTORS = [
+    "Technology",
+    "Healthcare",
+    "Financials",
+    "Consumer Discretionary",
+    "Consumer Staples",
+    "Communication Services",
+    "Industrials",
+    "Energy",
+    "Utilities",
+    "Materials",
+    "Real Estate"
+]
+
+# Listings known to the app - in a real app this would come from a data provider
+STOCK_UNIVERSE = [
+    {"symbol": "AAPL", "name": "Apple Inc.", "sector": "Technology"},
+    {"symbol": "MSFT", "name": "Microsoft Corporation", "sector": "Technology"},
+    {"symbol": "GOOGL", "name": "Alphabet Inc.", "sector": "Communication Services"},
+    {"symbol": "AMZN", "name": "Amazon.com Inc.", "sector": "Consumer Discretionary"},
+    {"symbol": "META", "name": "Meta Platforms Inc.", "sector": "Communication Services"},
+    {"symbol": "TSLA", "name": "Tesla Inc.", "sector": "Consumer Discretionary"},
+    {"symbol": "NVDA", "name": "NVIDIA Corporation", "sector": "Technology"},
+    {"symbol": "JPM", "name": "JPMorgan Chase & Co.", "sector": "Financials"},
+    {"symbol": "V", "name": "Visa Inc.", "sector": "Financials"},
+    {"symbol": "JNJ", "name": "Johnson & Johnson", "sector": "Healthcare"}
+]
+_KNOWN_SECTORS = {listing["symbol"]: listing["sector"] for listing in STOCK_UNIVERSE}
+
+# Reference prices for well-known symbols
+BASE_PRICES = {
+    "AAPL": 243.56,
+    "MSFT": 415.67,
+    "GOOGL": 187.32,
+    "AMZN": 192.45,
+    "META": 532.78,
+    "TSLA": 267.89,
+    "NVDA": 1245.67
+}
+
+# Market index levels at the previous close
+INDEX_LEVELS = {
+    "S&P 500": 5923.47,
+    "Dow Jones": 40654.32,
+    "Nasdaq": 18732.91,
+    "Russell 2000": 2354.76
+}
+
+# Symbols whose bars track the market indices, by index name
+INDEX_SYMBOLS = {
+    "S&P 500": "^GSPC",
+    "Dow Jones": "^DJI",
+    "Nasdaq": "^IXIC",
+    "Russell 2000": "^RUT"
+}
+BASE_PRICES.update({INDEX_SYMBOLS[name]: level for name, level in INDEX_LEVELS.items()})
+
+
+@lru_cache(maxsize=65536)
+def base_price(symbol):
+    """Current reference price for a symbol"""
+    if symbol in BASE_PRICES:
+        return BASE_PRICES[symbol]
+    
+    # Generate a semi-random but stable price for other symbols
+    rng = random_provider.generator(symbol, 'price')
+    return float(rng.integers(50, 500) + rng.random())
+
+
+@lru_cache(maxsize=65536)
+def shares_outstanding(symbol):
+    """Shares outstanding of a symbol, which weight it in cap-weighted indices"""
+    # Log-normal, so a few large caps dominate the way they do in real indices
+    rng = random_provider.generator(symbol, 'shares')
+    return int(rng.lognormal(19.5, 1.2))
+
+
+def sector(symbol):
+    """Sector of a symbol, as its listing gives it
+    
+    The market summary, the movers rankings, model training groups and
+    model lookups all take sectors from here or from the listings, so
+    they agree under a LISTINGS_PATH file.
+    """
+    listed = _listed_sectors().get(symbol)
+    return listed if listed is not None else _default_sector(symbol)
+
+
+@lru_cache(maxsize=1)
+def _listed_sectors():
+    return {listing["symbol"]: listing["sector"] for listing in load_listings()}
+
+
+@lru_cache(maxsize=65536)
+def _default_sector(symbol):
+    if symbol in _KNOWN_SECTORS:
+        return _KNOWN_SECTORS[symbol]
+    
+    # Assign other symbols a stable pseudo-random sector
+    rng = random_provider.generator(symbol, 'sector')
+    return SECTORS[int(rng.integers(len(SECTORS)))]
+
+
+def load_listings(path=None):
+    """Known listings followed by those in the LISTINGS_PATH csv file (symbol,name[,sector] columns)"""
+    listings = list(STOCK_UNIVERSE)
+    path = path or os.environ.get('LISTINGS_PATH')
+    if path:
+        known = {listing["symbol"] for listing in listings}
+        with open(path, newline='') as listings_file:
+            for row in csv.DictReader(listings_file):
+                if row["symbol"] not in known:
+                    known.add(row["symbol"])
+                    listings.append({
+                        "symbol": row["symbol"],
+                        "name": row["name"],
+                        "sector": row.get("sector") or _default_sector(row["symbol"])
+                    })
+    return listings
@@ -1,167 +1,166 @@
-import requests
-import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
+from statistics import NormalDist
+from services import reference_data
+from services.cache import cached
+from services.covariance import CovarianceTracker
+from services.indices import IndexAggregator
+from services.market_data import MarketDataClient
+from models.features import stack_tails
+from services.metrics import timed
+from services.movers import MoversEngine
+from services.price_store import PriceStore, INTRADAY, DAILY
+from services.random_provider import random_provider
+from services.symbol_index import SymbolIndex
+
+# Stored resolution, resample bucket (numpy datetime unit, multiple), number of
+# points and label format for each historical timeframe
+HISTORICAL_TIMEFRAMES = {
+    '1d': (INTRADAY, None, 78, '%H:%M'),        # 5-minute intervals for a 6.5 hour trading day
+    '1w': (INTRADAY, ('h', 1), 7 * 6, '%a'),    # Hourly for a week
+    '1m': (DAILY, None, 30, 'Week %U'),         # Daily for a month
+    '3m': (DAILY, None, 90, '%b'),              # Daily for 3 months
+    '1y': (DAILY, ('W', 1), 52, '%b'),          # Weekly for a year
+    'all': (DAILY, ('M', 1), 60, '%Y')          # Monthly for 5 years
+}
+DEFAULT_TIMEFRAME = (DAILY, None, 30, '%b %d')
+
+# Lookback of each timeframe in seconds, for raw bar queries
+TIMEFRAME_SECONDS = {
+    '1d': 86400,
+    '1w': 7 * 86400,
+    '1m': 30 * 86400,
+    '3m': 90 * 86400,
+    '1y': 365 * 86400,
+    'all': None
+}
+
+# Upper bound on the length of one bucket of each unit, used to size slices
+BUCKET_SECONDS = {'m': 60, 'h': 3600, 'D': 86400, 'W': 7 * 86400, 'M': 31 * 86400}
+
+# Largest number of gainers or losers one movers request can ask for
+MOVERS_MAX_LIMIT = 100
+
+# Largest number of holdings one portfolio risk request can value
+PORTFOLIO_MAX_HOLDINGS = 500
+
+# Trading days per year, to annualize daily volatility
+TRADING_DAYS = 252
 
 class StockService:
     """Service for interacting with stock market data sources"""
     
-    def __init__(self):
-        # In a real app, you would initialize API clients here
-        # and possibly set up credentials for data providers
-        pass
+    def __init__(self, price_store=None, symbol_index=None, market_data=None):
+        # Live quotes come from the provider configured by MARKET_DATA_URL,
+        # or an in-process fake feed when it is unset
+        self.price_store = price_store or PriceStore()
+        self.symbol_index = symbol_index or SymbolIndex(reference_data.load_listings())
+        self.market_data = market_data or MarketDataClient()
+        self.movers = MoversEngine(max_limit=MOVERS_MAX_LIMIT)
+        self.covariance = CovarianceTracker(self.price_store)
+        self.indices = IndexAggregator.from_listings(self.symbol_index.listings)
+        # Whether the movers rankings and index levels have had a snapshot of every listing
+        self._seeded = False
+    
+    @timed
+    def get_quotes(self, symbols):
+        """Get live quotes for several stocks, batched into as few provider calls as possible"""
+        quotes = self.market_data.get_quotes(symbols)
+        # Every quote of a listed symbol that passes through keeps the movers rankings and
+        # index levels current; others would stay in the rankings for good
+        listings = self.symbol_index.by_symbol
+        sectors = {symbol: listings[symbol]["sector"] for symbol in quotes if symbol in listings}
+        self.movers.update_many([quotes[symbol] for symbol in sectors], sectors)
+        self.indices.update_many(quotes.values())
+        return quotes
     
+    def _seed(self):
+        """Quote every listing once, so the movers rankings and index levels start from the whole universe"""
+        if not self._seeded:
+            self.get_quotes([listing["symbol"] for listing in self.symbol_index.listings])
+            self._seeded = True
+    
+    @cached(ttl=300)
     def search_stocks(self, query, limit=10):
         """Search for stocks based on a query string"""
-        # In a real app, this would query a stock API
-        # For now, return mock data
-        all_stocks = [
-            {"symbol": "AAPL", "name": "Apple Inc."},
-            {"symbol": "MSFT", "name": "Microsoft Corporation"},
-            {"symbol": "GOOGL", "name": "Alphabet Inc."},
-            {"symbol": "AMZN", "name": "Amazon.com Inc."},
-            {"symbol": "META", "name": "Meta Platforms Inc."},
-            {"symbol": "TSLA", "name": "Tesla Inc."},
-            {"symbol": "NVDA", "name": "NVIDIA Corporation"},
-            {"symbol": "JPM", "name": "JPMorgan Chase & Co."},
-            {"symbol": "V", "name": "Visa Inc."},
-            {"symbol": "JNJ", "name": "Johnson & Johnson"}
-        ]
-        
-        # Filter by query
-        if query:
-            query = query.lower()
-            filtered_stocks = [
-                stock for stock in all_stocks 
-                if query in stock["symbol"].lower() or query in stock["name"].lower()
-            ]
-            return filtered_stocks[:limit]
-        
-        return all_stocks[:limit]
+        # In a real app, the index would be rebuilt when listings change
+        return self.symbol_index.search(query, limit)
     
+    @timed
     def get_stock_details(self, symbol):
-        """Get detailed information about a specific stock"""
+        """Get detailed information about a specific stock, priced from its live quote"""
+        quote = self.get_quotes([symbol])[symbol]
+        profile = self._stock_profile(symbol)
+        
+        return {
+            "symbol": symbol,
+            "name": profile["name"],
+            "price": quote.price,
+            "change": quote.change,
+            "percentChange": quote.percentChange,
+            "marketCap": profile["marketCap"],
+            "volume": round(quote.volume / 1e6, 1) if quote.volume is not None else None,  # In millions
+            "avgVolume": profile["avgVolume"],
+            "pe": profile["pe"],
+            "eps": profile["eps"],
+            "dividend": profile["dividend"],
+            "high52w": profile["high52w"],
+            "low52w": profile["low52w"],
+            "open": round(quote.price - quote.change * profile["openShare"], 2),
+            "previousClose": round(quote.price - quote.change, 2),
+            "timestamp": quote.timestamp,
+            "analyst": profile["analyst"]
+        }
+    
+    @cached(ttl=300)
+    def _stock_profile(self, symbol):
+        """Fundamentals of a stock that don't move with its quote"""
         # In a real app, this would fetch data from an API
         # Return mock data based on the symbol
-        base_price = 0
-        if symbol == "AAPL":
-            base_price = 243.56
-        elif symbol == "MSFT":
-            base_price = 415.67
-        elif symbol == "GOOGL":
-            base_price = 187.32
-        elif symbol == "AMZN":
-            base_price = 192.45
-        elif symbol == "META":
-            base_price = 532.78
-        elif symbol == "TSLA":
-            base_price = 267.89
-        elif symbol == "NVDA":
-            base_price = 1245.67
-        else:
-            # Generate a semi-random price for other symbols
-            # Use the sum of ASCII values of the symbol as a seed
-            seed = sum(ord(c) for c in symbol)
-            np.random.seed(seed)
-            base_price = np.random.randint(50, 500) + np.random.random()
-        
-        change_percent = np.random.normal(0, 2)  # Random change with normal distribution
-        change = base_price * change_percent / 100
+        rng = random_provider.generator(symbol, 'details')
+        base_price = reference_data.base_price(symbol)
+        listing = self.symbol_index.get(symbol)
         
         return {
-            "symbol": symbol,
-            "name": next((s["name"] for s in self.search_stocks("", 100) if s["symbol"] == symbol), f"{symbol} Corp"),
-            "price": base_price,
-            "change": change,
-            "percentChange": change_percent,
-            "marketCap": round(base_price * np.random.randint(10, 100) * 1e6 / 1e12, 2),  # In trillions
-            "volume": round(np.random.randint(1, 100) * 1e6 / 1e6, 1),  # In millions
-            "avgVolume": round(np.random.randint(1, 100) * 1e6 / 1e6, 1),  # In millions
-            "pe": round(np.random.randint(10, 40) + np.random.random(), 1),
-            "eps": round(base_price / np.random.randint(10, 40), 2),
-            "dividend": round(np.random.random() * 3, 2),  # 0-3% dividend
-            "high52w": round(base_price * (1 + np.random.random() * 0.3), 2),  # Up to 30% higher
-            "low52w": round(base_price * (1 - np.random.random() * 0.3), 2),  # Up to 30% lower
-            "open": round(base_price - change * np.random.random(), 2),
-            "previousClose": round(base_price - change, 2),
-            "timestamp": datetime.now().isoformat(),
+            "name": listing["name"] if listing else f"{symbol} Corp",
+            "marketCap": round(base_price * rng.integers(10, 100) * 1e6 / 1e12, 2),  # In trillions
+            "avgVolume": round(rng.integers(1, 100) * 1e6 / 1e6, 1),  # In millions
+            "pe": round(rng.integers(10, 40) + rng.random(), 1),
+            "eps": round(base_price / rng.integers(10, 40), 2),
+            "dividend": round(rng.random() * 3, 2),  # 0-3% dividend
+            "high52w": round(base_price * (1 + rng.random() * 0.3), 2),  # Up to 30% higher
+            "low52w": round(base_price * (1 - rng.random() * 0.3), 2),  # Up to 30% lower
+            "openShare": rng.random(),  # How much of the day's change came after the open
             "analyst": {
-                "buy": np.random.randint(5, 30),
-                "hold": np.random.randint(1, 15),
-                "sell": np.random.randint(0, 5)
+                "buy": int(rng.integers(5, 30)),
+                "hold": int(rng.integers(1, 15)),
+                "sell": int(rng.integers(0, 5))
             }
         }
     
+    def get_historical_series(self, symbol, timeframe='1m'):
+        """Get the bars behind a historical timeframe as a PriceSeries of NumPy columns"""
+        # Determine resolution, bucket and data points based on timeframe
+        resolution, bucket, periods, _ = HISTORICAL_TIMEFRAMES.get(timeframe, DEFAULT_TIMEFRAME)
+        
+        # Slice just the tail of the stored series that covers the requested buckets
+        series = self.price_store.get(symbol, resolution)
+        if bucket is None:
+            return series.tail(periods)
+        unit, multiple = bucket
+        window_start = series.timestamps[-1] - (periods + 1) * multiple * BUCKET_SECONDS[unit]
+        return series.slice(start=window_start).resample(unit, multiple).tail(periods)
+    
+    @timed
+    @cached(ttl=60)
     def get_historical_data(self, symbol, timeframe='1m'):
         """Get historical price data for a stock over a specified timeframe"""
-        # Determine data points based on timeframe
-        if timeframe == '1d':
-            # 5-minute intervals for a day (78 points for 6.5 hour trading day)
-            periods = 78
-            freq = '5min'
-            start_date = datetime.now() - timedelta(days=1)
-            date_format = '%H:%M'
-        elif timeframe == '1w':
-            # Hourly for a week
-            periods = 7 * 6
-            freq = '1h'
-            start_date = datetime.now() - timedelta(weeks=1)
-            date_format = '%a'
-        elif timeframe == '1m':
-            # Daily for a month
-            periods = 30
-            freq = '1D'
-            start_date = datetime.now() - timedelta(days=30)
-            date_format = 'Week %U'
-        elif timeframe == '3m':
-            # Daily for 3 months
-            periods = 90
-            freq = '1D'
-            start_date = datetime.now() - timedelta(days=90)
-            date_format = '%b'
-        elif timeframe == '1y':
-            # Weekly for a year
-            periods = 52
-            freq = '1W'
-            start_date = datetime.now() - timedelta(days=365)
-            date_format = '%b'
-        elif timeframe == 'all':
-            # Monthly for 5 years
-            periods = 60
-            freq = '1M'
-            start_date = datetime.now() - timedelta(days=365 * 5)
-            date_format = '%Y'
-        else:
-            # Default to monthly data
-            periods = 30
-            freq = '1D'
-            start_date = datetime.now() - timedelta(days=30)
-            date_format = '%b %d'
-            
-        # Get current stock price and info to base historical data on
-        stock_info = self.get_stock_details(symbol)
-        current_price = stock_info['price']
-        
-        # Create a date range
-        date_range = pd.date_range(start=start_date, periods=periods, freq=freq)
-        
-        # Generate synthetic price data with a trend and some randomness
-        # Base the trend direction on the current percent change
-        trend = 0.02 if stock_info['percentChange'] > 0 else -0.02
-        
-        # Generate a semi-random walk with the trend
-        np.random.seed(sum(ord(c) for c in symbol))  # Set seed based on symbol
-        random_walk = np.random.normal(trend, 0.02, periods).cumsum()
-        
-        # Scale to start from a logical past price and end at the current price
-        start_factor = 1 - random_walk[-1]  # Adjust to make the last point end at 0
-        price_factors = 1 + random_walk + start_factor
-        
-        # Calculate prices and ensure the last price matches current price
-        prices = current_price / price_factors[-1] * price_factors
+        date_format = HISTORICAL_TIMEFRAMES.get(timeframe, DEFAULT_TIMEFRAME)[3]
+        bars = self.get_historical_series(symbol, timeframe)
         
         # Format dates according to the timeframe
-        labels = [date.strftime(date_format) for date in date_range]
+        dates = [datetime.fromtimestamp(ts) for ts in bars.timestamps.tolist()]
+        labels = [date.strftime(date_format) for date in dates]
         
         # For timeframes like 1m that use "Week X" formatting, make labels unique
         if timeframe == '1m':
@@ -186,78 +185,154 @@ class StockService:
             "symbol": symbol,
             "timeframe": timeframe,
             "labels": labels,
-            "data": prices.tolist(),
-            "timestamps": [date.isoformat() for date in date_range],
+            "data": bars.close.tolist(),
+            "timestamps": [date.isoformat() for date in dates],
             "updated_at": datetime.now().isoformat(),
             "updated_by": "lucifer0177continue"  # Using the provided username
         }
     
+    def get_historical_bars(self, symbol, timeframe='all', start=None, end=None, bar_seconds=INTRADAY):
+        """Get raw stored bars for a stock between start and end (epoch seconds)
+        
+        Returns a PriceSeries of views on the stored arrays, so long ranges
+        can be streamed out chunk by chunk without being copied.
+        """
+        series = self.price_store.get(symbol, bar_seconds)
+        if start is None and TIMEFRAME_SECONDS.get(timeframe) and len(series):
+            end_ts = series.timestamps[-1] if end is None else end
+            start = end_ts - TIMEFRAME_SECONDS[timeframe]
+        return series.slice(start, end)
+    
+    @timed
     def get_market_summary(self):
-        """Get a summary of the overall market including major indices"""
-        # This would typically fetch real market data
-        # For now, return mock data
-        current_timestamp = datetime.now().isoformat()
+        """Get a summary of the overall market including major indices
+        
+        Index levels and sector performance are aggregated from constituent
+        quotes as they arrive.
+        """
+        # Start from a snapshot of the universe, as for the movers rankings
+        self._seed()
         
         return {
-            "indices": [
-                {"name": "S&P 500", "value": 5923.47, "change": 47.88, "percentChange": 0.81},
-                {"name": "Dow Jones", "value": 40654.32, "change": 315.56, "percentChange": 0.78},
-                {"name": "Nasdaq", "value": 18732.91, "change": -24.53, "percentChange": -0.13},
-                {"name": "Russell 2000", "value": 2354.76, "change": 12.34, "percentChange": 0.53}
-            ],
-            "sectorPerformance": [
-                {"name": "Technology", "percentChange": 1.2},
-                {"name": "Healthcare", "percentChange": 0.8},
-                {"name": "Financials", "percentChange": 0.5},
-                {"name": "Consumer Discretionary", "percentChange": -0.3},
-                {"name": "Communication Services", "percentChange": 0.9},
-                {"name": "Industrials", "percentChange": 0.4},
-                {"name": "Energy", "percentChange": -0.7},
-                {"name": "Utilities", "percentChange": 0.2},
-                {"name": "Materials", "percentChange": -0.1},
-                {"name": "Real Estate", "percentChange": 0.3}
-            ],
+            **self.indices.summary(),
             "marketStatus": "open",
-            "timestamp": "2025-03-12 05:55:29",  # Using the provided timestamp
-            "updatedBy": "lucifer0177continue"   # Using the provided username
+            "timestamp": datetime.now().isoformat(),
+            "updatedBy": "lucifer0177continue"
         }
+    
+    @timed
+    def get_market_movers(self, limit=5, sector=None):
+        """Get top gainers and losers in the market, or in one sector"""
+        if sector is not None and sector not in self.indices.sector_names:
+            raise ValueError(f"Unknown sector: {sector}")
         
-    def get_market_movers(self, limit=5):
-        """Get top gainers and losers in the market"""
-        # This would typically fetch real market data
-        # For now, return mock data
+        # Rankings are kept up to date by incoming quotes; start from a snapshot of the universe
+        self._seed()
         
-        # Top gainers
-        gainers = [
-            {"symbol": "XYZ", "name": "XYZ Corp", "price": 134.21, "change": 12.45, "percentChange": 10.23},
-            {"symbol": "ABC", "name": "ABC Inc", "price": 56.78, "change": 4.32, "percentChange": 8.24},
-            {"symbol": "DEF", "name": "DEF Holdings", "price": 89.45, "change": 5.67, "percentChange": 6.77},
-            {"symbol": "GHI", "name": "GHI Tech", "price": 45.67, "change": 2.78, "percentChange": 6.48},
-            {"symbol": "JKL", "name": "JKL Systems", "price": 112.34, "change": 6.23, "percentChange": 5.87},
-            {"symbol": "MNO", "name": "MNO Pharma", "price": 78.90, "change": 4.12, "percentChange": 5.51},
-            {"symbol": "PQR", "name": "PQR Energy", "price": 34.56, "change": 1.78, "percentChange": 5.43},
-            {"symbol": "STU", "name": "STU Networks", "price": 23.45, "change": 1.12, "percentChange": 5.01}
-        ]
+        return {
+            "gainers": [self._mover(quote) for quote in self.movers.gainers(limit, sector)],
+            "losers": [self._mover(quote) for quote in self.movers.losers(limit, sector)],
+            "sector": sector,
+            "timestamp": datetime.now().isoformat(),
+            "updatedBy": "lucifer0177continue"
+        }
+    
+    @timed
+    def get_portfolio_risk(self, holdings, index="S&P 500", confidence=0.95):
+        """Get volatility, 1-day VaR/CVaR, beta and correlations of a portfolio of {symbol: shares}
         
-        # Top losers
-        losers = [
-            {"symbol": "AAA", "name": "AAA Industries", "price": 42.63, "change": -8.21, "percentChange": -16.15},
-            {"symbol": "BBB", "name": "BBB Tech", "price": 105.32, "change": -12.45, "percentChange": -10.57},
-            {"symbol": "CCC", "name": "CCC Systems", "price": 27.89, "change": -2.34, "percentChange": -7.74},
-            {"symbol": "DDD", "name": "DDD Electronics", "price": 67.54, "change": -4.87, "percentChange": -6.73},
-            {"symbol": "EEE", "name": "EEE Medical", "price": 89.32, "change": -5.43, "percentChange": -5.73},
-            {"symbol": "FFF", "name": "FFF Retail", "price": 45.67, "change": -2.34, "percentChange": -4.87},
-            {"symbol": "GGG", "name": "GGG Financial", "price": 123.45, "change": -5.67, "percentChange": -4.39},
-            {"symbol": "HHH", "name": "HHH Motors", "price": 56.78, "change": -2.31, "percentChange": -3.91}
-        ]
+        Covariances come from the incrementally updated EWMA matrix, which
+        first catches up with any new daily bars and picks up symbols it
+        hasn't seen; only the holdings' block of it is used per request.
+        Beta is against the index's cap-weighted constituent returns.
+        """
+        indices = self.indices.index_names
+        if index not in indices:
+            raise ValueError(f"Unknown index: {index}, expected one of {', '.join(indices)}")
+        if not 0.5 < confidence < 1:
+            raise ValueError("confidence must be between 0.5 and 1")
+        if not holdings or len(holdings) > PORTFOLIO_MAX_HOLDINGS:
+            raise ValueError(f"A portfolio needs between 1 and {PORTFOLIO_MAX_HOLDINGS} holdings")
+        if not all(shares > 0 for shares in holdings.values()):
+            raise ValueError("Holdings must be positive numbers of shares")
+        # The tracker keeps every symbol it is given, so only listed ones are let in
+        unknown = [symbol for symbol in holdings if self.symbol_index.get(symbol) is None]
+        if unknown:
+            raise ValueError(f"Unknown symbols: {', '.join(unknown[:10])}")
+        
+        symbols = list(holdings)
+        self.covariance.sync()
+        self.covariance.add(symbols)
+        holdings_covariance = self.covariance.covariance(symbols)
+        index_covariances, index_variance = self.covariance.covariance_with(symbols, self.index_returns(index))
+        
+        values = np.array([holdings[symbol] * self.price_store.latest_close(symbol) for symbol in symbols])
+        total = values.sum()
+        weights = values / total
+        volatility = float(np.sqrt(weights @ holdings_covariance @ weights))
+        beta = float(index_covariances @ weights / index_variance)
+        deviations = np.sqrt(np.diag(holdings_covariance))
+        with np.errstate(invalid='ignore', divide='ignore'):
+            correlation = np.nan_to_num(holdings_covariance / np.outer(deviations, deviations))
+        
+        # Parametric VaR assumes normal returns; historical uses the trailing year of the same weights
+        z = NormalDist().inv_cdf(confidence)
+        parametric_var = -np.expm1(-z * volatility) * total
+        parametric_cvar = -np.expm1(-NormalDist().pdf(z) / (1 - confidence) * volatility) * total
+        losses = -np.expm1(self.covariance.returns(symbols) @ weights) * total
+        historical_var = np.quantile(losses, confidence)
+        historical_cvar = losses[losses >= historical_var].mean()
         
         return {
-            "gainers": gainers[:limit],
-            "losers": losers[:limit],
-            "timestamp": "2025-03-12 05:55:29",  # Using the provided timestamp
-            "updatedBy": "lucifer0177continue"   # Using the provided username
+            "value": round(float(total), 2),
+            "weights": {symbol: round(float(weight), 4) for symbol, weight in zip(symbols, weights)},
+            "volatility": {
+                "daily": round(volatility * 100, 2),
+                "annual": round(volatility * np.sqrt(TRADING_DAYS) * 100, 2)
+            },
+            "valueAtRisk": {
+                "confidence": confidence,
+                "horizonDays": 1,
+                "parametric": round(float(parametric_var), 2),
+                "historical": round(float(historical_var), 2)
+            },
+            "conditionalValueAtRisk": {
+                "confidence": confidence,
+                "horizonDays": 1,
+                "parametric": round(float(parametric_cvar), 2),
+                "historical": round(float(historical_cvar), 2)
+            },
+            "beta": {"index": index, "value": round(beta, 3)},
+            "correlation": {
+                "symbols": symbols,
+                "matrix": np.round(correlation, 3).tolist()
+            },
+            "asOf": datetime.fromtimestamp(self.covariance.last_timestamp).date().isoformat(),
+            "timestamp": datetime.now().isoformat(),
+            "updatedBy": "lucifer0177continue"
+        }
+    
+    @cached(ttl=60)
+    def index_returns(self, index):
+        """Trailing daily log returns of an index, from its constituents' bars at their current cap weights"""
+        symbols, weights = self.indices.constituents(index)
+        if not symbols:
+            raise ValueError(f"{index} has no constituents among the listings")
+        close = stack_tails([self.price_store.get(symbol, DAILY).close for symbol in symbols],
+                            self.covariance.history + 1)
+        return np.nan_to_num(np.diff(np.log(close), axis=1)).T @ weights
+    
+    def _mover(self, quote):
+        listing = self.symbol_index.get(quote.symbol)
+        return {
+            "symbol": quote.symbol,
+            "name": listing["name"] if listing else f"{quote.symbol} Corp",
+            "price": quote.price,
+            "change": quote.change,
+            "percentChange": quote.percentChange
         }
     
+    @cached(ttl=30)
     def get_most_watched(self, limit=5):
         """Get most watched/popular stocks"""
         # This would typically be based on user activity data
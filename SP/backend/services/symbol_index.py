@@ -0,0 +1,178 @@
+import re
+import threading
+from bisect import bisect_left
+
+import numpy as np
+
+_TOKEN_PATTERN = re.compile(r'[a-z0-9]+')
+
+
+def tokenize(text):
+    """Lowercase alphanumeric tokens of a symbol, name or query"""
+    return _TOKEN_PATTERN.findall(text.lower())
+
+
+def _deletes(token):
+    """All strings one deletion away from a token"""
+    return {token[:i] + token[i + 1:] for i in range(len(token))}
+
+
+def _within_one_edit(a, b):
+    """True if a and b differ by at most one insertion, deletion, substitution or transposition"""
+    if a == b:
+        return True
+    if abs(len(a) - len(b)) > 1:
+        return False
+    i = 0
+    while i < min(len(a), len(b)) and a[i] == b[i]:
+        i += 1
+    if len(a) == len(b):
+        if a[i + 1:] == b[i + 1:]:
+            return True
+        return a[i:i + 2] == b[i:i + 2][::-1] and a[i + 2:] == b[i + 2:]
+    if len(a) > len(b):
+        return a[i + 1:] == b[i:]
+    return a[i:] == b[i + 1:]
+
+
+class _PrefixIndex:
+    """Sorted token array with the listing id of every token occurrence"""
+
+    # Above this many occurrences, distinct ids are found with a mask over all listings
+    MASK_THRESHOLD = 2048
+
+    def __init__(self, pairs, size):
+        pairs.sort()
+        self.size = size
+        self.tokens = [token for token, _ in pairs]
+        self.ids = np.array([listing_id for _, listing_id in pairs], dtype=np.int32)
+
+    def _range(self, lo_key, hi_key):
+        lo = bisect_left(self.tokens, lo_key)
+        return lo, bisect_left(self.tokens, hi_key, lo)
+
+    def _distinct(self, ids):
+        if len(ids) <= self.MASK_THRESHOLD:
+            return np.unique(ids)
+        return np.flatnonzero(self._mask(ids))
+
+    def _mask(self, ids):
+        mask = np.zeros(self.size, dtype=bool)
+        mask[ids] = True
+        return mask
+
+    def prefix_ids(self, prefix):
+        """Sorted distinct listing ids with a token starting with prefix"""
+        lo, hi = self._range(prefix, prefix + '\uffff')
+        return self._distinct(self.ids[lo:hi])
+
+    def prefix_mask(self, prefix):
+        """Boolean mask over listings with a token starting with prefix"""
+        lo, hi = self._range(prefix, prefix + '\uffff')
+        return self._mask(self.ids[lo:hi])
+
+    def exact_ids(self, token):
+        """Sorted distinct listing ids with a token equal to token"""
+        lo, hi = self._range(token, token + '\0')
+        return self._distinct(self.ids[lo:hi])
+
+
+class SymbolIndex:
+    """Search index over stock listings, built once and queried per keystroke
+
+    Listings are ranked by tier (exact symbol, symbol prefix, name token
+    prefix, then typo-tolerant token match) and, within a tier, by their
+    position in the listings, which puts more prominent listings first.
+    """
+
+    def __init__(self, listings, fuzzy=True):
+        self.listings = list(listings)
+        self.fuzzy = fuzzy
+        self.by_symbol = {listing["symbol"]: listing for listing in self.listings}
+
+        symbol_pairs = []
+        name_pairs = []
+        for listing_id, listing in enumerate(self.listings):
+            symbol_pairs.append((listing["symbol"].lower(), listing_id))
+            name_pairs.extend((token, listing_id) for token in tokenize(listing["name"]))
+
+        self._symbols = _PrefixIndex(symbol_pairs, len(self.listings))
+        self._names = _PrefixIndex(name_pairs, len(self.listings))
+
+        # Deletion dictionary for typo-tolerant matching, built on first use
+        self._typo_index = None
+        self._typo_lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.listings)
+
+    def get(self, symbol):
+        """Listing metadata for a symbol, or None"""
+        return self.by_symbol.get(symbol)
+
+    def search(self, query, limit=10):
+        """Listings matching every token of the query, best matches first"""
+        tokens = tokenize(query)
+        if not tokens:
+            return self.listings[:limit]
+
+        # Completed tokens must each prefix a symbol or name token of the listing;
+        # ranking candidates come from the last token, which the user is still typing
+        *complete, partial = tokens
+        required = None
+        for token in complete:
+            mask = self._symbols.prefix_mask(token) | self._names.prefix_mask(token)
+            required = mask if required is None else required & mask
+
+        ranked = []
+        seen = set()
+
+        def take(ids):
+            if required is not None:
+                ids = ids[required[ids]]
+            # Only the first few ids can make it into the results
+            for listing_id in ids[:limit + len(seen)].tolist():
+                if listing_id not in seen:
+                    seen.add(listing_id)
+                    ranked.append(listing_id)
+                    if len(ranked) >= limit:
+                        return True
+            return False
+
+        if not complete:
+            if take(self._symbols.exact_ids(partial)) or take(self._symbols.prefix_ids(partial)):
+                return [self.listings[i] for i in ranked]
+        if take(self._names.prefix_ids(partial)):
+            return [self.listings[i] for i in ranked]
+
+        if self.fuzzy and len(partial) >= 3:
+            take(self._fuzzy_ids(partial))
+
+        return [self.listings[i] for i in ranked]
+
+    def _fuzzy_ids(self, token):
+        """Listing ids with a symbol or name token within one edit of token"""
+        typo_index = self._typo_index or self._build_typo_index()
+        candidates = set()
+        for variant in _deletes(token) | {token}:
+            candidates.update(typo_index.get(variant, ()))
+
+        ids = [np.empty(0, dtype=np.int32)]
+        for candidate in candidates:
+            if _within_one_edit(token, candidate):
+                ids.append(self._symbols.exact_ids(candidate))
+                ids.append(self._names.exact_ids(candidate))
+        return np.unique(np.concatenate(ids))
+
+    def _build_typo_index(self):
+        with self._typo_lock:
+            if self._typo_index is None:
+                vocabulary = set(self._names.tokens) | set(self._symbols.tokens)
+                typo_index = {}
+                for token in vocabulary:
+                    if len(token) < 3:
+                        continue
+                    for variant in _deletes(token) | {token}:
+                        typo_index.setdefault(variant, []).append(token)
+                self._typo_index = typo_index
+        return self._typo_index
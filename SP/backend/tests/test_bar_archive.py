@@ -0,0 +1,72 @@
+import numpy as np
+import pytest
+
+from services.bar_archive import BarArchive, BarArchiveWriter, compact
+from services.price_store import DAILY, INTRADAY, PriceSeries, SyntheticBarLoader
+
+
+def series(timestamps, bar_seconds=DAILY, offset=0.0):
+    timestamps = np.asarray(timestamps, dtype=np.int64)
+    close = np.arange(len(timestamps), dtype=np.float64) + 100 + offset
+    return PriceSeries(timestamps, close - 0.5, close + 1, close - 1, close, close * 1000, bar_seconds)
+
+
+def assert_same(actual, expected):
+    assert actual.bar_seconds == expected.bar_seconds
+    for got, want in zip(actual.columns(), expected.columns()):
+        np.testing.assert_array_equal(got, want)
+
+
+@pytest.fixture
+def loader():
+    return SyntheticBarLoader(intraday_days=2, history_days=60)
+
+
+def test_write_and_read_round_trip(tmp_path, loader):
+    symbols = ['AAPL', 'MSFT', 'JPM']
+    # A small partition size spreads the segments over several files
+    with BarArchiveWriter(str(tmp_path), partition_bytes=4096) as writer:
+        for symbol in symbols:
+            for bar_seconds in (INTRADAY, DAILY):
+                writer.add(symbol, loader(symbol, bar_seconds))
+
+    archive = BarArchive(str(tmp_path))
+    assert archive.symbols() == sorted(symbols)
+    assert len(set(archive.index['partition'].tolist())) > 1
+    for symbol in symbols:
+        for bar_seconds in (INTRADAY, DAILY):
+            read = archive.read(symbol, bar_seconds)
+            assert read.mapped
+            assert_same(read, loader(symbol, bar_seconds))
+    assert archive.read('TSLA', DAILY) is None
+
+
+def test_appended_segments_read_in_order(tmp_path):
+    with BarArchiveWriter(str(tmp_path)) as writer:
+        writer.add('AAPL', series([300, 400]))
+    with BarArchiveWriter(str(tmp_path), append=True) as writer:
+        writer.add('AAPL', series([100, 200]))
+
+    read = BarArchive(str(tmp_path)).read('AAPL', DAILY)
+    np.testing.assert_array_equal(read.timestamps, [100, 200, 300, 400])
+    np.testing.assert_array_equal(read.close, [100, 101, 100, 101])
+
+
+def test_compact_merges_and_prefers_later_segments(tmp_path):
+    source, dest = tmp_path / 'source', tmp_path / 'dest'
+    with BarArchiveWriter(str(source)) as writer:
+        writer.add('AAPL', series([100, 200, 300]))
+        writer.add('MSFT', series([100, 200], bar_seconds=INTRADAY))
+    with BarArchiveWriter(str(source), append=True) as writer:
+        writer.add('AAPL', series([300, 400], offset=50.0))
+
+    compact(str(source), str(dest))
+    archive = BarArchive(str(dest))
+    assert len(archive.segments('AAPL', DAILY)) == 1
+
+    read = archive.read('AAPL', DAILY)
+    assert read.mapped
+    np.testing.assert_array_equal(read.timestamps, [100, 200, 300, 400])
+    # The bar at 300 comes from the appended segment
+    np.testing.assert_array_equal(read.close, [100, 101, 150, 151])
+    assert_same(archive.read('MSFT', INTRADAY), series([100, 200], bar_seconds=INTRADAY))
@@ -0,0 +1,84 @@
+import numpy as np
+import pytest
+
+from services.covariance import CovarianceTracker
+from services.price_store import DAILY, PriceStore, SyntheticBarLoader
+
+SYMBOLS = ['AAPL', 'MSFT', 'GOOGL', 'JPM', 'XOM']
+
+
+def ewma_cov(returns, decay):
+    """Zero-mean EWMA covariance of (bars, symbols) returns, oldest first, through np.cov
+
+    np.cov centres on the weighted mean; appending the negated returns
+    with the same weights makes that mean zero without changing r r'.
+    """
+    bars = len(returns)
+    weights = (1 - decay) * decay ** np.arange(bars - 1, -1, -1)
+    mirrored = np.concatenate((returns, -returns))
+    return np.cov(mirrored.T, aweights=np.concatenate((weights, weights)), bias=True) * weights.sum()
+
+
+def daily_returns(store, symbol, bars):
+    close = store.get(symbol, DAILY).close
+    return np.diff(np.log(close[-bars - 1:]))
+
+
+@pytest.fixture
+def store():
+    return PriceStore(SyntheticBarLoader(history_days=400))
+
+
+@pytest.fixture
+def tracker(store):
+    return CovarianceTracker(store, history=120)
+
+
+def test_matches_np_cov(store, tracker):
+    tracker.add(SYMBOLS[:3])
+    # Symbols added later get their rows against the history kept for the others
+    tracker.add(SYMBOLS[2:])
+    assert tracker.symbols == SYMBOLS
+
+    returns = np.column_stack([daily_returns(store, symbol, tracker.history) for symbol in SYMBOLS])
+    np.testing.assert_allclose(tracker.returns(SYMBOLS), returns)
+    np.testing.assert_allclose(tracker.covariance(SYMBOLS), ewma_cov(returns, tracker.decay), rtol=1e-10)
+
+    subset = ['XOM', 'AAPL']
+    np.testing.assert_allclose(tracker.covariance(subset), ewma_cov(returns[:, [4, 0]], tracker.decay), rtol=1e-10)
+
+
+def test_incremental_updates_match_a_recompute(tracker):
+    tracker.add(SYMBOLS)
+    rng = np.random.default_rng(0)
+    history = tracker.returns(SYMBOLS)
+    for _ in range(30):
+        bar = rng.normal(0, 0.02, len(SYMBOLS))
+        tracker.update(bar)
+        history = np.vstack((history, bar))
+
+    # The recursion keeps the bars that left the window; a rebuild only weighs the window
+    np.testing.assert_allclose(tracker.covariance(SYMBOLS), ewma_cov(history, tracker.decay), rtol=1e-10)
+    tracker.rebuild()
+    np.testing.assert_allclose(tracker.returns(SYMBOLS), history[-tracker.history:])
+    np.testing.assert_allclose(tracker.covariance(SYMBOLS), ewma_cov(history[-tracker.history:], tracker.decay),
+                               rtol=1e-10)
+
+
+def test_lazy_scale_is_folded_in():
+    store = PriceStore(SyntheticBarLoader(history_days=400))
+    tracker = CovarianceTracker(store, decay=0.5, history=60)
+    tracker.add(SYMBOLS[:2])
+    bars = np.random.default_rng(1).normal(0, 0.02, (400, 2))
+    tracker.update(bars)
+    # 0.5 ** 400 is below MIN_SCALE, so the scale was folded into the matrix on the way
+    np.testing.assert_allclose(tracker.covariance(SYMBOLS[:2]), ewma_cov(bars, 0.5), rtol=1e-10)
+
+
+def test_covariance_with_an_untracked_series(store, tracker):
+    tracker.add(SYMBOLS)
+    returns = tracker.returns(SYMBOLS)
+    covariances, variance = tracker.covariance_with(SYMBOLS[:4], returns[:, 4])
+    full = tracker.covariance(SYMBOLS)
+    np.testing.assert_allclose(covariances, full[4, :4], rtol=1e-10)
+    assert variance == pytest.approx(full[4, 4], rel=1e-10)
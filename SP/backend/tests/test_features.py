@@ -0,0 +1,132 @@
+import numpy as np
+import pytest
+
+from models import features
+from models.features import IndicatorState, compute_indicators, ema, ewm, rsi
+
+
+def prices(symbols=4, bars=300, seed=0):
+    rng = np.random.default_rng(seed)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.02, (symbols, bars)), axis=1))
+    spread = close * rng.uniform(0, 0.02, close.shape)
+    return close, close + spread, close - spread
+
+
+def test_ewm_matches_the_recurrence():
+    values = np.random.default_rng(1).normal(0, 1, (3, 2000))
+    alpha = 0.05
+    expected = np.empty_like(values)
+    expected[:, 0] = values[:, 0]
+    for t in range(1, values.shape[1]):
+        expected[:, t] = alpha * values[:, t] + (1 - alpha) * expected[:, t - 1]
+    np.testing.assert_allclose(ewm(values, alpha), expected, rtol=1e-9, atol=1e-12)
+
+
+def test_single_series_keeps_its_shape():
+    close = prices(1)[0][0]
+    assert ema(close).shape == close.shape
+    np.testing.assert_allclose(ema(close), ema(close[np.newaxis])[0])
+
+
+@pytest.mark.parametrize('bars', [10, 600])
+def test_compiled_kernel_matches_numpy_indicators(monkeypatch, bars):
+    pytest.importorskip('numba')
+    close, high, low = prices(bars=bars)
+    compiled = compute_indicators(close, high, low)
+    monkeypatch.setattr(features, '_indicator_kernel', lambda: None)
+    expected = compute_indicators(close, high, low)
+    for name, values in expected.items():
+        np.testing.assert_allclose(compiled[name], values, rtol=1e-9, atol=1e-9, err_msg=name)
+
+
+def pandas_indicators(close, high, low):
+    """Textbook pandas definitions of the indicators of one series, independent of models.features"""
+    import pandas as pd
+    close, high, low = pd.Series(close), pd.Series(high), pd.Series(low)
+
+    def wilder(values, period):
+        return values.ewm(alpha=1.0 / period, adjust=False).mean()
+
+    moves = close.diff().iloc[1:]
+    gains, losses = wilder(moves.clip(lower=0), features.RSI_PERIOD), wilder(-moves.clip(upper=0), features.RSI_PERIOD)
+    rsi_values = pd.concat([pd.Series([np.nan]), 100 * gains / (gains + losses)])
+    rsi_values.iloc[:features.RSI_PERIOD] = np.nan
+
+    line = (close.ewm(span=features.MACD_FAST, adjust=False).mean()
+            - close.ewm(span=features.MACD_SLOW, adjust=False).mean())
+    signal = line.ewm(span=features.MACD_SIGNAL, adjust=False).mean()
+
+    window = close.rolling(features.BOLLINGER_WINDOW)
+    middle, spread = window.mean(), features.BOLLINGER_WIDTH * window.std(ddof=0)
+
+    previous = close.shift(1)
+    ranges = (pd.concat([high, previous], axis=1).max(axis=1) - pd.concat([low, previous], axis=1).min(axis=1))
+    atr_values = wilder(ranges, features.ATR_PERIOD)
+    atr_values.iloc[:features.ATR_PERIOD - 1] = np.nan
+
+    returns = np.log(close / previous)
+    return {
+        "sma": close.rolling(features.SMA_WINDOW).mean(),
+        "ema": close.ewm(span=features.EMA_SPAN, adjust=False).mean(),
+        "rsi": rsi_values,
+        "macd": line,
+        "macdSignal": signal,
+        "macdHistogram": line - signal,
+        "bollingerMiddle": middle,
+        "bollingerUpper": middle + spread,
+        "bollingerLower": middle - spread,
+        "atr": atr_values,
+        "volatility": returns.rolling(features.VOLATILITY_WINDOW).std(ddof=0),
+    }
+
+
+@pytest.mark.parametrize('compiled', [True, False])
+def test_indicators_match_pandas_definitions(monkeypatch, compiled):
+    pytest.importorskip('pandas')
+    if compiled:
+        pytest.importorskip('numba')
+    else:
+        monkeypatch.setattr(features, '_indicator_kernel', lambda: None)
+    close, high, low = prices(symbols=3, bars=700)
+    # A price level far from zero, where running window sums would cancel badly
+    close, high, low = close + 1e4, high + 1e4, low + 1e4
+    results = compute_indicators(close, high, low)
+    assert set(results) == set(features.INDICATORS)
+    for row in range(close.shape[0]):
+        for name, values in pandas_indicators(close[row], high[row], low[row]).items():
+            np.testing.assert_allclose(results[name][row], values.to_numpy(), rtol=1e-7, atol=1e-9,
+                                       err_msg=f"{name}, symbol {row}")
+
+
+@pytest.mark.parametrize('history', [30, 120])
+def test_indicator_state_matches_full_recompute(history):
+    close, high, low = prices()
+    state = IndicatorState.from_history(close[:, :history], high[:, :history], low[:, :history])
+    for bar in range(history, close.shape[1]):
+        latest = state.append(close[:, bar], high[:, bar], low[:, bar])
+
+    expected = compute_indicators(close, high, low)
+    assert set(latest) == set(expected)
+    for name, values in latest.items():
+        np.testing.assert_allclose(values, expected[name][:, -1], rtol=1e-6, atol=1e-9, err_msg=name)
+
+
+def test_indicator_state_before_full_windows_matches_recompute():
+    close, high, low = prices(bars=25)
+    state = IndicatorState.from_history(close[:, :10], high[:, :10], low[:, :10])
+    for bar in range(10, 25):
+        latest = state.append(close[:, bar], high[:, bar], low[:, bar])
+
+    expected = compute_indicators(close, high, low)
+    for name, values in latest.items():
+        np.testing.assert_allclose(values, expected[name][:, -1], rtol=1e-6, atol=1e-9, err_msg=name)
+
+
+def test_flat_prices_have_no_rsi():
+    close = np.vstack([np.full(40, 50.0), 50.0 + np.arange(40.0)])
+    state = IndicatorState.from_history(close[:, :20])
+    for bar in range(20, 40):
+        latest = state.append(close[:, bar])
+
+    np.testing.assert_array_equal(rsi(close)[:, -1], [np.nan, 100.0])
+    np.testing.assert_array_equal(latest['rsi'], rsi(close)[:, -1])
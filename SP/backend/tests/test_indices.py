@@ -0,0 +1,19 @@
+from services import reference_data
+from services.indices import IndexAggregator
+
+
+def test_empty_groups_keep_their_place_in_the_summary():
+    aggregator = IndexAggregator.from_listings(reference_data.STOCK_UNIVERSE)
+    summary = aggregator.summary()
+
+    # The ten built-in listings leave the Russell 2000 and several sectors without constituents
+    indices = {row["name"]: row for row in summary["indices"]}
+    assert list(indices) == list(reference_data.INDEX_LEVELS)
+    assert indices["Russell 2000"] == {"name": "Russell 2000", "value": None, "change": None, "percentChange": None}
+    assert indices["S&P 500"]["value"] is not None
+    sectors = {row["name"]: row["percentChange"] for row in summary["sectorPerformance"]}
+    assert list(sectors) == reference_data.SECTORS
+    assert sectors["Energy"] is None and sectors["Technology"] is not None
+
+    assert "Russell 2000" not in aggregator.index_names
+    assert "S&P 500" in aggregator.index_names
@@ -0,0 +1,123 @@
+import random
+
+import pytest
+
+from models import training
+from services import reference_data
+from services.market_data import FakeMarketDataProvider, MarketDataClient
+from services.movers import IndexedHeap, MoversEngine, top_k
+from services.records import Quote
+from services.stock_service import StockService
+
+SECTORS = ['Technology', 'Healthcare', 'Energy', None]
+
+
+def quote(symbol, percent_change):
+    return Quote(symbol, 100.0, percent_change, percent_change, 1e6, None)
+
+
+def check_heap(heap):
+    for pos, item in enumerate(heap.items):
+        assert heap.positions[item] == pos
+        if pos:
+            assert heap.keys[(pos - 1) // 2] >= heap.keys[pos]
+    assert len(heap.positions) == len(heap)
+
+
+def test_indexed_heap_against_a_sort():
+    rng = random.Random(0)
+    heap, expected = IndexedHeap(), {}
+    for _ in range(5000):
+        item = f"S{rng.randrange(300)}"
+        if item in expected and rng.random() < 0.2:
+            heap.remove(item)
+            del expected[item]
+        else:
+            # Few distinct keys, so equal keys and unchanged keys are both exercised
+            key = rng.randrange(-20, 20) / 2
+            heap.set(item, key)
+            expected[item] = key
+    check_heap(heap)
+
+    assert sorted(zip(heap.items, heap.keys)) == sorted(expected.items())
+    keys = [key for _, key in top_k([heap], len(expected))]
+    assert keys == sorted(expected.values(), reverse=True)
+
+
+def test_movers_against_a_sort():
+    rng = random.Random(1)
+    engine, latest, sectors = MoversEngine(max_limit=100), {}, {}
+    for _ in range(20000):
+        symbol = f"S{rng.randrange(500)}"
+        action = rng.random()
+        if action < 0.05 and symbol in latest:
+            engine.remove(symbol)
+            del latest[symbol]
+            del sectors[symbol]
+            continue
+        # Some updates move a symbol to another sector, some leave it where it was
+        sector = rng.choice(SECTORS) if symbol not in sectors or action < 0.1 else None
+        update = quote(symbol, rng.uniform(-10, 10))
+        engine.update(update, sector)
+        latest[symbol] = update
+        sectors[symbol] = sector if sector is not None else sectors.get(symbol)
+
+    assert len(engine) == len(latest)
+    for sector in [None] + SECTORS[:-1]:
+        quotes = [q for s, q in latest.items() if sector is None or sectors[s] == sector]
+        gainers = sorted((q for q in quotes if q.percentChange > 0), key=lambda q: -q.percentChange)
+        losers = sorted((q for q in quotes if q.percentChange < 0), key=lambda q: q.percentChange)
+        for limit in (1, 5, 100):
+            assert engine.gainers(limit, sector) == gainers[:limit]
+            assert engine.losers(limit, sector) == losers[:limit]
+
+
+def test_update_many_matches_single_updates():
+    quotes = [quote(f"S{i}", (i * 7919 % 200 - 100) / 10) for i in range(200)]
+    sectors = {q.symbol: SECTORS[i % 3] for i, q in enumerate(quotes)}
+    single, batched = MoversEngine(), MoversEngine()
+    for q in quotes:
+        single.update(q, sectors[q.symbol])
+    batched.update_many(quotes, sectors)
+    for sector in [None] + SECTORS[:3]:
+        assert single.gainers(20, sector) == batched.gainers(20, sector)
+        assert single.losers(20, sector) == batched.losers(20, sector)
+    assert batched.sectors() == sorted(SECTORS[:3])
+
+
+@pytest.mark.parametrize('limit', [0, 101])
+def test_limit_is_bounded(limit):
+    with pytest.raises(ValueError):
+        MoversEngine(max_limit=100).gainers(limit)
+
+
+def test_service_ranks_only_listed_symbols_from_a_full_snapshot():
+    client = MarketDataClient(FakeMarketDataProvider(bucket_seconds=3600))
+    service = StockService(market_data=client)
+    try:
+        # Quotes before the first movers read neither rank unlisted symbols nor stop the snapshot
+        service.get_quotes(['AAPL', 'ZZZZ', 'JUNK0'])
+        movers = service.get_market_movers(limit=100)
+        ranked = {mover["symbol"] for mover in movers["gainers"] + movers["losers"]}
+        assert not ranked & {'ZZZZ', 'JUNK0'}
+        assert len(service.movers) == len(service.symbol_index)
+    finally:
+        client.close()
+
+
+def test_listed_sectors_agree_across_summary_movers_and_training(tmp_path, monkeypatch):
+    listings = tmp_path / 'listings.csv'
+    listings.write_text('symbol,name,sector\nFOO,Foo Oil,Energy\nBAR,Bar Gas,Energy\n')
+    monkeypatch.setenv('LISTINGS_PATH', str(listings))
+    reference_data._listed_sectors.cache_clear()
+    client = MarketDataClient(FakeMarketDataProvider(bucket_seconds=3600))
+    try:
+        service = StockService(market_data=client)
+        summary = {row["name"]: row["percentChange"] for row in service.get_market_summary()["sectorPerformance"]}
+        movers = service.get_market_movers(limit=100, sector='Energy')
+        assert summary['Energy'] is not None
+        assert {mover["symbol"] for mover in movers["gainers"] + movers["losers"]} == {'FOO', 'BAR'}
+        assert training.group_symbols(['FOO', 'BAR', 'AAPL'], 'sector')['Energy'] == ['FOO', 'BAR']
+    finally:
+        client.close()
+        reference_data._listed_sectors.cache_clear()
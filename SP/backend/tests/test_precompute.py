@@ -0,0 +1,45 @@
+import pytest
+
+from services.precompute import MemoryPrecomputeStore, PrecomputeScheduler, SqlitePrecomputeStore
+
+
+@pytest.fixture(params=['memory', 'sqlite'])
+def store(request, tmp_path):
+    if request.param == 'memory':
+        return MemoryPrecomputeStore()
+    return SqlitePrecomputeStore(str(tmp_path / 'precompute.db'))
+
+
+def test_hot_keys_by_decayed_demand(store):
+    store.add_demand({('AAPL', '3m'): 5, ('MSFT', '3m'): 2, ('JPM', '1y'): 1}, now=0, half_life=10)
+    store.add_demand({('JPM', '1y'): 4}, now=10, half_life=10)
+    # AAPL has decayed to 2.5, MSFT to 1, JPM to 0.5 + 4
+    assert store.hot_keys(3, now=10, half_life=10) == [('JPM', '1y'), ('AAPL', '3m'), ('MSFT', '3m')]
+    assert store.hot_keys(1, now=10, half_life=10) == [('JPM', '1y')]
+
+
+def test_cold_keys_are_pruned(store):
+    store.add_demand({('AAPL', '3m'): 1, ('MSFT', '3m'): 100}, now=0, half_life=10)
+    # After 100 s AAPL is at 1 / 1024, MSFT at about 0.1
+    assert store.hot_keys(10, now=100, half_life=10, min_demand=0.01) == [('MSFT', '3m')]
+    # A pruned key starts over when it is requested again
+    store.add_demand({('AAPL', '3m'): 1}, now=100, half_life=10)
+    assert store.hot_keys(10, now=100, half_life=10, min_demand=0.01) == [('AAPL', '3m'), ('MSFT', '3m')]
+
+
+def test_scheduler_only_counts_accepted_keys():
+    computed = []
+
+    def compute(symbols, timeframe):
+        computed.extend((symbol, timeframe) for symbol in symbols)
+        return [(None, None)] * len(symbols)
+
+    scheduler = PrecomputeScheduler(compute, accepts=lambda symbol, timeframe: timeframe == '3m', interval=3600)
+    try:
+        for key in [('AAPL', '3m'), ('AAPL', '3m'), ('AAPL', 'bogus'), ('MSFT', '3m')]:
+            assert scheduler.lookup(*key) is None
+        scheduler.run_cycle()
+    finally:
+        scheduler.stop()
+    # The scheduler's own thread may have run a cycle as well
+    assert set(computed) == {('AAPL', '3m'), ('MSFT', '3m')}
@@ -0,0 +1,42 @@
+import json
+
+import pytest
+
+from services.market_data import FakeMarketDataProvider, MarketDataClient
+from services.quote_stream import QuoteHub
+from services.stock_service import StockService
+
+FIELDS = ('price', 'change', 'percentChange', 'timestamp')
+
+
+@pytest.fixture
+def service():
+    # An hour-long bucket, so every lookup in a test sees the same tick
+    client = MarketDataClient(FakeMarketDataProvider(bucket_seconds=3600))
+    yield StockService(market_data=client)
+    client.close()
+
+
+def streamed_quote(subscription):
+    event = subscription.get(timeout=5)
+    return json.loads(event.payload.split('data: ', 1)[1])
+
+
+def test_streamed_quote_matches_rest_quotes(service):
+    hub = QuoteHub(service.get_quotes)
+    subscription = hub.subscribe(['AAPL', 'MSFT'])
+    hub.tick()
+    streamed = {quote['symbol']: quote for quote in (streamed_quote(subscription), streamed_quote(subscription))}
+    hub.stop()
+
+    quotes = service.get_quotes(['AAPL', 'MSFT'])
+    for symbol in ('AAPL', 'MSFT'):
+        details = service.get_stock_details(symbol)
+        for field in FIELDS:
+            assert streamed[symbol][field] == getattr(quotes[symbol], field) == details[field]
+
+
+def test_fake_quotes_do_not_depend_on_the_batch(service):
+    alone = service.get_quotes(['AAPL'])['AAPL']
+    batched = service.get_quotes(['TSLA', 'AAPL', 'JPM'])['AAPL']
+    assert alone == batched
@@ -0,0 +1,25 @@
+from models.registry import ModelRegistry
+
+
+def test_unsaved_names_are_neither_scanned_nor_cached(tmp_path, monkeypatch):
+    registry = ModelRegistry(str(tmp_path))
+    registry.save('technology-3m', {'weights': [1.0]})
+    assert registry.latest_version('technology-3m') == 1
+
+    scanned = []
+    versions = registry.versions
+    monkeypatch.setattr(registry, 'versions', lambda name: scanned.append(name) or versions(name))
+    for index in range(100):
+        assert registry.latest_version(f'junk{index}-3m') is None
+    assert not scanned
+    assert set(registry._latest) == {'technology-3m'}
+
+
+def test_refresh_picks_up_models_saved_elsewhere(tmp_path):
+    registry = ModelRegistry(str(tmp_path))
+    assert registry.latest_version('market-3m') is None
+    ModelRegistry(str(tmp_path)).save('market-3m', {'weights': [1.0]})
+    assert registry.latest_version('market-3m') is None
+    registry.refresh()
+    assert registry.latest_version('market-3m') == 1
+    assert registry.get('market-3m') == {'weights': [1.0]}
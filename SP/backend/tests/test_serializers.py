@@ -0,0 +1,74 @@
+import numpy as np
+import pytest
+from flask import Flask
+
+from api import serializers
+from api.serializers import JSON, PACKED_COLUMNS, negotiate, pack_columns, unpack_columns
+
+
+def test_packed_columns_round_trip():
+    columns = {
+        'timestamps': np.arange(1_700_000_000, 1_700_000_000 + 7 * 300, 300, dtype=np.int64),
+        'close': np.linspace(100.0, 101.5, 7),
+        'flags': np.array([True, False, True, True, False, False, True]),
+        'odd': np.arange(3, dtype=np.int32),
+        'empty': np.empty(0)
+    }
+    payload = b''.join(pack_columns(columns, {'symbol': 'AAPL', 'barSeconds': 300}))
+    metadata, unpacked = unpack_columns(payload)
+
+    assert metadata == {'symbol': 'AAPL', 'barSeconds': 300}
+    assert list(unpacked) == list(columns)
+    for name, values in columns.items():
+        np.testing.assert_array_equal(unpacked[name], values)
+    assert unpacked['timestamps'].dtype == np.dtype('<i8')
+    assert unpacked['flags'].dtype == np.dtype('<i8')
+    assert unpacked['close'].dtype == np.dtype('<f8')
+
+
+def test_packed_columns_are_aligned_views():
+    payload = b''.join(pack_columns({'a': np.arange(5.0), 'b': np.arange(3)}))
+    _, columns = unpack_columns(payload)
+    for values in columns.values():
+        assert values.base is not None
+        assert values.ctypes.data % 8 == 0 or len(values) == 0
+
+
+def test_unpack_rejects_other_payloads():
+    with pytest.raises(ValueError):
+        unpack_columns(b'{"success": true}')
+
+
+@pytest.mark.parametrize('accept, expected', [
+    (None, JSON),
+    ('*/*', JSON),
+    ('application/*', JSON),
+    ('application/json', JSON),
+    (PACKED_COLUMNS, PACKED_COLUMNS),
+    (f'{PACKED_COLUMNS}, application/json', PACKED_COLUMNS),
+    (f'application/json, {PACKED_COLUMNS}', PACKED_COLUMNS),
+    (f'application/json, {PACKED_COLUMNS};q=0.9', JSON),
+    (f'{PACKED_COLUMNS};q=0.5, */*', JSON),
+])
+def test_negotiate(accept, expected):
+    headers = {'Accept': accept} if accept else {}
+    with Flask(__name__).test_request_context(headers=headers) as context:
+        assert negotiate(context.request) == expected
+
+
+def test_binary_response_sets_length():
+    response = serializers.binary_response(PACKED_COLUMNS, {'close': np.arange(4.0)}, {'symbol': 'AAPL'})
+    body = response.get_data()
+    assert int(response.headers['Content-Length']) == len(body)
+    assert unpack_columns(body)[0] == {'symbol': 'AAPL'}
+
+
+# NDJSON streaming and binary columns both read the bar range
+@pytest.mark.parametrize('query, accept', [('stream=1&', JSON), ('', PACKED_COLUMNS)])
+@pytest.mark.parametrize('bound', ['start=inf', 'start=1e400', 'end=nan'])
+def test_non_finite_bar_range_is_a_bad_request(query, accept, bound):
+    from app import create_app
+    client = create_app().test_client()
+    response = client.get(f'/api/stocks/AAPL/historical?{query}{bound}', headers={'Accept': accept})
+    assert response.status_code == 400
+    assert response.get_json()['success'] is False
@@ -0,0 +1,67 @@
+import itertools
+import random
+
+import pytest
+
+from services.symbol_index import SymbolIndex, _within_one_edit, tokenize
+
+LISTINGS = [
+    {"symbol": "AAPL", "name": "Apple Inc."},
+    {"symbol": "MSFT", "name": "Microsoft Corporation"},
+    {"symbol": "GOOGL", "name": "Alphabet Inc."},
+    {"symbol": "AMZN", "name": "Amazon.com Inc."},
+    {"symbol": "AMD", "name": "Advanced Micro Devices Inc."},
+    {"symbol": "MU", "name": "Micron Technology Inc."},
+    {"symbol": "JPM", "name": "JPMorgan Chase & Co."},
+]
+
+
+def edit_distance(a, b):
+    """Optimal string alignment distance: insertions, deletions, substitutions and adjacent transpositions"""
+    rows = [[i + j if i * j == 0 else 0 for j in range(len(b) + 1)] for i in range(len(a) + 1)]
+    for i, j in itertools.product(range(1, len(a) + 1), range(1, len(b) + 1)):
+        rows[i][j] = min(rows[i - 1][j] + 1, rows[i][j - 1] + 1, rows[i - 1][j - 1] + (a[i - 1] != b[j - 1]))
+        if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+            rows[i][j] = min(rows[i][j], rows[i - 2][j - 2] + 1)
+    return rows[-1][-1]
+
+
+def test_within_one_edit_against_edit_distance():
+    rng = random.Random(0)
+    words = ['apple', 'micro', 'amazon', 'chase', 'ab', 'a', '']
+    for _ in range(3000):
+        word = rng.choice(words)
+        typo = list(word)
+        for _ in range(rng.randrange(3)):
+            edit = rng.randrange(4)
+            pos = rng.randrange(len(typo) + 1)
+            if edit == 0:
+                typo.insert(pos, rng.choice('abcm'))
+            elif typo and edit == 1:
+                del typo[min(pos, len(typo) - 1)]
+            elif typo and edit == 2:
+                typo[min(pos, len(typo) - 1)] = rng.choice('abcm')
+            elif len(typo) > 1:
+                pos = min(pos, len(typo) - 2)
+                typo[pos], typo[pos + 1] = typo[pos + 1], typo[pos]
+        typo = ''.join(typo)
+        assert _within_one_edit(word, typo) == (edit_distance(word, typo) <= 1), (word, typo)
+
+
+@pytest.mark.parametrize('query', ['aple', 'micrsoft', 'amazno', 'alphabte', 'jpmorgna', 'chsae', 'techology'])
+def test_fuzzy_search_against_a_scan(query):
+    index = SymbolIndex(LISTINGS)
+    expected = [
+        listing for listing in LISTINGS
+        if any(edit_distance(query, token) <= 1 for token in tokenize(listing["symbol"]) + tokenize(listing["name"]))
+    ]
+    assert expected
+    assert index.search(query) == expected
+
+
+def test_prefix_matches_rank_before_typos():
+    index = SymbolIndex(LISTINGS)
+    assert index.search('am')[:2] == [LISTINGS[3], LISTINGS[4]]
+    assert index.search('micro') == [LISTINGS[1], LISTINGS[4], LISTINGS[5]]
+    assert index.search('micro dev') == [LISTINGS[4]]
+    assert SymbolIndex(LISTINGS, fuzzy=False).search('aple') == []
@@ -0,0 +1,44 @@
+import numpy as np
+
+from models import features
+from models.training import FeatureCache, fit_group
+from services.price_store import DAILY
+
+
+def cache_history(cache, symbol, bars):
+    rng = np.random.default_rng(len(symbol) + bars)
+    timestamps = np.arange(bars, dtype=np.int64) * DAILY
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, bars)))
+    matrix = rng.normal(size=(bars, len(features.FEATURE_NAMES))).astype(np.float32)
+    cache.store(symbol, 'fingerprint', timestamps, close, matrix)
+
+
+def options(cache_dir):
+    return {"cacheDir": cache_dir, "registry": None, "folds": 4, "stride": 1, "save": False}
+
+
+def test_group_without_usable_folds_is_skipped(tmp_path, caplog):
+    cache_dir = str(tmp_path)
+    cache = FeatureCache(cache_dir)
+    # 50 daily bars leave 20 samples of a 30-bar horizon, all too late to train any fold
+    cache_history(cache, 'AAA', 50)
+    # Shorter than the horizon: no samples at all
+    cache_history(cache, 'BBB', 20)
+
+    assert fit_group(('technology-1m', ['AAA'], '1m', options(cache_dir))) == ('technology-1m', None)
+    assert fit_group(('energy-1m', ['BBB', 'MISSING'], '1m', options(cache_dir))) == ('energy-1m', None)
+    assert 'Skipping technology-1m' in caplog.text
+    assert 'Skipping energy-1m' in caplog.text
+    assert 'No cached features for MISSING' in caplog.text
+
+
+def test_group_with_history_is_evaluated(tmp_path):
+    cache_dir = str(tmp_path)
+    cache = FeatureCache(cache_dir)
+    for symbol in ('AAA', 'BBB'):
+        cache_history(cache, symbol, 400)
+    cache_history(cache, 'CCC', 20)
+
+    name, metrics = fit_group(('market-1m', ['AAA', 'BBB', 'CCC', 'MISSING'], '1m', options(cache_dir)))
+    assert name == 'market-1m'
+    assert metrics["samples"] > 0
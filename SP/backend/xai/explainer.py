@@ -1,27 +1,221 @@
+import dataclasses
+import threading
+from collections import OrderedDict
+
 import numpy as np
-import pandas as pd
 from datetime import datetime
 
+from models import features
+from models.prediction_model import TECHNICAL_HISTORY_BARS
+from services import reference_data
+from services.metrics import timed
+from services.price_store import DAILY
+
+# Centroids in the background set summarizing models saved without one
+BACKGROUND_SIZE = 32
+
+# Memoized attributions, keyed by model version and feature vector
+ATTRIBUTION_CACHE_SIZE = 65536
+
+# Model evaluations per explanation when no exact method fits the model
+KERNEL_SAMPLES = 200
+
+# Levels of explanation detail: summary is the outlook and per-factor
+# interpretations, full adds SHAP attributions, caveats and methodology
+DETAILS = ('summary', 'full')
+
+
 class ModelExplainer:
-    """Explainable AI component for making model predictions interpretable"""
+    """Explainable AI component for making model predictions interpretable
+    
+    Predictions scored by a trained model get SHAP attributions of the
+    predicted percent change to the model's features. The exact linear
+    form is used for linear models and TreeExplainer for tree ensembles,
+    with KernelSHAP only as a last resort; all of them measure against a
+    k-means summary of the training features, cached per model version.
+    Attributions are memoized by (model, version, feature vector), and
+    explain_many evaluates every symbol sharing a model in one call.
+    """
     
     def __init__(self, model):
         self.model = model
+        self._explainers = {}  # (model name, version) -> (method, explainer)
+        self._attributions = OrderedDict()  # (model name, version, feature bytes) -> (base value, contributions)
+        self._fallback_background = None
+        self._lock = threading.Lock()
     
-    def explain_prediction(self, symbol, prediction_data):
+    @timed
+    def explain_prediction(self, symbol, prediction_data, detail='full'):
         """Generate human-readable explanations for a prediction"""
-        # In a real app, this would use techniques like SHAP, LIME, etc.
-        # For now, create explanations from the mock prediction data
+        if prediction_data.symbol != symbol:
+            prediction_data = dataclasses.replace(prediction_data, symbol=symbol)
+        return self.explain_many([prediction_data], detail)[0]
+    
+    @timed
+    def explain_many(self, predictions, detail='full'):
+        """Generate explanations for a batch of predictions, attributing them in one pass per model"""
+        if detail not in DETAILS:
+            raise ValueError(f"detail must be one of {', '.join(DETAILS)}")
+        if detail == 'full':
+            attributions = self.attributions_many(predictions)
+        else:
+            attributions = [None] * len(predictions)
+        return [
+            self._explain(prediction_data.symbol, prediction_data, attribution, detail)
+            for prediction_data, attribution in zip(predictions, attributions)
+        ]
+    
+    def attributions_many(self, predictions):
+        """SHAP attributions of each prediction's percent change, or None where no trained model scored it"""
+        results = [None] * len(predictions)
+        by_timeframe = {}
+        for index, prediction_data in enumerate(predictions):
+            by_timeframe.setdefault(prediction_data.timeframe, []).append(index)
+        
+        for timeframe, indices in by_timeframe.items():
+            symbols = [predictions[index].symbol for index in indices]
+            names = self.model.resolve_models(symbols, timeframe)
+            if not (names != "").any():
+                continue
+            rows = np.nan_to_num(self.model.technical_signals(symbols)["features"])
+            for name in np.unique(names):
+                if not name:
+                    continue
+                selected = np.flatnonzero(names == name)
+                for position, attribution in zip(selected.tolist(), self._attribute(name, rows[selected])):
+                    results[indices[position]] = attribution
+        return results
+    
+    def stats(self):
+        with self._lock:
+            return {"explainers": len(self._explainers), "memoized": len(self._attributions)}
+    
+    def _attribute(self, name, rows):
+        """Attributions of rows to the latest version of the named model, memoized per feature vector"""
+        version = self.model.registry.latest_version(name)
+        method, explainer = self._explainer(name, version)
+        keys = [(name, version, row.tobytes()) for row in rows]
+        found = [None] * len(rows)
+        with self._lock:
+            for index, key in enumerate(keys):
+                cached = self._attributions.get(key)
+                if cached is not None:
+                    self._attributions.move_to_end(key)
+                    found[index] = cached
         
-        factors = prediction_data.get('factors', [])
+        missing = [index for index, cached in enumerate(found) if cached is None]
+        if missing:
+            # One batched evaluation for every row not seen before
+            base_value, contributions = explainer(rows[missing])
+            with self._lock:
+                for index, values in zip(missing, contributions):
+                    found[index] = self._attributions[keys[index]] = (base_value, values)
+                while len(self._attributions) > ATTRIBUTION_CACHE_SIZE:
+                    self._attributions.popitem(last=False)
+        
+        return [
+            self._attribution_record(name, version, method, row, base_value, contributions)
+            for row, (base_value, contributions) in zip(rows, found)
+        ]
+    
+    def _explainer(self, name, version):
+        """(method, function of feature rows returning (base value, contributions)) for a model version"""
+        key = (name, version)
+        entry = self._explainers.get(key)
+        if entry is not None:
+            return entry
+        
+        model = self.model.registry.get(name, version)
+        estimator = getattr(model, 'estimator', model)
+        background = getattr(model, 'background', None)
+        weights = getattr(model, 'background_weights', None)
+        if background is None:
+            background, weights = self._default_background()
+        background = np.asarray(background, dtype=np.float64)
+        
+        # Attributions are in percentage points, like percentChange
+        if hasattr(estimator, 'coef_') and hasattr(estimator, 'intercept_'):
+            # Exact linear SHAP values: coefficient times distance from the background mean
+            coef = np.ravel(estimator.coef_) * 100
+            mean = np.average(background, axis=0, weights=weights)
+            base_value = float(np.dot(coef, mean) + np.ravel(estimator.intercept_)[0] * 100)
+            entry = ('linear', lambda rows: (base_value, (rows - mean) * coef))
+        elif (shap := _import_shap()) is None:
+            raise RuntimeError("SHAP attributions for this model need the shap package")
+        elif _is_tree_model(estimator):
+            tree_explainer = shap.TreeExplainer(estimator, data=background, feature_perturbation='interventional')
+            base_value = float(np.ravel(tree_explainer.expected_value)[0]) * 100
+            entry = ('tree', lambda rows: (base_value, tree_explainer.shap_values(rows, check_additivity=False) * 100))
+        else:
+            kernel_explainer = shap.KernelExplainer(model.predict, background)
+            base_value = float(np.ravel(kernel_explainer.expected_value)[0]) * 100
+            entry = ('kernel', lambda rows: (
+                base_value, np.asarray(kernel_explainer.shap_values(rows, nsamples=KERNEL_SAMPLES, silent=True)) * 100
+            ))
+        
+        with self._lock:
+            self._explainers[key] = entry
+        return entry
+    
+    def _default_background(self):
+        """Background for models saved without one: k-means summary of the reference symbols' recent features"""
+        if self._fallback_background is None:
+            store = self.model.price_store
+            rows = []
+            for symbol in reference_data.BASE_PRICES:
+                series = store.get(symbol, DAILY).tail(TECHNICAL_HISTORY_BARS)
+                indicators = features.compute_indicators(series.close, series.high, series.low)
+                matrix = features.feature_matrix(series.close, indicators)[0]
+                rows.append(matrix[np.isfinite(matrix).all(axis=1)])
+            
+            from models.training import summarize_background
+            self._fallback_background = summarize_background(np.concatenate(rows), BACKGROUND_SIZE)
+        return self._fallback_background
+    
+    @staticmethod
+    def _attribution_record(name, version, method, row, base_value, contributions):
+        order = np.argsort(-np.abs(contributions))
+        return {
+            "model": name,
+            "version": version,
+            "method": method,
+            "baseValue": round(base_value, 4),
+            "features": [
+                {
+                    "name": features.FEATURE_NAMES[i],
+                    "value": round(float(row[i]), 6),
+                    "contribution": round(float(contributions[i]), 4)
+                }
+                for i in order.tolist()
+            ]
+        }
+    
+    def _explain(self, symbol, prediction_data, attribution, detail):
+        """Human-readable explanation of a prediction, with its attributions if it has them"""
+        factors = prediction_data.factors
         
         # Generate overall explanation
-        overall_sentiment = "bullish" if prediction_data['percentChange'] > 0 else "bearish"
-        timeframe = prediction_data['timeframe']
-        confidence = prediction_data['confidence']
+        overall_sentiment = "bullish" if prediction_data.percentChange > 0 else "bearish"
+        timeframe = prediction_data.timeframe
+        confidence = prediction_data.confidence
+        
+        summary = f"The model has a {overall_sentiment} outlook for {symbol} over the next {timeframe} with {confidence}% confidence."
+        if detail == 'summary':
+            return {
+                "summary": summary,
+                "factors": {
+                    factor.name: {
+                        "impact": factor.impact,
+                        "weight": factor.weight,
+                        "interpretation": self._generate_interpretation(
+                            factor.name, factor.impact, factor.weight, factor.description)
+                    }
+                    for factor in factors
+                }
+            }
         
         explanation = {
-            "summary": f"The model has a {overall_sentiment} outlook for {symbol} over the next {timeframe} with {confidence}% confidence.",
+            "summary": summary,
             "factors": {},
             "interpretation": [],
             "caveats": [
@@ -44,22 +238,33 @@ class ModelExplainer:
         
         # Process each factor
         for factor in factors:
-            factor_name = factor['name']
-            impact = factor['impact']
-            weight = factor['weight']
-            description = factor['description']
+            factor_name = factor.name
+            impact = factor.impact
+            weight = factor.weight
+            description = factor.description
+            interpretation = self._generate_interpretation(factor_name, impact, weight, description)
             
             explanation['factors'][factor_name] = {
                 "impact": impact,
                 "weight": weight,
                 "description": description,
-                "interpretation": self._generate_interpretation(factor_name, impact, weight, description)
+                "interpretation": interpretation
             }
             
             # Add to overall interpretation list
             explanation['interpretation'].append({
                 "factor": factor_name,
-                "explanation": self._generate_interpretation(factor_name, impact, weight, description)
+                "explanation": interpretation
+            })
+        
+        if attribution is not None:
+            explanation['attributions'] = attribution
+            drivers = ", ".join(
+                f"{feature['name']} ({feature['contribution']:+.2f} pts)" for feature in attribution['features'][:3]
+            )
+            explanation['interpretation'].append({
+                "factor": "Model Attributions",
+                "explanation": f"The largest contributions to the predicted change come from {drivers}."
             })
         
         return explanation
@@ -99,4 +304,24 @@ class ModelExplainer:
                 return f"The sector is showing average performance with {weight}% influence on the prediction. {description}."
         
         else:
-            return f"{factor_name} has a {impact} impact with {weight}% influence on the prediction. {description}."
\ No newline at end of file
+            return f"{factor_name} has a {impact} impact with {weight}% influence on the prediction. {description}."
+
+
+def _import_shap():
+    """The shap package, or None if it isn't installed
+    
+    It takes over a second to import (numba, scikit-learn, SciPy), so it
+    is imported when the first model needing it is explained rather than
+    when a worker starts; a preloaded gunicorn master imports it for all.
+    """
+    try:
+        import shap
+    except ImportError:  # pragma: no cover - attributions for tree and other models need shap
+        return None
+    return shap
+
+
+def _is_tree_model(estimator):
+    """Whether shap's TreeExplainer supports the estimator (sklearn tree ensembles, XGBoost, LightGBM...)"""
+    return hasattr(estimator, 'estimators_') or hasattr(estimator, 'tree_') or hasattr(estimator, '_predictors') \
+        or type(estimator).__module__.split('.')[0] in ('xgboost', 'lightgbm', 'catboost')
\ No newline at end of file
@@ -72,18 +72,21 @@ const MarketSummary = ({ data }) => {
           <div key={i} className="flex justify-between items-start">
             <div>
               <h3 className="text-base font-medium text-gray-900 dark:text-white">{index.name}</h3>
-              <p className="text-lg font-bold text-gray-900 dark:text-white">{index.value.toFixed(2)}</p>
-            </div>
-            <div className={`flex items-center text-sm ${index.percentChange >= 0 ? 'text-green-600' : 'text-red-600'}`}>
-              {index.percentChange >= 0 ? (
-                <ArrowSmUpIcon className="h-4 w-4 mr-1" />
-              ) : (
-                <ArrowSmDownIcon className="h-4 w-4 mr-1" />
-              )}
-              <span>
-                {index.percentChange >= 0 ? '+' : ''}{index.change.toFixed(2)} ({index.percentChange >= 0 ? '+' : ''}{index.percentChange.toFixed(2)}%)
-              </span>
+              <p className="text-lg font-bold text-gray-900 dark:text-white">{index.value === null ? '—' : index.value.toFixed(2)}</p>
             </div>
+            {/* Indices without constituents among the listings have no level */}
+            {index.value !== null && (
+              <div className={`flex items-center text-sm ${index.percentChange >= 0 ? 'text-green-600' : 'text-red-600'}`}>
+                {index.percentChange >= 0 ? (
+                  <ArrowSmUpIcon className="h-4 w-4 mr-1" />
+                ) : (
+                  <ArrowSmDownIcon className="h-4 w-4 mr-1" />
+                )}
+                <span>
+                  {index.percentChange >= 0 ? '+' : ''}{index.change.toFixed(2)} ({index.percentChange >= 0 ? '+' : ''}{index.percentChange.toFixed(2)}%)
+                </span>
+              </div>
+            )}
           </div>
         ))}
       </div>